@@ -18,6 +18,12 @@ import time
 import urllib2
 import hashlib
 import hmac
+import Queue
+import errno
+import select
+import socket
+import threading
+import wsgiref.simple_server
 try:
     import json
 except ImportError:
@@ -31,6 +37,10 @@ from scalarizr.bus import bus
 LOG_CATEGORY = 'scalarizr.api'
 LOG = logging.getLogger(LOG_CATEGORY)
 
+POOL_SIZE = 8
+QUEUE_SIZE = 32
+KEEPALIVE_TIMEOUT = 5
+
 
 
 class Security(object):
@@ -91,8 +101,10 @@ class WsgiApplication(Security):
                 self.check_signature(environ['HTTP_X_SIGNATURE'], data, environ['HTTP_DATE'])
                 data = self.decrypt_data(data)
             except:
-                start_response('400 Bad request', [], sys.exc_info())
-                return str(sys.exc_info()[1])
+                body = str(sys.exc_info()[1])
+                start_response('400 Bad request',
+                               [('Content-length', str(len(body)))], sys.exc_info())
+                return [body, ]
 
             req = json.loads(data)
             with self.handle_meta_params(req):
@@ -110,16 +122,19 @@ class WsgiApplication(Security):
         except:
             if sys.exc_info()[0] in (SystemExit, KeyboardInterrupt):
                 raise
-            start_response('500 Internal Server Error', [], sys.exc_info())
+            start_response('500 Internal Server Error',
+                           [('Content-length', '0')], sys.exc_info())
             LOG.exception('Unhandled exception')
-            return ''
+            return ['', ]
 
 
     def handle_meta_params(self, req):
-        if 'params' in req and '_platform_access_data' in req['params']:
-            pl = bus.platform
-            pl.set_access_data(req['params']['_platform_access_data'])
-            del req['params']['_platform_access_data']
+        for r in req if isinstance(req, list) else [req]:
+            if isinstance(r, dict) and isinstance(r.get('params'), dict) \
+                    and '_platform_access_data' in r['params']:
+                pl = bus.platform
+                pl.set_access_data(r['params']['_platform_access_data'])
+                del r['params']['_platform_access_data']
         return self
 
     def __enter__(self):
@@ -132,6 +147,260 @@ class WsgiApplication(Security):
         # Commented to allow async=True processing
 
 
+class WSGIServerHandler(wsgiref.simple_server.ServerHandler):
+    http_version = '1.1'
+    keep_alive = False
+
+    def close(self):
+        # Connection can be reused only when client knows where response ends
+        self.keep_alive = bool(self.headers and self.headers.get('Content-Length'))
+        wsgiref.simple_server.ServerHandler.close(self)
+
+
+class _RequestBody(object):
+    """
+    Request body limited to Content-Length, so that unread body can be
+    drained before the next request on the same connection
+    """
+
+    def __init__(self, rfile, length):
+        self._rfile = rfile
+        self._left = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self._left:
+            size = self._left
+        data = self._rfile.read(size) if size else ''
+        self._left -= len(data)
+        return data
+
+    def readline(self, size=-1):
+        if size < 0 or size > self._left:
+            size = self._left
+        data = self._rfile.readline(size) if size else ''
+        self._left -= len(data)
+        return data
+
+    def drain(self):
+        while self._left and self.read(65536):
+            pass
+
+
+class WSGIRequestHandler(wsgiref.simple_server.WSGIRequestHandler):
+    """
+    HTTP/1.1 request handler. handle() serves a single request (and ones
+    already pipelined into rfile buffer), then kept-alive connection stays
+    open and server calls resume() when the next request arrives
+    """
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
+    # Headers and body are written separately, Nagle + delayed ACK
+    # would add ~40ms to every response on a kept-alive connection
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        self.close_connection = 1
+        self.handle_one_request()
+        # pipelined request is already read from socket, poller won't see it
+        while not self.close_connection and self._buffered():
+            self.handle_one_request()
+
+    def resume(self):
+        try:
+            self.handle()
+        finally:
+            self.finish()
+
+    def finish(self):
+        if self.close_connection:
+            wsgiref.simple_server.WSGIRequestHandler.finish(self)
+        elif not self.wfile.closed:
+            self.wfile.flush()
+
+    def _buffered(self):
+        rbuf = getattr(self.rfile, '_rbuf', None)
+        return bool(rbuf and rbuf.tell())
+
+    def handle_one_request(self):
+        try:
+            self.raw_requestline = self.rfile.readline(65537)
+        except socket.timeout:
+            self.close_connection = 1
+            return
+        if not self.raw_requestline:
+            self.close_connection = 1
+            return
+        if not self.parse_request():
+            return
+        try:
+            length = int(self.headers.get('content-length') or 0)
+        except ValueError:
+            length = 0
+        body = _RequestBody(self.rfile, length)
+        handler = WSGIServerHandler(body, self.wfile, self.get_stderr(), self.get_environ())
+        handler.request_handler = self
+        handler.run(self.server.get_app())
+        if not handler.keep_alive:
+            self.close_connection = 1
+        else:
+            body.drain()
+
+
+def _socketpair():
+    if hasattr(socket, 'socketpair'):
+        return socket.socketpair()
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        sock = socket.create_connection(listener.getsockname())
+        return listener.accept()[0], sock
+    finally:
+        listener.close()
+
+
+class _KeepAlivePoller(object):
+    """
+    Holds idle kept-alive connections off the handler threads. Connection
+    goes back to the pool when its next request becomes readable, and is
+    closed after `timeout` seconds of idleness
+    """
+
+    def __init__(self, server, timeout):
+        self.server = server
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._wakeup_r, self._wakeup_w = _socketpair()
+        self._thread = threading.Thread(target=self._run, name='API keep-alive poller')
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def park(self, handler):
+        with self._lock:
+            self._idle[handler.connection] = (handler, time.time())
+        self._wakeup()
+
+    def close(self):
+        self._closed = True
+        self._wakeup()
+
+    def _wakeup(self):
+        try:
+            self._wakeup_w.send('x')
+        except socket.error:
+            pass
+
+    def _run(self):
+        try:
+            while not self._closed:
+                with self._lock:
+                    socks = self._idle.keys()
+                try:
+                    readable = select.select(socks + [self._wakeup_r], [], [], 1)[0]
+                except select.error, e:
+                    if e.args[0] == errno.EINTR:
+                        continue
+                    raise
+                if self._wakeup_r in readable:
+                    self._wakeup_r.recv(4096)
+                now = time.time()
+                ready, expired = [], []
+                with self._lock:
+                    for sock, (handler, parked_at) in self._idle.items():
+                        if sock in readable:
+                            ready.append(handler)
+                        elif now - parked_at >= self.timeout:
+                            expired.append(handler)
+                        else:
+                            continue
+                        del self._idle[sock]
+                for handler in expired:
+                    self.server.close_connection(handler)
+                for handler in ready:
+                    self.server.resume_connection(handler)
+        finally:
+            with self._lock:
+                idle, self._idle = self._idle.values(), {}
+            for handler, _ in idle:
+                self.server.close_connection(handler)
+            self._wakeup_r.close()
+            self._wakeup_w.close()
+
+
+class ThreadPoolWSGIServer(wsgiref.simple_server.WSGIServer):
+    """
+    WSGI server with a fixed number of handler threads. Accepted
+    connections wait in a bounded queue. When the queue is full the
+    server stops accepting new connections until a handler frees up, so
+    extra clients wait in the listen backlog instead of spawning threads.
+    Handler threads serve requests, not connections: between requests
+    kept-alive connections wait in a poller without holding a thread
+    """
+    pool_size = POOL_SIZE
+    queue_size = QUEUE_SIZE
+    keepalive_timeout = KEEPALIVE_TIMEOUT
+    request_queue_size = 128
+    daemon_threads = True
+
+    def __init__(self, *args, **kwds):
+        wsgiref.simple_server.WSGIServer.__init__(self, *args, **kwds)
+        self._requests = Queue.Queue(self.queue_size)
+        self._keepalive = _KeepAlivePoller(self, self.keepalive_timeout)
+        self._workers = []
+        for i in range(self.pool_size):
+            t = threading.Thread(target=self._process_requests, name='API handler %d' % i)
+            t.setDaemon(self.daemon_threads)
+            t.start()
+            self._workers.append(t)
+
+    def process_request(self, request, client_address):
+        self._requests.put((None, request, client_address))
+
+    def resume_connection(self, handler):
+        self._requests.put((handler, handler.request, handler.client_address))
+
+    def close_connection(self, handler):
+        handler.close_connection = 1
+        try:
+            handler.finish()
+        finally:
+            self.shutdown_request(handler.request)
+
+    def _process_requests(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                break
+            handler, request, client_address = item
+            try:
+                if handler:
+                    handler.resume()
+                else:
+                    handler = self.RequestHandlerClass(request, client_address, self)
+            except:
+                self.handle_error(request, client_address)
+                self.shutdown_request(request)
+                continue
+            if handler.close_connection:
+                self.shutdown_request(request)
+            else:
+                self._keepalive.park(handler)
+
+    def server_close(self):
+        wsgiref.simple_server.WSGIServer.server_close(self)
+        self._keepalive.close()
+        for _ in self._workers:
+            self._requests.put(None)
+
+
+def make_server(host, port, app):
+    return wsgiref.simple_server.make_server(host, port, app,
+                    server_class=ThreadPoolWSGIServer,
+                    handler_class=WSGIRequestHandler)
+
+
 class HttpServiceProxy(rpc.ServiceProxy, Security):
 
     def __init__(self, endpoint, crypto_key_path, server_id=None, sign_only=False):
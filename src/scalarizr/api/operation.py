@@ -6,6 +6,7 @@ import time
 import logging
 import traceback
 import datetime
+import collections
 
 from scalarizr import rpc
 from scalarizr import bollard
@@ -46,8 +47,8 @@ class OperationAPIAdapter(object):
         return reduce(lambda x, y: x + y, (api.list() for api in self._apis))
 
     @rpc.query_method
-    def result(self, operation_id=None):
-        return self._get_api(operation_id).result(operation_id)
+    def result(self, operation_id=None, since=None):
+        return self._get_api(operation_id).result(operation_id, since=since)
 
     @rpc.command_method
     def cancel(self, operation_id=None):
@@ -78,12 +79,13 @@ class OperationAPI2(object):
         return retval
 
     @rpc.query_method
-    def result(self, operation_id=None):
+    def result(self, operation_id=None, since=None):
         """
         Returns result of an operation by operation ID.
 
         :param operation_id: Operation ID
         :type operation_id: str
+        :param since: Ignored, tasks don't keep logs
         """
         if operation_id is None:
             return None
@@ -121,14 +123,12 @@ class OperationAPI(object):
 
     __metaclass__ = Singleton
 
+    rotate_interval = 3600
+    finished_ttl = 172800  # 2 days
+
     def __init__(self):
         self._ops = {}
-        self.rotate_thread = threading.Thread(
-            name='Rotate finished operations',
-            target=OperationAPI.rotate_runnable
-        )
-        self.rotate_thread.setDaemon(True)
-        self.rotate_thread.start()
+        self._rotate_scheduled = False
 
     @rpc.query_method
     def list(self):
@@ -146,13 +146,16 @@ class OperationAPI(object):
 
 
     @rpc.query_method
-    def result(self, operation_id=None):
+    def result(self, operation_id=None, since=None):
         """
         Returns result of an operation by operation ID.
         :param operation_id: Operation ID
         :type operation_id: str
+        :param since: Return only log lines after this cursor,
+            pass 'logs_cursor' value from the previous result
+        :type since: int
         """
-        return self.get(operation_id).serialize()
+        return self.get(operation_id).serialize(since=since)
 
     @rpc.command_method
     def cancel(self, operation_id=None):
@@ -170,6 +173,7 @@ class OperationAPI(object):
     def create(self, name, func, **kwds):
         op = Operation(name, func, **kwds)
         self._ops[op.operation_id] = op
+        self._schedule_rotate()
         return op
 
     def get(self, operation_id):
@@ -206,16 +210,17 @@ class OperationAPI(object):
         else:
             return op.run()
 
-    @classmethod
-    def rotate_runnable(cls):
-        api = cls()
-        one_day = 86400
-        two_days = one_day * 2
-        while True:
-            time.sleep(one_day)
-            LOG.debug('Rotating operations finished older then 2 days')
-            for op in api.find(finished_before=two_days):
-                api.remove(op.operation_id)
+    def rotate(self):
+        LOG.debug('Rotating operations finished older then %s seconds', self.finished_ttl)
+        for op in self.find(finished_before=self.finished_ttl):
+            self.remove(op.operation_id)
+
+    def _schedule_rotate(self):
+        # periodical executor is created after some APIs are instantiated
+        if not self._rotate_scheduled and __node__['periodical_executor']:
+            __node__['periodical_executor'].add_task(
+                    self.rotate, self.rotate_interval, title='Rotate finished operations')
+            self._rotate_scheduled = True
 
 
 class _LogHandler(logging.Handler):
@@ -228,11 +233,13 @@ class _LogHandler(logging.Handler):
         msg = self.format(record)
         if trace_marker in msg:
             msg = msg[0:msg.index(trace_marker)].strip()
-        self.op.logs.append(msg)
+        self.op.log(msg)
 
 
 class Operation(object):
 
+    log_limit = 1000
+
     def __init__(self, name, func, func_args=None, func_kwds=None,
                  cancel_func=None, exclusive=False, notifies=True):
         self.operation_id = str(uuid.uuid4())
@@ -248,7 +255,9 @@ class Operation(object):
         self.notifies = notifies
         self.status = 'new'
         self.result = None
-        self.logs = []
+        self.logs = collections.deque(maxlen=self.log_limit)
+        self.logs_cursor = 0
+        self._logs_lock = threading.Lock()
         self.data = {}
         self.error = None
         self.started_at = None
@@ -257,18 +266,38 @@ class Operation(object):
         self.async = False
         self.canceled = False
         self.thread = None
-        self.logger = None
-        self._init_log()
+        # own child logger: concurrent operations with the same name
+        # must not collect each other's records
+        self.logger = logging.getLogger('scalarizr.ops.{0}.{1}'.format(
+                self.name, self.operation_id))
+        self._log_hdlr = None
 
     def _init_log(self):
-        self.logger = logging.getLogger('scalarizr.ops.{0}'.format(self.name))
-        hdlr = _LogHandler(self)
-        hdlr.setLevel(logging.INFO)
-        self.logger.addHandler(hdlr)
+        self._log_hdlr = _LogHandler(self)
+        self._log_hdlr.setLevel(logging.INFO)
+        self.logger.addHandler(self._log_hdlr)
+
+    def _close_log(self):
+        if self._log_hdlr:
+            self.logger.removeHandler(self._log_hdlr)
+            self._log_hdlr = None
+        # don't accumulate a logger per operation in logging manager,
+        # self.logger still propagates to 'scalarizr.ops'
+        logging._acquireLock()
+        try:
+            logging.Logger.manager.loggerDict.pop(self.logger.name, None)
+        finally:
+            logging._releaseLock()
+
+    def log(self, msg):
+        with self._logs_lock:
+            self.logs.append(msg)
+            self.logs_cursor += 1
 
     def _in_progress(self):
         self.status = 'in-progress'
         self.started_at = time.time()
+        self._init_log()
         try:
             self._completed(self.func(self, *self.func_args, **self.func_kwds))
             if self.canceled:
@@ -277,6 +306,7 @@ class Operation(object):
             self._failed()
         finally:
             self.finished_at = time.time()
+            self._close_log()
             if self.notifies:
                 __node__['messaging'].send('OperationResult', body=self.serialize())
 
@@ -320,7 +350,14 @@ class Operation(object):
         self.result = result
         self.status = 'completed'
 
-    def serialize(self):
+    def serialize(self, since=None):
+        with self._logs_lock:
+            logs = list(self.logs)
+            cursor = self.logs_cursor
+        if since is not None:
+            # cursor counts all lines, including ones pushed out of the buffer
+            new = min(max(cursor - int(since), 0), len(logs))
+            logs = logs[len(logs) - new:]
         ret = {
             'id': self.operation_id,
             'name': self.name,
@@ -328,7 +365,8 @@ class Operation(object):
             'result': self.result,
             'error': None,
             'trace': None,
-            'logs': self.logs,
+            'logs': logs,
+            'logs_cursor': cursor,
             'start_date': self.started_at and \
                     datetime.datetime.fromtimestamp(self.started_at).isoformat() or \
                     None,
@@ -7,9 +7,13 @@ Created on Feb 25, 2013
 import os
 import re
 import sys
+import errno
+import signal
 import logging
 import tempfile
 import shutil
+import subprocess
+import multiprocessing
 
 from scalarizr import bollard
 from scalarizr.bus import bus
@@ -25,7 +29,7 @@ from scalarizr.handlers import DbMsrMessages, HandlerError
 from scalarizr.handlers import transfer_result_to_backup_result
 from scalarizr.linux.coreutils import chown_r
 from scalarizr.services.postgresql import PSQL, PG_DUMP, SU_EXEC
-from scalarizr.storage2 import largetransfer
+from scalarizr.storage2 import largetransfer, cloudfs
 from scalarizr.util import Singleton
 from scalarizr.linux import pkgmgr
 from scalarizr import exceptions
@@ -42,6 +46,9 @@ OPT_SNAPSHOT_CNF = 'snapshot_config'
 OPT_REPLICATION_MASTER = postgresql_svc.OPT_REPLICATION_MASTER
 __postgresql__ = postgresql_svc.__postgresql__
 
+BACKUP_CONCURRENCY = 2
+BACKUP_JOBS_MIN_SIZE = 10 * 1024 ** 3
+
 
 def grow_volume_callback(task, meta):
     if task['state'] == 'completed':
@@ -81,6 +88,88 @@ def create_backup_callback(task, meta):
                 last_error=str(task.exception)))
 
 
+class _DumpGroups(object):
+    """
+    Process groups of running dumps in shared memory. Dumps are started
+    by the upload process, which can be killed before it closes them:
+    kill() in the parent then stops whatever is left
+    """
+
+    def __init__(self, size):
+        self._pids = multiprocessing.Array('i', size)
+
+    def started(self, slot, pid):
+        self._pids[slot] = pid
+
+    def closed(self, slot):
+        self._pids[slot] = 0
+
+    def kill(self):
+        for slot, pid in enumerate(self._pids[:]):
+            if pid:
+                _killpg(pid)
+                self._pids[slot] = 0
+
+
+def _killpg(pgid):
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except OSError, e:
+        if e.errno != errno.ESRCH:
+            raise
+
+
+class _PgDumpStream(object):
+    """
+    Readable stdout of a pg_dump process. Checks the process exit code
+    when the output is exhausted so a failed dump fails the upload.
+    Runs in its own process group: close() kills su, pg_dump workers and tar
+    together
+    """
+
+    def __init__(self, db_name, args, groups=None, slot=None):
+        self.db_name = db_name
+        self._closed = False
+        self._groups = groups
+        self._slot = slot
+        self._stderr = tempfile.TemporaryFile()
+        self._popen = subprocess.Popen(args, stdout=subprocess.PIPE,
+                                       stderr=self._stderr, close_fds=True,
+                                       preexec_fn=os.setsid)
+        if groups:
+            groups.started(slot, self._popen.pid)
+
+    def fileno(self):
+        return self._popen.stdout.fileno()
+
+    def read(self, size=-1):
+        data = self._popen.stdout.read(size)
+        if not data:
+            self._check()
+        return data
+
+    def _check(self):
+        try:
+            if self._popen.wait():
+                self._stderr.seek(0)
+                raise HandlerError('Error while dumping database %s: %s' % (
+                                   self.db_name, self._stderr.read()))
+        finally:
+            self.close()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._popen.poll() is None:
+            _killpg(self._popen.pid)
+            self._popen.wait()
+        if self._groups:
+            self._groups.closed(self._slot)
+        self._popen.stdout.close()
+        self._stderr.close()
+
+
 class PostgreSQLAPI(BehaviorAPI):
     """
     Basic API for managing PostgreSQL 9.x service.
@@ -297,36 +386,56 @@ class PostgreSQLAPI(BehaviorAPI):
         else:
             return async_result.get()
 
-    def do_backup(self):
+    def do_backup(self, concurrency=None, jobs=None, jobs_min_size=None):
+        """
+        Dumps all databases with concurrent pg_dump processes streamed
+        directly into cloud storage, one manifest entry per database.
+
+        :param concurrency: Number of databases dumped at the same time
+        :param jobs: When > 1, databases larger than jobs_min_size bytes are
+            dumped in directory format with `pg_dump -j jobs`. Such dumps
+            need free space in the storage tmp dir and are uploaded as tar
+        """
+        concurrency = concurrency or BACKUP_CONCURRENCY
+        jobs_min_size = jobs_min_size or BACKUP_JOBS_MIN_SIZE
         tmpdir = None
-        dumps = []
-        tmp_path = os.path.join(__postgresql__['storage_dir'], 'tmp')
+        groups = None
         try:
             # Get databases list
             psql = PSQL(user=self.postgresql.root_user.name)
             databases = psql.list_pg_databases()
             if 'template0' in databases:
                 databases.remove('template0')
-
-            if not os.path.exists(tmp_path):
-                os.makedirs(tmp_path)
-
-            # Dump all databases
-            LOG.info("Dumping all databases")
-            tmpdir = tempfile.mkdtemp(dir=tmp_path)
-            chown_r(tmpdir, self.postgresql.root_user.name)
-
-            def _single_backup(db_name):
-                dump_path = tmpdir + os.sep + db_name + '.sql'
-                pg_args = '%s %s --no-privileges -f %s' % (PG_DUMP, db_name, dump_path)
-                su_args = [SU_EXEC, '-', self.postgresql.root_user.name, '-c', pg_args]
-                err = system2(su_args)[1]
-                if err:
-                    raise HandlerError('Error while dumping database %s: %s' % (db_name, err))  # ?
-                dumps.append(dump_path)
-
-            for db_name in databases:
-                _single_backup(db_name)
+            # dumps are started in the upload process
+            groups = _DumpGroups(len(databases))
+
+            large_databases = []
+            if jobs and jobs > 1:
+                sizes = psql.list_pg_database_sizes()
+                large_databases = [db_name for db_name in databases
+                                   if sizes.get(db_name, 0) >= jobs_min_size]
+            if large_databases:
+                tmp_path = os.path.join(__postgresql__['storage_dir'], 'tmp')
+                if not os.path.exists(tmp_path):
+                    os.makedirs(tmp_path)
+                tmpdir = tempfile.mkdtemp(dir=tmp_path)
+                chown_r(tmpdir, self.postgresql.root_user.name)
+
+            def dumps():
+                for slot, db_name in enumerate(databases):
+                    if db_name in large_databases:
+                        pg_args = '%s -Fd -j %d --no-privileges -f %s %s && /bin/tar cp -C %s %s' % (
+                                PG_DUMP, jobs, os.path.join(tmpdir, db_name), db_name,
+                                tmpdir, db_name)
+                        streamer, extension = 'tar', 'tar'
+                    else:
+                        pg_args = '%s -Fc --no-privileges %s' % (PG_DUMP, db_name)
+                        streamer, extension = None, 'dump'
+                    LOG.info('Dumping database %s', db_name)
+                    dump = _PgDumpStream(db_name,
+                            [SU_EXEC, '-', self.postgresql.root_user.name, '-c', pg_args],
+                            groups=groups, slot=slot)
+                    yield cloudfs.NamedStream(dump, db_name, streamer=streamer, extension=extension)
 
             cloud_storage_path = __node__.platform.scalrfs.backups(BEHAVIOUR)
 
@@ -338,7 +447,10 @@ class PostgreSQLAPI(BehaviorAPI):
             def progress_cb(progress):
                 LOG.debug('Uploading %s bytes' % progress)
 
-            uploader = largetransfer.Upload(dumps, cloud_storage_path, progress_cb=progress_cb)
+            # pg_dump custom and directory formats are already compressed
+            uploader = largetransfer.Upload(dumps(), cloud_storage_path, gzip=False,
+                                            streams_concurrency=concurrency,
+                                            progress_cb=progress_cb)
             try:
                 uploader.apply_async()
                 uploader.join()
@@ -352,6 +464,9 @@ class PostgreSQLAPI(BehaviorAPI):
                 uploader.terminate()
                 raise
         finally:
+            # dumps still running after a failure would write into tmpdir
+            if groups:
+                groups.kill()
             if tmpdir:
                 shutil.rmtree(tmpdir, ignore_errors=True)
 
@@ -12,6 +12,7 @@ import platform
 import re
 import signal
 import subprocess
+import sys
 import threading
 import time
 import weakref
@@ -23,7 +24,7 @@ from scalarizr.bus import bus
 from scalarizr.handlers import script_executor
 from scalarizr.handlers.chef import ChefClient
 from scalarizr.handlers.chef import ChefSolo
-from scalarizr.linux import mount
+from scalarizr.linux import procstat
 from scalarizr.node import __node__
 from scalarizr.queryenv import ScalingMetric
 from scalarizr.util import kill_childs
@@ -49,12 +50,14 @@ max_log_size = 5*1024*1024
 class _ScalingMetricStrategy(object):
     """Strategy class for custom scaling metric"""
 
+    exec_timeout = 3
+
     @staticmethod
     def _get_execute(metric):
         if not os.access(metric.path, os.X_OK):
             raise BaseException("File is not executable: '%s'" % metric.path)
 
-        exec_timeout = 3
+        exec_timeout = metric.timeout or _ScalingMetricStrategy.exec_timeout
         close_fds = fact['os']['name'] != 'windows'
         proc = subprocess.Popen(
             metric.path,
@@ -62,22 +65,25 @@ class _ScalingMetricStrategy(object):
             stderr=subprocess.PIPE,
             close_fds=close_fds)
 
-        timeout_time = time.time() + exec_timeout
-        while time.time() < timeout_time:
-            if proc.poll() is None:
-                time.sleep(0.2)
-            else:
-                break
-        else:
+        timeouted = []
+
+        def kill():
+            timeouted.append(True)
             kill_childs(proc.pid)
             if hasattr(proc, 'terminate'):
                 # python >= 2.6
                 proc.terminate()
             else:
                 os.kill(proc.pid, signal.SIGTERM)
-            raise BaseException('Timeouted')
 
-        stdout, stderr = proc.communicate()
+        timer = threading.Timer(exec_timeout, kill)
+        timer.start()
+        try:
+            stdout, stderr = proc.communicate()
+        finally:
+            timer.cancel()
+        if timeouted:
+            raise BaseException('Timeouted')
 
         if proc.returncode > 0:
             raise BaseException(stderr if stderr else 'exitcode: %d' % proc.returncode)
@@ -117,6 +123,118 @@ class _ScalingMetricStrategy(object):
         return {'id':metric.id, 'name':metric.name, 'value':value, 'error':error}
 
 
+class _ScalingMetricsCollector(object):
+    """
+    Collects custom scaling metrics in background, each one every
+    `metric.interval` (default `interval`) seconds, and keeps the last result.
+    Metric definitions are re-read from QueryEnv every `metrics_ttl` seconds.
+    Collection stops when results were not requested for `idle_timeout` seconds
+    """
+
+    interval = 60
+    metrics_ttl = 300
+    idle_timeout = 600
+    workers = 10
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._metrics = []
+        self._metrics_updated = 0
+        self._results = {}
+        self._accessed = 0
+        self._thread = None
+        self._pool = None
+
+    def results(self):
+        """
+        :returns: list of last results in metrics order, collecting
+            the ones that were never collected before
+        """
+        now = time.time()
+        if now - self._metrics_updated > self.metrics_ttl:
+            self._set_metrics(bus.queryenv_service.get_scaling_metrics() or [], now)
+        with self._lock:
+            self._accessed = now
+            metrics = list(self._metrics)
+            missing = [m for m in metrics if m.id not in self._results]
+        if missing:
+            self._collect(missing)
+        self._ensure_running()
+
+        ret = []
+        with self._lock:
+            for m in metrics:
+                # concurrent call may have replaced metrics meanwhile
+                if m.id not in self._results:
+                    continue
+                result, collected = self._results[m.id]
+                result = dict(result, age=int(now - collected) if collected < now else 0)
+                ret.append(result)
+        return ret
+
+    def _set_metrics(self, metrics, now):
+        with self._lock:
+            ids = set(m.id for m in metrics)
+            for id in self._results.keys():
+                if id not in ids:
+                    del self._results[id]
+            self._metrics = metrics
+            self._metrics_updated = now
+        self._wakeup.set()
+
+    def _collect(self, metrics):
+        for metric, result in zip(metrics, self._get_pool().map(_ScalingMetricStrategy.get, metrics)):
+            with self._lock:
+                self._results[metric.id] = (result, time.time())
+
+    def _get_pool(self):
+        with self._lock:
+            if not self._pool:
+                if not hasattr(threading.current_thread(), '_children'):
+                    threading.current_thread()._children = weakref.WeakKeyDictionary()
+                self._pool = pool.ThreadPool(processes=self.workers)
+            return self._pool
+
+    def _ensure_running(self):
+        with self._lock:
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run, name='Scaling metrics collector')
+                self._thread.setDaemon(True)
+                self._thread.start()
+
+    def _due(self, now):
+        due, next_time = [], now + self.interval
+        for m in self._metrics:
+            if m.id not in self._results:
+                continue
+            run_time = self._results[m.id][1] + (m.interval or self.interval)
+            if run_time <= now:
+                due.append(m)
+            else:
+                next_time = min(next_time, run_time)
+        return due, next_time
+
+    def _run(self):
+        while True:
+            now = time.time()
+            with self._lock:
+                if now - self._accessed > self.idle_timeout:
+                    LOG.debug('Scaling metrics were not requested for %d seconds, '
+                              'stopping collection', self.idle_timeout)
+                    self._thread = None
+                    return
+                due, next_time = self._due(now)
+            if due:
+                try:
+                    self._collect(due)
+                except:
+                    LOG.warn('Failed to collect scaling metrics', exc_info=sys.exc_info())
+                continue
+            self._wakeup.wait(max(next_time - time.time(), 1))
+            self._wakeup.clear()
+
+
 class SystemAPI(object):
     """
     Pluggable API to get system information similar to SNMP, Facter(puppet), Ohai(chef).
@@ -138,6 +256,7 @@ class SystemAPI(object):
 
     def __init__(self):
         self._op_api = operation_api.OperationAPI()
+        self._scaling_metrics = _ScalingMetricsCollector()
 
 
     def _readlines(self, path):
@@ -328,7 +447,7 @@ class SystemAPI(object):
                 'idle': 147309
             }
         """
-        return fact['stat']['cpu']
+        return self._stat('cpu')
 
 
     @rpc.query_method
@@ -348,7 +467,7 @@ class SystemAPI(object):
                 'cached': 316756
             }
         """
-        return fact['stat']['memory']
+        return self._stat('memory')
 
 
     @rpc.query_method
@@ -363,7 +482,7 @@ class SystemAPI(object):
                0.05      // LA15
             ]
         """
-        return fact['stat']['load_average']
+        return self._stat('load_average')
 
 
     @rpc.query_method
@@ -387,7 +506,7 @@ class SystemAPI(object):
             }
         See more at http://www.kernel.org/doc/Documentation/iostats.txt
         """
-        return fact['stat']['disk']
+        return self._stat('disk')
 
 
     @rpc.query_method
@@ -411,7 +530,7 @@ class SystemAPI(object):
                 ...
             }
         """
-        return fact['stat']['net']
+        return self._stat('net')
 
 
     @rpc.query_method
@@ -444,15 +563,18 @@ class SystemAPI(object):
                         'not %s' % type(mpoints))
 
         res = dict()
-        mounts = mount.mounts()
+        mounts = self._stat('mounts') or {}
         for mpoint in mpoints:
-            try:
-                assert mpoint in mounts
+            entry = mounts.get(mpoint)
+            if entry and entry['total'] is not None:
+                res[mpoint] = {'total': entry['total'], 'free': entry['free']}
+            elif not entry and os.path.ismount(mpoint):
+                # pseudo file systems are not sampled
                 mpoint_stat = os.statvfs(mpoint)
                 res[mpoint] = dict()
                 res[mpoint]['total'] = (mpoint_stat.f_bsize * mpoint_stat.f_blocks) / 1024  # Kb
                 res[mpoint]['free'] = (mpoint_stat.f_bsize * mpoint_stat.f_bavail) / 1024   # Kb
-            except:
+            else:
                 res[mpoint] = None
 
         return res
@@ -460,15 +582,29 @@ class SystemAPI(object):
 
     @rpc.query_method
     def mounts(self):
-        skip_mpoint_re = re.compile(r'/(sys|proc|dev|selinux)')
-        skip_fstype = ('tmpfs', 'devfs')
-        ret = {}
-        for m in mount.mounts():
-            if m.mpoint and (not (skip_mpoint_re.search(m.mpoint) or m.fstype in skip_fstype)):
-                entry = m._asdict()
-                entry.update(self.statvfs([m.mpoint])[m.mpoint])
-                ret[m.mpoint] = entry
-        return ret
+        return self._stat('mounts')
+
+
+    @rpc.query_method
+    def stat_rates(self, period=None):
+        """
+        :return: Per-second rates of cpu, disk and net counters computed from
+            recently sampled stats, or None when there is no earlier sample yet.
+        :param period: Max age in seconds of the earlier sample, by default
+            the oldest kept one is used
+        Example::
+            {
+                'period': 60.0,
+                'cpu': {'user': 1.5, 'nice': 0.0, 'system': 0.7, 'idle': 97.8},
+                'disk': {'xvda1': {'read': {'num': 0.1, 'sectors': 2.0, 'bytes': 1024.0}, ...}},
+                'net': {'eth0': {'receive': {'bytes': 1024.0, 'packets': 5.0, 'errors': 0.0}, ...}}
+            }
+        """
+        return procstat.sampler.rates(period, max_age=__node__['base']['stat_sample_interval'])
+
+
+    def _stat(self, name):
+        return procstat.sampler.snapshot(__node__['base']['stat_sample_interval'])[name]
 
 
     @rpc.command_method
@@ -482,30 +618,21 @@ class SystemAPI(object):
                 'id': 101011,
                 'name': 'jmx.scaling',
                 'value': 1,
-                'error': None
+                'error': None,
+                'age': 12
             }, {
                 'id': 202020,
                 'name': 'app.poller',
                 'value': None,
-                'error': 'Couldnt connect to host'
+                'error': 'Couldnt connect to host',
+                'age': 12
             }]
+        'age' is the number of seconds since the value was collected
         """
 
-        # Obtain scaling metrics from Scalr.
-        scaling_metrics = bus.queryenv_service.get_scaling_metrics()
-        if not scaling_metrics:
-            return []
-
-        if not hasattr(threading.current_thread(), '_children'):
-            threading.current_thread()._children = weakref.WeakKeyDictionary()
-
-        wrk_pool = pool.ThreadPool(processes=10)
-
-        try:
-            return wrk_pool.map_async(_ScalingMetricStrategy.get, scaling_metrics).get()
-        finally:
-            wrk_pool.close()
-            wrk_pool.join()
+        # Metrics are collected in background, values are up to
+        # metric interval (60 seconds by default) old.
+        return self._scaling_metrics.results()
 
 
     @rpc.command_method
@@ -527,10 +654,17 @@ class SystemAPI(object):
 
 
     @rpc.query_method
-    def get_script_logs(self, exec_script_id, maxsize=max_log_size):
+    def get_script_logs(self, exec_script_id, maxsize=max_log_size,
+                        stdout_offset=None, stderr_offset=None):
         '''
         :return: stdout and stderr scripting logs
         :rtype: dict(stdout: base64encoded, stderr: base64encoded)
+
+        When stdout_offset or stderr_offset is passed, returns up to maxsize bytes
+        of each log starting from offset instead of the log tail, along with
+        the next offsets and current log sizes, so polling clients fetch
+        only new output:
+        dict(stdout, stdout_offset, stdout_size, stderr, stderr_offset, stderr_size)
         '''
         stdout_match = glob.glob(os.path.join(
             script_executor.logs_dir,
@@ -543,6 +677,21 @@ class SystemAPI(object):
                     'You can increase "Rotate scripting logs" setting under "Advanced" tab'
                     ' in Farm Designer')
 
+        if stdout_offset is not None or stderr_offset is not None:
+            ret = {}
+            for name, match, offset in (('stdout', stdout_match, stdout_offset),
+                                        ('stderr', stderr_match, stderr_offset)):
+                if not match:
+                    ret[name] = binascii.b2a_base64(err_rotated)
+                    ret[name + '_offset'] = ret[name + '_size'] = None
+                    continue
+                data, next_offset, size = script_executor.read_log_range(
+                        match[0], int(offset or 0), maxsize)
+                ret[name] = binascii.b2a_base64(data)
+                ret[name + '_offset'] = next_offset
+                ret[name + '_size'] = size
+            return ret
+
         if not stdout_match:
             stdout = binascii.b2a_base64(err_rotated)
         else:
@@ -598,6 +747,9 @@ if fact['os']['name'] == 'windows':
         _UPDATE_LOG_FILE = os.path.join(__node__['log_dir'], 'scalarizr_update.log')
         _pending_hostname = None
 
+        def _stat(self, name):
+            return fact['stat'][name]
+
         @rpc.command_method
         def set_hostname(self, hostname=None):
             super(WindowsSystemAPI, self).set_hostname(hostname)
@@ -2,11 +2,9 @@
 import sys
 import re
 
-try:
-    import httplib2
-    httplib2_loaded = True
-except ImportError:
-    httplib2_loaded = False
+# Installed first to account for everything imported below
+from scalarizr.util import startup
+startup.profile_imports()
 
 # Core
 from scalarizr import __version__
@@ -16,7 +14,6 @@ from scalarizr.node import __node__
 from scalarizr.linux import coreutils, mount
 from scalarizr.bus import bus
 from scalarizr.config import CmdLineIni, ScalarizrCnf, ScalarizrState, ScalarizrOptions, STATE
-from scalarizr.storage import Storage
 from scalarizr.handlers import MessageListener
 from scalarizr.messaging import MessageServiceFactory, MessageService, MessageConsumer, Queues, Messages
 from scalarizr.platform import PlatformFactory, UserDataOptions
@@ -34,8 +31,6 @@ if linux.os.windows:
     import win32timezone as os_time
 else:
     from datetime import datetime as os_time
-import psutil
-import requests
 
 # Utils
 from scalarizr import util
@@ -60,8 +55,6 @@ import urllib2
 import pprint
 import binascii
 import select
-import wsgiref.simple_server
-import SocketServer
 
 from scalarizr import exceptions
 
@@ -214,6 +207,17 @@ def _init():
     initdv2.explore("scalarizr", ScalarizrInitScript)
 
 
+# Bollard task modules of behaviors. Workers import them only on hosts
+# with one of these behaviors; mariadb imports mysql tasks itself
+BEHAVIOR_TASK_MODULES = {
+    'mysql': 'scalarizr.api.mysql',
+    'mysql2': 'scalarizr.api.mysql',
+    'percona': 'scalarizr.api.mysql',
+    'mariadb': 'scalarizr.api.mariadb',
+    'postgresql': 'scalarizr.api.postgresql',
+    'redis': 'scalarizr.api.redis'
+}
+
 DB_NAME = 'db.sqlite'
 DB_SCRIPT = 'db.sql'
 
@@ -311,13 +315,18 @@ def _init_platform():
         logger.debug('Enable RedHat subscription')
         urllib.urlretrieve('http://169.254.169.254/latest/dynamic/instance-identity/document')
 
-    if httplib2_loaded:
+    try:
+        import httplib2
+    except ImportError:
+        pass
+    else:
         httplib2.CA_CERTS = os.path.join(os.path.dirname(__file__), 'cacert.pem')
 
     # Initialize platform
     logger.debug("Initialize platform")
     if platform_name:
         bus.platform = PlatformFactory().new_platform(platform_name)
+        bus.platform.prefetch_metadata()
     else:
         raise ScalarizrError("Platform not defined")
 
@@ -630,6 +639,7 @@ class Service(object):
 
 
     def start(self):
+        phases = startup.PhaseTimer()
         self._logger.debug("Initialize scalarizr...")
         _init()
         _init_environ()
@@ -684,6 +694,7 @@ class Service(object):
             self._talk_to_updclient()
             # UpdateClient should fetch meta-data for us.
             metadata.wait(timeout=60)
+            phases.mark('metadata')
 
         if linux.os.windows:
             try:
@@ -716,10 +727,12 @@ class Service(object):
         # Load INI files configuration
         cnf.bootstrap(force_reload=True)
         ini = cnf.rawini
+        phases.mark('configuration')
 
         # Initialize platform module
         _init_platform()
         pl = bus.platform
+        phases.mark('platform')
 
         # Initialize local database
         _init_db()
@@ -755,8 +768,11 @@ class Service(object):
         if num_errors or (optparser and optparser.values.validate_cnf):
             sys.exit(int(not num_errors or 1))
 
+        phases.mark('database')
+
         # Initialize scalarizr services
         self._init_services()
+        phases.mark('services')
 
         if STATE['global.start_after_update'] and __node__['state'] == 'running':
             self._logger.info('Scalarizr was updated to %s', __version__)
@@ -773,6 +789,7 @@ class Service(object):
         except:
             self._logger.warn('Caught exception in "init": %s', sys.exc_info()[1],
                         exc_info=sys.exc_info())
+        phases.mark('init handlers')
 
         # Install signal handlers
         if not linux.os.windows:
@@ -788,6 +805,8 @@ class Service(object):
             if isinstance(e, SystemExit):
                 raise
             self._logger.warn('Caught exception in "start": %s', e, exc_info=sys.exc_info())
+        phases.mark('start handlers')
+        self._log_startup(phases)
 
         try:
             while self.running:
@@ -837,7 +856,15 @@ class Service(object):
                 return True
 
 
+    def _log_startup(self, phases):
+        self._logger.debug('Started in %.2fs (%s)', phases.total, phases.report())
+        if startup.import_profiler.stats:
+            startup.import_profiler.uninstall()
+            self._logger.debug('Slowest imports:\n%s', startup.import_profiler.report())
+
+
     def _ensure_resolver(self, url):
+        import requests
         try:
             requests.get(url, verify=False, timeout=(1, 0.01))
         except requests.ConnectionError as e:
@@ -939,6 +966,7 @@ class Service(object):
             })
         producer.on('before_send', msg_meta)
 
+        from scalarizr.storage import Storage
         Storage.maintain_volume_table = True
 
         if not bus.api_server:
@@ -953,12 +981,9 @@ class Service(object):
             STATE['global.api_port'] = api_port
             api_app = jsonrpc_http.WsgiApplication(rpc.RequestHandler(api.api_routes),
                                                 cnf.key_path(cnf.DEFAULT_KEY))
-            class ThreadingWSGIServer(SocketServer.ThreadingMixIn, wsgiref.simple_server.WSGIServer):
-                pass
-            bus.api_server = wsgiref.simple_server.make_server('0.0.0.0',
+            bus.api_server = jsonrpc_http.make_server('0.0.0.0',
                                 __node__['base']['api_port'],
-                                api_app,
-                                server_class=ThreadingWSGIServer)
+                                api_app)
 
         if ports_non_default:
             msg = msg_service.new_message('HostUpdate', None, {
@@ -1082,14 +1107,14 @@ class Service(object):
             '/var/lib/scalarizr'
         agent.config.CACHE_DIR = os.path.join(agent.config.HOME_DIR, 'cache')
         task_modules = [
-            'scalarizr.api.mariadb',
-            'scalarizr.api.mysql',
             'scalarizr.api.operation',
-            'scalarizr.api.postgresql',
-            'scalarizr.api.redis',
             'scalarizr.api.storage',
-            'scalarizr.api.system'] + \
-            list(agent.celeryfile.CELERY_INCLUDE)
+            'scalarizr.api.system']
+        for behavior in __node__['behavior']:
+            module = BEHAVIOR_TASK_MODULES.get(behavior)
+            if module and module not in task_modules:
+                task_modules.append(module)
+        task_modules += list(agent.celeryfile.CELERY_INCLUDE)
         callbacks = {
             'global.push': _bollard_pass_access_data,
             'global.before': _bollard_set_access_data,
@@ -11,7 +11,7 @@ from scalarizr.util import validators
 
 from ConfigParser import ConfigParser, RawConfigParser, NoOptionError, NoSectionError
 from getpass import getpass
-import os, sys, logging
+import os, sys, time, logging, threading
 try:
     import json
 except ImportError:
@@ -946,32 +946,93 @@ class ScalarizrCnf(Observable):
 
 
 class State(dict):
+    '''
+    Rows are cached after the first read, writes go through to database.
+    Database file mtime is checked at most once per check_interval seconds:
+    any change made by other processes (bollard workers, szradm) drops
+    the whole cache.
+    '''
+
+    check_interval = 1.0
+
+    def __init__(self):
+        super(State, self).__init__()
+        self._cache = {}
+        self._cache_conn = None
+        self._db_file = None
+        self._db_mtime = None
+        self._checked_at = 0
+        self._lock = threading.RLock()
 
     def _conn(self):
         return bus.db
 
-
-    def __getitem__(self, name):
-        conn = self._conn()
+    def _db_path(self, conn):
         cur = conn.cursor()
         try:
-            cur.execute("SELECT value FROM state WHERE name = ?", [name])
-            ret = cur.fetchone()
-            try:
-                return json.loads(ret['value'])
-            except (TypeError, KeyError, ValueError):
-                return ret
+            cur.execute("PRAGMA database_list")
+            for row in cur.fetchall():
+                if row[1] == 'main':
+                    return row[2] or None
         finally:
             cur.close()
 
-    def __setitem__(self, name, value):
+    def _mtime(self):
+        try:
+            return self._db_file and os.stat(self._db_file).st_mtime
+        except OSError:
+            return None
+
+    def _validate(self, conn, force=False):
+        with self._lock:
+            if conn is not self._cache_conn:
+                self._cache.clear()
+                self._cache_conn = conn
+                self._db_file = self._db_path(conn)
+                force = True
+            now = time.time()
+            if not force and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            mtime = self._mtime()
+            if mtime != self._db_mtime:
+                self._cache.clear()
+                self._db_mtime = mtime
+
+
+    def __getitem__(self, name):
         conn = self._conn()
-        cur = conn.cursor()
+        self._validate(conn)
         try:
-            cur.execute("INSERT INTO state VALUES (?, ?)", [name, json.dumps(value) ])
-        finally:
-            cur.close()
-        conn.commit()
+            ret = self._cache[name]
+        except KeyError:
+            with self._lock:
+                cur = conn.cursor()
+                try:
+                    cur.execute("SELECT value FROM state WHERE name = ?", [name])
+                    ret = self._cache[name] = cur.fetchone()
+                finally:
+                    cur.close()
+        try:
+            return json.loads(ret['value'])
+        except (TypeError, KeyError, ValueError):
+            return ret
+
+    def __setitem__(self, name, value):
+        conn = self._conn()
+        with self._lock:
+            # pick up changes made by others before own write changes mtime
+            self._validate(conn, force=True)
+            self._cache.pop(name, None)
+            value = json.dumps(value)
+            cur = conn.cursor()
+            try:
+                cur.execute("INSERT INTO state VALUES (?, ?)", [name, value])
+            finally:
+                cur.close()
+            conn.commit()
+            self._cache[name] = {'value': value}
+            self._db_mtime = self._mtime()
 
     def get_all(self, name):
         conn = self._conn()
@@ -15,6 +15,7 @@ import logging
 import threading
 import pprint
 import sys
+import time
 import traceback
 import uuid
 import codecs
@@ -182,12 +183,14 @@ class MessageListener:
 
             cnf = bus.cnf
             for _, module_str in cnf.rawini.items(config.SECT_HANDLERS):
+                start = time.time()
                 __import__(module_str)
                 try:
                     hds.extend(sys.modules[module_str].get_handlers())
                 except:
                     LOG.error("Can't get module handlers (module: %s)", module_str)
                     raise
+                LOG.debug('Loaded %s in %.3fs', module_str, time.time() - start)
 
             def cls_weight(obj):
                 cls = obj.__class__.__name__
@@ -646,6 +649,60 @@ class DbMsrMessages:
     """
 
 
+class ReadinessWaiter(object):
+    """
+    Polls check() until it returns true value. Pauses between attempts start
+    at `delay` seconds and grow `factor` times up to `max_delay`. Receiving
+    any of `wake_on` messages ends current pause immediately, so replication
+    handlers react to DbMsr_NewMasterUp/HostUp without waiting for the next poll.
+
+    Example:
+    >> waiter = ReadinessWaiter(wake_on=(DbMsrMessages.DBMSR_NEW_MASTER_UP, ))
+    >> master = waiter.wait(find_master, timeout=600)
+    """
+
+    def __init__(self, wake_on=(), delay=0.5, factor=2, max_delay=5, logger=None):
+        self.wake_on = set(wake_on)
+        self.delay = delay
+        self.factor = factor
+        self.max_delay = max_delay
+        self.logger = logger or LOG
+        self._wakeup = threading.Event()
+
+    def _on_message(self, message, queue):
+        if message.name in self.wake_on:
+            self.logger.debug('Received %s, checking again', message.name)
+            self._wakeup.set()
+
+    def _consumer(self):
+        if self.wake_on and bus.messaging_service:
+            return bus.messaging_service.get_consumer()
+
+    def wait(self, check, timeout=None):
+        """
+        @return: check() result, or None when timeout reached
+        """
+        result = []
+        def ready():
+            ret = check()
+            if ret:
+                result.append(ret)
+            return ret
+
+        consumer = self._consumer()
+        if consumer:
+            consumer.ingoing_listeners.append(self._on_message)
+        try:
+            util.wait_until(ready, sleep=self.delay, backoff=self.factor,
+                            max_sleep=self.max_delay, timeout=timeout,
+                            raise_exc=False, wakeup=self._wakeup,
+                            logger=self.logger)
+        finally:
+            if consumer:
+                consumer.ingoing_listeners.remove(self._on_message)
+        return result[0] if result else None
+
+
 class FarmSecurityMixin(object):
     def __init__(self):
         self.__enabled = False
@@ -29,7 +29,7 @@ from scalarizr.messaging import Messages
 from scalarizr.util import wait_until, Hosts, cryptotool
 
 from scalarizr.config import BuiltinBehaviours, ScalarizrState, STATE
-from scalarizr.handlers import ServiceCtlHandler, HandlerError
+from scalarizr.handlers import ServiceCtlHandler, HandlerError, ReadinessWaiter
 from scalarizr import storage2
 
 from scalarizr.node import __node__
@@ -508,16 +508,16 @@ class MongoDBHandler(ServiceCtlHandler):
                 if wait_for_config_server:
                     self._logger.info('Waiting until mongo config server on mongo-0-0 becomes alive')
                     log.info('Wait for ConfigServer on mongo-0-0')
-                    while not cfg_server_running:
+                    def cfg_server_up():
                         try:
-                            time.sleep(20)
                             role_hosts = self._get_cluster_hosts()
                             for host in role_hosts:
                                 if host.shard_index == 0 and host.replica_set_index == 0:
-                                    cfg_server_running = True
-                                    break
+                                    return True
                         except:
                             self._logger.debug('Caught exception', exc_info=sys.exc_info())
+                    waiter = ReadinessWaiter(wake_on=(Messages.HOST_UP, ), max_delay=20)
+                    cfg_server_running = waiter.wait(cfg_server_up)
 
 
             log.info('Start Router')
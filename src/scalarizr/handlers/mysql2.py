@@ -15,7 +15,7 @@ import threading
 # Core
 from scalarizr.bus import bus
 from scalarizr.messaging import Messages
-from scalarizr.handlers import ServiceCtlHandler, DbMsrMessages, HandlerError
+from scalarizr.handlers import ServiceCtlHandler, DbMsrMessages, HandlerError, ReadinessWaiter
 import scalarizr.services.mysql as mysql_svc
 from scalarizr.service import CnfController, _CnfManifest
 from scalarizr.services import ServiceError
@@ -1112,16 +1112,15 @@ class MysqlHandler(DBMSRHandler):
 
 
     def get_master_host(self):
-        master_host = None
-        while not master_host:
+        def find_master():
             try:
-                master_host = list(host
+                return list(host
                         for host in self._queryenv.list_roles(behaviour=__mysql__['behavior'])[0].hosts
                         if host.replication_master)[0]
             except IndexError:
-                LOG.debug("QueryEnv respond with no mysql master. " +
-                                "Waiting %d seconds before the next attempt", 5)
-            time.sleep(5)
+                LOG.debug("QueryEnv respond with no mysql master")
+        waiter = ReadinessWaiter(wake_on=(DbMsrMessages.DBMSR_NEW_MASTER_UP, Messages.HOST_UP))
+        master_host = waiter.wait(find_master)
         LOG.debug("Master server obtained (local_ip: %s, public_ip: %s)",
                         master_host.internal_ip, master_host.external_ip)
         return master_host.internal_ip or master_host.external_ip
@@ -1265,15 +1264,13 @@ class MysqlHandler(DBMSRHandler):
         if result and 'ERROR' in result:
             raise HandlerError('Cannot start mysql slave: %s' % result)
 
-        time_until = time.time() + timeout
-        status = None
-        while time.time() <= time_until:
-            status = self.root_client.slave_status()
-            if status['Slave_IO_Running'] == 'Yes' and \
-                    status['Slave_SQL_Running'] == 'Yes':
-                break
-            time.sleep(5)
-        else:
+        status = {}
+        def replication_running():
+            status.update(self.root_client.slave_status())
+            return status['Slave_IO_Running'] == 'Yes' and \
+                    status['Slave_SQL_Running'] == 'Yes'
+
+        if not ReadinessWaiter().wait(replication_running, timeout=timeout):
             if status:
                 if not status['Last_Error']:
                     logfile = firstmatched(lambda p: os.path.exists(p),
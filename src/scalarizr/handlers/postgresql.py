@@ -15,7 +15,7 @@ from scalarizr import config
 from scalarizr.bus import bus
 from scalarizr.messaging import Messages
 from scalarizr.config import ScalarizrState
-from scalarizr.handlers import ServiceCtlHandler, HandlerError, DbMsrMessages
+from scalarizr.handlers import ServiceCtlHandler, HandlerError, DbMsrMessages, ReadinessWaiter
 from scalarizr.linux.coreutils import chown_r
 from scalarizr import linux
 from scalarizr.util import system2, software, cryptotool, initdv2
@@ -651,18 +651,16 @@ class PostgreSqlHander(ServiceCtlHandler):
 
 
     def _get_master_host(self):
-        master_host = None
-        LOG.info("Requesting master server")
-        while not master_host:
+        def find_master():
             try:
-                master_host = list(host
+                return list(host
                     for host in self._queryenv.list_roles(behaviour=BEHAVIOUR)[0].hosts
                     if host.replication_master)[0]
             except IndexError:
-                LOG.debug("QueryEnv respond with no postgresql master. " +
-                        "Waiting %d seconds before the next attempt", 5)
-                time.sleep(5)
-        return master_host
+                LOG.debug("QueryEnv respond with no postgresql master")
+        LOG.info("Requesting master server")
+        waiter = ReadinessWaiter(wake_on=(DbMsrMessages.DBMSR_NEW_MASTER_UP, Messages.HOST_UP))
+        return waiter.wait(find_master)
 
     def _get_slave_hosts(self):
         LOG.info("Requesting standby servers")
@@ -12,9 +12,10 @@ from scalarizr.bus import bus
 from scalarizr.config import ScalarizrState
 from scalarizr.handlers import Handler, HandlerError
 from scalarizr.messaging import Messages, Queues
+from scalarizr.messaging.loghandler import MessagingLogHandler
 from scalarizr.storage2 import filesystem
 from scalarizr.storage2.util import loop
-from scalarizr.util import system2, software
+from scalarizr.util import system2, software, format_size
 from scalarizr import linux
 from scalarizr.linux import mount, coreutils, rsync
 
@@ -39,18 +40,16 @@ class StopRebundle(BaseException):
 
 
 
-class RebundleLogHandler(logging.Handler):
+class RebundleLogHandler(MessagingLogHandler):
     def __init__(self, bundle_task_id=None):
-        logging.Handler.__init__(self, logging.INFO)
+        MessagingLogHandler.__init__(self, Messages.REBUNDLE_LOG, queue=Queues.LOG)
         self.bundle_task_id = bundle_task_id
-        self._msg_service = bus.messaging_service
 
-    def emit(self, record):
-        msg = self._msg_service.new_message(Messages.REBUNDLE_LOG, body=dict(
+    def make_body(self, lines):
+        return dict(
                 bundle_task_id = self.bundle_task_id,
-                message = record.msg % record.args if record.args else record.msg
-        ))
-        self._msg_service.get_producer().send(Queues.LOG, msg)
+                message = '\n'.join(lines)
+        )
 
 
 def plug_rebundle_log(on_rebundle):
@@ -67,6 +66,8 @@ def plug_rebundle_log(on_rebundle):
             on_rebundle(self, message)
         finally:
             LOG.removeHandler(on_rebundle._log_hdlr)
+            # ship the rest before handler is reused for another bundle task
+            on_rebundle._log_hdlr.flush()
     return wrapper
 
 
@@ -245,6 +246,11 @@ class RebundleHandler(Handler):
 class LinuxImage:
     SPECIAL_DIRS = ('/dev', '/media', '/mnt', '/proc', '/sys', '/cdrom', '/tmp')
 
+    copy_workers = 4
+    """
+    Number of concurrent rsync processes copying volume into the image
+    """
+
     _volume = None
 
     path = None
@@ -400,8 +406,6 @@ class LinuxImage:
         rsync_longs = dict(archive=True,
                                            sparse=True,
                                            times=True)
-        if self.excludes:
-            rsync_longs['exclude'] = list(self.excludes)
         #rsync = filetool.Rsync()
         #rsync.archive().times().sparse().links().quietly()
         #rsync.archive().sparse().xattributes()
@@ -409,8 +413,13 @@ class LinuxImage:
 
         if xattr:
             rsync_longs['xattrs'] = True
+        self._copy_progress_pct = 0
         try:
-            rsync.rsync(source, dest, **rsync_longs)
+            rsync.ParallelRsync(source, dest,
+                    workers=self.copy_workers,
+                    excludes=self.excludes,
+                    progress=self._copy_progress,
+                    **rsync_longs).run()
         except linux.LinuxError, e:
             if e.returncode == 24:
                 LOG.warn(
@@ -434,6 +443,16 @@ class LinuxImage:
                 raise
 
 
+    def _copy_progress(self, copied_bytes, total_bytes, copied_files, total_files):
+        pct = copied_bytes * 100 / total_bytes if total_bytes else 100
+        last = self._copy_progress_pct
+        if pct > last and (pct - last >= 5 or pct == 100):
+            self._copy_progress_pct = pct
+            LOG.info('Copied %s of %s (%d%%), %d of %d files',
+                    format_size(copied_bytes), format_size(total_bytes), pct,
+                    copied_files, total_files)
+
+
 class LinuxLoopbackImage(LinuxImage):
     """
     This class encapsulate functionality to create an file loopback image
@@ -23,7 +23,7 @@ from scalarizr.util import system2, cryptotool, software, initdv2
 from scalarizr.linux import iptables, which
 from scalarizr.services import redis, backup
 from scalarizr.service import CnfController
-from scalarizr.handlers import ServiceCtlHandler, HandlerError, DbMsrMessages
+from scalarizr.handlers import ServiceCtlHandler, HandlerError, DbMsrMessages, ReadinessWaiter
 from scalarizr import node
 
 
@@ -557,18 +557,16 @@ class RedisHandler(ServiceCtlHandler, handlers.FarmSecurityMixin):
         return password
 
     def _get_master_host(self):
-        master_host = None
-        LOG.info("Requesting master server")
-        while not master_host:
+        def find_master():
             try:
-                master_host = list(host
+                return list(host
                         for host in self._queryenv.list_roles(behaviour=BEHAVIOUR)[0].hosts
                         if host.replication_master)[0]
             except IndexError:
-                LOG.debug("QueryEnv respond with no %s master. " % BEHAVIOUR +
-                          "Waiting %d seconds before the next attempt" % 5)
-                time.sleep(5)
-        return master_host
+                LOG.debug("QueryEnv respond with no %s master" % BEHAVIOUR)
+        LOG.info("Requesting master server")
+        waiter = ReadinessWaiter(wake_on=(DbMsrMessages.DBMSR_NEW_MASTER_UP, Messages.HOST_UP))
+        return waiter.wait(find_master)
 
 
     def _init_slave(self, message):
@@ -19,6 +19,11 @@ import signal
 import logging
 import Queue
 import binascii
+import errno
+import heapq
+import select
+import itertools
+from multiprocessing.pool import ThreadPool
 from urlparse import urlparse
 from urllib2 import urlopen
 try:
@@ -30,15 +35,18 @@ import psutil
 
 from scalarizr import config as szrconfig
 from scalarizr import linux
-from scalarizr.linux import coreutils
+from scalarizr.linux import coreutils, execute
 from scalarizr.bus import bus
 from scalarizr.handlers import Handler, HandlerError
 from scalarizr.handlers.chef import ChefSolo, ChefClient, extract_json_attributes
 from scalarizr.messaging import Queues, Messages
 from scalarizr.node import __node__
-from scalarizr.util import parse_size, format_size, read_shebang, split_strip, wait_until
+from scalarizr.util import parse_size, format_size, read_shebang, split_strip
 from scalarizr.config import ScalarizrState
 
+if not linux.os.windows_family:
+    import fcntl
+
 
 def get_handlers():
     return [ScriptExecutor()]
@@ -52,6 +60,10 @@ skip_events = set()
 
 logs_truncate_over = 20000
 
+logs_stream_interval = 10
+
+logs_stream_chunk = 64 * 1024
+
 
 def get_truncated_log(logfile, maxsize=None):
     """
@@ -78,6 +90,54 @@ def get_truncated_log(logfile, maxsize=None):
         return output.encode('utf-8')
 
 
+def read_log_range(logfile, offset=0, maxsize=None, whole_lines=False):
+    """
+    @param logfile: log file path
+    @param offset: byte offset to read from
+    @param maxsize: max bytes to return, None reads till the end
+    @param whole_lines: return only complete lines, unless a single line
+        is longer then maxsize
+    @return: (data, next offset, log file size)
+    """
+    with open(logfile, 'r') as f:
+        f.seek(0, 2)
+        filesize = f.tell()
+        offset = min(offset, filesize)
+        f.seek(offset)
+        data = f.read(maxsize) if maxsize else f.read()
+    if whole_lines and data and not data.endswith('\n'):
+        eol = data.rfind('\n')
+        if eol != -1:
+            data = data[:eol + 1]
+        elif not maxsize or len(data) < maxsize:
+            data = ''
+    return data, offset + len(data), filesize
+
+
+class LogTailer(object):
+    """
+    Reads log file incrementally, each read() continues from where
+    the previous one stopped
+    """
+
+    def __init__(self, path, offset=0):
+        self.path = path
+        self.offset = offset
+        self._lock = threading.Lock()
+
+    def read(self, maxsize, final=False):
+        """
+        @return: (offset of data, data, bytes left unread)
+        """
+        with self._lock:
+            offset = self.offset
+            if not os.path.exists(self.path):
+                return offset, '', 0
+            data, self.offset, filesize = read_log_range(self.path, offset, maxsize,
+                                                          whole_lines=not final)
+            return offset, data, filesize - self.offset
+
+
 if linux.os.windows_family:
     exec_dir_prefix = os.getenv('TEMP') + r'\scalr-scripting'
     logs_dir = os.path.join(__node__['log_dir'], 'scripting')
@@ -109,9 +169,10 @@ class ScriptExecutor(Handler):
         self._cnf = bus.cnf
         self._queryenv = bus.queryenv_service
         self._platform = bus.platform
+        self._output_sender = OutputSender(self._send_output_message)
 
     def on_init(self):
-        global exec_dir_prefix, logs_dir, logs_truncate_over
+        global exec_dir_prefix, logs_dir, logs_truncate_over, logs_stream_interval, logs_stream_chunk
 
         bus.on(
             host_init_response=self.on_host_init_response,
@@ -153,6 +214,18 @@ class ScriptExecutor(Handler):
         except ConfigParser.Error:
             pass
 
+        # live output streaming, 0 interval disables it
+        try:
+            logs_stream_interval = int(ini.get(self.name, 'logs_stream_interval'))
+        except ConfigParser.Error:
+            pass
+        try:
+            logs_stream_chunk = parse_size(ini.get(self.name, 'logs_stream_chunk'))
+        except ConfigParser.Error:
+            pass
+
+        supervisor.progress_interval = logs_stream_interval
+
         self.log_rotate_runnable = LogRotateRunnable()
         self.log_rotate_thread = threading.Thread(name='ScriptingLogRotate',
                                                                 target=self.log_rotate_runnable)
@@ -177,10 +250,10 @@ class ScriptExecutor(Handler):
             scripts.append(script_class(**kwds))
         LOG.debug('Restoring %d in-progress scripts', len(scripts))
 
-        def supervisor():        
+        def restore():
             for sc in scripts:
                 self._execute_one_script(sc)
-        t = threading.Thread(target=supervisor)
+        t = threading.Thread(target=restore)
         t.setDaemon(True)
         t.start()
 
@@ -209,44 +282,89 @@ class ScriptExecutor(Handler):
 
     def _execute_one_script(self, script):
         if script.asynchronous:
-            threading.Thread(target=self._execute_one_script0,
-                                            args=(script, )).start()
+            # Started in supervisor workers, completion is reported from
+            # supervisor callback, no thread waits for the script
+            supervisor.apply_async(self._start_async_script, (script, ))
         else:
             self._execute_one_script0(script)
 
+    def _start_async_script(self, script):
+        try:
+            self.in_progress.append(script)
+            if not script.start_time:
+                script.start()
+        except:
+            self._script_finished(script, sys.exc_info())
+        else:
+            supervisor.watch(script, self._on_async_script_exit,
+                             progress=self._output_streamer(script))
+
+    def _on_async_script_exit(self, script, return_code):
+        exc_info = None
+        try:
+            script.complete(return_code)
+        except:
+            exc_info = sys.exc_info()
+        try:
+            self._script_finished(script, exc_info)
+        except:
+            LOG.warn('Failed to report result of script %s', script.name, exc_info=sys.exc_info())
+
     def _execute_one_script0(self, script):
         exc_info = None
         try:
             self.in_progress.append(script)
             if not script.start_time:
                 script.start()
-            script.wait()
+            script.wait(progress=self._output_streamer(script))
 
         except KeyboardInterrupt:
             raise
         except:
             exc_info = sys.exc_info()
         finally:
-            if __node__['running']:
-                script_result = script.get_result()
-                if exc_info:
-                    with open(script.stderr_path, 'w+') as stderr_log:
-                        stderr_log.write(str(exc_info[1]))
-                    script_result['stderr'] = binascii.b2a_base64(str(exc_info[1]))
-                    script_result['return_code'] = 1
-                LOG.debug('sending exec script result message')
-                self.send_message(Messages.EXEC_SCRIPT_RESULT, script_result, queue=Queues.LOG)
-                self.in_progress.remove(script)
-                if not exc_info \
-                        and script_result['return_code'] != 0 \
-                        and script.event_name == 'BeforeHostUp' \
-                        and int(__node__['base'].get('abort_init_on_script_fail', False)):
-                    msg = ('Script {0} exited with code {1}, '
-                            'and the option to abort initialization when a Blocking BeforeHostUp Script fails was enabled. '
-                            'Update the script, or disable the option in the Advanced Tab.').format(
-                            script.name, script_result['return_code'])
-                    raise HandlerError(msg)
+            self._script_finished(script, exc_info)
+
+    def _output_streamer(self, script):
+        if logs_stream_interval and script.execution_id:
+            return self._send_script_output
 
+    def _send_script_output(self, script, final=False):
+        output = script.read_output(logs_stream_chunk, final=final)
+        if output:
+            self._output_sender.send(output)
+
+    def _send_output_message(self, output):
+        self.send_message(Messages.EXEC_SCRIPT_OUTPUT, output, queue=Queues.LOG)
+
+    def _script_finished(self, script, exc_info=None):
+        if __node__['running']:
+            if self._output_streamer(script) and script.stdout_tailer:
+                # trailing incomplete line
+                try:
+                    self._send_script_output(script, final=True)
+                except:
+                    LOG.debug('Failed to send output of script %s', script.name, exc_info=sys.exc_info())
+                # result goes after all output
+                self._output_sender.flush(self._output_sender.flush_timeout)
+            script_result = script.get_result()
+            if exc_info:
+                with open(script.stderr_path, 'w+') as stderr_log:
+                    stderr_log.write(str(exc_info[1]))
+                script_result['stderr'] = binascii.b2a_base64(str(exc_info[1]))
+                script_result['return_code'] = 1
+            LOG.debug('sending exec script result message')
+            self.send_message(Messages.EXEC_SCRIPT_RESULT, script_result, queue=Queues.LOG)
+            self.in_progress.remove(script)
+            if not exc_info \
+                    and script_result['return_code'] != 0 \
+                    and script.event_name == 'BeforeHostUp' \
+                    and int(__node__['base'].get('abort_init_on_script_fail', False)):
+                msg = ('Script {0} exited with code {1}, '
+                        'and the option to abort initialization when a Blocking BeforeHostUp Script fails was enabled. '
+                        'Update the script, or disable the option in the Advanced Tab.').format(
+                        script.name, script_result['return_code'])
+                raise HandlerError(msg)
 
     def execute_scripts(self, scripts, event_name, scripts_qty):
         """
@@ -373,6 +491,8 @@ class ScriptExecutor(Handler):
 
 class Script(object):
     TIMEOUT_RETURN_CODE = 130
+    # exit status was collected by someone else
+    UNKNOWN_RETURN_CODE = 255
 
     name = None
     body = None
@@ -395,8 +515,11 @@ class Script(object):
 
     logger = None
     proc = None
+    rusage = None
     stdout_path = None
     stderr_path = None
+    stdout_tailer = None
+    stderr_tailer = None
     execution_id = None
 
     def __init__(self, **kwds):
@@ -553,25 +676,13 @@ class Script(object):
         self.pid = self.proc.pid
         self.start_time = time.time()
 
-    def wait(self):
-        try:
-            # Communicate with process
-            self.logger.debug('Communicating with %s (pid: %s)', self.interpreter, self.pid)
-            while time.time() - self.start_time < self.exec_timeout:
-                if self._proc_poll() is None:
-                    if __node__['running']:
-                        time.sleep(0.5)
-                    else:
-                        raise KeyboardInterrupt()
-                else:
-                    # Process terminated
-                    self.logger.debug('Process terminated')
-                    self.return_code = self._proc_complete()
-                    break
-            else:
-                # Process timed out
-                self.return_code = self._proc_kill()
+    def wait(self, progress=None):
+        self.logger.debug('Communicating with %s (pid: %s)', self.interpreter, self.pid)
+        self.complete(supervisor.wait(self, progress=progress))
 
+    def complete(self, return_code):
+        try:
+            self.return_code = return_code
             if not os.path.exists(self.stdout_path):
                 open(self.stdout_path, 'w+').close()
             if not os.path.exists(self.stderr_path):
@@ -583,12 +694,14 @@ class Script(object):
                             '\n  1: %s'
                             '\n  2: %s'
                             '\n  return code: %s'
-                            '\n  elapsed time: %s',
+                            '\n  elapsed time: %s'
+                            '\n  resource usage: %s',
                             self.interpreter, self.exec_path,
                             format_size(os.path.getsize(self.stdout_path)),
                             format_size(os.path.getsize(self.stderr_path)),
                             self.return_code,
-                            self.elapsed_time)
+                            self.elapsed_time,
+                            self.rusage)
 
         except KeyboardInterrupt:
             raise
@@ -623,6 +736,31 @@ class Script(object):
         )
         return ret
 
+    def read_output(self, maxsize, final=False):
+        """
+        Returns output produced since the previous call, at most maxsize bytes
+        of each stdout and stderr, or None when there is nothing new
+        """
+        if not self.stdout_tailer:
+            self.stdout_tailer = LogTailer(self.stdout_path)
+            self.stderr_tailer = LogTailer(self.stderr_path)
+        stdout_offset, stdout, stdout_left = self.stdout_tailer.read(maxsize, final)
+        stderr_offset, stderr, stderr_left = self.stderr_tailer.read(maxsize, final)
+        if not stdout and not stderr:
+            return None
+        return dict(
+            execution_id=self.execution_id,
+            script_name=self.name,
+            event_name=self.event_name or '',
+            event_server_id=self.event_server_id,
+            event_id=self.event_id,
+            stdout=binascii.b2a_base64(stdout),
+            stdout_offset=stdout_offset,
+            stderr=binascii.b2a_base64(stderr),
+            stderr_offset=stderr_offset,
+            pending=stdout_left + stderr_left
+        )
+
     def state(self):
         return {'id': self.id,
                 'pid': self.pid,
@@ -654,19 +792,20 @@ class Script(object):
                     return None
                 return 0
 
-    def _proc_kill(self):
+    def _proc_terminate(self):
         self.logger.warn('Script %s reached timeout %d seconds, sending TERM signal (pid: %s)',
             self.name, self.exec_timeout, self.pid)
-        if self.proc and self._proc_poll() is None:
+        if self.proc and self.proc.returncode is None:
             os.kill(self.pid, signal.SIGTERM)
-            if not wait_until(lambda: self._proc_poll() is not None,
-                            timeout=2, sleep=.5, raise_exc=False):
-                self.logger.warn('Script %s timed out, killing entire process tree', self.name)
-                if linux.os.windows_family:
-                    os.kill(self.pid, signal.SIGKILL)
-                else:
-                    linux.execute.eradicate(self.pid)
-            return self.TIMEOUT_RETURN_CODE
+            return True
+        return False
+
+    def _proc_kill(self):
+        self.logger.warn('Script %s timed out, killing entire process tree', self.name)
+        if linux.os.windows_family:
+            os.kill(self.pid, signal.SIGKILL)
+        else:
+            execute.eradicate(self.pid)
 
     def _proc_complete(self):
         if self.proc:
@@ -716,9 +855,9 @@ class BaseChefScript(Script):
         LOG.debug("Chef script cmd: {0}".format(cmd))
         return shebang + "\n" + " ".join(cmd)
 
-    def wait(self):
+    def complete(self, return_code):
         try:
-            super(BaseChefScript, self).wait()
+            super(BaseChefScript, self).complete(return_code)
         finally:
             self.chef.cleanup()
 
@@ -791,6 +930,292 @@ class ChefSoloScript(BaseChefScript):
         return state
 
 
+class ScriptSupervisor(object):
+    """
+    Tracks all running scripts from a single thread.
+
+    Children are reaped with os.wait4(WNOHANG) every `tick` seconds, which
+    also gives resource usage. There is no SIGCHLD handler: it would make
+    system calls elsewhere in the process fail with EINTR.
+    Timeouts are kept in a deadline heap. Scripts restored after restart are
+    not our children and are polled on the same tick.
+    Script starts and progress callbacks run in a small pool of worker threads,
+    completion callbacks in another one, so reporting results never delays
+    them. wait() is woken up from the supervisor thread itself. Kills run
+    in their own threads, so they never queue behind callbacks sending messages.
+    Optional progress callbacks are called every progress_interval seconds
+    while script is running, never more than one at a time for a script.
+    """
+
+    tick = 0.1
+    kill_grace = 2
+    workers = 4
+    progress_interval = 10
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scripts = {}  # pid -> (script, callback, inline)
+        self._progress = {}  # pid -> (progress, in flight)
+        self._deadlines = []  # heap of (time, seq, script, action)
+        self._seq = itertools.count()
+        self._thread = None
+        self._pools = {}  # 'tasks' or 'callbacks' -> ThreadPool
+        self._wakeup_ev = None
+        self._wakeup_fds = None
+        if linux.os.windows_family:
+            self._wakeup_ev = threading.Event()
+        else:
+            self._wakeup_fds = os.pipe()
+            for fd in self._wakeup_fds:
+                fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+    def _wakeup(self):
+        if self._wakeup_ev:
+            self._wakeup_ev.set()
+        else:
+            try:
+                os.write(self._wakeup_fds[1], '.')
+            except OSError:
+                pass  # pipe is full, supervisor will wake up anyway
+
+    def _sleep(self, timeout):
+        if self._wakeup_ev:
+            self._wakeup_ev.wait(timeout)
+            self._wakeup_ev.clear()
+            return
+        try:
+            select.select([self._wakeup_fds[0]], [], [], timeout)
+        except select.error, e:
+            if e.args[0] != errno.EINTR:
+                raise
+        try:
+            while os.read(self._wakeup_fds[0], 4096):
+                pass
+        except OSError:
+            pass
+
+    def apply_async(self, fn, args=()):
+        return self._get_pool('tasks').apply_async(fn, args)
+
+    def watch(self, script, callback, progress=None):
+        """
+        Calls callback(script, return_code) from a worker thread when
+        script exits or is killed on timeout, and progress(script) while
+        it's running
+        """
+        self._watch(script, callback, progress)
+
+    def _watch(self, script, callback, progress=None, inline=False):
+        # inline callbacks are called from supervisor thread and must not block
+        deadline = script.start_time + script.exec_timeout
+        with self._lock:
+            self._scripts[script.pid] = (script, callback, inline)
+            heapq.heappush(self._deadlines, (deadline, next(self._seq), script, 'terminate'))
+            if progress and self.progress_interval:
+                self._progress[script.pid] = [progress, False]
+                heapq.heappush(self._deadlines, (time.time() + self.progress_interval,
+                                                 next(self._seq), script, 'progress'))
+            self._ensure_running()
+        self._wakeup()
+
+    def wait(self, script, progress=None):
+        """
+        Blocks until script exits or is killed on timeout, returns exit code.
+        Raises KeyboardInterrupt when scalarizr is stopping
+        """
+        done = threading.Event()
+        result = []
+
+        def callback(script, return_code):
+            result.append(return_code)
+            done.set()
+
+        self._watch(script, callback, progress, inline=True)
+        while not done.wait(1):
+            if not __node__['running']:
+                with self._lock:
+                    self._scripts.pop(script.pid, None)
+                    self._progress.pop(script.pid, None)
+                raise KeyboardInterrupt()
+        return result[0]
+
+    def _get_pool(self, name):
+        with self._lock:
+            if name not in self._pools:
+                self._pools[name] = ThreadPool(processes=self.workers)
+            return self._pools[name]
+
+    def _ensure_running(self):
+        if not self._thread:
+            self._thread = threading.Thread(target=self._run, name='Script supervisor')
+            self._thread.setDaemon(True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self._check_exited()
+                self._check_deadlines()
+                with self._lock:
+                    if not self._scripts:
+                        self._deadlines = []
+                        self._thread = None
+                        return
+                    timeout = self.tick
+                    if self._deadlines:
+                        timeout = max(min(timeout, self._deadlines[0][0] - time.time()), 0)
+                self._sleep(timeout)
+            except:
+                LOG.warn('Caught exception in script supervisor', exc_info=sys.exc_info())
+                time.sleep(self.tick)
+
+    def _check_exited(self):
+        with self._lock:
+            scripts = self._scripts.items()
+        for pid, (script, _, _) in scripts:
+            if script.proc and not linux.os.windows_family:
+                try:
+                    wpid, status, rusage = os.wait4(pid, os.WNOHANG)
+                except OSError, e:
+                    if e.errno != errno.ECHILD:
+                        raise
+                    # already reaped by someone else
+                    wpid, status, rusage = pid, None, None
+                    if script.proc.returncode is None:
+                        LOG.warn('Script %s (pid: %s) was reaped elsewhere, exit code is unknown',
+                                 script.name, pid)
+                        script.proc.returncode = script.UNKNOWN_RETURN_CODE
+                if not wpid:
+                    continue
+                if status is not None:
+                    if os.WIFSIGNALED(status):
+                        script.proc.returncode = -os.WTERMSIG(status)
+                    else:
+                        script.proc.returncode = os.WEXITSTATUS(status)
+                if rusage:
+                    script.rusage = {'utime': rusage.ru_utime,
+                                     'stime': rusage.ru_stime,
+                                     'maxrss': rusage.ru_maxrss}
+                return_code = script._proc_complete()
+            elif script._proc_poll() is not None:
+                return_code = script._proc_complete()
+            else:
+                continue
+            if getattr(script, '_timed_out', False):
+                return_code = script.TIMEOUT_RETURN_CODE
+            self._finish(pid, return_code)
+
+    def _check_deadlines(self):
+        now = time.time()
+        while True:
+            with self._lock:
+                if not self._deadlines or self._deadlines[0][0] > now:
+                    return
+                _, _, script, action = heapq.heappop(self._deadlines)
+                entry = self._scripts.get(script.pid)
+            if not entry or entry[0] is not script:
+                # finished already
+                continue
+            pid = script.pid
+            if action == 'progress':
+                with self._lock:
+                    entry = self._progress.get(pid)
+                    busy = not entry or entry[1]
+                    if not busy:
+                        entry[1] = True
+                    heapq.heappush(self._deadlines,
+                            (now + self.progress_interval, next(self._seq), script, 'progress'))
+                if not busy:
+                    self.apply_async(self._call_progress, (script, entry))
+            elif action == 'terminate':
+                script._timed_out = True
+                if script._proc_terminate():
+                    with self._lock:
+                        heapq.heappush(self._deadlines,
+                                (now + self.kill_grace, next(self._seq), script, 'kill'))
+                else:
+                    self._finish(pid, script.TIMEOUT_RETURN_CODE)
+            else:
+                t = threading.Thread(target=self._kill, args=(script, ),
+                                     name='Script killer %s' % pid)
+                t.setDaemon(True)
+                t.start()
+
+    def _kill(self, script):
+        try:
+            script._proc_kill()
+        except:
+            LOG.warn('Failed to kill script %s', script.name, exc_info=sys.exc_info())
+
+    def _call_progress(self, script, entry):
+        try:
+            entry[0](script)
+        except:
+            LOG.debug('Progress callback for script %s failed', script.name, exc_info=sys.exc_info())
+        finally:
+            entry[1] = False
+
+    def _finish(self, pid, return_code):
+        with self._lock:
+            entry = self._scripts.pop(pid, None)
+            self._progress.pop(pid, None)
+        if entry:
+            script, callback, inline = entry
+            if inline:
+                callback(script, return_code)
+            else:
+                self._get_pool('callbacks').apply_async(callback, (script, return_code))
+
+
+supervisor = ScriptSupervisor()
+
+
+class OutputSender(object):
+    """
+    Sends script output messages from its own thread in the order they were
+    queued, so supervisor workers only read output and never wait for
+    messaging server
+    """
+
+    flush_timeout = 60
+
+    def __init__(self, send):
+        self._send = send
+        self._queue = Queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def send(self, body):
+        self._put(('send', body))
+
+    def flush(self, timeout=None):
+        """
+        Waits until messages queued so far are sent
+        """
+        done = threading.Event()
+        self._put(('flush', done))
+        return done.wait(timeout)
+
+    def _put(self, item):
+        self._queue.put(item)
+        with self._lock:
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run, name='Script output sender')
+                self._thread.setDaemon(True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            action, arg = self._queue.get()
+            if action == 'flush':
+                arg.set()
+                continue
+            try:
+                self._send(arg)
+            except:
+                LOG.debug('Failed to send script output', exc_info=sys.exc_info())
+
+
 class LogRotateRunnable(object):
     keep_scripting_logs_time = 86400  # 1 day
 
@@ -23,6 +23,25 @@ def sync():
     return linux.system(('/bin/sync', ))
 
 
+_frozen = set()
+
+def fsfreeze(mpoint, unfreeze=False):
+    ret = linux.system((linux.which('fsfreeze') or '/sbin/fsfreeze',
+                '--unfreeze' if unfreeze else '--freeze', mpoint))
+    if unfreeze:
+        _frozen.discard(mpoint)
+    else:
+        _frozen.add(mpoint)
+    return ret
+
+
+def frozen(mpoint):
+    '''
+    Whether mpoint was frozen with fsfreeze() from this process
+    '''
+    return mpoint in _frozen
+
+
 def dd(**kwds):
     short = []
     for k, v in kwds.items():
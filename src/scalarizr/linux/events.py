@@ -0,0 +1,193 @@
+'''
+Wake-up sources for util.wait_until.
+
+UeventWatcher listens for kernel uevents (udev netlink), PathWatcher waits
+for a file to appear with inotify. Both have wait(timeout) like
+threading.Event, and both must be created before the action they should
+catch: events are queued from that moment. When kernel facility isn't
+available (containers, non-Linux) wait() is a plain sleep, so callers still
+work with polling.
+'''
+
+from __future__ import with_statement
+
+import os
+import time
+import errno
+import select
+import socket
+import ctypes
+import logging
+
+from ctypes.util import find_library
+
+
+LOG = logging.getLogger(__name__)
+
+NETLINK_KOBJECT_UEVENT = 15
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+IN_ATTRIB = 0x00000004
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+
+
+class _Watcher(object):
+
+    def __init__(self):
+        self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _fileno(self):
+        return self._fd
+
+    def _drain(self):
+        '''
+        Reads all pending events. :returns: True if any of them matched
+        '''
+        raise NotImplementedError()
+
+    def wait(self, timeout):
+        '''
+        :returns: True when woken up by a matching event before timeout
+        '''
+        if self._fileno() is None:
+            time.sleep(timeout)
+            return False
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            try:
+                readable = select.select([self._fileno()], [], [], remaining)[0]
+            except select.error, e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+            if readable and self._drain():
+                return True
+
+    def close(self):
+        raise NotImplementedError()
+
+
+class UeventWatcher(_Watcher):
+    '''
+    Wakes up on kernel uevents of a subsystem (e.g. 'block')
+    and optional actions ('add', 'change', ...)
+    '''
+
+    def __init__(self, subsystem=None, actions=None):
+        super(UeventWatcher, self).__init__()
+        self.subsystem = subsystem
+        self.actions = actions
+        self._sock = None
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM,
+                                 NETLINK_KOBJECT_UEVENT)
+            sock.bind((0, 1))
+            sock.setblocking(0)
+            self._sock = sock
+        except (AttributeError, socket.error), e:
+            LOG.debug('Kernel uevents are not available, falling back to polling: %s', e)
+
+    def _fileno(self):
+        return self._sock.fileno() if self._sock else None
+
+    def _matches(self, data):
+        props = dict(item.split('=', 1) for item in data.split('\0') if '=' in item)
+        if self.subsystem and props.get('SUBSYSTEM') != self.subsystem:
+            return False
+        if self.actions and props.get('ACTION') not in self.actions:
+            return False
+        return True
+
+    def _drain(self):
+        matched = False
+        while True:
+            try:
+                data = self._sock.recv(16384)
+            except socket.error, e:
+                if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return matched
+                if e.args[0] == errno.ENOBUFS:
+                    # receive queue overflowed, something surely happened
+                    matched = True
+                    continue
+                raise
+            matched = self._matches(data) or matched
+
+    def close(self):
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+
+_libc = None
+
+def _inotify():
+    global _libc
+    if _libc is None:
+        libc = ctypes.CDLL(find_library('c'), use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, 'inotify is not supported')
+        _libc = libc
+    return _libc
+
+
+class PathWatcher(_Watcher):
+    '''
+    Wakes up when something is created in the deepest existing directory
+    on the way to path. Intermediate directories are followed as they appear
+    '''
+
+    def __init__(self, path):
+        super(PathWatcher, self).__init__()
+        self.path = os.path.abspath(path)
+        self._watched = set()
+        try:
+            fd = _inotify().inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+            self._fd = fd
+            self._watch()
+        except OSError, e:
+            LOG.debug('inotify is not available, falling back to polling: %s', e)
+            self.close()
+
+    def _watch(self):
+        dirname = os.path.dirname(self.path)
+        while not os.path.isdir(dirname):
+            dirname = os.path.dirname(dirname)
+        if dirname not in self._watched:
+            mask = IN_CREATE | IN_MOVED_TO | IN_ATTRIB
+            if _inotify().inotify_add_watch(self._fd, dirname, mask) < 0:
+                raise OSError(ctypes.get_errno(), 'inotify_add_watch %s failed' % dirname)
+            self._watched.add(dirname)
+
+    def _drain(self):
+        while True:
+            try:
+                if not os.read(self._fd, 4096):
+                    break
+            except OSError, e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+        try:
+            self._watch()
+        except OSError:
+            pass
+        return True
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,63 @@
+'''
+Cached storage inventory for lvm2 and mdadm read helpers.
+
+Every mutating lvm2/mdadm command calls invalidate(), which drops all caches
+at once: md arrays carry LVM physical volumes, so a change on one side
+makes the other stale too. Values are also reloaded after max_age seconds
+to pick up changes made outside of scalarizr.
+'''
+
+from __future__ import with_statement
+
+import time
+import functools
+import threading
+
+
+_caches = []
+
+
+class Cache(object):
+
+    max_age = 10
+
+    def __init__(self, loader):
+        self.loader = loader
+        self._value = None
+        self._loaded_at = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    def get(self):
+        with self._lock:
+            if self._value is not None and time.time() - self._loaded_at < self.max_age:
+                return self._value
+            generation = self._generation
+        value = self.loader()
+        with self._lock:
+            # value loaded while a mutating command was running is already stale
+            if generation == self._generation:
+                self._value = value
+                self._loaded_at = time.time()
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._value = None
+
+
+def invalidate():
+    for cache in _caches:
+        cache.invalidate()
+
+
+def mutating(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwds):
+        try:
+            return fn(*args, **kwds)
+        finally:
+            invalidate()
+    return wrapper
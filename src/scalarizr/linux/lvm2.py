@@ -8,12 +8,14 @@ Created on Aug 28, 2012
 from __future__ import with_statement
 
 import os
+import json
 import logging
 import base64
 import collections
 import time
 
 from scalarizr import linux
+from scalarizr.linux import inventory
 
 if not linux.which('lvs'):
     from scalarizr.linux import pkgmgr
@@ -42,6 +44,10 @@ _columns = 'pv_name,vg_name,pv_fmt,pv_attr,pv_size,pv_free,pv_uuid'
 class PVInfo(collections.namedtuple('PVInfo', _columns)):
     COLUMNS = _columns
 
+    @property
+    def key(self):
+        return os.path.realpath(self.pv_name)
+
 
 _columns = 'vg_name,pv_count,lv_count,snap_count,vg_attr,vg_size,vg_free'
 class VGInfo(collections.namedtuple('VGInfo', _columns)):
@@ -51,6 +57,10 @@ class VGInfo(collections.namedtuple('VGInfo', _columns)):
     def path(self):
         return '/dev/%s' % self.vg_name
 
+    @property
+    def key(self):
+        return self.vg_name
+
 
 _columns = 'vg_name,lv_uuid,lv_name,lv_attr,lv_major,lv_minor,lv_read_ahead,' \
                 'lv_kernel_major,lv_kernel_minor,lv_kernel_read_ahead,lv_size,seg_count,' \
@@ -62,6 +72,10 @@ class LVInfo(collections.namedtuple('LVInfo', _columns)):
     def lv_path(self):
         return lvpath(self.vg_name, self.lv_name)
     path = lv_path
+
+    @property
+    def key(self):
+        return '%s/%s' % (self.vg_name, self.lv_name)
 del _columns
 
 
@@ -80,72 +94,128 @@ def restart_udev(fn):
         return wrapper
     return fn
 
-def lvs(*volume_groups, **long_kwds):
+def _report(command, info_cls, params=(), long_kwds=None):
+    long_kwds = dict(long_kwds or {})
+    long_kwds.update({
+            'options': info_cls.COLUMNS,
+            'separator': '|',
+            'noheadings': True
+    })
     try:
-        long_kwds.update({
-                'options': LVInfo.COLUMNS,
-                'separator': '|',
-                'noheadings': True
-        })
         out = linux.system(linux.build_cmd_args(
-                        executable='/sbin/lvs',
+                        executable='/sbin/%s' % command,
                         long=long_kwds,
-                        params=volume_groups))[0]
-        ret = {}
-        for line in out.splitlines():
-            item = LVInfo(*line.strip().split('|'))
-            ret['%s/%s' % (item.vg_name, item.lv_name)] = item
-        return ret
+                        params=params))[0]
     except linux.LinuxError, e:
         if 'not found' in str(e).lower():
             raise NotFound()
         raise
+    return dict((item.key, item) for item in
+                (info_cls(*line.strip().split('|')) for line in out.splitlines()))
+
+
+_fullreport_supported = True
+
+def _load_inventory():
+    '''
+    All physical volumes, volume groups and logical volumes with one
+    `lvm fullreport` call, or with three separate reports on LVM
+    versions without it
+    '''
+    global _fullreport_supported
+    if _fullreport_supported:
+        try:
+            return _fullreport()
+        except (linux.LinuxError, ValueError, KeyError, TypeError):
+            _fullreport_supported = False
+            LOG.debug('lvm fullreport failed, using separate reports', exc_info=True)
+    return {
+        'pv': _report('pvs', PVInfo),
+        'vg': _report('vgs', VGInfo),
+        'lv': _report('lvs', LVInfo)
+    }
+
+
+def _fullreport():
+    reports = (('pv', PVInfo), ('vg', VGInfo), ('lv', LVInfo))
+    cmd = ['/sbin/lvm', 'fullreport', '--reportformat', 'json']
+    for name, info_cls in reports:
+        cmd += ['--configreport', name, '--options', info_cls.COLUMNS]
+    out = system(cmd)[0]
+    # rows keep columns order, so they map to info tuples positionally
+    data = json.loads(out, object_pairs_hook=collections.OrderedDict)
+    ret = dict((name, {}) for name, _ in reports)
+    for vg_report in data['report']:
+        for name, info_cls in reports:
+            for row in vg_report.get(name, []):
+                item = info_cls(*row.values())
+                ret[name][item.key] = item
+    return ret
+
+
+_inventory = inventory.Cache(_load_inventory)
+
+
+def _lv_matches(item, name):
+    if name.startswith('/dev/mapper/'):
+        return item.lv_path == name
+    if name.startswith('/dev/'):
+        name = name[5:]
+    return item.key == name if '/' in name else item.vg_name == name
+
+
+def lvs(*volume_groups, **long_kwds):
+    '''
+    Served from inventory cache, unless extra lvs options are passed
+    '''
+    if long_kwds:
+        return _report('lvs', LVInfo, volume_groups, long_kwds)
+    report = _inventory.get()
+    if not volume_groups:
+        return dict(report['lv'])
+    ret = {}
+    for name in volume_groups:
+        matched = [item for item in report['lv'].values() if _lv_matches(item, name)]
+        if not matched:
+            vg_name = name[5:] if name.startswith('/dev/') else name
+            if '/' in vg_name or vg_name not in report['vg']:
+                raise NotFound('Logical volume %s not found' % name)
+        ret.update((item.key, item) for item in matched)
+    return ret
 
 
 def pvs(*physical_volumes, **long_kwds):
-    try:
-        long_kwds.update({
-                'options': PVInfo.COLUMNS,
-                'separator': '|',
-                'noheadings': True
-        })
-        out = linux.system(linux.build_cmd_args(
-                        executable='/sbin/pvs',
-                        long=long_kwds,
-                        params=physical_volumes))[0]
-        ret = {}
-        for line in out.splitlines():
-            item = PVInfo(*line.strip().split('|'))
-            ret[os.path.realpath(item.pv_name)] = item
-        return ret
-    except linux.LinuxError, e:
-        if 'not found' in str(e).lower():
-            raise NotFound()
-        raise
+    if long_kwds:
+        return _report('pvs', PVInfo, physical_volumes, long_kwds)
+    report = _inventory.get()
+    if not physical_volumes:
+        return dict(report['pv'])
+    ret = {}
+    for name in physical_volumes:
+        key = os.path.realpath(name)
+        if key not in report['pv']:
+            raise NotFound('Physical volume %s not found' % name)
+        ret[key] = report['pv'][key]
+    return ret
 
 
 def vgs(*volume_groups, **long_kwds):
-    try:
-        long_kwds.update({
-                'options': VGInfo.COLUMNS,
-                'separator': '|',
-                'noheadings': True
-        })
-        out = linux.system(linux.build_cmd_args(
-                        executable='/sbin/vgs',
-                        long=long_kwds,
-                        params=volume_groups))[0]
-        ret = {}
-        for line in out.splitlines():
-            item = VGInfo(*line.strip().split('|'))
-            ret[item.vg_name] = item
-        return ret
-    except linux.LinuxError, e:
-        if 'not found' in str(e).lower():
-            raise NotFound()
-        raise
+    if long_kwds:
+        return _report('vgs', VGInfo, volume_groups, long_kwds)
+    report = _inventory.get()
+    if not volume_groups:
+        return dict(report['vg'])
+    ret = {}
+    for name in volume_groups:
+        key = os.path.basename(name)
+        if key not in report['vg']:
+            raise NotFound('Volume group %s not found' % name)
+        ret[key] = report['vg'][key]
+    return ret
+
 
 @restart_udev
+@inventory.mutating
 def pvcreate(*physical_volumes, **long_kwds):
     long_kwds.update({'yes': True, 'force': True})
     return linux.system(linux.build_cmd_args(
@@ -155,6 +225,7 @@ def pvcreate(*physical_volumes, **long_kwds):
 
 
 @restart_udev
+@inventory.mutating
 def pvresize(*physical_volume_paths, **long_kwds):
     return linux.system(linux.build_cmd_args(
             executable='/sbin/pvresize',
@@ -163,6 +234,7 @@ def pvresize(*physical_volume_paths, **long_kwds):
 
 
 @restart_udev
+@inventory.mutating
 def pvchange(*physical_volume_paths, **long_kwds):
     try:
         return linux.system(linux.build_cmd_args(
@@ -175,12 +247,14 @@ def pvchange(*physical_volume_paths, **long_kwds):
         raise
 
 
+@inventory.mutating
 def pvscan(**long_kwds):
     return linux.system(linux.build_cmd_args(
                     executable='/sbin/pvscan',
                     long=long_kwds))
 
 
+@inventory.mutating
 def pvremove(*physical_volumes, **long_kwds):
     try:
         long_kwds.update({
@@ -198,6 +272,7 @@ def pvremove(*physical_volumes, **long_kwds):
 
 
 @restart_udev
+@inventory.mutating
 def vgcreate(volume_group_name, *physical_volumes, **long_kwds):
     return linux.system(linux.build_cmd_args(
                     executable='/sbin/vgcreate',
@@ -206,6 +281,7 @@ def vgcreate(volume_group_name, *physical_volumes, **long_kwds):
 
 
 @restart_udev
+@inventory.mutating
 def vgchange(*volume_group_names, **long_kwds):
     try:
         return linux.system(linux.build_cmd_args(
@@ -218,6 +294,7 @@ def vgchange(*volume_group_names, **long_kwds):
         raise
 
 
+@inventory.mutating
 def vgextend(volume_group_name, *physical_volumes, **long_kwds):
     try:
         long_kwds.update({
@@ -235,6 +312,7 @@ def vgextend(volume_group_name, *physical_volumes, **long_kwds):
 
 
 @restart_udev
+@inventory.mutating
 def vgremove(*volume_group_names, **long_kwds):
     try:
         long_kwds.update({'force': True})
@@ -248,6 +326,7 @@ def vgremove(*volume_group_names, **long_kwds):
         raise
 
 
+@inventory.mutating
 def vgcfgrestore(volume_group_name, **long_kwds):
     return linux.system(linux.build_cmd_args(
             executable='/sbin/vgcfgrestore',
@@ -256,6 +335,7 @@ def vgcfgrestore(volume_group_name, **long_kwds):
 
 
 @restart_udev
+@inventory.mutating
 def lvcreate(*params, **long_kwds):
     try:
         return linux.system(linux.build_cmd_args(
@@ -269,6 +349,7 @@ def lvcreate(*params, **long_kwds):
             time.sleep(1)
 
 @restart_udev
+@inventory.mutating
 def lvchange(*logical_volume_path, **long_kwds):
     try:
         long_kwds.update({'yes': True})
@@ -283,6 +364,7 @@ def lvchange(*logical_volume_path, **long_kwds):
 
 
 @restart_udev
+@inventory.mutating
 def lvremove(*logical_volume_paths, **long_kwds):
     try:
         long_kwds.update({'force': True})
@@ -308,6 +390,7 @@ def lvremove(*logical_volume_paths, **long_kwds):
         raise
 
 
+@inventory.mutating
 def lvextend(logical_volume_path, **long_kwds):
     return linux.system(linux.build_cmd_args(
             executable='/sbin/lvextend',
@@ -315,6 +398,7 @@ def lvextend(logical_volume_path, **long_kwds):
             params=[logical_volume_path]))
 
 
+@inventory.mutating
 def lvresize(logical_volume_path, **long_kwds):
     return linux.system(linux.build_cmd_args(
             executable='/sbin/lvresize',
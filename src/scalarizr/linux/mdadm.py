@@ -5,6 +5,7 @@ import re
 import os
 from scalarizr import linux
 from scalarizr.linux import coreutils
+from scalarizr.linux import inventory
 from scalarizr.storage2 import StorageError
 
 
@@ -27,32 +28,74 @@ def mdadm(mode, md_device=None, *devices, **long_kwds):
                             assume_clean=True, raid_devices=2)
     """
     raise_exc = long_kwds.pop('raise_exc', True)
-    return linux.system(linux.build_cmd_args(
-                                    mdadm_binary,
-                                    ['--%s' % mode] + ([md_device] if md_device else []),
-                                    long_kwds, devices), raise_exc=raise_exc)
+    try:
+        return linux.system(linux.build_cmd_args(
+                                        mdadm_binary,
+                                        ['--%s' % mode] + ([md_device] if md_device else []),
+                                        long_kwds, devices), raise_exc=raise_exc)
+    finally:
+        # after the command: mdstat read while it was running is stale
+        if not (long_kwds.get('detail') or '--version' in devices):
+            inventory.invalidate()
 
 
-def mdfind(*devices):
-    """ Return md name that contains passed devices """
-    devices_base = map(os.path.basename, devices)
+_member_re = re.compile(r'^(?P<name>[^\[\s]+)\[\d+\]')
+
 
+def _read_mdstat():
     with open('/proc/mdstat') as f:
-        stat = f.readlines()
-        
+        stat = f.read()
     LOG.debug('mdstat: %s', stat)
+    return parse_mdstat(stat)
+
+
+def parse_mdstat(stat):
+    """
+    Example:
+    >> mdadm.parse_mdstat(open('/proc/mdstat').read())
+    >> {
+            '/dev/md0': {
+                    'state': 'active',
+                    'level': '0',
+                    'devices': ['loop1', 'loop0']
+            }
+    }
+    """
+    ret = {}
+    for line in stat.splitlines():
+        if ' : ' not in line or line.startswith(('Personalities', 'unused')):
+            continue
+        name, info = line.split(' : ', 1)
+        words = [w for w in info.split() if not w.startswith('(')]
+        members = [m.group('name') for m in map(_member_re.match, words) if m]
+        words = [w for w in words if not _member_re.match(w)]
+        level = words[1] if len(words) > 1 else None
+        if level and level.startswith('raid'):
+            level = level[4:]
+        ret['/dev/%s' % name.strip()] = {
+            'state': words[0] if words else None,
+            'level': level,
+            'devices': members
+        }
+    return ret
+
+
+_mdstat = inventory.Cache(_read_mdstat)
+
 
-    for line in stat:
-        if all(map(lambda x: x in line, devices_base)):
-            array = '/dev/%s' % line.split()[0]
-            md_info = detail(array)
-            md_devices = md_info['devices'].keys()
-            md_devices = map(os.path.realpath, md_devices)
-            if sorted(md_devices) == sorted(devices):
-                return array
-    else:
-        raise StorageError(
-                "Devices aren't part of any array: %s" % ', '.join(devices))
+def mdstat():
+    """ Cached /proc/mdstat arrays, detail() is still needed for rebuild status """
+    return _mdstat.get()
+
+
+def mdfind(*devices):
+    """ Return md name that contains passed devices """
+    devices_base = sorted(os.path.basename(os.path.realpath(d)) for d in devices)
+    for array, info in mdstat().items():
+        if sorted(info['devices']) == devices_base:
+            return array
+    raise StorageError(
+            "Devices aren't part of any array: %s" % ', '.join(devices))
 
 def findname():
     """ Return unused md device name """
@@ -4,8 +4,12 @@ Created on Aug 27, 2012
 @author: marat
 '''
 
+from __future__ import with_statement
+
 import re
 import os
+import select
+import threading
 import collections
 import itertools
 
@@ -20,10 +24,92 @@ _MountEntry = collections.namedtuple('_MountEntry',
                 'device mpoint fstype options dump fsck_order')
 
 
+_octal_re = re.compile(r'\\([0-7]{3})')
+
+
+def _unescape(value):
+    return _octal_re.sub(lambda m: chr(int(m.group(1), 8)), value)
+
+
+class _MountTable(object):
+    '''
+    Process wide mount table parsed from /proc/self/mountinfo. It's reparsed
+    only when kernel reports a change with POLLPRI on mountinfo fd, or after
+    mount()/umount() from this process. Forked child opens its own fd:
+    with an inherited one parent and child would consume each other's events.
+    '''
+    filename = '/proc/self/mountinfo'
+
+    def __init__(self, filename=None):
+        if filename:
+            self.filename = filename
+        self._lock = threading.Lock()
+        self._fp = None
+        self._poll = None
+        self._pid = None
+        self._table = None
+
+    def invalidate(self):
+        self._table = None
+
+    def _changed(self):
+        if self._poll and self._pid != os.getpid():
+            self._fp.close()
+            self._fp = self._poll = None
+        if not self._poll:
+            if not hasattr(select, 'poll'):
+                return True
+            self._fp = open(self.filename)
+            self._pid = os.getpid()
+            self._poll = select.poll()
+            self._poll.register(self._fp.fileno(), select.POLLPRI | select.POLLERR)
+            return True
+        # kernel resets the event once it's reported
+        return bool(self._poll.poll(0))
+
+    def get(self):
+        '''
+        :returns: (entries, index, by_devno). index maps device and mpoint
+            to the first entry that has it, like a linear scan over entries does
+        '''
+        with self._lock:
+            # poll before parsing, changes made during parsing will be reported next time
+            if self._changed() or self._table is None:
+                self._table = self._parse()
+            return self._table
+
+    def _parse(self):
+        entries = []
+        index = {}
+        by_devno = {}
+        with open(self.filename) as fp:
+            for line in fp:
+                fields = line.split()
+                sep = fields.index('-')
+                devno, mpoint, options = fields[2], _unescape(fields[4]), fields[5]
+                fstype, device = fields[sep + 1], _unescape(fields[sep + 2])
+                # /proc/mounts shows mount options followed by superblock ones
+                options = options.split(',')
+                options += [opt for opt in fields[sep + 3].split(',')
+                            if opt not in ('rw', 'ro') and opt not in options]
+                if os.path.islink(device):
+                    device = os.path.realpath(device)
+                entry = _MountEntry(device, mpoint, fstype, ','.join(options), '0', '0')
+                entries.append(entry)
+                index.setdefault(device, entry)
+                index.setdefault(mpoint, entry)
+                by_devno.setdefault(devno, entry)
+        return entries, index, by_devno
+
+
+_mount_table = _MountTable()
+
+
 class _Mounts(object):
     filename = '/proc/mounts'
     _entries = None
     _entry_re = None
+    _index = None
 
     def __init__(self, filename=None):
         if filename:
@@ -32,6 +118,10 @@ class _Mounts(object):
         self._reload()
 
     def _reload(self):
+        if type(self) is _Mounts and self.filename == _Mounts.filename \
+                and os.path.exists(_mount_table.filename):
+            self._entries, self._index, self._by_devno = _mount_table.get()
+            return
         self._entries = []
         for line in open(self.filename):
             if line[0] != "#":
@@ -43,15 +133,31 @@ class _Mounts(object):
                     self._entries.append(_MountEntry(*m))
 
     def __getitem__(self, device_or_mpoint):
-        matched = [entry for entry in self
+        self._reload()
+        if self._index is not None:
+            return self._index[device_or_mpoint]
+        matched = [entry for entry in self._entries
                     if self._entry_matches(entry, device_or_mpoint)]
         if matched:
             return matched[0]
         raise KeyError(device_or_mpoint)
 
     def __contains__(self, device_or_mpoint):
-        return any([self._entry_matches(entry, device_or_mpoint)
-                    for entry in self])
+        try:
+            self[device_or_mpoint]
+            return True
+        except KeyError:
+            return False
+
+    def by_devno(self, devno):
+        '''
+        Entry for 'major:minor' device number, e.g. for symlinked device names
+        that differ from the one mount source has
+        '''
+        self._reload()
+        if self._index is not None:
+            return self._by_devno[devno]
+        raise KeyError(devno)
 
     def __len__(self):
         self._reload()
@@ -118,6 +224,8 @@ def mount(device, mpoint, *short_args, **long_kwds):
         if 'you must specify the filesystem type' in e.err:
             raise NoFileSystem(device)
         raise
+    finally:
+        _mount_table.invalidate()
 
 
 def umount(device_or_mpoint, **long_kwds):
@@ -131,6 +239,8 @@ def umount(device_or_mpoint, **long_kwds):
         if 'not mounted' in e.err or 'not found' in e.err:
             return
         raise
+    finally:
+        _mount_table.invalidate()
 
 class MountError(BaseException):
     NO_FS = -100
@@ -15,6 +15,7 @@ import urllib2
 import subprocess
 import shutil
 import tempfile
+import threading
 import distutils.version
 
 from scalarizr import linux, util
@@ -78,9 +79,58 @@ class Repository(object):
         return not all(line.startswith('#') for line in open(self.filename))
 
 
+class PackageInventory(object):
+    '''
+    Process-wide cache of installed packages.
+    Package list is parsed once and shared by all package managers until
+    package database file changes (size or mtime) or invalidate() is called
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._packages = None
+        self._stamp = None
+        self.stats = {'hits': 0, 'loads': 0}
+
+
+    def get(self, db_paths, loader):
+        '''
+        Returns copy of cached packages dict, calling loader() to rebuild it
+        when database file from db_paths changed since last load
+        '''
+        stamp = self._db_stamp(db_paths)
+        with self._lock:
+            if self._packages is None or stamp is None or stamp != self._stamp:
+                self._packages = loader()
+                self._stamp = stamp
+                self.stats['loads'] += 1
+            else:
+                self.stats['hits'] += 1
+            return dict(self._packages)
+
+
+    def invalidate(self):
+        with self._lock:
+            self._packages = None
+            self._stamp = None
+
+
+    def _db_stamp(self, db_paths):
+        for path in db_paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            return (path, st.st_mtime, st.st_size)
+
+
+inventory = PackageInventory()
+
+
 class PackageMgr(object):
     backup_dir = '/var/cache/scalr/pkgmgr'
     backup_count = 5
+    db_paths = ()
 
 
     def info(self, name):
@@ -136,8 +186,13 @@ class PackageMgr(object):
             except:
                 shutil.rmtree(backup_dir)
                 raise
+            finally:
+                inventory.invalidate()
         else:
-            self._install_package(name_version, **kwds)
+            try:
+                self._install_package(name_version, **kwds)
+            finally:
+                inventory.invalidate()
 
 
     def remove(self, name, purge=False):
@@ -147,13 +202,18 @@ class PackageMgr(object):
 
     def list(self):
         '''
-        Returns dict of installed packages
+        Returns dict of installed packages.
+        Result is served from process-wide inventory cache
         :returns: dict
         Example:
             {
                 'python': '2.6.7-ubuntu1',
             }
         '''
+        return inventory.get(self.db_paths, self._list_installed)
+
+
+    def _list_installed(self):
         raise NotImplementedError()
 
 
@@ -269,9 +329,13 @@ class PackageMgr(object):
             self._install_file(*files)
         except:
             raise Exception('%s. %s' % (msg, sys.exc_info()[1]))
+        finally:
+            inventory.invalidate()
 
 
 class AptPackageMgr(PackageMgr):
+    db_paths = ('/var/lib/dpkg/status',)
+
     def updatedb(self, **kwds):
         try:
             coreutils.clean_dir('/var/lib/apt/lists/partial', recursive=False)
@@ -303,15 +367,7 @@ class AptPackageMgr(PackageMgr):
         return names
 
 
-    def list(self):
-        '''
-        Returns dict of installed packages
-        :returns: dict
-        Example:
-            {
-                'python':'2.6.7-ubuntu1',
-            }
-        '''
+    def _list_installed(self):
         out, err, code = linux.system(
                 ("dpkg-query", "-W", "-f=${Status}|${Package}|${Version}\n",),
                 raise_exc=True
@@ -330,6 +386,8 @@ class AptPackageMgr(PackageMgr):
         except linux.LinuxError, e:
             if 'Unable to locate package {0}'.format(name) not in e.err:
                 raise
+        finally:
+            inventory.invalidate()
 
 
     def restore_backup(self, name, backup_id):
@@ -497,12 +555,17 @@ class RpmVersion(object):
 
 
 class YumPackageMgr(PackageMgr):
+    db_paths = ('/var/lib/rpm/Packages', '/var/lib/rpm/rpmdb.sqlite')
+
     def updatedb(self, **kwds):
         self.yum_command('clean all')
 
 
     def remove(self, name, purge=False):
-        self.yum_command('remove '+name, raise_exc=True)
+        try:
+            self.yum_command('remove '+name, raise_exc=True)
+        finally:
+            inventory.invalidate()
 
 
     def repos(self):
@@ -516,15 +579,7 @@ class YumPackageMgr(PackageMgr):
         return map(string.lower, ret)
 
 
-    def list(self):
-        '''
-        Returns dict of installed packages
-        :returns: dict
-        Example:
-            {
-                'python':'2.6.7-ubuntu1',
-            }
-        '''
+    def _list_installed(self):
         out, err, code = linux.system(
                 ('rpm', '-qa', '--queryformat', '%{NAME}|%{VERSION}\n',),
                 raise_exc=True
@@ -599,7 +654,10 @@ class YumPackageMgr(PackageMgr):
 
     def localinstall(self, name):
         def do_localinstall(filename):
-            self.yum_command('localinstall --nogpgcheck %s' % filename, raise_exc=True)
+            try:
+                self.yum_command('localinstall --nogpgcheck %s' % filename, raise_exc=True)
+            finally:
+                inventory.invalidate()
 
         if name.startswith('http://'):
             filename = os.path.join('/tmp', os.path.basename(name))
@@ -647,11 +705,17 @@ class RpmPackageMgr(PackageMgr):
 
     def install(self, name, version=None, updatedb=False, **kwds):
         ''' Installs a package from file or url with `name' '''
-        self.rpm_command('-Uvh '+name, raise_exc=True, **kwds)
+        try:
+            self.rpm_command('-Uvh '+name, raise_exc=True, **kwds)
+        finally:
+            inventory.invalidate()
 
 
     def remove(self, name, purge=False):
-        self.rpm_command('-e '+name, raise_exc=True)
+        try:
+            self.rpm_command('-e '+name, raise_exc=True)
+        finally:
+            inventory.invalidate()
 
 
     def _version_from_name(self, name):
@@ -0,0 +1,194 @@
+'''
+Periodic sampling of system counters from /proc.
+
+A Sampler reads /proc/stat, /proc/meminfo, /proc/loadavg, /proc/diskstats,
+/proc/net/dev and mounted file systems at most once per `max_age` seconds
+into a shared snapshot. Recent snapshots are kept in a ring, so per-second
+rates of counters can be computed without extra reads.
+'''
+
+from __future__ import with_statement
+
+import os
+import re
+import time
+import logging
+import threading
+import collections
+
+from scalarizr.linux import mount
+
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE = 5
+DEFAULT_HISTORY = 12
+
+SECTOR_SIZE = 512
+
+_skip_mpoint_re = re.compile(r'/(sys|proc|dev|selinux)')
+_skip_fstype = ('tmpfs', 'devfs')
+_skip_disk_re = re.compile(r'^(ram|loop)\d+$')
+
+
+def read_cpu(path='/proc/stat'):
+    with open(path) as fp:
+        for line in fp:
+            if line.startswith('cpu '):
+                values = map(int, line.split()[1:5])
+                return dict(zip(('user', 'nice', 'system', 'idle'), values))
+    return {}
+
+
+def read_memory(path='/proc/meminfo'):
+    info = {}
+    with open(path) as fp:
+        for line in fp:
+            name, value = line.split(':', 1)
+            info[name] = int(value.split()[0])
+    return {
+        'total_swap': info.get('SwapTotal', 0),
+        'avail_swap': info.get('SwapFree', 0),
+        'total_real': info.get('MemTotal', 0),
+        'total_free': info.get('MemFree', 0),
+        'shared': info.get('Shmem', 0),
+        'buffer': info.get('Buffers', 0),
+        'cached': info.get('Cached', 0)
+    }
+
+
+def read_load_average(path='/proc/loadavg'):
+    with open(path) as fp:
+        return map(float, fp.read().split()[0:3])
+
+
+def read_disk(path='/proc/diskstats'):
+    ret = {}
+    with open(path) as fp:
+        for line in fp:
+            row = line.split()
+            if len(row) < 10 or _skip_disk_re.match(row[2]):
+                continue
+            reads, read_sectors, writes, write_sectors = map(int, (row[3], row[5], row[7], row[9]))
+            ret[row[2]] = {
+                'read': {
+                    'num': reads,
+                    'sectors': read_sectors,
+                    'bytes': read_sectors * SECTOR_SIZE
+                },
+                'write': {
+                    'num': writes,
+                    'sectors': write_sectors,
+                    'bytes': write_sectors * SECTOR_SIZE
+                }
+            }
+    return ret
+
+
+def read_net(path='/proc/net/dev'):
+    ret = {}
+    with open(path) as fp:
+        for line in fp.readlines()[2:]:
+            iface, data = line.split(':', 1)
+            row = map(int, data.split())
+            ret[iface.strip()] = {
+                'receive': {'bytes': row[0], 'packets': row[1], 'errors': row[2]},
+                'transmit': {'bytes': row[8], 'packets': row[9], 'errors': row[10]}
+            }
+    return ret
+
+
+def read_mounts(filename=None):
+    '''
+    :returns: dict mpoint -> mount entry with total/free sizes in Kb
+    '''
+    ret = {}
+    for m in mount.mounts(filename):
+        if not m.mpoint or _skip_mpoint_re.search(m.mpoint) or m.fstype in _skip_fstype:
+            continue
+        entry = m._asdict()
+        try:
+            st = os.statvfs(m.mpoint)
+            entry['total'] = (st.f_bsize * st.f_blocks) / 1024  # Kb
+            entry['free'] = (st.f_bsize * st.f_bavail) / 1024  # Kb
+        except OSError:
+            entry['total'] = entry['free'] = None
+        ret[m.mpoint] = entry
+    return ret
+
+
+class Sampler(object):
+    '''
+    Thread-safe snapshot source. snapshot() re-reads everything only when the
+    latest sample is older than max_age, concurrent callers share one read
+    '''
+
+    readers = {
+        'cpu': read_cpu,
+        'memory': read_memory,
+        'load_average': read_load_average,
+        'disk': read_disk,
+        'net': read_net,
+        'mounts': read_mounts
+    }
+    counters = ('cpu', 'disk', 'net')
+
+    def __init__(self, max_age=DEFAULT_MAX_AGE, history=DEFAULT_HISTORY):
+        self.max_age = max_age
+        self.samples = collections.deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def snapshot(self, max_age=None):
+        if max_age is None:
+            max_age = self.max_age
+        with self._lock:
+            if not self.samples or time.time() - self.samples[-1]['time'] >= max_age:
+                self.samples.append(self.sample())
+            return self.samples[-1]
+
+    def sample(self):
+        snap = {'time': time.time()}
+        for name, reader in self.readers.items():
+            try:
+                snap[name] = reader()
+            except (IOError, OSError), e:
+                LOG.debug('Failed to read %s stat: %s', name, e)
+                snap[name] = None
+        return snap
+
+    def rates(self, period=None, max_age=None):
+        '''
+        Per-second rates of cpu, disk and net counters between the latest
+        snapshot and the oldest one not older than `period` seconds
+        (the oldest kept one when period is None).
+        Returns None until at least two snapshots are taken
+        '''
+        last = self.snapshot(max_age)
+        with self._lock:
+            samples = [s for s in self.samples if s is not last and
+                       (period is None or last['time'] - s['time'] <= period)]
+        if not samples:
+            return None
+        first = samples[0]
+        elapsed = last['time'] - first['time']
+        ret = {'period': elapsed}
+        for name in self.counters:
+            ret[name] = _rates(first[name], last[name], elapsed)
+        return ret
+
+    def invalidate(self):
+        with self._lock:
+            self.samples.clear()
+
+
+def _rates(old, new, elapsed):
+    if isinstance(new, dict):
+        old = old or {}
+        return dict((key, _rates(old.get(key), value, elapsed))
+                    for key, value in new.items())
+    if isinstance(new, (int, long)) and isinstance(old, (int, long)) and elapsed > 0:
+        return max(new - old, 0) / float(elapsed)
+    return None
+
+
+sampler = Sampler()
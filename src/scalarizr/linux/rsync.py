@@ -1,11 +1,18 @@
 from __future__ import with_statement
 
 import os
+import stat
+import fnmatch
+import logging
+import threading
+from multiprocessing.pool import ThreadPool
 
 from scalarizr import linux
 from scalarizr.node import __node__
 
 
+LOG = logging.getLogger(__name__)
+
 
 def rsync(src, dst, **long_kwds):
     linux.system(['sync'])
@@ -16,3 +23,161 @@ def rsync(src, dst, **long_kwds):
             duplicate_keys=True))
     linux.system(['sync'])
     return output
+
+
+class ParallelRsync(object):
+    '''
+    Copies a directory tree with several concurrent rsync processes.
+
+    The tree is scanned once, top level directories larger then split_size
+    are split into their subdirectories (up to max_depth levels deep), and
+    every such partition is copied by a separate rsync with --relative,
+    so absolute excludes are matched the same way as in a single rsync of
+    the whole tree. Failed partitions are re-run up to `retries` times,
+    rsync skips files that were already copied. The final single rsync of
+    the whole tree copies files not covered by partitions, fixes directory
+    attributes and raises linux.LinuxError as a plain rsync() would.
+
+    :param progress: Callable(copied_bytes, total_bytes, copied_files, total_files),
+        called after each partition and after the final rsync
+    '''
+
+    split_size = 1024 * 1024 * 1024
+    max_depth = 3
+    max_partitions = 64
+    retries = 2
+
+    def __init__(self, src, dst, workers=4, excludes=None, progress=None,
+                 executable=None, **long_kwds):
+        self.src = src.rstrip('/') or '/'
+        self.dst = dst
+        self.workers = workers
+        self.excludes = list(excludes or ())
+        self.progress = progress
+        self.executable = executable or os.path.join(__node__['embedded_bin_dir'], 'rsync')
+        self.long_kwds = long_kwds
+        if self.excludes:
+            self.long_kwds['exclude'] = self.excludes
+        self.total_bytes = self.total_files = 0
+        self.copied_bytes = self.copied_files = 0
+        self._lock = threading.Lock()
+
+    def run(self):
+        linux.system(['sync'])
+        partitions = self.partitions()
+        LOG.debug('Copying %s with %d workers in %d partitions',
+                  self.src, self.workers, len(partitions))
+        failed = partitions
+        if partitions:
+            pool = ThreadPool(processes=self.workers)
+            try:
+                for attempt in range(self.retries + 1):
+                    results = pool.map(self._copy_partition, failed)
+                    failed = [p for p, ok in zip(failed, results) if not ok]
+                    if not failed:
+                        break
+                    LOG.debug('Retrying %d failed partitions', len(failed))
+            finally:
+                pool.close()
+                pool.join()
+        # everything else, and whatever still failed
+        output = linux.system(self._cmd([self._src_dir(), self.dst]))
+        linux.system(['sync'])
+        if self.progress:
+            self.progress(self.total_bytes, self.total_bytes, self.total_files, self.total_files)
+        return output
+
+    def partitions(self):
+        '''
+        :returns: list of (relative path, bytes, files) sorted biggest first
+        '''
+        sizes = self._scan()
+        # top level entries are the largest partitions
+        parts = [path for path in sizes if os.sep not in path]
+        self.total_bytes = sum(sizes[path][0] for path in parts)
+        self.total_files = sum(sizes[path][1] for path in parts)
+        while True:
+            parts.sort(key=lambda path: sizes[path][0], reverse=True)
+            big = [path for path in parts
+                   if sizes[path][0] > self.split_size and path.count(os.sep) < self.max_depth - 1]
+            children = big and [path for path in sizes
+                                if os.path.dirname(path) == big[0]]
+            if not big or not children or len(parts) + len(children) > self.max_partitions:
+                break
+            parts.remove(big[0])
+            parts.extend(children)
+        return [(path, sizes[path][0], sizes[path][1]) for path in parts]
+
+    def _scan(self):
+        '''
+        :returns: dict relative dir path -> [subtree bytes, subtree files]
+            for directories up to max_depth
+        '''
+        sizes = {}
+        src = self._src_dir()
+        for top, dirs, files in os.walk(src):
+            rel = top[len(src):]
+            for name in list(dirs):
+                path = os.path.join(rel, name)
+                if self._excluded(path) or os.path.islink(os.path.join(top, name)):
+                    dirs.remove(name)
+                elif path.count(os.sep) < self.max_depth:
+                    sizes[path] = [0, 0]
+            if not rel:
+                continue  # top level files are copied by final rsync
+            size = 0
+            for name in files:
+                try:
+                    st = os.lstat(os.path.join(top, name))
+                except OSError:
+                    continue  # vanished
+                if stat.S_ISREG(st.st_mode):
+                    size += st.st_size
+            ancestor = rel
+            while ancestor:
+                if ancestor in sizes:
+                    sizes[ancestor][0] += size
+                    sizes[ancestor][1] += len(files)
+                ancestor = os.path.dirname(ancestor)
+        return sizes
+
+    def _excluded(self, path):
+        abs_path = os.path.join('/', path)
+        for pattern in self.excludes:
+            if pattern.startswith('/'):
+                if fnmatch.fnmatch(abs_path, pattern.rstrip('/')):
+                    return True
+            elif fnmatch.fnmatch(os.path.basename(path), pattern):
+                return True
+        return False
+
+    def _src_dir(self):
+        return self.src if self.src.endswith('/') else self.src + '/'
+
+    def _cmd(self, params, **extra):
+        long_kwds = dict(self.long_kwds)
+        long_kwds.update(extra)
+        return linux.build_cmd_args(
+                executable=self.executable,
+                long=long_kwds,
+                params=params,
+                duplicate_keys=True)
+
+    def _copy_partition(self, partition):
+        path, size, files = partition
+        # /./ marks where --relative path starts
+        src = os.path.join(self._src_dir(), '.', path)
+        try:
+            linux.system(self._cmd([src, self.dst], relative=True))
+        except linux.LinuxError, e:
+            if e.returncode != 24:  # vanished source files
+                LOG.debug('rsync of %s failed: %s', path, e)
+                return False
+        with self._lock:
+            self.copied_bytes += size
+            self.copied_files += files
+            progress = (self.copied_bytes, self.total_bytes,
+                        self.copied_files, self.total_files)
+        if self.progress:
+            self.progress(*progress)
+        return True
@@ -193,10 +193,21 @@ class MessageConsumer(object):
     """
 
     listeners = None
+    """
+    Message handlers, called one message at a time from handler thread
+    """
+
+    ingoing_listeners = None
+    """
+    Callables f(message, queue) notified from receiving thread as soon as
+    message is stored, even while handler thread is busy with another one
+    """
+
     running = False
 
     def __init__(self):
         self.listeners = []
+        self.ingoing_listeners = []
         self.filters = {
                 'data' : [],
                 'protocol' : []
@@ -298,6 +309,11 @@ class Messages(object):
     Fires after script execution
     """
 
+    EXEC_SCRIPT_OUTPUT = "ExecScriptOutput"
+    """
+    Fires periodically while script is running with its new output
+    """
+
     REBUNDLE_RESULT = "RebundleResult"
     """
     Fires after rebundle task finished
@@ -0,0 +1,138 @@
+'''
+Non-blocking log shipping to Scalr.
+
+MessagingLogHandler never sends from the logging thread: records are put
+into a bounded in-memory queue and a background flusher coalesces them
+into batched messages. When Scalr is slow to accept messages, the oldest
+queued records are dropped instead of blocking the caller.
+'''
+
+from __future__ import with_statement
+
+import time
+import logging
+import threading
+import collections
+
+from scalarizr.bus import bus
+from scalarizr.messaging import Queues
+
+
+LOG = logging.getLogger(__name__)
+
+
+class MessagingLogHandler(logging.Handler):
+    '''
+    :param message_name: Name of messages to send
+    :param body: Dict of extra fields sent in every message body
+    :param queue: Messaging queue
+    :param capacity: Max queued records, the oldest are dropped on overflow
+    :param batch_size: Max records per message
+    :param batch_bytes: Max size of joined records per message
+    :param flush_interval: Seconds to wait for more records before sending
+        a message that isn't full yet
+
+    Records are joined with newlines into body['message'],
+    override make_body() to change message format.
+    '''
+
+    def __init__(self, message_name, body=None, queue=Queues.LOG, level=logging.INFO,
+                 capacity=1000, batch_size=100, batch_bytes=64 * 1024, flush_interval=1):
+        logging.Handler.__init__(self, level)
+        self.message_name = message_name
+        self.body = dict(body or {})
+        self.queue = queue
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.stats = {'queued': 0, 'dropped': 0, 'sent': 0, 'messages': 0, 'errors': 0}
+        self._records = collections.deque(maxlen=capacity)
+        self._cond = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def emit(self, record):
+        try:
+            msg = record.getMessage()
+        except:
+            self.handleError(record)
+            return
+        with self._cond:
+            if len(self._records) == self._records.maxlen:
+                self.stats['dropped'] += 1
+            self._records.append(msg)
+            self.stats['queued'] += 1
+            if not self._thread and not self._closed:
+                self._thread = threading.Thread(target=self._run, name='Messaging log flusher')
+                self._thread.setDaemon(True)
+                self._thread.start()
+            if len(self._records) >= self.batch_size:
+                self._cond.notify()
+
+    def make_body(self, lines):
+        body = dict(self.body)
+        body['message'] = '\n'.join(lines)
+        return body
+
+    def flush(self):
+        '''
+        Sends all queued records from the calling thread
+        '''
+        while self._send_batch():
+            pass
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.flush()
+        logging.Handler.close(self)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._records and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._records:
+                    self._thread = None
+                    return
+                # give records a chance to accumulate into a batch
+                deadline = time.time() + self.flush_interval
+                while not self._closed and len(self._records) < self.batch_size:
+                    timeout = deadline - time.time()
+                    if timeout <= 0:
+                        break
+                    self._cond.wait(timeout)
+            self._send_batch()
+
+    def _take_batch(self):
+        lines = []
+        size = 0
+        with self._cond:
+            while self._records and len(lines) < self.batch_size:
+                line = self._records[0]
+                if lines and size + len(line) > self.batch_bytes:
+                    break
+                lines.append(self._records.popleft())
+                size += len(line) + 1
+        return lines
+
+    def _send_batch(self):
+        # one batch in flight at a time keeps messages in order
+        with self._send_lock:
+            lines = self._take_batch()
+            if not lines:
+                return False
+            try:
+                msg_service = bus.messaging_service
+                msg = msg_service.new_message(self.message_name, body=self.make_body(lines))
+                msg_service.get_producer().send(self.queue, msg)
+            except:
+                self.stats['errors'] += 1
+                LOG.debug('Failed to send %s message with %d log records',
+                          self.message_name, len(lines), exc_info=True)
+            else:
+                self.stats['sent'] += len(lines)
+                self.stats['messages'] += 1
+            return True
@@ -186,6 +186,12 @@ class P2pMessageConsumer(MessageConsumer):
                     self.end_headers()
                     return
 
+                for ln in list(self.consumer.ingoing_listeners):
+                    try:
+                        ln(message, queue)
+                    except:
+                        logger.debug('Ingoing message listener failed', exc_info=sys.exc_info())
+
                 self.send_response(201, 'Created')
                 self.end_headers()
 
@@ -1,9 +1,17 @@
+from __future__ import with_statement
+
 import os
 import ConfigParser
 import sys
 import copy
 import json
+import time
+import thread
 import logging
+import threading
+import contextlib
+import collections
+import cStringIO
 
 from scalarizr import linux
 
@@ -11,6 +19,110 @@ from scalarizr import linux
 LOG = logging.getLogger(__name__)
 
 
+stat_interval = 1.0
+'''
+File stores stat their files at most once per stat_interval seconds.
+Writes made by this process are seen immediately.
+'''
+
+stats = {'stat': 0, 'parse': 0, 'write': 0}
+'''
+Number of file operations made by stores
+'''
+
+_files = {}  # filename -> [checked_at, mtime, version]
+_files_lock = threading.Lock()
+_local = threading.local()
+
+
+def _mtime(filename):
+    '''
+    Returns (mtime, version). mtime is 0 for missing file, version
+    is incremented by each write from this process
+    '''
+    now = time.time()
+    with _files_lock:
+        entry = _files.get(filename)
+        if entry and now - entry[0] < stat_interval:
+            return entry[1], entry[2]
+    stats['stat'] += 1
+    try:
+        mtime = os.stat(filename).st_mtime
+    except OSError:
+        mtime = 0
+    with _files_lock:
+        entry = _files.setdefault(filename, [0, 0, 0])
+        entry[0:2] = now, mtime
+        return entry[1], entry[2]
+
+
+def _touch(filename):
+    with _files_lock:
+        entry = _files.setdefault(filename, [0, 0, 0])
+        entry[0] = 0
+        entry[2] += 1
+
+
+def _write(filename, data):
+    '''
+    Writes data (string or object with write(fp) method) with atomic rename,
+    or defers it until batch() commit
+    '''
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        pending[filename] = data
+        return
+    if hasattr(data, 'write'):
+        buf = cStringIO.StringIO()
+        data.write(buf)
+        data = buf.getvalue()
+    tmp = '%s.%d.%d.tmp' % (filename, os.getpid(), thread.get_ident())
+    try:
+        with open(tmp, 'w') as fp:
+            fp.write(data)
+        if os.path.exists(filename):
+            os.chmod(tmp, os.stat(filename).st_mode & 07777)
+        os.rename(tmp, filename)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    stats['write'] += 1
+    _touch(filename)
+
+
+def _pending(filename):
+    pending = getattr(_local, 'pending', None)
+    return pending.get(filename) if pending else None
+
+
+@contextlib.contextmanager
+def batch():
+    '''
+    Defers store writes made in this thread until block exits, then
+    writes each file once. Writes are discarded when block raises.
+
+    Example:
+    with node.batch():
+        __node__['mysql']['root_password'] = password
+        __node__['mysql']['log_file'] = log_file
+    '''
+    if getattr(_local, 'pending', None) is not None:
+        yield
+        return
+    _local.pending = pending = collections.OrderedDict()
+    try:
+        yield
+    except:
+        _local.pending = None
+        for filename in pending:
+            # stores already changed in memory, make them reload
+            _touch(filename)
+        raise
+    _local.pending = None
+    for filename, data in pending.items():
+        _write(filename, data)
+
+
 class Store(object):
 
     def __repr__(self):
@@ -73,8 +185,9 @@ class Compound(dict):
         return ret
 
     def update(self, values):
-        for key, value in list(values.items()):
-            self[key] = value
+        with batch():
+            for key, value in list(values.items()):
+                self[key] = value
 
     def __repr__(self):
         ret = {}
@@ -118,8 +231,7 @@ class Json(Store):
         dirname = os.path.dirname(self.filename)
         if not os.path.exists(dirname):
             os.makedirs(dirname)
-        with open(self.filename, 'w+') as fp:
-            json.dump(value, fp)
+        _write(self.filename, json.dumps(value))
 
 
 class Ini(Store):
@@ -127,21 +239,22 @@ class Ini(Store):
         if not hasattr(filenames, '__iter__') or isinstance(filenames, basestring):
             filenames = [filenames]
         self.filenames = filenames
-        self.saved_mtimes = [0 for _ in range(0, len(filenames))]
+        self.saved_mtimes = [(0, 0) for _ in range(0, len(filenames))]
         self.section = section
         self.ini = ConfigParser.ConfigParser() 
         self.mapping = mapping or {}
 
     def _reload(self):
-        mtimes = [os.path.exists(filename) and os.stat(filename).st_mtime or 0 \
-                for filename in self.filenames]
+        mtimes = [_mtime(filename) for filename in self.filenames]
         # LOG.debug('mtimes: {} saved_mtimes: {}'.format(mtimes, self.saved_mtimes))
-        if any(mtimes[i] > self.saved_mtimes[i] \
+        if any(mtimes[i][0] > self.saved_mtimes[i][0] or \
+                mtimes[i][1] != self.saved_mtimes[i][1] \
                 for i in range(0, len(self.filenames))):
             self.ini = ConfigParser.ConfigParser() 
             for i, filename in enumerate(self.filenames):
-                if os.path.exists(filename):
+                if mtimes[i][0]:
                     LOG.debug('Reloading {}'.format(filename))
+                    stats['parse'] += 1
                     self.ini.read(filename)
                 self.saved_mtimes[i] = mtimes[i]
 
@@ -169,9 +282,12 @@ class Ini(Store):
             value = str(value)
 
         filename = self.filenames[-1]
-        ini = ConfigParser.ConfigParser()
-        if os.path.exists(filename):
-            ini.read(filename)
+        ini = _pending(filename)
+        if ini is None:
+            ini = ConfigParser.ConfigParser()
+            if os.path.exists(filename):
+                stats['parse'] += 1
+                ini.read(filename)
 
         if not ini.has_section(self.section):
             ini.add_section(self.section)
@@ -184,8 +300,10 @@ class Ini(Store):
         #        self.section, key, value, filename))
         ini.set(self.section, key, value)
         self.ini.set(self.section, key, value)
-        with open(filename, 'w+') as fp:
-            ini.write(fp)
+        _write(filename, ini)
+        if _pending(filename) is None:
+            # self.ini is up to date with this write
+            self.saved_mtimes[-1] = _mtime(filename)
 
 
 
@@ -233,17 +351,23 @@ class IniOption(Ini):
 class File(Store):
     def __init__(self, filename):
         self.filename = filename
+        self._cached = None  # (mtime, version, value)
 
     def __getitem__(self, key):
+        mtime = _mtime(self.filename)
+        if self._cached and self._cached[0:2] == mtime:
+            return self._cached[2]
         try:
             with open(self.filename) as fp:
-                return fp.read().strip()
+                value = fp.read().strip()
         except IOError as e:
             raise KeyError('{}: {}'.format(key, e))
+        stats['parse'] += 1
+        self._cached = mtime + (value, )
+        return value
 
     def __setitem__(self, key, value):
-        with open(self.filename, 'w+') as fp:
-            fp.write(str(value).strip())
+        _write(self.filename, str(value).strip())
 
 
 class BoolFile(Store):
@@ -251,7 +375,7 @@ class BoolFile(Store):
         self.filename = filename
 
     def __getitem__(self, key):
-        return os.path.isfile(self.filename)
+        return bool(_mtime(self.filename)[0])
 
     def __setitem__(self, key, value):
         if value:
@@ -259,6 +383,7 @@ class BoolFile(Store):
         else:
             if os.path.isfile(self.filename):
                 os.remove(self.filename)
+        _touch(self.filename)
 
 
 class StateFile(File):
@@ -429,6 +554,7 @@ def reload_params(default=False):
             self['union_script_executor'] = int(self.get('union_script_executor', False))
             self['api_port'] = int(self.get('api_port', 8010))
             self['messaging_port'] = int(self.get('messaging_port', 8013))
+            self['stat_sample_interval'] = int(self.get('stat_sample_interval', 5))
 
 
     __node__['base'] = BaseSettings()
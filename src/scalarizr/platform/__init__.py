@@ -7,7 +7,6 @@ Created on Dec 24, 2009
 import os
 import re
 import socket
-import urllib2
 import logging
 import platform
 import sys
@@ -22,6 +21,7 @@ from scalarizr.bus import bus
 from scalarizr import linux
 from scalarizr.util import metadata
 from scalarizr.util import LocalPool, NullPool
+from scalarizr.platform import metacache
 if linux.os.windows_family:
     import win32com.client
 else:
@@ -147,6 +147,13 @@ class Platform(object):
     get_public_ip = _get_ip_addr
     get_private_ip = _get_ip_addr
 
+    def prefetch_metadata(self):
+        '''
+        Warms up instance meta-data cache. Called once at startup,
+        override in platforms that query a meta-data service
+        '''
+        pass
+
     def get_user_data(self, key=None):
         if key:
             return metadata.user_data().get(key)
@@ -263,31 +270,38 @@ class Ec2LikePlatform(Platform):
     _meta_url = "http://169.254.169.254/"
     _userdata_key = 'latest/user-data'
     _metadata_key = 'latest/meta-data'
-    _metadata = {}
+    _metadata_timeout = 5
+    # Everything else is immutable during instance lifetime
+    _metadata_ttl = {
+        'latest/meta-data/public-': 300,
+        'latest/meta-data/network/': 300,
+        'latest/meta-data/iam/': 300,
+        'latest/meta-data/block-device-mapping': 60
+    }
     _userdata = None
 
     def __init__(self):
         Platform.__init__(self)
         self._logger = logging.getLogger(__name__)
         self._cnf = bus.cnf
+        self._metacache = metacache.MetadataCache(self._meta_url,
+                timeout=self._metadata_timeout,
+                ttl=self._metadata_ttl)
+
+    def prefetch_metadata(self):
+        try:
+            self._metacache.prefetch([self._metadata_key + '/'])
+        except:
+            self._logger.debug('Meta-data prefetch failed: %s', sys.exc_info()[1])
 
     def _get_property(self, name):
-        if not self._metadata.has_key(name):
-            full_name = self._metadata_key + "/" + name
-            self._metadata[name] = self._fetch_metadata(full_name)
-        return self._metadata[name]
+        return self._fetch_metadata(self._metadata_key + "/" + name)
 
     def _fetch_metadata(self, key):
-        url = self._meta_url + key
         try:
-            r = urllib2.urlopen(url)
-            return r.read().strip()
-        except IOError, e:
-            if isinstance(e, urllib2.HTTPError):
-                if e.code == 404:
-                    return ""
-            raise PlatformError("Cannot fetch %s metadata url '%s'. Error: %s" %
-                (self.name, url, e))
+            return self._metacache.get(key)
+        except metacache.Error, e:
+            raise PlatformError("Cannot fetch %s metadata. Error: %s" % (self.name, e))
 
     def get_private_ip(self):
         return self._get_property("local-ipv4")
@@ -323,13 +337,14 @@ class Ec2LikePlatform(Platform):
         return self.get_avail_zone()[0:-1]
 
     def get_block_device_mapping(self):
-        keys = self._get_property("block-device-mapping").split("\n")
-        ret = {}
-        for key in keys:
-            ret[key] = self._get_property("block-device-mapping/" + key)
-        return ret
+        return dict(self.block_devs_mapping())
 
     def block_devs_mapping(self):
+        bdm_key = self._metadata_key + "/block-device-mapping"
+        try:
+            self._metacache.prefetch([bdm_key + "/"])
+        except:
+            self._logger.debug('Block device mapping prefetch failed: %s', sys.exc_info()[1])
         keys = self._get_property("block-device-mapping").split("\n")
         ret = list()
         for key in keys:
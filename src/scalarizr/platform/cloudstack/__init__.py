@@ -1,6 +1,5 @@
 
 import os
-import urllib2
 import glob
 import sys
 import logging
@@ -11,6 +10,7 @@ from scalarizr import node
 from scalarizr.bus import bus
 from scalarizr.util import LocalPool
 from scalarizr.platform import Platform, PlatformFeatures, PlatformError
+from scalarizr.platform import metacache
 from scalarizr.platform import ConnectionError, NoCredentialsError, InvalidCredentialsError
 from . import storage
 from scalarizr import util
@@ -48,10 +48,11 @@ class CloudStackPlatform(Platform):
     _dhcp_leases_mtime = None
     _dhcp_leases_path = None
     _router_addr = None
+    metadata_prefetch = ('instance-id', 'local-ipv4', 'public-ipv4', 'availability-zone')
 
     def __init__(self):
         Platform.__init__(self)
-        self._metadata = {}
+        self._metacache = None
         self._conn_pool = LocalPool(_create_connection)
         self.refresh_virtual_router_addr()
 
@@ -90,17 +91,25 @@ class CloudStackPlatform(Platform):
         return self.get_meta_data('public-ipv4')
 
 
+    def prefetch_metadata(self):
+        try:
+            self._get_metacache().prefetch(self.metadata_prefetch, recursive=False)
+        except:
+            LOG.debug('Meta-data prefetch failed: %s', sys.exc_info()[1])
+
     def get_meta_data(self, key):
+        try:
+            return self._get_metacache().get(key)
+        except metacache.Error:
+            exc_info = sys.exc_info()
+            raise PlatformError, "Can't fetch meta-data from '%s'." \
+                            " error: %s" % (self._router_addr, exc_info[1]), exc_info[2]
+
+    def _get_metacache(self):
         self.refresh_virtual_router_addr()
-        if not key in self._metadata:
-            try:
-                url = 'http://%s/latest/%s' % (self._router_addr, key)
-                self._metadata[key] = urllib2.urlopen(url).read().strip()
-            except IOError:
-                exc_info = sys.exc_info()
-                raise PlatformError, "Can't fetch meta-data from '%s'." \
-                                " error: %s" % (url, exc_info[1]), exc_info[2]
-        return self._metadata[key]
+        if not self._metacache or self._metacache.host != self._router_addr:
+            self._metacache = metacache.MetadataCache('http://%s/latest/' % self._router_addr)
+        return self._metacache
 
     def get_instance_id(self):
         ret = self.get_meta_data('instance-id')
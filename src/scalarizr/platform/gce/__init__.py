@@ -4,7 +4,6 @@ import os
 import sys
 import base64
 import logging
-import urllib2
 import httplib2
 import threading
 from httplib import BadStatusLine
@@ -17,6 +16,7 @@ from apiclient.discovery import build
 from scalarizr import node
 from scalarizr import platform
 from scalarizr.platform import NoCredentialsError, InvalidCredentialsError
+from scalarizr.platform import metacache
 from scalarizr.util import LocalPool
 
 
@@ -168,7 +168,16 @@ class GcePlatform(platform.Platform):
     storage_api_version = 'v1'
 
     metadata_url = 'http://metadata/computeMetadata/v1/'
-    _metadata = None
+    metadata_prefetch = (
+        'instance/network-interfaces/?recursive=true',
+        'project/project-id',
+        'project/numeric-project-id',
+        'instance/zone',
+        'instance/machine-type',
+        'instance/id',
+        'instance/hostname',
+        'instance/image'
+    )
     name = 'gce'
 
     def __init__(self):
@@ -177,31 +186,31 @@ class GcePlatform(platform.Platform):
                 'compute', 'v1', COMPUTE_RW_SCOPE + STORAGE_FULL_SCOPE)
         self._storage_conn_pool = GCEConnectionPool(
                 'storage', 'v1', STORAGE_FULL_SCOPE)
+        self._metacache = metacache.MetadataCache(self.metadata_url,
+                headers={'X-Google-Metadata-Request': 'True'},
+                ttl={'instance/network-interfaces/': 300})
 
-    def _get_metadata(self, key, url=None):
-        if url is None:
-            url = key
-
-        if self._metadata is None:
-            self._metadata = dict()
-
-        if not url in self._metadata:
-            key_url = os.path.join(self.metadata_url, url)
-            req = urllib2.Request(key_url, headers={'X-Google-Metadata-Request': 'True'})
-            resp = urllib2.urlopen(req)
-            self._metadata[key] = resp.read()
+    def prefetch_metadata(self):
+        try:
+            self._metacache.prefetch(self.metadata_prefetch, recursive=False)
+        except:
+            LOG.debug('Meta-data prefetch failed: %s', sys.exc_info()[1])
 
-        return self._metadata[key]
+    def _get_metadata(self, key, url=None):
+        try:
+            return self._metacache.get(url or key)
+        except metacache.Error, e:
+            raise platform.PlatformError(str(e))
 
 
     def get_public_ip(self):
-        network = self._get_metadata('network', 'instance/network-interfaces/?recursive=true')
+        network = self._get_metadata('instance/network-interfaces/?recursive=true')
         network = json.loads(network)
         return network[0]['accessConfigs'][0]['externalIp']
 
 
     def get_private_ip(self):
-        network = self._get_metadata('network', 'instance/network-interfaces/?recursive=true')
+        network = self._get_metadata('instance/network-interfaces/?recursive=true')
         network = json.loads(network)
         return network[0]['ip']
 
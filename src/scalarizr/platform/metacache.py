@@ -0,0 +1,195 @@
+'''
+Cached access to cloud instance meta-data services.
+
+Instance meta-data is served over plain HTTP from a link-local address,
+every key costs a full round-trip. MetadataCache keeps one keep-alive
+connection per thread, fetches keys with a timeout, caches values with
+per-key TTLs (most of the meta-data never changes during instance lifetime)
+and can prefetch a whole subtree concurrently.
+'''
+
+import time
+import socket
+import httplib
+import urlparse
+import logging
+import threading
+from multiprocessing.pool import ThreadPool
+
+
+LOG = logging.getLogger(__name__)
+
+FOREVER = None
+
+
+class Error(Exception):
+    pass
+
+
+class MetadataCache(object):
+    '''
+    :param base_url: Meta-data service url, all keys are relative to it
+    :param headers: Extra HTTP headers sent with every request
+    :param timeout: Socket timeout in seconds for a single request
+    :param ttl: Dict of key prefix -> seconds. Keys matching no prefix
+        use default_ttl
+    :param default_ttl: TTL for keys not found in ttl. FOREVER (None)
+        caches them until invalidate()
+    :param workers: Number of threads used by prefetch()
+    '''
+
+    retries = 2
+
+    def __init__(self, base_url, headers=None, timeout=5,
+                 ttl=None, default_ttl=FOREVER, workers=8):
+        url = urlparse.urlparse(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.path = url.path.rstrip('/') + '/'
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.ttl = ttl or {}
+        self.default_ttl = default_ttl
+        self.workers = workers
+        self.stats = {'hits': 0, 'misses': 0, 'requests': 0}
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def get(self, key):
+        '''
+        Returns key value from cache, fetching it when missing or expired.
+        Missing keys (HTTP 404) are cached as empty string.
+        '''
+        key = key.strip('/')
+        value = self._cached(key)
+        if value is not None:
+            self.stats['hits'] += 1
+            return value
+        self.stats['misses'] += 1
+        return self._store(key, self.fetch(key))
+
+    def list(self, key):
+        '''
+        Returns directory listing for key as a list of names.
+        Names of subdirectories end with '/'
+        '''
+        value = self.get(key)
+        return [name for name in value.splitlines() if name]
+
+    def prefetch(self, keys=('',), recursive=True):
+        '''
+        Concurrently fetches keys and stores them in cache.
+        When recursive, directory listings (keys ending with '/' or the root)
+        are walked breadth-first and all leaf values are fetched too.
+        Keys that are already cached and not expired are not re-fetched.
+        '''
+        pool = ThreadPool(processes=self.workers)
+        try:
+            level = [key.lstrip('/') for key in keys]
+            while level:
+                results = pool.map(self._prefetch_one, level)
+                level = []
+                if not recursive:
+                    break
+                for key, names in results:
+                    for name in names or ():
+                        if '=' in name:
+                            # EC2 public-keys listing: '0=key-name'
+                            name = name.split('=', 1)[0] + '/'
+                        if name.endswith('/'):
+                            level.append(self._join(key, name.rstrip('/')) + '/')
+                        else:
+                            level.append(self._join(key, name))
+        finally:
+            pool.close()
+            pool.join()
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(key.strip('/'), None)
+
+    def fetch(self, key):
+        '''
+        Fetches key from meta-data service bypassing cache.
+        Returns None when key doesn't exists
+        '''
+        path = self.path + key
+        for retry in range(self.retries):
+            conn = self._connection()
+            try:
+                conn.request('GET', path, headers=self.headers)
+                resp = conn.getresponse()
+                body = resp.read()
+                self.stats['requests'] += 1
+            except (socket.error, httplib.HTTPException), e:
+                self._close()
+                if retry == self.retries - 1:
+                    raise Error("Cannot fetch meta-data url 'http://%s:%s%s'. Error: %s" % (
+                                self.host, self.port, path, e))
+                continue
+            if resp.getheader('connection', '').lower() == 'close':
+                self._close()
+            if resp.status == 404:
+                return None
+            if resp.status != 200:
+                raise Error("Cannot fetch meta-data url 'http://%s:%s%s'. HTTP %s %s" % (
+                            self.host, self.port, path, resp.status, resp.reason))
+            return body.strip()
+
+    def _prefetch_one(self, key):
+        is_dir = not key or key.endswith('/')
+        key = key.rstrip('/')
+        value = self._cached(key)
+        if value is None:
+            try:
+                value = self._store(key, self.fetch(key + ('/' if is_dir and key else '')))
+            except Error, e:
+                LOG.debug('Meta-data prefetch of %s failed: %s', key, e)
+                return key, None
+        if is_dir:
+            return key, [name for name in value.splitlines() if name]
+        return key, None
+
+    def _cached(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and (entry[1] is None or entry[1] > time.time()):
+                return entry[0]
+
+    def _store(self, key, value):
+        if value is None:
+            value = ''
+        ttl = self._ttl(key)
+        expires = None if ttl is FOREVER else time.time() + ttl
+        with self._lock:
+            self._cache[key] = (value, expires)
+        return value
+
+    def _ttl(self, key):
+        matches = [prefix for prefix in self.ttl if key.startswith(prefix)]
+        if matches:
+            return self.ttl[max(matches, key=len)]
+        return self.default_ttl
+
+    def _join(self, key, name):
+        return key + '/' + name if key else name
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if not conn:
+            conn = httplib.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn:
+            conn.close()
+            self._local.conn = None
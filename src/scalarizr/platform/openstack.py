@@ -207,6 +207,7 @@ class SwiftConnectionProxy(platform.ConnectionProxy):
 class OpenstackPlatform(platform.Platform):
 
     _meta_url = "http://169.254.169.254/openstack/latest/meta_data.json"
+    _meta_timeout = 5
     _metadata = {}
     _userdata = None
 
@@ -266,7 +267,7 @@ class OpenstackPlatform(platform.Platform):
         try:
             try:
                 self._logger.debug('fetching meta-data from %s', self._meta_url)
-                r = urllib2.urlopen(self._meta_url)
+                r = urllib2.urlopen(self._meta_url, timeout=self._meta_timeout)
                 response = r.read().strip()
                 meta = json.loads(response)
             except:
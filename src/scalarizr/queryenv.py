@@ -471,6 +471,10 @@ class QueryEnvService(object):
             m.name = metric_el['name']
             m.path = metric_el['path']
             m.retrieve_method = metric_el['retrieve-method'].strip()
+            if metric_el.get('timeout'):
+                m.timeout = int(metric_el['timeout'])
+            if metric_el.get('interval'):
+                m.interval = int(metric_el['interval'])
             ret.append(m)
         return ret
 
@@ -654,6 +658,8 @@ class ScalingMetric(object):
     id = None
     name = None
     path = None
+    timeout = None
+    interval = None
 
     _retrieve_method = None
 
@@ -125,11 +125,27 @@ class RequestHandler(object):
         LOG.exception('Caught exception')
 
     def handle_request(self, data, namespace=None):
+        """
+        Handles a single JSON-RPC request or a batch (list of requests).
+        Returns serialized response, a list of responses for a batch
+        """
+        if isinstance(data, basestring):
+            try:
+                data = self._parse_request(data)
+            except ServiceError, e:
+                return self._serialize_response('', error=self._format_error(e))
+        if isinstance(data, list):
+            if not data:
+                return self._serialize_response('',
+                        error=self._format_error(InvalidRequestError('Empty batch')))
+            return '[%s]' % ', '.join(self._handle_one(req, namespace) for req in data)
+        return self._handle_one(data, namespace)
+
+    def _handle_one(self, data, namespace):
         id, result, error = '', None, None
         log_it = False
         try:
-            req = self._parse_request(data) if isinstance(data, basestring) else data
-            id, method, params = self._translate_request(req)
+            id, method, params = self._translate_request(data)
             svs = self._find_service(namespace)
             fn = self._find_method(svs, method)
             if fn._jsonrpc == 'command':
@@ -137,39 +153,40 @@ class RequestHandler(object):
                 data_to_log = self._clear_request_data(data)
                 LOG.debug('request: %s', json.dumps(data_to_log))
             result = self._invoke_method(fn, params)
-            # important to test json serializarion before serialize the whole result
-            json.dumps(result)
-
-        except ServiceError, e:
-            error = {'code': e.code,
-                            'message': e.message,
-                            'data': e.data}
         except:
-            E, e = sys.exc_info()[:2]
-            if E in (SystemExit, KeyboardInterrupt):
+            if sys.exc_info()[0] in (SystemExit, KeyboardInterrupt):
                 raise
-            code = E.__name__
-            if E in (KeyError, IndexError):
-                # file/line/def where exception occurred formatted like exception stacktrace 
-                where = traceback.format_list([traceback.extract_tb(sys.exc_info()[2])[-1]])[0].strip()  
-                message = '{0}: {1} in {2}'.format(E.__name__, e, where)
-            else:
-                message = '{0}: {1}'.format(E.__name__, e)
-            LOG.warn('Caught API exception. {0}'.format(message), exc_info=sys.exc_info())
-            error = {'code': ServiceError.INTERNAL,
-                            'message': message,
-                            'data': None}
-        finally:
-            if not error:
-                resp = {'result': result}
-            else:
-                resp = {'error': error}
-            resp['id'] = id
-        ret = json.dumps(resp)
+            error = self._format_error(sys.exc_info()[1])
+        ret = self._serialize_response(id, result, error)
         if log_it:
             LOG.debug('response: %s', ret)
         return ret
 
+    def _serialize_response(self, id, result=None, error=None):
+        if not error:
+            try:
+                return json.dumps({'result': result, 'id': id})
+            except:
+                # result is not serializable
+                error = self._format_error(sys.exc_info()[1])
+        return json.dumps({'error': error, 'id': id})
+
+    def _format_error(self, e):
+        if isinstance(e, ServiceError):
+            return {'code': e.code,
+                    'message': e.message,
+                    'data': e.data}
+        E = type(e)
+        if E in (KeyError, IndexError):
+            # file/line/def where exception occurred formatted like exception stacktrace
+            where = traceback.format_list([traceback.extract_tb(sys.exc_info()[2])[-1]])[0].strip()
+            message = '{0}: {1} in {2}'.format(E.__name__, e, where)
+        else:
+            message = '{0}: {1}'.format(E.__name__, e)
+        LOG.warn('Caught API exception. {0}'.format(message), exc_info=sys.exc_info())
+        return {'code': ServiceError.INTERNAL,
+                'message': message,
+                'data': None}
 
     def _parse_request(self, data):
         try:
@@ -235,6 +252,34 @@ class ServiceProxy(object):
         finally:
             self.local.method = []
 
+    def batch(self, calls):
+        """
+        Sends several calls in one request: proxy.namespace.batch([(method, params), ...])
+        Returns list of results in calls order, ServiceError instances for failed calls
+        """
+        try:
+            method = getattr(self.local, 'method', [])
+            self.local.method = method + ['batch']
+            ids = range(len(calls))
+            req = json.dumps([{'method': name, 'params': params or {}, 'id': id}
+                              for id, (name, params) in zip(ids, calls)])
+            resp = json.loads(self.exchange(req))
+            if isinstance(resp, dict):
+                error = resp['error']
+                raise ServiceError(error.get('code'), error.get('message'), error.get('data'))
+            results = dict((r['id'], r) for r in resp)
+            ret = []
+            for id in ids:
+                r = results[id]
+                if 'error' in r:
+                    error = r['error']
+                    ret.append(ServiceError(error.get('code'), error.get('message'), error.get('data')))
+                else:
+                    ret.append(r['result'])
+            return ret
+        finally:
+            self.local.method = []
+
     def exchange(self, request):
         raise NotImplementedError()
 
@@ -19,6 +19,7 @@ import time
 import shutil
 import socket
 import errno
+import thread
 
 
 from pymysql import cursors
@@ -177,8 +178,137 @@ class MySQL(BaseService):
     my_cnf = property(_get_my_cnf, _set_my_cnf)
 
 
+class ConnectionPool(object):
+    """
+    Bounded pool of connections with the same credentials.
+
+    Connection is checked out for a single statement and returned back,
+    unless calling thread pinned it: then the thread gets the same session
+    until unpin(), which is required for statements like
+    FLUSH TABLES WITH READ LOCK. Connections idle longer than ping_interval
+    are pinged before reuse.
+    """
+
+    def __init__(self, connect, size=5, timeout=30, ping_interval=30):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._idle = []  # [(conn, released_at), ...]
+        self._pinned = {}  # thread ident -> [conn, depth]
+        self._generations = {}  # id(conn) -> generation it was opened in
+        self._used = 0
+        self._generation = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        ident = thread.get_ident()
+        with self._cond:
+            if ident in self._pinned:
+                return self._pinned[ident][0]
+            self._reap_pinned()
+            time_until = time.time() + self.timeout
+            while not self._idle and self._used >= self.size:
+                remaining = time_until - time.time()
+                if remaining <= 0:
+                    raise ServiceError('No free MySQL connections in pool (size: %d)' % self.size)
+                self._cond.wait(remaining)
+            self._used += 1
+            idle = self._idle.pop() if self._idle else None
+            generation = self._generation
+        try:
+            conn = (idle and self._healthy(*idle)) or self._connect()
+            with self._cond:
+                self._generations[id(conn)] = generation
+            return conn
+        except:
+            with self._cond:
+                self._used -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn, broken=False):
+        ident = thread.get_ident()
+        with self._cond:
+            pinned = self._pinned.get(ident)
+            if pinned and pinned[0] is conn:
+                if not broken:
+                    return
+                del self._pinned[ident]
+            self._put(conn, broken)
+
+    def pin(self):
+        ident = thread.get_ident()
+        conn = self.acquire()
+        with self._cond:
+            if ident in self._pinned:
+                self._pinned[ident][1] += 1
+            else:
+                self._pinned[ident] = [conn, 1]
+
+    def pinned(self):
+        with self._cond:
+            return thread.get_ident() in self._pinned
+
+    def unpin(self):
+        ident = thread.get_ident()
+        with self._cond:
+            pinned = self._pinned.get(ident)
+            if not pinned:
+                return
+            pinned[1] -= 1
+            if not pinned[1]:
+                del self._pinned[ident]
+                self._put(pinned[0])
+
+    def clear(self):
+        """ Close idle connections, ones in use will be closed when released """
+        with self._cond:
+            self._generation += 1
+            for conn, _ in self._idle:
+                self._close(conn)
+            self._idle = []
+
+    def _put(self, conn, broken=False):
+        # called with self._cond held
+        generation = self._generations.pop(id(conn))
+        if broken or generation != self._generation:
+            self._close(conn)
+        else:
+            self._idle.append((conn, time.time()))
+        self._used -= 1
+        self._cond.notify()
+
+    def _reap_pinned(self):
+        # threads that exited without unpin() would hold their connections forever
+        alive = set(t.ident for t in threading.enumerate())
+        for ident in [ident for ident in self._pinned if ident not in alive]:
+            conn = self._pinned.pop(ident)[0]
+            del self._generations[id(conn)]
+            self._close(conn)
+            self._used -= 1
+
+    def _healthy(self, conn, released_at):
+        if time.time() - released_at < self.ping_interval:
+            return conn
+        try:
+            conn.ping(False)
+            return conn
+        except:
+            LOG.debug('Idle MySQL connection is dead, opening a new one')
+            self._close(conn)
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except:
+            pass
+
+
 class MySQLClient(object):
-    _pool = dict()
+    _pools = dict()
+    _pools_lock = threading.Lock()
+    pool_size = 5
 
     def __init__(self, user=None, passwd=None, db=None):
         self.db = db
@@ -233,11 +363,32 @@ class MySQLClient(object):
 	
 	
     def lock_tables(self):
-        return self.fetchone('FLUSH TABLES WITH READ LOCK')
+        # lock belongs to session, keep it for this thread until unlock_tables
+        self.pool.pin()
+        try:
+            return self.fetchone('FLUSH TABLES WITH READ LOCK')
+        except:
+            self.pool.unpin()
+            raise
 
 
     def unlock_tables(self):
-        return self.fetchone('UNLOCK TABLES')
+        try:
+            return self.fetchone('UNLOCK TABLES')
+        finally:
+            self.pool.unpin()
+
+
+    def flush_tables(self):
+        return self.fetchone('FLUSH NO_WRITE_TO_BINLOG TABLES')
+
+
+    def long_running_queries(self, min_time):
+        """ Statements that would make FLUSH TABLES WITH READ LOCK wait """
+        return self.fetchdict("SELECT ID, USER, TIME, INFO FROM information_schema.PROCESSLIST "
+                        "WHERE COMMAND NOT IN ('Sleep', 'Binlog Dump', 'Daemon') "
+                        "AND USER != 'system user' AND ID != CONNECTION_ID() "
+                        "AND TIME >= %s", fetch_one=False, args=(min_time, ))
 
 
     def create_user(self, login, host, password, privileges=None):
@@ -246,7 +397,7 @@ class MySQLClient(object):
             '''
             XXX: temporary solution for mysql55
             '''
-            cmd = "INSERT INTO mysql.user VALUES('%s','%s',PASSWORD('%s')" % (host, login, password) + ",'Y'"*priv_count
+            cmd = "INSERT INTO mysql.user VALUES(%s,%s,PASSWORD(%s)" + ",'Y'"*priv_count
             column_count = len(self.fetchdict("select * from mysql.user LIMIT 1;"))
             if column_count == 43:
                 cmd += ",'','','','',0,0,0,0,'','','N'"
@@ -256,35 +407,37 @@ class MySQLClient(object):
                 cmd += ",''"*4 +',0'*4
             cmd += ");"
         else:
-            cmd = "INSERT INTO mysql.user (Host, User, Password, %s) VALUES ('%s','%s',PASSWORD('%s'), %s);" \
-                            % (', '.join(privileges), host,login,password, ', '.join(["'Y'"]*len(privileges)))
-        self.fetchone(cmd)
+            cmd = "INSERT INTO mysql.user (Host, User, Password, " + ', '.join(privileges) + \
+                            ") VALUES (%s,%s,PASSWORD(%s), " + ', '.join(["'Y'"]*len(privileges)) + ");"
+        self.fetchone(cmd, (host, login, password))
         self.flush_privileges()
 
 
     def remove_user(self, login, host):
-        return self.fetchone("DELETE FROM mysql.user WHERE User='%s' and Host='%s'" % (login, host))
+        return self.fetchone("DELETE FROM mysql.user WHERE User=%s and Host=%s", (login, host))
 
 
     def user_exists(self, login, host):
-        ret = self.fetchone("select User,Host from mysql.user where User='%s' and Host='%s'" % (login, host))
+        ret = self.fetchone("select User,Host from mysql.user where User=%s and Host=%s", (login, host))
         result = ret and len(ret)==2 and ret[0]==login and ret[1]==host
         LOG.debug('user_exists query returned value: %s for user %s on host %s. User exists: %s' % (str(ret), login, host, str(result)))
         return result
 
     def set_user_password(self, username, host, password):
-        return self.fetchone("UPDATE mysql.user SET Password=PASSWORD('%s') WHERE User='%s' AND Host='%s';" % (password, username, host))
+        return self.fetchone("UPDATE mysql.user SET Password=PASSWORD(%s) WHERE User=%s AND Host=%s;",
+                        (password, username, host))
 
     def flush_privileges(self):
         return self.fetchone("FLUSH PRIVILEGES")
 
     def change_master_to(self, host, user, password, log_file, log_pos):
-        return self.fetchone('CHANGE MASTER TO MASTER_HOST="%(host)s", \
-                                        MASTER_USER="%(user)s", \
-                                        MASTER_PASSWORD="%(password)s", \
-                                        MASTER_LOG_FILE="%(log_file)s", \
-                                        MASTER_LOG_POS=%(log_pos)s, \
-                                        MASTER_CONNECT_RETRY=15;' % vars())
+        return self.fetchone('CHANGE MASTER TO MASTER_HOST=%s, \
+                                        MASTER_USER=%s, \
+                                        MASTER_PASSWORD=%s, \
+                                        MASTER_LOG_FILE=%s, \
+                                        MASTER_LOG_POS=%s, \
+                                        MASTER_CONNECT_RETRY=15;',
+                                        (host, user, password, log_file, int(log_pos)))
 
 
     def slave_status(self):
@@ -319,7 +472,7 @@ class MySQLClient(object):
         return d
 
     def check_password(self, user, password):
-        hash_pairs = self.fetchall("SELECT PASSWORD('%s') AS hash, Password AS valid_hash FROM mysql.user WHERE mysql.user.User = '%s';" %
+        hash_pairs = self.fetchall("SELECT PASSWORD(%s) AS hash, Password AS valid_hash FROM mysql.user WHERE mysql.user.User = %s;",
                         (password, user))
 
         for pair in hash_pairs:
@@ -333,16 +486,22 @@ class MySQLClient(object):
         return self.fetchone('SELECT VERSION()')
 
     def reconnect(self):
-        self._pool[self.creds] = pymysql.connect(host="127.0.0.1", user=self.user, passwd=self.passwd, db=self.db)
+        """ Sessions opened so far are closed, next statements get new ones """
+        self.pool.clear()
 
     @property
     def creds(self):
         return (self.user, self.passwd, self.db)
 
-    def get_connection(self, force=False):
-        if force or not self.creds in self._pool:
-            self.reconnect()
-        return self._pool[self.creds]
+    @property
+    def pool(self):
+        with self._pools_lock:
+            if self.creds not in self._pools:
+                self._pools[self.creds] = ConnectionPool(self._connect, size=self.pool_size)
+            return self._pools[self.creds]
+
+    def _connect(self):
+        return pymysql.connect(host="127.0.0.1", user=self.user, passwd=self.passwd, db=self.db)
 
 
     def _priv_count(self):
@@ -350,38 +509,44 @@ class MySQLClient(object):
         return len([r for r in res.keys() if r.endswith('priv')])
 
 
-    def _fetch(self, query, cursor_type = None, fetch_one=False):
-        conn = self.get_connection()
-        cur = conn.cursor(cursor_type)
+    def _fetch(self, query, args=None, cursor_type=None, fetch_one=False):
         LOG.debug(query)
-        try:
-            cur.execute(query)
-        except (pymysql.err.Error, pymysql.err.OperationalError, socket.error, IOError), e:
-            #catching mysqld restarts (e.g. sgt)
-            if type(e) == pymysql.err.Error or e.args[0] in (2013,32,errno.EPIPE):
-                try:
-                    conn = self.get_connection(force=True)
-                    cur = conn.cursor(cursor_type)
-                    cur.execute(query)
-                except socket.error, err:
-                    if err.args[0] == 32:
-                        raise ServiceError('Scalarizr was unable to connect to mysql with user %s: (%s)' % (self.user, str(err)))
-            else:
+        # new session wouldn't have locks the pinned one had
+        pinned = self.pool.pinned()
+        retry = not pinned
+        while True:
+            conn = self.pool.acquire()
+            try:
+                cur = conn.cursor(cursor_type)
+                cur.execute(query, args)
+                res = cur.fetchone() if fetch_one else cur.fetchall()
+            except (pymysql.err.Error, pymysql.err.OperationalError, socket.error, IOError), e:
+                #catching mysqld restarts (e.g. sgt)
+                lost = type(e) == pymysql.err.Error or \
+                        (e.args and e.args[0] in (2006, 2013, 32, errno.EPIPE))
+                self.pool.release(conn, broken=lost)
+                if lost and retry:
+                    retry = False
+                    continue
+                if lost and pinned:
+                    raise ServiceError('MySQL session holding table lock was lost: %s' % e)
+                if isinstance(e, socket.error) and e.args and e.args[0] == 32:
+                    raise ServiceError('Scalarizr was unable to connect to mysql with user %s: (%s)' % (self.user, str(e)))
                 raise
-        res = cur.fetchone() if fetch_one else cur.fetchall()
-        return res
+            self.pool.release(conn)
+            return res
 
 
-    def fetchdict(self, query, fetch_one=True):
-        return self._fetch(query, cursors.DictCursor, fetch_one)
+    def fetchdict(self, query, fetch_one=True, args=None):
+        return self._fetch(query, args, cursors.DictCursor, fetch_one)
 
 
-    def fetchall(self, query):
-        return self._fetch(query)
+    def fetchall(self, query, args=None):
+        return self._fetch(query, args)
 
 
-    def fetchone(self, query):
-        return self._fetch(query, fetch_one=True)
+    def fetchone(self, query, args=None):
+        return self._fetch(query, args, fetch_one=True)
 
 
 class MySQLUser(object):
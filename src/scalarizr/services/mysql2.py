@@ -3,6 +3,7 @@ from __future__ import with_statement
 import os
 import sys
 import re
+import time
 import logging
 import subprocess
 import threading
@@ -62,40 +63,123 @@ __mysql__.update({
 })
 
 
+# Snapshot of these types neither syncs nor suspends a frozen filesystem
+# (ebs and cinder skip their sync when filesystem is frozen)
+FSFREEZE_VOLUME_TYPES = ('ebs', 'cinder', 'csvol', 'gce_persistent', 'loop')
+
+
 class MySQLSnapBackup(backup.SnapBackup):
+    '''
+    freeze_method:
+        'fsfreeze' - FLUSH TABLES WITH READ LOCK is held only while binary log
+            coordinates are read and data filesystem is frozen. Filesystem stays
+            frozen until snapshot is taken, but MySQL is unlocked in milliseconds
+        'lock' - lock is held until snapshot is taken
+        Default is 'fsfreeze' when it's available for FSFREEZE_VOLUME_TYPES.
+        Other types sync or suspend their device (dmsetup suspend, lvcreate -s)
+        while taking a snapshot, that can't be done under a frozen filesystem
+
+    Before locking it waits up to long_query_timeout seconds for queries
+    running longer than long_query_time to finish, and fails otherwise:
+    FTWRL waiting for them would stall every writer.
+    '''
 
-    def __init__(self, **kwds):
-        super(MySQLSnapBackup, self).__init__(**kwds)
+    def __init__(self,
+                 freeze_method=None,
+                 long_query_time=10,
+                 long_query_timeout=60,
+                 **kwds):
+        super(MySQLSnapBackup, self).__init__(
+                freeze_method=freeze_method,
+                long_query_time=long_query_time,
+                long_query_timeout=long_query_timeout,
+                **kwds)
         self.on(
             freeze=self.freeze,
             unfreeze=self.unfreeze
         )
         self._mysql_init = mysql_svc.MysqlInitScript()
+        self._frozen_mpoint = None
+        self._locked_at = None
 
     def _client(self):
         return mysql_svc.MySQLClient(
             __mysql__['root_user'],
             __mysql__['root_password'])
 
-    def freeze(self, volume, state):
-        self._mysql_init.start()
-        client = self._client()
-        client.lock_tables()
-        coreutils.sync()
+    def _freeze_method(self, volume):
+        if self.freeze_method:
+            return self.freeze_method
+        if volume.type in FSFREEZE_VOLUME_TYPES and volume.mounted_to() \
+                and linux.which('fsfreeze'):
+            return 'fsfreeze'
+        return 'lock'
+
+    def _wait_long_queries(self, client):
+        deadline = time.time() + self.long_query_timeout
+        while True:
+            queries = client.long_running_queries(self.long_query_time)
+            if not queries:
+                return
+            if time.time() >= deadline:
+                raise Error('Long running queries would block FLUSH TABLES WITH READ LOCK: %s' %
+                        ', '.join('%s (%ss)' % (q['ID'], q['TIME']) for q in queries))
+            LOG.debug('Waiting for %d long running queries to finish before locking tables',
+                    len(queries))
+            time.sleep(1)
+
+    def _binlog_position(self, client):
         if int(__mysql__['replication_master']):
             (log_file, log_pos) = client.master_status()
         else:
             slave_status = client.slave_status()
             log_pos = slave_status['Exec_Master_Log_Pos']
             log_file = slave_status['Master_Log_File']
+        return {'log_file': log_file, 'log_pos': log_pos}
+
+    def _unlock(self, client, state):
+        client.unlock_tables()
+        state['lock_duration'] = round(time.time() - self._locked_at, 3)
+        self._locked_at = None
+        LOG.info('MySQL tables were locked for %.3f seconds', state['lock_duration'])
+
+    def freeze(self, volume, state):
+        self._mysql_init.start()
+        client = self._client()
+        self._wait_long_queries(client)
+        method = self._freeze_method(volume)
+        LOG.debug('Freezing MySQL with %s', method)
+        # flush without lock first, so FTWRL has little left to flush
+        client.flush_tables()
+        client.lock_tables()
+        self._locked_at = time.time()
+        try:
+            upd = self._binlog_position(client)
+            if method == 'fsfreeze':
+                mpoint = volume.mounted_to()
+                coreutils.fsfreeze(mpoint)
+                self._frozen_mpoint = mpoint
+                self._unlock(client, state)
+            else:
+                coreutils.sync()
+        except:
+            exc_info = sys.exc_info()
+            # unfreeze event isn't fired when freeze fails
+            try:
+                self.unfreeze(volume, state)
+            except:
+                LOG.warn('Failed to unfreeze MySQL', exc_info=sys.exc_info())
+            raise exc_info[0], exc_info[1], exc_info[2]
 
-        upd = {'log_file': log_file, 'log_pos': log_pos}
         state.update(upd)
         self.tags.update(upd)
 
-    def unfreeze(self, *args):
-        client = self._client()
-        client.unlock_tables()
+    def unfreeze(self, volume, state):
+        if self._frozen_mpoint:
+            coreutils.fsfreeze(self._frozen_mpoint, unfreeze=True)
+            self._frozen_mpoint = None
+        if self._locked_at:
+            self._unlock(self._client(), state)
 
 
 class MySQLSnapRestore(backup.SnapRestore):
@@ -599,6 +599,15 @@ class PSQL(object):
         roles = out.split()[2:-2]
         return roles    
     
+    def list_pg_database_sizes(self):
+        out = self.execute('SELECT datname, pg_database_size(datname) FROM pg_database where not datistemplate;')
+        sizes = {}
+        for line in out.splitlines()[2:]:
+            row = [col.strip() for col in line.split('|')]
+            if len(row) == 2 and row[1].isdigit():
+                sizes[row[0]] = int(row[1])
+        return sizes
+
     def delete_pg_role(self, name):
         out = self.execute('DROP ROLE IF EXISTS %s;' % name)
         LOG.debug(out)
@@ -23,7 +23,7 @@ except ImportError:
 
 from scalarizr.util import system2, firstmatched, PopenError
 from scalarizr.util.software import which
-from scalarizr.linux import coreutils, pkgmgr
+from scalarizr.linux import coreutils, pkgmgr, events
 from scalarizr.storage import StorageError
 
 
@@ -276,7 +276,9 @@ class Lvm2:
             raise Lvm2Error('Cannot create logical volume: %s' % err)
 
         device_path = lvpath(os.path.basename(group), vol)
-        wait_until(lambda: os.path.exists(device_path), timeout=30)
+        with events.PathWatcher(device_path) as watcher:
+            wait_until(lambda: os.path.exists(device_path), timeout=30,
+                       sleep=0.1, backoff=2, max_sleep=2, wakeup=watcher)
         return device_path
 
 
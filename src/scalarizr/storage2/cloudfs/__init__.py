@@ -1100,24 +1100,15 @@ class Manifest(object):
         except AttributeError:
             LOG.debug("'cloudfs_path' for the manifest isn't defined")
             raise
-        pieces = Queue.Queue()
-        for file_ in self.data["files"]:
-            for name, checksum, size in file_["chunks"]:
-                pieces.put(os.path.join(path, name))
-
-        def delete_obj():
-            driver = cloudfs(urlparse.urlparse(path).scheme)
-            while True:
-                try:
-                    driver.delete(pieces.get_nowait())
-                except Queue.Empty:
-                    return
-
-        threads = [threading.Thread(target=delete_obj) for i in range(
-                min(destroyers, pieces.qsize()))]
-        if threads:
-            map(lambda x: x.start(), threads)
-            map(lambda x: x.join(), threads)
+        pieces = [os.path.join(path, name)
+                  for file_ in self.data["files"]
+                  for name, checksum, size in file_["chunks"]]
+        driver = cloudfs(urlparse.urlparse(path).scheme)
+        try:
+            driver.delete_many(pieces, workers=destroyers)
+        except:
+            # Cleanup is best effort, it's also called on transfer errors
+            LOG.warn('Cloudfs clean up failed: %s', sys.exc_info()[1])
 
 
 class _CloudfsTypes(dict):
@@ -1,6 +1,12 @@
 import sys
 import urlparse
 import os
+import logging
+import threading
+from multiprocessing.pool import ThreadPool
+
+
+LOG = logging.getLogger(__name__)
 
 
 class DriverError(Exception):
@@ -80,15 +86,111 @@ def decorate_public_methods(decorator):
     return DecoratePublicMethods
 
 
+class FileSlice(object):
+    """
+    Read-only file-like view of `length` bytes of file `path` starting
+    at `offset`. Lets drivers upload a part of a large file without
+    loading it into memory.
+    """
+
+    def __init__(self, path, offset, length):
+        self._fp = open(path, 'rb')
+        self._offset = offset
+        self._length = length
+        self._pos = 0
+        self._fp.seek(offset)
+
+    def read(self, size=-1):
+        left = self._length - self._pos
+        if size < 0 or size > left:
+            size = left
+        data = self._fp.read(size)
+        self._pos += len(data)
+        return data
+
+    def seek(self, pos, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            pos += self._pos
+        elif whence == os.SEEK_END:
+            pos += self._length
+        self._pos = max(0, min(pos, self._length))
+        self._fp.seek(self._offset + self._pos)
+
+    def tell(self):
+        return self._pos
+
+    def __len__(self):
+        return self._length
+
+    def close(self):
+        self._fp.close()
+
+
+class PartsProgress(object):
+    """
+    Sums progress of concurrently transferred parts into a single
+    report_to(transferred, total) callback
+    """
+
+    def __init__(self, total, report_to=None):
+        self.total = total
+        self.report_to = report_to
+        self._lock = threading.Lock()
+        self._parts = {}
+
+    def callback(self, num):
+        def report(transferred, size=None):
+            with self._lock:
+                self._parts[num] = transferred
+                transferred = sum(self._parts.values())
+            if self.report_to:
+                self.report_to(transferred, self.total)
+        return report
+
+
 class CloudFileSystem(object):
 
     __metaclass__ = decorate_public_methods(raises(DriverError))
 
     schema = None
     features = {
-            'multipart': False
+            'multipart': False,
+            'bulk_delete': False
     }
 
+    # put() and get() of objects larger than multipart_threshold are split
+    # into part_size parts transferred by `concurrency` threads
+    # in drivers that support it
+    multipart_threshold = 64 * 1024 * 1024
+    part_size = 16 * 1024 * 1024
+    concurrency = 4
+
+    def __init__(self, multipart_threshold=None, part_size=None, concurrency=None):
+        if multipart_threshold is not None:
+            self.multipart_threshold = multipart_threshold
+        if part_size is not None:
+            self.part_size = part_size
+        if concurrency is not None:
+            self.concurrency = concurrency
+
+    def _split_parts(self, size):
+        """
+        :returns: list of (part_num, offset, length)
+        """
+        return [(num, offset, min(self.part_size, size - offset))
+                for num, offset in enumerate(xrange(0, size, self.part_size))]
+
+    def _map_parts(self, fn, parts):
+        """
+        Calls fn(part) for each part concurrently, returns results in parts order
+        """
+        pool = ThreadPool(processes=max(1, min(self.concurrency, len(parts))))
+        try:
+            return pool.map(fn, parts)
+        finally:
+            pool.close()
+            pool.join()
+
     def _parse_url(self, url):
         """
         :returns: bucket, key
@@ -110,6 +212,13 @@ class CloudFileSystem(object):
     def ls(self, url):
         raise NotImplementedError()
 
+    def ls_iter(self, url):
+        '''
+        Same as ls(), but yields urls while listing pages are fetched
+        '''
+        for item in self.ls(url):
+            yield item
+
     def stat(self, url):
         '''
         size in bytes
@@ -126,6 +235,33 @@ class CloudFileSystem(object):
     def delete(self, url):
         raise NotImplementedError()
 
+    def delete_many(self, urls, workers=4):
+        '''
+        Deletes all urls. Drivers with bulk delete API override this,
+        others fall back to concurrent delete() calls.
+        Raises DriverError with failed urls after all deletions were tried
+        '''
+        urls = list(urls)
+        if not urls:
+            return
+
+        def delete(url):
+            try:
+                self.delete(url)
+            except:
+                LOG.debug('Failed to delete %s: %s', url, sys.exc_info()[1])
+                return url
+
+        pool = ThreadPool(processes=min(workers, len(urls)))
+        try:
+            failed = filter(None, pool.map(delete, urls))
+        finally:
+            pool.close()
+            pool.join()
+        if failed:
+            raise DriverError('Failed to delete %d of %d objects: %s' % (
+                    len(failed), len(urls), ', '.join(failed[:10])))
+
 
     def multipart_init(self, path, part_size):
         '''
@@ -133,7 +269,10 @@ class CloudFileSystem(object):
         '''
         raise NotImplementedError()
 
-    def multipart_put(self, upload_id, src):
+    def multipart_put(self, upload_id, part_num, src):
+        '''
+        Uploads file `src` as part number `part_num` (starting from 0)
+        '''
         raise NotImplementedError()
 
     def multipart_complete(self, upload_id):
@@ -8,10 +8,11 @@ import time
 import logging
 import random
 
-from apiclient.http import MediaIoBaseUpload, MediaIoBaseDownload
+from apiclient.http import MediaIoBaseUpload, MediaIoBaseDownload, BatchHttpRequest
 from apiclient.errors import HttpError
 
-from scalarizr.storage2.cloudfs.base import CloudFileSystem
+from scalarizr.storage2.cloudfs.base import CloudFileSystem, DriverError
+from scalarizr.storage2.cloudfs.base import FileSlice, PartsProgress
 from scalarizr.storage2.cloudfs import cloudfs_types
 from scalarizr.bus import bus
 from scalarizr.node import __node__
@@ -28,6 +29,14 @@ class GCSFileSystem(CloudFileSystem):
 
     chunk_size = 2*1024*1024
     report_interval = 10  # percent; every <value> percent at most
+    # Google batch API accepts at most 100 calls per request
+    delete_batch_size = 100
+    # Objects compose API accepts at most 32 source objects
+    compose_max_sources = 32
+    features = {
+            'multipart': False,
+            'bulk_delete': True
+    }
 
     def _parse_url(self, url):
         bucket, key = super(GCSFileSystem, self)._parse_url(url)
@@ -40,17 +49,21 @@ class GCSFileSystem(CloudFileSystem):
 
 
     def ls(self, remote_path):
+        return tuple(self.ls_iter(remote_path))
+
+
+    def ls_iter(self, remote_path):
         bucket, path = self._parse_url(remote_path)
 
         path = path.rstrip('/') + '/' if path else ''
 
-        req = self.cloudstorage.objects().list(
-                bucket=bucket, prefix=path)
-        resp = req.execute()
-
-        items = (self._format_url(bucket, x["name"])
-                         for x in resp.setdefault("items", []))
-        return tuple(items)
+        objects = self.cloudstorage.objects()
+        req = objects.list(bucket=bucket, prefix=path)
+        while req is not None:
+            resp = req.execute()
+            for x in resp.get("items", []):
+                yield self._format_url(bucket, x["name"])
+            req = objects.list_next(req, resp)
 
 
     def get(self, remote_path, local_path, report_to=None):
@@ -93,42 +106,90 @@ class GCSFileSystem(CloudFileSystem):
         if bucket not in buckets:
             self._create_bucket(bucket)
 
-        fd = open(local_path, 'rb')
-        try:
-            media = MediaIoBaseUpload(fd,
-                    'application/octet-stream',
-                    resumable=True)
-            req = self.cloudstorage.objects().insert(
-                    bucket=bucket, name=name, media_body=media
-            )
-            last_progress = 0
-            response = None
-            exponent_backoff = [1, 2, 4, 8, 16, 32]
-            while response is None: 
-                try:
-                    status, response = req.next_chunk()
-                    if status:
-                        percentage = int(status.progress() * 100)
-                        if percentage - last_progress >= self.report_interval:
-                            if report_to:
-                                report_to(status.resumable_progress, status.total_size)
-                            last_progress = percentage
-                    exponent_backoff = [1, 2, 4, 8, 16, 32]
-                except HttpError, e:
-                    if not exponent_backoff or not int(e.resp.status) in (500, 502, 503, 504):
-                        raise
-
-                    sec_to_wait = exponent_backoff.pop(0)
-                    LOG.warning('Error while uploading chunk: %s. Retry in %s sec' % (e, sec_to_wait))
-                    # add random milliseconds
-                    sec_to_wait += random.random()
-                    time.sleep(sec_to_wait)
-        finally:
-            fd.close()
+        if os.path.getsize(local_path) > self.multipart_threshold:
+            self._compose_put(local_path, bucket, name, report_to)
+        else:
+            fd = open(local_path, 'rb')
+            try:
+                self._upload(fd, bucket, name, report_to)
+            finally:
+                fd.close()
         LOG.debug("Finished uploading %s", os.path.basename(local_path))
         return self._format_url(bucket, name)
 
 
+    def _upload(self, fd, bucket, name, report_to=None):
+        media = MediaIoBaseUpload(fd,
+                'application/octet-stream',
+                resumable=True)
+        req = self.cloudstorage.objects().insert(
+                bucket=bucket, name=name, media_body=media
+        )
+        last_progress = 0
+        response = None
+        exponent_backoff = [1, 2, 4, 8, 16, 32]
+        while response is None: 
+            try:
+                status, response = req.next_chunk()
+                if status:
+                    percentage = int(status.progress() * 100)
+                    if percentage - last_progress >= self.report_interval:
+                        if report_to:
+                            report_to(status.resumable_progress, status.total_size)
+                        last_progress = percentage
+                exponent_backoff = [1, 2, 4, 8, 16, 32]
+            except HttpError, e:
+                if not exponent_backoff or not int(e.resp.status) in (500, 502, 503, 504):
+                    raise
+
+                sec_to_wait = exponent_backoff.pop(0)
+                LOG.warning('Error while uploading chunk: %s. Retry in %s sec' % (e, sec_to_wait))
+                # add random milliseconds
+                sec_to_wait += random.random()
+                time.sleep(sec_to_wait)
+
+
+    def _compose_put(self, local_path, bucket, name, report_to=None):
+        """
+        Uploads parts as separate objects concurrently and composes them into `name`
+        """
+        size = os.path.getsize(local_path)
+        progress = PartsProgress(size, report_to)
+
+        def upload(part):
+            num, offset, length = part
+            part_name = '%s.part%04d' % (name, num)
+            fd = FileSlice(local_path, offset, length)
+            try:
+                self._upload(fd, bucket, part_name, progress.callback(num))
+            finally:
+                fd.close()
+            return part_name
+
+        part_names = self._map_parts(upload, self._split_parts(size))
+        try:
+            sources = part_names[:self.compose_max_sources]
+            rest = part_names[self.compose_max_sources:]
+            self._compose(bucket, name, sources)
+            while rest:
+                # Append next parts to already composed object
+                sources = [name] + rest[:self.compose_max_sources - 1]
+                rest = rest[self.compose_max_sources - 1:]
+                self._compose(bucket, name, sources)
+        finally:
+            self.delete_many([self._format_url(bucket, part_name)
+                              for part_name in part_names])
+
+
+    def _compose(self, bucket, name, sources):
+        body = {
+            'sourceObjects': [{'name': source} for source in sources],
+            'destination': {'contentType': 'application/octet-stream'}
+        }
+        self.cloudstorage.objects().compose(
+                destinationBucket=bucket, destinationObject=name, body=body).execute()
+
+
     def delete(self, remote_path, delete_bucket=False):
         LOG.info('Deleting %s from GCS', remote_path)
         bucket, obj = self._parse_url(remote_path)
@@ -145,6 +206,29 @@ class GCSFileSystem(CloudFileSystem):
         if delete_bucket:
             self._delete_bucket(bucket)
 
+
+    def delete_many(self, urls, workers=4):
+        urls = list(urls)
+        errors = []
+
+        def callback(request_id, response, exception):
+            if exception and not (isinstance(exception, HttpError) and
+                                  int(exception.resp.status) == 404):
+                errors.append(urls[int(request_id)])
+
+        objects = self.cloudstorage.objects()
+        for i in range(0, len(urls), self.delete_batch_size):
+            batch_urls = urls[i:i + self.delete_batch_size]
+            batch = BatchHttpRequest(callback=callback)
+            for j, url in enumerate(batch_urls, i):
+                bucket, obj = self._parse_url(url)
+                batch.add(objects.delete(bucket=bucket, object=obj), request_id=str(j))
+            LOG.info('Deleting %d objects from GCS', len(batch_urls))
+            batch.execute()
+        if errors:
+            raise DriverError('Failed to delete %d objects: %s' % (
+                    len(errors), ', '.join(errors[:10])))
+
     def _list_buckets(self):
         pl = bus.platform
         proj_id = pl.get_numeric_project_id()
@@ -4,12 +4,14 @@ __author__ = 'vladimir'
 import logging
 import os
 import sys
+import threading
 
 from scalarizr.node import __node__
-from scalarizr.storage2.cloudfs.base import CloudFileSystem
+from scalarizr.storage2.cloudfs.base import CloudFileSystem, DriverError, PartsProgress
 from scalarizr.storage2.cloudfs import cloudfs_types
 
 from boto.s3.key import Key
+from boto.s3.multipart import MultiPartUpload
 from boto.exception import S3ResponseError
 
 
@@ -19,11 +21,23 @@ LOG = logging.getLogger(__name__)
 class S3FileSystem(CloudFileSystem):
 
     acl = None
+    features = {
+            'multipart': True,
+            'bulk_delete': True
+    }
+    # S3 Multi-Object Delete accepts at most 1000 keys per request
+    delete_batch_size = 1000
+    buffer_size = 256 * 1024
 
     _bucket = None
+    # upload_id -> (bucket_name, key_name), shared between driver instances
+    # because FileTransfer workers use their own drivers for the same upload
+    _uploads = {}
+    _uploads_lock = threading.Lock()
 
     # TODO: change report frequency
-    def __init__(self, acl='aws-exec-read', report_frequency=11):
+    def __init__(self, acl='aws-exec-read', report_frequency=11, **kwds):
+        super(S3FileSystem, self).__init__(**kwds)
         self.acl = acl
         self.report_frequency = report_frequency
 
@@ -39,16 +53,14 @@ class S3FileSystem(CloudFileSystem):
         return bucket_lower, key
 
     def ls(self, remote_path):
-        bucket_name, key_name = self._parse_url(remote_path)
-
-        connection = self._get_connection()
-
-        if not self._bucket_check_cache(bucket_name):
-            self._bucket = connection.get_bucket(bucket_name, validate=False)
+        return tuple(self.ls_iter(remote_path))
 
-        files = [self._format_url(self._bucket.name, key.name)
-                         for key in self._bucket.list(prefix=key_name)]
-        return tuple(files)
+    def ls_iter(self, remote_path):
+        bucket_name, key_name = self._parse_url(remote_path)
+        bucket = self._get_bucket(bucket_name)
+        # boto fetches next page only when previous one is consumed
+        for key in bucket.list(prefix=key_name):
+            yield self._format_url(bucket.name, key.name)
 
     def put(self, local_path, remote_path, report_to=None):
         LOG.info("Uploading '%s' to S3 under '%s'", local_path, remote_path)
@@ -58,26 +70,14 @@ class S3FileSystem(CloudFileSystem):
         LOG.debug("Uploading '%s'", key_name)
 
         try:
-            connection = self._get_connection()
-
-            if not self._bucket_check_cache(bucket_name):
-                try:
-                    bck = connection.get_bucket(bucket_name)
-                except S3ResponseError, e:
-                    if e.code == 'NoSuchBucket':
-                        bck = connection.create_bucket(
-                                bucket_name,
-                                location=self._bucket_location(),
-                                policy=self.acl
-                        )
-                    else:
-                        raise
-                # Cache bucket
-                self._bucket = bck
+            bucket = self._get_bucket(bucket_name, create=True)
+            if os.path.getsize(local_path) > self.multipart_threshold:
+                self._multipart_put(bucket, local_path, key_name, report_to)
+                return self._format_url(bucket_name, key_name)
 
             file_ = None
             try:
-                key = Key(self._bucket)
+                key = Key(bucket)
                 key.name = key_name
                 file_ = open(local_path, "rb")
                 LOG.debug("Actually uploading %s", os.path.basename(local_path))
@@ -94,35 +94,158 @@ class S3FileSystem(CloudFileSystem):
             LOG.debug('Caught error', exc_info=exc)
             raise
 
+    def _multipart_put(self, bucket, local_path, key_name, report_to=None):
+        size = os.path.getsize(local_path)
+        parts = self._split_parts(size)
+        progress = PartsProgress(size, report_to)
+        LOG.debug("Uploading %s in %d parts", os.path.basename(local_path), len(parts))
+
+        mp = bucket.initiate_multipart_upload(key_name, policy=self.acl)
+
+        def upload(part):
+            num, offset, length = part
+            with open(local_path, 'rb') as fp:
+                fp.seek(offset)
+                mp.upload_part_from_file(fp, num + 1, size=length,
+                        cb=progress.callback(num), num_cb=self.report_frequency)
+
+        try:
+            self._map_parts(upload, parts)
+            mp.complete_upload()
+        except:
+            exc_info = sys.exc_info()
+            try:
+                mp.cancel_upload()
+            except:
+                LOG.debug('Failed to cancel multipart upload %s: %s', mp.id, sys.exc_info()[1])
+            raise exc_info[0], exc_info[1], exc_info[2]
+        LOG.debug("Finished uploading %s", os.path.basename(local_path))
+
     def get(self, remote_path, local_path, report_to=None):
         LOG.info('Downloading %s from S3 to %s', remote_path, local_path)
         bucket_name, key_name = self._parse_url(remote_path)
         dest_path = os.path.join(local_path, os.path.basename(remote_path))
 
-        connection = self._get_connection()
-
-        if not self._bucket_check_cache(bucket_name):
-            self._bucket = connection.get_bucket(bucket_name, validate=False)
-        key = self._bucket.get_key(key_name)
+        bucket = self._get_bucket(bucket_name)
+        key = bucket.get_key(key_name)
         assert key, "No such key: %s" % key_name
 
         LOG.debug("Actually downloading %s", os.path.basename(dest_path))
-        key.get_contents_to_filename(dest_path, cb=report_to,
-                num_cb=self.report_frequency)
+        if key.size > self.multipart_threshold:
+            self._ranged_get(bucket, key, dest_path, report_to)
+        else:
+            key.get_contents_to_filename(dest_path, cb=report_to,
+                    num_cb=self.report_frequency)
         LOG.debug("Finished downloading %s", os.path.basename(dest_path))
         return dest_path
 
+    def _ranged_get(self, bucket, key, dest_path, report_to=None):
+        progress = PartsProgress(key.size, report_to)
+        with open(dest_path, 'wb') as fp:
+            fp.truncate(key.size)
+
+        def download(part):
+            num, offset, length = part
+            report = progress.callback(num)
+            part_key = Key(bucket, key.name)
+            part_key.open_read(headers={
+                    'Range': 'bytes=%d-%d' % (offset, offset + length - 1)})
+            try:
+                with open(dest_path, 'r+b') as fp:
+                    fp.seek(offset)
+                    received = 0
+                    while True:
+                        data = part_key.read(self.buffer_size)
+                        if not data:
+                            break
+                        fp.write(data)
+                        received += len(data)
+                        report(received)
+                if received != length:
+                    raise DriverError('Part %d of %s: expected %d bytes, got %d' % (
+                            num, key.name, length, received))
+            finally:
+                part_key.close()
+
+        self._map_parts(download, self._split_parts(key.size))
+
+    def multipart_init(self, path, part_size):
+        bucket_name, key_name = self._parse_url(path)
+        mp = self._get_bucket(bucket_name, create=True).initiate_multipart_upload(
+                key_name, policy=self.acl)
+        with self._uploads_lock:
+            self._uploads[mp.id] = (bucket_name, key_name)
+        return mp.id
+
+    def multipart_put(self, upload_id, part_num, src):
+        with open(src, 'rb') as fp:
+            self._get_multipart_upload(upload_id).upload_part_from_file(fp, part_num + 1)
+
+    def multipart_complete(self, upload_id):
+        self._get_multipart_upload(upload_id).complete_upload()
+        with self._uploads_lock:
+            bucket_name, key_name = self._uploads.pop(upload_id)
+        return self._format_url(bucket_name, key_name)
+
+    def multipart_abort(self, upload_id):
+        self._get_multipart_upload(upload_id).cancel_upload()
+        with self._uploads_lock:
+            self._uploads.pop(upload_id, None)
+
+    def _get_multipart_upload(self, upload_id):
+        with self._uploads_lock:
+            bucket_name, key_name = self._uploads[upload_id]
+        mp = MultiPartUpload(self._get_bucket(bucket_name))
+        mp.id = upload_id
+        mp.key_name = key_name
+        return mp
+
     def delete(self, remote_path):
         LOG.info('Deleting %s from S3', remote_path)
         bucket_name, key_name = self._parse_url(remote_path)
-
-        connection = self._get_connection()
-
+        # DELETE of a missing key succeeds, no need to HEAD it first
+        self._get_bucket(bucket_name).delete_key(key_name)
+
+    def delete_many(self, urls, workers=4):
+        keys = {}
+        for url in urls:
+            bucket_name, key_name = self._parse_url(url)
+            keys.setdefault(bucket_name, []).append(key_name)
+
+        errors = []
+        for bucket_name, key_names in keys.items():
+            bucket = self._get_bucket(bucket_name)
+            for i in range(0, len(key_names), self.delete_batch_size):
+                batch = key_names[i:i + self.delete_batch_size]
+                LOG.info('Deleting %d objects from S3 bucket %s', len(batch), bucket_name)
+                result = bucket.delete_keys(batch, quiet=True)
+                errors.extend(self._format_url(bucket_name, error.key)
+                              for error in result.errors
+                              if error.code != 'NoSuchKey')
+        if errors:
+            raise DriverError('Failed to delete %d objects: %s' % (
+                    len(errors), ', '.join(errors[:10])))
+
+    def _get_bucket(self, bucket_name, create=False):
         if not self._bucket_check_cache(bucket_name):
-            self._bucket = connection.get_bucket(bucket_name, validate=False)
-        key = self._bucket.get_key(key_name)
-
-        return key.delete() if key else None
+            connection = self._get_connection()
+            if create:
+                try:
+                    bucket = connection.get_bucket(bucket_name)
+                except S3ResponseError, e:
+                    if e.code == 'NoSuchBucket':
+                        bucket = connection.create_bucket(
+                                bucket_name,
+                                location=self._bucket_location(),
+                                policy=self.acl
+                        )
+                    else:
+                        raise
+            else:
+                bucket = connection.get_bucket(bucket_name, validate=False)
+            # Cache bucket
+            self._bucket = bucket
+        return self._bucket
 
     def _bucket_check_cache(self, bucket):
         if self._bucket and self._bucket.name != bucket:
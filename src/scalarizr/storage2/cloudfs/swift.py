@@ -1,11 +1,16 @@
 __author__ = 'vladimir'
 
 import os
+import json
+import posixpath
+import time
+import urllib
 import logging
 
 from swiftclient.client import ClientException
 
-from scalarizr.storage2.cloudfs.base import CloudFileSystem
+from scalarizr.storage2.cloudfs.base import CloudFileSystem, DriverError
+from scalarizr.storage2.cloudfs.base import FileSlice, PartsProgress
 from scalarizr.storage2.cloudfs import cloudfs_types
 from scalarizr.node import __node__
 
@@ -17,22 +22,40 @@ LOG = logging.getLogger(__name__)
 
 class SwiftFileSystem(CloudFileSystem):
 
+    features = {
+            'multipart': False,
+            'bulk_delete': True
+    }
+    # Default max_deletes_per_request of Swift bulk middleware
+    delete_batch_size = 10000
+    buffer_size = 256 * 1024
+    # Static Large Object segments are stored in
+    # <container>_segments/<object>/slo/<timestamp>/<part_num>
+    segments_suffix = '_segments'
+    # bulk_delete capability from /info, checked once
+    _bulk_delete = None
+
     def _get_connection(self):
         return __node__['openstack'].connect_swift()
 
 
     def ls(self, remote_path):
-        container, prefix = self._parse_url(remote_path)
-        conn = self._get_connection()
-        objects = conn.get_container(container)[1]
+        return tuple(self.ls_iter(remote_path))
 
-        objects = (obj["name"] for obj in objects)
 
+    def ls_iter(self, remote_path):
+        container, prefix = self._parse_url(remote_path)
         if prefix:
             prefix = prefix.rstrip("/") + "/"
-            objects = (obj for obj in objects if obj.startswith(prefix))
-
-        return tuple((self._format_url(container, obj) for obj in objects))
+        conn = self._get_connection()
+        marker = ''
+        while True:
+            objects = conn.get_container(container, marker=marker, prefix=prefix or None)[1]
+            if not objects:
+                break
+            for obj in objects:
+                yield self._format_url(container, obj["name"])
+            marker = objects[-1]["name"]
 
 
     def put(self, local_path, remote_path, report_to=None):
@@ -41,6 +64,10 @@ class SwiftFileSystem(CloudFileSystem):
         if object_.endswith("/"):
             object_ = os.path.join(object_, os.path.basename(local_path))
 
+        if os.path.getsize(local_path) > self.multipart_threshold:
+            self._slo_put(local_path, container, object_, report_to)
+            return self._format_url(container, object_)
+
         fd = open(local_path, 'rb')
         try:
             conn = self._get_connection()
@@ -59,29 +86,95 @@ class SwiftFileSystem(CloudFileSystem):
         return self._format_url(container, object_)
 
 
+    def _slo_put(self, local_path, container, object_, report_to=None):
+        """
+        Uploads segments concurrently and puts Static Large Object manifest
+        """
+        size = os.path.getsize(local_path)
+        progress = PartsProgress(size, report_to)
+        segments_container = container + self.segments_suffix
+        prefix = '%s/slo/%s/' % (object_, int(time.time()))
+
+        conn = self._get_connection()
+        conn.put_container(container)
+        conn.put_container(segments_container)
+
+        def upload(part):
+            num, offset, length = part
+            name = prefix + '%08d' % num
+            fp = FileSlice(local_path, offset, length)
+            try:
+                etag = self._get_connection().put_object(
+                        segments_container, name, fp, content_length=length)
+            finally:
+                fp.close()
+            progress.callback(num)(length)
+            return {'path': '/%s/%s' % (segments_container, name),
+                    'etag': etag,
+                    'size_bytes': length}
+
+        parts = self._split_parts(size)
+        LOG.debug("Uploading %s in %d segments", os.path.basename(local_path), len(parts))
+        segments = self._map_parts(upload, parts)
+        conn.put_object(container, object_, json.dumps(segments),
+                        query_string='multipart-manifest=put')
+
+
     def get(self, remote_path, local_path, report_to=None):
         LOG.info('Downloading %s from Swift to %s', remote_path, local_path)
         container, object_ = self._parse_url(remote_path)
         #? join only if local_path.endswith("/")
         dest_path = os.path.join(local_path, os.path.basename(remote_path))
 
+        conn = self._get_connection()
+        size = int(conn.head_object(container, object_)['content-length'])
+        if size > self.multipart_threshold:
+            self._ranged_get(container, object_, size, dest_path, report_to)
+            return dest_path
+
         fd = open(dest_path, 'w')
         try:
-            conn = self._get_connection()
-            res = conn.get_object(container, object_)
-            fd.write(res[1])
+            res = conn.get_object(container, object_, resp_chunk_size=self.buffer_size)
+            for chunk in res[1]:
+                fd.write(chunk)
         finally:
             fd.close()
         return dest_path
 
 
+    def _ranged_get(self, container, object_, size, dest_path, report_to=None):
+        progress = PartsProgress(size, report_to)
+        with open(dest_path, 'wb') as fp:
+            fp.truncate(size)
+
+        def download(part):
+            num, offset, length = part
+            report = progress.callback(num)
+            res = self._get_connection().get_object(container, object_,
+                    headers={'Range': 'bytes=%d-%d' % (offset, offset + length - 1)},
+                    resp_chunk_size=self.buffer_size)
+            with open(dest_path, 'r+b') as fp:
+                fp.seek(offset)
+                received = 0
+                for chunk in res[1]:
+                    fp.write(chunk)
+                    received += len(chunk)
+                    report(received)
+            if received != length:
+                raise DriverError('Part %d of %s: expected %d bytes, got %d' % (
+                        num, object_, length, received))
+
+        self._map_parts(download, self._split_parts(size))
+
+
     def delete(self, remote_path):
         LOG.info('Deleting %s from Swift', remote_path)
         container, object_ = self._parse_url(remote_path)
 
         try:
             conn = self._get_connection()
-            conn.delete_object(container, object_)
+            # Removes segments too when object is a Static Large Object
+            conn.delete_object(container, object_, query_string='multipart-manifest=delete')
         except ClientException, e:
             if e.http_status == 404:
                 return False
@@ -89,4 +182,95 @@ class SwiftFileSystem(CloudFileSystem):
                 raise
 
 
+
+    def delete_many(self, urls, workers=4):
+        urls = list(urls)
+        # Bulk delete doesn't follow SLO manifests, segments go in the same requests
+        urls += self._list_segments(urls)
+        if not urls:
+            return
+        conn = self._get_connection()
+        if not self._bulk_delete_supported(conn):
+            super(SwiftFileSystem, self).delete_many(urls, workers=workers)
+            return
+        for i in range(0, len(urls), self.delete_batch_size):
+            batch = urls[i:i + self.delete_batch_size]
+            body = '\n'.join(urllib.quote('/'.join(self._parse_url(url)))
+                             for url in batch)
+            LOG.info('Deleting %d objects from Swift', len(batch))
+            try:
+                resp = conn.post_account(
+                        headers={'Content-Type': 'text/plain', 'Accept': 'application/json'},
+                        query_string='bulk-delete',
+                        data=body)
+            except (AttributeError, TypeError, ClientException), e:
+                LOG.debug('Swift bulk delete failed (%s), '
+                          'falling back to single deletes', e)
+                super(SwiftFileSystem, self).delete_many(urls[i:], workers=workers)
+                return
+            if not self._bulk_deleted(resp, len(batch)):
+                LOG.debug('Swift bulk delete response %r, '
+                          'falling back to single deletes', resp and resp[1])
+                super(SwiftFileSystem, self).delete_many(urls[i:], workers=workers)
+                return
+
+
+    def _bulk_delete_supported(self, conn):
+        if self._bulk_delete is None:
+            try:
+                self._bulk_delete = 'bulk_delete' in conn.get_capabilities()
+            except (AttributeError, ClientException), e:
+                # Old swiftclient or cluster without /info
+                LOG.debug('Swift capabilities not available: %s', e)
+                self._bulk_delete = False
+        return self._bulk_delete
+
+
+    def _bulk_deleted(self, resp, count):
+        """
+        Bulk delete answers 200 even on errors: checks response status
+        and that every object was processed
+        """
+        try:
+            result = json.loads(resp[1])
+            processed = int(result['Number Deleted']) + int(result['Number Not Found'])
+            return result['Response Status'].startswith('2') and processed == count
+        except (TypeError, ValueError, KeyError, IndexError, AttributeError):
+            return False
+
+
+    def _list_segments(self, urls):
+        """
+        Returns SLO segments of objects. Segments container is listed
+        once per directory of deleted objects, not once per object
+        """
+        objects = {}
+        for url in urls:
+            container, object_ = self._parse_url(url)
+            if not container.endswith(self.segments_suffix):
+                objects.setdefault(container, set()).add(object_)
+        segments = []
+        for container, names in objects.items():
+            segments_container = container + self.segments_suffix
+            prefixes = []
+            for dirname in sorted(set(posixpath.dirname(name) for name in names)):
+                # nested directories are listed with their parent
+                if not any(dirname == p or dirname.startswith(p + '/') or not p
+                           for p in prefixes):
+                    prefixes.append(dirname)
+            for prefix in prefixes:
+                try:
+                    for url in self.ls_iter(self._format_url(segments_container, prefix)):
+                        # <object>/slo/<timestamp>/<part_num>
+                        parts = self._parse_url(url)[1].rsplit('/', 3)
+                        if len(parts) == 4 and parts[1] == 'slo' and parts[0] in names:
+                            segments.append(url)
+                except ClientException, e:
+                    if e.http_status != 404:
+                        raise
+                    # no segments container, nothing to look for
+                    break
+        return segments
+
+
 cloudfs_types["swift"] = SwiftFileSystem
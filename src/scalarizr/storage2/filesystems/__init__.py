@@ -33,7 +33,9 @@ class FileSystem(object):
     features = {
             'freezable': False,
             'resizable': True,
-            'umount_on_resize': False
+            'umount_on_resize': False,
+            # grows while mounted
+            'resize_online': False
     }
 
     error_messages = {
@@ -4,8 +4,11 @@ Created on Aug 29, 2012
 @author: marat
 """
 
+import os
+
 from scalarizr import storage2
 from scalarizr.storage2 import filesystems
+from scalarizr.linux import mount
 
 
 E2LABEL_EXEC            = "/sbin/e2label"
@@ -18,6 +21,7 @@ class ExtFileSystem(filesystems.FileSystem):
 
     features = filesystems.FileSystem.features.copy()
     features['umount_on_resize'] = True
+    features['resize_online'] = True
 
     error_messages = filesystems.FileSystem.error_messages.copy()
     error_messages['fsck'] = 'Error occured during filesystem check on device %s'
@@ -32,11 +36,13 @@ class ExtFileSystem(filesystems.FileSystem):
 
 
     def resize(self, device, size=None, *short_args, **long_kwds):
-        cmd = (E2FSCK_EXEC, '-fy', device)
-        rcode = filesystems.system(cmd, raise_exc=False,
-                                                error_text=self.error_messages['fsck'] % device)[2]
-        if rcode not in (0, 1):
-            raise storage2.StorageError('Fsck failed to correct file system errors')
+        # mounted filesystem is grown online, fsck can't check it
+        if os.path.realpath(device) not in mount.mounts():
+            cmd = (E2FSCK_EXEC, '-fy', device)
+            rcode = filesystems.system(cmd, raise_exc=False,
+                                                    error_text=self.error_messages['fsck'] % device)[2]
+            if rcode not in (0, 1):
+                raise storage2.StorageError('Fsck failed to correct file system errors')
         cmd = (RESIZE2FS_EXEC, device)
         filesystems.system(cmd, error_text=self.error_messages['resize'] % device)
 
@@ -26,6 +26,9 @@ def _device_mpoint(device):
 class XfsFileSystem(filesystems.FileSystem):
     type = 'xfs'
 
+    features = filesystems.FileSystem.features.copy()
+    features['resize_online'] = True
+
     os_packages = ('xfsprogs', )
 
     def __init__(self):
@@ -35,6 +35,11 @@ DEFAULT_CALLBACK_INTERVAL = 2
 DEFAULT_CHUNK_SIZE = 100
 DEFAULT_SLEEP_TIME = 0.1
 DEFAULT_RETRY_NUMBER = 3
+# Objects larger than threshold are transferred by parts in parallel
+# by drivers that support it (S3 multipart / ranged GET, Swift SLO, GCS compose)
+DEFAULT_MULTIPART_THRESHOLD = 64 * 1024 * 1024
+DEFAULT_PART_SIZE = 16 * 1024 * 1024
+DEFAULT_PART_CONCURRENCY = 4
 
 
 def raise_thread_error():
@@ -104,10 +109,11 @@ class _Transfer(object):
     Internal class for multithreaded upload and download
     """
 
-    def __init__(self, method, pool_size=None):
+    def __init__(self, method, pool_size=None, driver_kwds=None):
         assert method in ['put', 'get']
         self.method = method
         self._pool_size = pool_size or DEFAULT_POOL_SIZE
+        self._driver_kwds = driver_kwds or {}
         self._queue = NonBlockingLifoQueue(maxsize=self._pool_size * 2)
         self._start_workers()
 
@@ -144,7 +150,7 @@ class _Transfer(object):
         else:
             scheme = urlparse.urlparse(src.path).scheme or 'file'
 
-        driver = cloudfs(scheme)
+        driver = cloudfs(scheme, **self._driver_kwds)
 
         def complete_cb_wrapper(task):
             if complete_cb:
@@ -257,10 +263,16 @@ class Transfer(object):
     Base class for Upload, Download
     """
 
-    def __init__(self, pool_size=None, progress_cb=None, cb_interval=None):
+    def __init__(self, pool_size=None, progress_cb=None, cb_interval=None,
+                 multipart_threshold=None, part_size=None, part_concurrency=None):
         self.process = None
 
         self._pool_size = pool_size or DEFAULT_POOL_SIZE
+        self._driver_kwds = {
+            'multipart_threshold': multipart_threshold or DEFAULT_MULTIPART_THRESHOLD,
+            'part_size': part_size or DEFAULT_PART_SIZE,
+            'concurrency': part_concurrency or DEFAULT_PART_CONCURRENCY
+        }
         self._tmp_dir = tempfile.mkdtemp()
         self._error_queue = None
         self._progress = multiprocessing.Value('i', 0)
@@ -421,7 +433,8 @@ class Upload(Transfer):
 
     def __init__(self, src, dst, transfer_id=None, manifest='manifest.json', description='', tags='',
                  gzip=True, use_pigz=True, simple=False, pool_size=None,
-                 chunk_size=None, progress_cb=None, cb_interval=None):
+                 chunk_size=None, progress_cb=None, cb_interval=None,
+                 streams_concurrency=None, **kwds):
         """
         :type src: string / list / generator / iterator / NamedStream
         :param src: Transfer source, file path or stream
@@ -431,9 +444,17 @@ class Upload(Transfer):
 
         :type simple: bool
         :param simple: if True handle src as file path and don't use split and gzip
+
+        :type streams_concurrency: int
+        :param streams_concurrency: Number of sources split and uploaded
+            at the same time. Sources are taken from src one by one when
+            a slot becomes free
+
+        Accepts multipart_threshold, part_size and part_concurrency keywords
+        to tune parallel transfer of a single object
         """
         super(Upload, self).__init__(pool_size=pool_size, progress_cb=progress_cb,
-                                     cb_interval=cb_interval)
+                                     cb_interval=cb_interval, **kwds)
 
         if not hasattr(src, '__iter__') or hasattr(src, 'read'):
             self.src = [src]
@@ -445,6 +466,7 @@ class Upload(Transfer):
 
         self._simple = simple
         self._chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+        self._streams_concurrency = streams_concurrency or 1
         self._manifest = None
         self._manifest_queue = None
 
@@ -470,7 +492,7 @@ class Upload(Transfer):
         self._manifest.delete()
 
     def _simple_upload(self):
-        uploader = _Transfer('put', pool_size=1)
+        uploader = _Transfer('put', pool_size=1, driver_kwds=self._driver_kwds)
         try:
             file_generator = map(FileInfo, self.src)
 
@@ -489,79 +511,17 @@ class Upload(Transfer):
             raise
 
     def _large_upload(self):
-        uploader = _Transfer('put', pool_size=self._pool_size)
+        uploader = _Transfer('put', pool_size=self._pool_size, driver_kwds=self._driver_kwds)
         try:
             if self.gzip and self.use_pigz:
                 self._check_pigz()
 
-            for src in self.src:
-                name = streamer = extension = None
-
-                if hasattr(src, 'fileno'):
-                    # Popen stdout/fileobj/NamedStream
-                    if isinstance(src, NamedStream):
-                        stream = src
-                    else:
-                        name = 'stream-%s' % hash(src)
-                        stream = NamedStream(src, name)
-                elif isinstance(src, basestring) and os.path.isfile(src):
-                    # file path
-                    dirname, name = os.path.split(src)
-                    cmd = ['/bin/tar', 'cp', '-C', dirname, name]
-                    popen = subprocess.Popen(cmd, stdout=subprocess.PIPE)
-                    stream = NamedStream(popen.stdout, name, streamer='tar', extension='tar')
-                else:
-                    raise TransferError('Unsupported source %s' % src)
-
-                name = os.path.basename(stream.name).strip('<>')
-                streamer = stream.streamer
-                extension = stream.extension
-
-                if self.gzip:
-                    if extension:
-                        extension += '.gz'
-                    else:
-                        extension = 'gz'
-                    stream = NamedStream(gzip_compressor(stream, self.use_pigz),
-                                         stream.name, extension=extension, streamer=streamer)
-                file_generator = split(stream, self._tmp_dir,
-                                       chunk_size=self._chunk_size, extension=extension)
-
-                uploaded_chunks = []
-
-                # add file info to manifest
-                file_info = {
-                    'name': name,
-                    'streamer': streamer,
-                    'compressor': 'gzip' if self.gzip and not self._simple else '',
-                    'chunks': uploaded_chunks,
-                }
-                self._manifest['files'].append(file_info)
-
-                def on_chunk_complete(info):
-                    self._on_file_complete(info)
-                    if info['status'] == 'done':
-                        data = (os.path.basename(info['src']), info['md5_sum'], info['size'])
-                        bisect.insort(uploaded_chunks, data)
-                    os.remove(info['src'])
-
-                for file_info in file_generator:
-                    dst = os.path.join(self.dst, file_info.name)
-                    uploader.apply_async(file_info, dst,
-                                         complete_cb=on_chunk_complete,
-                                         progress_cb=self._on_progress)
-                    while not self._semaphore.acquire(False):
-                        time.sleep(DEFAULT_SLEEP_TIME)
-
-                uploader.wait_completion()
-
-                # add file info to manifest
-                file_info = {
-                    'name': name,
-                    'streamer': streamer,
-                    'compressor': 'gzip' if self.gzip and not self._simple else '',
-                    'chunks': sorted(uploaded_chunks),
-                }
+            if self._streams_concurrency > 1:
+                self._upload_streams_concurrently(uploader)
+            else:
+                for src in self.src:
+                    self._upload_stream(uploader, src)
+                    uploader.wait_completion()
 
             manifest_file = os.path.join(self._tmp_dir, self._manifest_name)
             self._manifest.write(manifest_file)
@@ -591,6 +551,89 @@ class Upload(Transfer):
             pkgmgr.epel_repository()
             pkgmgr.installed('pigz', updatedb=True)
 
+    def _upload_streams_concurrently(self, uploader):
+        sources = iter(self.src)
+        lock = threading.Lock()
+
+        def next_source():
+            # Sources are pulled lazily, so a generator can start its
+            # producer process only when a slot becomes free
+            with lock:
+                return next(sources, None)
+
+        def worker(_):
+            src = next_source()
+            while src is not None:
+                self._upload_stream(uploader, src)
+                src = next_source()
+
+        pool = ThreadPool(processes=self._streams_concurrency)
+        try:
+            pool.map(worker, range(self._streams_concurrency))
+        finally:
+            pool.close()
+            pool.join()
+        uploader.wait_completion()
+
+    def _upload_stream(self, uploader, src):
+        name = streamer = extension = None
+
+        if hasattr(src, 'fileno'):
+            # Popen stdout/fileobj/NamedStream
+            if isinstance(src, NamedStream):
+                stream = src
+            else:
+                name = 'stream-%s' % hash(src)
+                stream = NamedStream(src, name)
+        elif isinstance(src, basestring) and os.path.isfile(src):
+            # file path
+            dirname, name = os.path.split(src)
+            cmd = ['/bin/tar', 'cp', '-C', dirname, name]
+            popen = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+            stream = NamedStream(popen.stdout, name, streamer='tar', extension='tar')
+        else:
+            raise TransferError('Unsupported source %s' % src)
+
+        name = os.path.basename(stream.name).strip('<>')
+        streamer = stream.streamer
+        extension = stream.extension
+
+        if self.gzip:
+            if extension:
+                extension += '.gz'
+            else:
+                extension = 'gz'
+            stream = NamedStream(gzip_compressor(stream, self.use_pigz),
+                                 stream.name, extension=extension, streamer=streamer)
+        file_generator = split(stream, self._tmp_dir,
+                               chunk_size=self._chunk_size, extension=extension)
+
+        uploaded_chunks = []
+
+        # add file info to manifest
+        file_info = {
+            'name': name,
+            'streamer': streamer,
+            'compressor': 'gzip' if self.gzip and not self._simple else '',
+            'chunks': uploaded_chunks,
+        }
+        self._manifest['files'].append(file_info)
+
+        def on_chunk_complete(info):
+            self._on_file_complete(info)
+            if info['status'] == 'done':
+                data = (os.path.basename(info['src']), info['md5_sum'], info['size'])
+                bisect.insort(uploaded_chunks, data)
+            os.remove(info['src'])
+
+        for file_info in file_generator:
+            dst = os.path.join(self.dst, file_info.name)
+            uploader.apply_async(file_info, dst,
+                                 complete_cb=on_chunk_complete,
+                                 progress_cb=self._on_progress)
+            while not self._semaphore.acquire(False):
+                time.sleep(DEFAULT_SLEEP_TIME)
+
     def _run(self):
         if self._simple:
             self._simple_upload()
@@ -601,13 +644,13 @@ class Upload(Transfer):
 class Download(Transfer):
 
     def __init__(self, src, dst=None, simple=False, use_pigz=True, pool_size=None,
-                 progress_cb=None, cb_interval=None):
+                 progress_cb=None, cb_interval=None, **kwds):
         """
         :type src: string
         :param src: manifest file url
         """
         super(Download, self).__init__(pool_size=pool_size, progress_cb=progress_cb,
-                                       cb_interval=cb_interval)
+                                       cb_interval=cb_interval, **kwds)
         self._simple = simple
         self._read_fd = None
         self._write_fd = None
@@ -637,7 +680,7 @@ class Download(Transfer):
         """
         Download chunks from manifest file and yield them in sorted order
         """
-        downloader = _Transfer('get', pool_size=self._pool_size)
+        downloader = _Transfer('get', pool_size=self._pool_size, driver_kwds=self._driver_kwds)
         try:
             # step 1
             # download manifest
@@ -700,7 +743,7 @@ class Download(Transfer):
             raise
 
     def _simple_download(self):
-        downloader = _Transfer('get', pool_size=1)
+        downloader = _Transfer('get', pool_size=1, driver_kwds=self._driver_kwds)
         try:
             for src in self.src:
                 downloader.apply_async(FileInfo(src), self.dst,
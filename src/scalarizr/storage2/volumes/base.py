@@ -2,6 +2,7 @@
 import os
 import re
 import sys
+import stat
 import uuid
 import string
 import glob
@@ -9,7 +10,7 @@ import glob
 from scalarizr.bus import bus
 from scalarizr import storage2, linux, util
 from scalarizr.libs import bases
-from scalarizr.linux import coreutils, mount as mod_mount
+from scalarizr.linux import coreutils, events, inventory, mount as mod_mount
 
 
 LOG = storage2.LOG
@@ -69,7 +70,9 @@ class Volume(Base):
                         recreate_if_missing=recreate_if_missing,
                         template=template,
                         **kwds)
-        self.features.update({'restore': True, 'grow': False, 'detach': True})
+        # own copy, types update features after this call
+        self.features = {'restore': True, 'grow': False, 'grow_online': False,
+                         'detach': True}
 
 
     def ensure(self, mount=False, mkfs=False, fstab=True, **updates):
@@ -86,6 +89,9 @@ class Volume(Base):
             self.snap = self.snap.config()
         try:
             self._ensure()
+            # attached device may carry PV or md superblock (e.g. restored
+            # from snapshot), cached lvm and mdadm listings don't have it yet
+            inventory.invalidate()
         except storage2.VolumeNotExistsError, e:
             LOG.debug('recreate_if_missing: %s', self.recreate_if_missing)
             if self.recreate_if_missing:
@@ -210,13 +216,22 @@ class Volume(Base):
         except:
             return False
 
+        mounts = mod_mount.mounts()
         try:
             # mounts() resolve symlinks in MountEntry (e.g. /dev/group/lvol becomes /dev/md-N)
             # we need to do the same to prevent KeyError for mounted device
             device = os.path.realpath(self.device)
-            return mod_mount.mounts()[device].mpoint
+            return mounts[device].mpoint
         except KeyError:
-            return False
+            pass
+        try:
+            # mount source may name device differently (e.g. /dev/root)
+            st = os.stat(self.device)
+            if stat.S_ISBLK(st.st_mode):
+                return mounts.by_devno('%d:%d' % (os.major(st.st_rdev), os.minor(st.st_rdev))).mpoint
+        except (OSError, KeyError):
+            pass
+        return False
 
 
     def is_fs_created(self):
@@ -255,16 +270,22 @@ class Volume(Base):
     def grow(self, **growth):
         """
         Grow (and/or alternate, e.g.: change ebs type to io1) volume and fs.
-        Method creates clone of current volume, increases it's size and
-        attaches it to the same place. In case of error, old volume attaches back.
 
+        Volume types with 'grow_online' feature extend device in place
+        and resize mounted filesystem, volume stays in use.
+        Otherwise (or when type can't grow in place with given growth)
+        method creates clone of current volume, increases it's size and
+        attaches it to the same place. In case of error, old volume attaches back.
         Old volume detached, but not destroyed.
 
         :param growth: Volume type-dependent rules for volume growth
         :type growth: dict
         :param resize_fs: Resize fs on device after it's growth or not
         :type resize_fs: bool
-        :return: New, bigger (or altered) volume instance
+        :param online: Try to grow volume in place
+        :type online: bool
+        :return: New, bigger (or altered) volume instance, or self
+            when volume was grown in place
         :rtype: Volume
         """
 
@@ -277,8 +298,23 @@ class Volume(Base):
 
         # Resize_fs is true by default
         resize_fs = growth.pop('resize_fs', True)
+        online = growth.pop('online', True)
 
         self.check_growth(**growth)
+
+        if online and self.features.get('grow_online') and self.device:
+            try:
+                grown = self._grow_online(**growth)
+                if grown and resize_fs:
+                    self._resize_fs()
+            except:
+                err_type, err_val, trace = sys.exc_info()
+                raise storage2.StorageError, 'Volume growth failed: %s' % err_val, trace
+            if grown:
+                LOG.info('Volume %s grown in place', self.id)
+                return self
+            LOG.info('Volume %s can not grow in place, growing a clone', self.id)
+
         was_mounted = self.mounted_to() if self.device else False
 
         new_vol = None
@@ -349,6 +385,42 @@ class Volume(Base):
         pass
 
 
+    def _grow_online(self, **growth):
+        """
+        Extend device in place, while it's attached and possibly mounted.
+
+        :param growth: Type-dependant config for volume growth
+        :type growth: dict
+        :return: False when volume can't grow in place with this growth
+        :rtype: bool
+        """
+        return False
+
+
+    def _resize_fs(self):
+        if not self.detect_fstype():
+            return
+        LOG.info('Resizing filesystem')
+        fs = storage2.filesystem(fstype=self.fstype)
+        if self.mounted_to():
+            if fs.features.get('resize_online'):
+                fs.resize(self.device)
+            else:
+                self.umount()
+                try:
+                    fs.resize(self.device)
+                finally:
+                    self.mount()
+        elif fs.features.get('umount_on_resize'):
+            fs.resize(self.device)
+        else:
+            self.mount()
+            try:
+                fs.resize(self.device)
+            finally:
+                self.umount()
+
+
     def _check(self, fstype=True, device=True, **kwds):
         if fstype:
             self._check_attr('fstype')
@@ -464,19 +536,27 @@ def rescan_scsi_host():
             with open(scsi_scan_file, 'w') as fp:
                 fp.write('- - -')
 
-def wait_device_plugged(volume_id, taken_before):
+def wait_device_plugged(volume_id, taken_before, uevents=None):
     '''
-    This is called after attaching volume to instance
+    This is called after attaching volume to instance.
+    Pass events.UeventWatcher created before attach as uevents
+    to not miss kernel events that came in between
     '''
     def device_plugged():
         rescan_scsi_host()
         return taken_devices() > taken_before
 
-    util.wait_until(device_plugged,
-            start_text='Checking that volume %s is available in OS' % volume_id,
-            timeout=30,
-            sleep=1,
-            error_text='Volume %s attached but not available in OS' % volume_id)
+    watcher = uevents or events.UeventWatcher('block', ('add', 'change'))
+    try:
+        util.wait_until(device_plugged,
+                start_text='Checking that volume %s is available in OS' % volume_id,
+                timeout=30,
+                sleep=0.2, backoff=2, max_sleep=2,
+                wakeup=watcher,
+                error_text='Volume %s attached but not available in OS' % volume_id)
+    finally:
+        if not uevents:
+            watcher.close()
 
     devices = list(taken_devices() - taken_before)
     if len(devices) > 1:
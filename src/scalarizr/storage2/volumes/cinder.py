@@ -220,7 +220,10 @@ class CinderVolume(base.Volume):
         self._check_cinder_connection()
 
         LOG.debug('Creating snapshot of Cinder volume %s', volume_id)
-        coreutils.sync()
+        mpoint = self.mounted_to()
+        # frozen filesystem is already consistent, sync would block on it
+        if not (mpoint and coreutils.frozen(mpoint)):
+            coreutils.sync()
         snapshot = self._cinder.volume_snapshots.create(volume_id,
                                                         force=True,
                                                         description=description)
@@ -224,7 +224,10 @@ class CSVolume(base.Volume):
     def _create_snapshot(self, volume_id, nowait=True):
         self._check_connection()
         LOG.debug('Creating snapshot of volume %s', volume_id)
-        util.system2('sync', shell=True)
+        mpoint = self.mounted_to()
+        # frozen filesystem is already consistent, sync would block on it
+        if not (mpoint and coreutils.frozen(mpoint)):
+            coreutils.sync()
         snap = self._conn.createSnapshot(volume_id)
         LOG.debug('Snapshot %s created for volume %s', snap.id, volume_id)
 
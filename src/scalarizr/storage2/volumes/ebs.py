@@ -16,7 +16,7 @@ from scalarizr import util
 from scalarizr.platform import NoCredentialsError
 from scalarizr.node import __node__
 from scalarizr.storage2.volumes import base
-from scalarizr.linux import coreutils
+from scalarizr.linux import coreutils, events
 from scalarizr.util import system2
 
 if linux.os.windows:
@@ -531,6 +531,7 @@ class EbsVolume(WinMountMixin, base.Volume, EbsMixin):
         util.wait_until(
                 lambda: ebs.update() == "available",
                 logger=LOG, timeout=self._global_timeout,
+                sleep=1, backoff=1.5, max_sleep=10, jitter=0.2,
                 error_text=msg
         )
         LOG.debug('EBS volume %s available', ebs.id)
@@ -543,8 +544,11 @@ class EbsVolume(WinMountMixin, base.Volume, EbsMixin):
     def _create_snapshot(self, volume, description=None, tags=None, nowait=False):
         LOG.debug('Creating snapshot of EBS volume %s', volume)
 
-        if not linux.os.windows and self.mounted_to():
-            coreutils.sync()
+        if not linux.os.windows:
+            mpoint = self.mounted_to()
+            # frozen filesystem is already consistent, sync would block on it
+            if mpoint and not coreutils.frozen(mpoint):
+                coreutils.sync()
 
         # conn.create_snapshot leaks snapshots when RequestLimitExceeded occured
         params = {'VolumeId': volume}
@@ -572,25 +576,36 @@ class EbsVolume(WinMountMixin, base.Volume, EbsMixin):
             device_name = get_free_name()
             taken_before = base.taken_devices()
             volume_id = ebs.id
+            # listen before attach, device may be plugged before API reports it
+            uevents = None if linux.os.windows else \
+                    events.UeventWatcher('block', ('add', 'change'))
 
-            LOG.debug('Attaching EBS volume %s (name: %s)', volume_id, device_name)
-            ebs.attach(self._instance_id(), device_name)
-            LOG.debug('Checking that EBS volume %s is attached', volume_id)
-            msg = "EBS volume %s wasn't attached. Timeout reached (%s seconds)" % (
-                            ebs.id, self._global_timeout)
-            util.wait_until(
-                    lambda: ebs.update() and ebs.attachment_state() == 'attached',
-                    logger=LOG, timeout=self._global_timeout,
-                    error_text=msg
-            )
-            LOG.debug('EBS volume %s attached', volume_id)
+            try:
+                LOG.debug('Attaching EBS volume %s (name: %s)', volume_id, device_name)
+                ebs.attach(self._instance_id(), device_name)
+                LOG.debug('Checking that EBS volume %s is attached', volume_id)
+                msg = "EBS volume %s wasn't attached. Timeout reached (%s seconds)" % (
+                                ebs.id, self._global_timeout)
+                util.wait_until(
+                        lambda: ebs.update() and ebs.attachment_state() == 'attached',
+                        logger=LOG, timeout=self._global_timeout,
+                        sleep=1, backoff=1.5, max_sleep=10, jitter=0.2,
+                        error_text=msg
+                )
+                LOG.debug('EBS volume %s attached', volume_id)
+            except:
+                if uevents:
+                    uevents.close()
+                raise
 
             if not linux.os.windows:
-                util.wait_until(lambda: base.taken_devices() > taken_before,
-                        start_text='Checking that volume %s is available in OS' % volume_id,
-                        timeout=30,
-                        sleep=1,
-                        error_text='Volume %s attached but not available in OS' % volume_id)
+                with uevents:
+                    util.wait_until(lambda: base.taken_devices() > taken_before,
+                            start_text='Checking that volume %s is available in OS' % volume_id,
+                            timeout=30,
+                            sleep=0.2, backoff=2, max_sleep=2,
+                            wakeup=uevents,
+                            error_text='Volume %s attached but not available in OS' % volume_id)
 
                 devices = list(base.taken_devices() - taken_before)
                 if len(devices) > 1:
@@ -630,6 +645,7 @@ class EbsVolume(WinMountMixin, base.Volume, EbsMixin):
         util.wait_until(
                 lambda: ebs.update() == 'available',
                 logger=LOG, timeout=self._global_timeout,
+                sleep=1, backoff=1.5, max_sleep=10, jitter=0.2,
                 error_text=msg
         )
         LOG.debug('EBS volume %s is available', ebs.id)
@@ -642,6 +658,7 @@ class EbsVolume(WinMountMixin, base.Volume, EbsMixin):
         util.wait_until(
                 lambda: ebs.update() and ebs.attachment_state() not in ('attaching', 'detaching'),
                 logger=LOG, timeout=self._global_timeout,
+                sleep=1, backoff=1.5, max_sleep=10, jitter=0.2,
                 error_text=msg
         )
 
@@ -655,6 +672,7 @@ class EbsVolume(WinMountMixin, base.Volume, EbsMixin):
         util.wait_until(
                 lambda: snapshot.update() and snapshot.status != 'pending',
                 logger=LOG,
+                sleep=5, backoff=1.5, max_sleep=30, jitter=0.2,
                 error_text=msg
         )
         if snapshot.status == 'error':
@@ -3,6 +3,10 @@ from __future__ import with_statement
 
 import os
 import sys
+import glob
+import json
+import shutil
+import hashlib
 import logging
 import tempfile
 import urlparse
@@ -10,6 +14,7 @@ import threading
 import subprocess
 
 from scalarizr import storage2
+from scalarizr.node import __node__
 from scalarizr.libs import metaconf
 from scalarizr.linux import coreutils, mount
 from scalarizr.storage2 import cloudfs, largetransfer
@@ -18,6 +23,8 @@ from scalarizr.storage2.volumes import base
 
 LOG = logging.getLogger(__name__)
 
+ZERO_BLOCK = '0'
+
 
 class EphVolume(base.Volume):
     """
@@ -26,11 +33,23 @@ class EphVolume(base.Volume):
     Ephemeral snapshot freezes lvm layout (creates pure LVM snapshot), then it uploads
     all the data on this logical volume to cloud storage provider (whereas lvm volume
     snapshots underlying disks)
+
+    With thin=True logical volume is created in LVM thin pool. Snapshots are
+    thin snapshots, and only blocks changed since the previous snapshot
+    are uploaded (see BlockMap). Every max_chain-th snapshot is a full one,
+    restore writes the full snapshot and then each delta in order.
+
+    Delta snapshot stays restorable only while every snapshot in its chain
+    exists: rotate thin snapshots by whole chains, starting from the oldest
+    one, never delete a full or intermediate snapshot with deltas still kept.
     """
 
+    max_chain = 7
+    snapshot_block_size = 4 * 1024 * 1024
+
 
     def __init__(self, vg=None, disk=None, disks=None,
-                 size=None, cloudfs_dir=None, **kwds):
+                 size=None, cloudfs_dir=None, thin=False, last_snapshot=None, **kwds):
         # Compatibility with 1.0
         snap_backend = kwds.pop('snap_backend', None)
         if snap_backend:
@@ -47,6 +66,8 @@ class EphVolume(base.Volume):
                 disks=disks,
                 size=size or '80%',
                 cloudfs_dir=cloudfs_dir,
+                thin=thin,
+                last_snapshot=last_snapshot,
                 **kwds)
 
         self._lvm_volume = None
@@ -68,6 +89,8 @@ class EphVolume(base.Volume):
                     setattr(self, attr, getattr(self.snap, attr))
             if not (self.disk or self.disks):
                 raise storage2.StorageError('Missing "disk" or "disks" attribute')
+            if self.snap and getattr(self.snap, 'block_size', None):
+                self.thin = True
 
             if self.disk:
                 self.disk = storage2.volume(self.disk)
@@ -78,12 +101,16 @@ class EphVolume(base.Volume):
                     elif 'google' in self.disk.device:
                         self.disk = storage2.volume(type='gce_ephemeral', name='ephemeral-disk-0')
 
+            lvm_kwds = {}
+            if self.thin:
+                lvm_kwds['thin_pool'] = 'pool'
             self._lvm_volume = storage2.volume(
                             type='lvm',
                             pvs=[self.disk] if self.disk else self.disks,
                             size=self.size + 'VG',
                             vg=self.vg,
-                            name='data')
+                            name='data',
+                            **lvm_kwds)
 
         self._lvm_volume.ensure()
         self.device = self._lvm_volume.device
@@ -93,6 +120,11 @@ class EphVolume(base.Volume):
 
         if self.snap:
             self.snap = storage2.snapshot(self.snap)
+
+        if self.snap and getattr(self.snap, 'block_size', None):
+            self._restore_blocks(self.snap)
+
+        elif self.snap:
             # umount device to allow filesystem re-creation
             if self.mounted_to():
                 self.umount()
@@ -133,15 +165,77 @@ class EphVolume(base.Volume):
             self.snap = None
 
 
+    def _restore_blocks(self, snap):
+        if not self.thin:
+            raise storage2.StorageError('Snapshot %s can be restored only '
+                                        'to thin ephemeral volume' % snap.id)
+        if self.mounted_to():
+            self.umount()
+        if self.fscreated:
+            # fresh thin volume reads as zeros, and zero blocks are never uploaded
+            self._lvm_volume.destroy()
+            self._lvm_volume.ensure()
+            self.device = self._lvm_volume.device
+        snap.restore_blocks(self.device)
+        self.fscreated = True
+        # next snapshot is a delta over the restored one
+        self.last_snapshot = snap.config()
+        self.snap = None
+
+
     def _snapshot(self, description, tags, **kwds):
         snap = storage2.snapshot(type='eph')
-        lvm_snap = self._lvm_volume.lvm_snapshot(size='100%FREE')
+        if self.thin:
+            lvm_snap = self._lvm_volume.lvm_snapshot()
+            base = self.last_snapshot
+            if base and len(base.get('chain') or []) + 1 >= self.max_chain:
+                base = None
+            target = self._upload_thin_snapshot
+            args = (snap, lvm_snap, tags, base)
+        else:
+            lvm_snap = self._lvm_volume.lvm_snapshot(size='100%FREE')
+            target = snap.upload_lvm_snapshot
+            args = (lvm_snap, tags, self.cloudfs_dir)
 
-        t = threading.Thread(target=snap.upload_lvm_snapshot, args=(lvm_snap, tags, self.cloudfs_dir))
+        t = threading.Thread(target=target, args=args)
         t.start()
         return snap
 
 
+    def _upload_thin_snapshot(self, snap, lvm_snap, tags, base):
+        snap.upload_thin_snapshot(lvm_snap, tags, self.cloudfs_dir,
+                                  base=base, block_size=self.snapshot_block_size)
+        if snap.status() == snap.COMPLETED:
+            self.last_snapshot = snap.config()
+            self._save_last_snapshot()
+
+
+    def _save_last_snapshot(self):
+        '''
+        Writes last_snapshot into node volume configs (private.d/storage/*.json)
+        of this volume: upload completes after the config was saved,
+        often in a bollard worker
+        '''
+        pattern = os.path.join(__node__['private_dir'], 'storage', '*.json')
+        for path in glob.glob(pattern):
+            try:
+                with open(path) as fp:
+                    config = json.load(fp)
+            except (IOError, ValueError):
+                continue
+            if isinstance(config, dict) and config.get('id') == self.id:
+                config['last_snapshot'] = self.last_snapshot
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'w') as fp:
+                    json.dump(config, fp)
+                os.rename(tmp_path, path)
+                LOG.debug('Saved last snapshot of %s into %s', self.id, path)
+
+
+    def _clone(self, config):
+        config.pop('last_snapshot', None)
+
+
     def _destroy(self, force, **kwds):
         if self._lvm_volume:
             self._lvm_volume.destroy(force=force)
@@ -160,6 +254,21 @@ class EphSnapshot(base.Snapshot):
 
     """
 
+    def destroy(self, force=False):
+        """
+        Thin snapshots are refused without force: later deltas may have
+        this one in their chain, and they can't be restored without it
+        """
+        if getattr(self, 'block_size', None):
+            if not force:
+                raise storage2.StorageError('Thin snapshot %s may be in the '
+                        'chain of later delta snapshots, use force=True to '
+                        'delete it anyway' % self.id)
+            LOG.warning('Deleting thin snapshot %s, delta snapshots taken '
+                        'over it are no longer restorable', self.id)
+        return super(EphSnapshot, self).destroy()
+
+
     def _destroy(self):
         """
         Reads chunks paths from manifest, then deletes manifest and chunks
@@ -180,6 +289,8 @@ class EphSnapshot(base.Snapshot):
             for chunk in c.children('./chunks/'):
                 chunk_path = os.path.join(base_url, chunk)
                 storage_drv.delete(chunk_path)
+            if getattr(self, 'block_size', None):
+                storage_drv.delete(blockmap_url(self.path))
             storage_drv.delete(self.path)
             self.path = None
         finally:
@@ -240,5 +351,179 @@ class EphSnapshot(base.Snapshot):
             lvm_snap.destroy()
 
 
+    def upload_thin_snapshot(self, lvm_snap, tags, path, base=None, block_size=None):
+        """
+        Uploads blocks of thin lvm snapshot changed since `base` snapshot,
+        or all non-zero blocks when there is no base.
+
+        EphVolume runs this method in separate thread
+        """
+        try:
+            self._snap_status = self.QUEUED
+            previous = None
+            if base:
+                try:
+                    previous = BlockMap.load(blockmap_url(base['path']))
+                except:
+                    LOG.warning('Failed to load block map of %s, taking full snapshot: %s',
+                                base['id'], sys.exc_info()[1])
+            if previous and previous.block_size != block_size:
+                previous = None
+
+            blockmap = BlockMap.scan(lvm_snap.device, block_size, previous)
+            LOG.debug('%d of %d blocks changed since %s', len(blockmap.changed),
+                      len(blockmap.blocks), base['id'] if previous else 'empty volume')
+            self.block_size = blockmap.block_size
+            self.device_size = blockmap.size
+            self.chain = (base.get('chain') or []) + [base['path']] if previous else []
+
+            transfer = largetransfer.Upload(blockmap.stream(lvm_snap.device), path,
+                                            tags=tags, transfer_id=self.id)
+            self._snap_status = self.IN_PROGRESS
+            transfer.apply_async()
+            transfer.join()
+            self.path = transfer.manifest.cloudfs_path
+            blockmap.save(blockmap_url(self.path))
+            self._snap_status = self.COMPLETED
+
+        except:
+            self._snap_status = self.FAILED
+            LOG.exception('Caught error while uploading thin LVM snapshot')
+        finally:
+            lvm_snap.destroy()
+
+
+    def restore_blocks(self, device):
+        """
+        Writes full snapshot and then every delta from the chain to device
+        """
+        with open(device, 'r+b') as dev:
+            dev.seek(0, os.SEEK_END)
+            if dev.tell() < int(self.device_size):
+                raise storage2.StorageError('Not enough space on device %s '
+                                            'to restore snapshot.' % device)
+            for path in (self.chain or []) + [self.path]:
+                LOG.debug('Restoring blocks from %s', path)
+                blockmap = BlockMap.load(blockmap_url(path))
+                transfer = largetransfer.Download(path)
+                transfer.apply_async()
+                try:
+                    blockmap.apply(transfer.output, dev)
+                except:
+                    transfer.terminate()
+                    raise
+                transfer.join()
+
+
+def blockmap_url(manifest_url):
+    return os.path.join(os.path.dirname(manifest_url), 'blockmap.json')
+
+
+class BlockMap(object):
+    """
+    Hashes of fixed size device blocks and indexes of blocks
+    changed since the previous map, kept next to snapshot manifest.
+    Uploaded data stream is a concatenation of changed blocks.
+
+    All-zero blocks are hashed as ZERO_BLOCK, without previous map
+    every block is compared to a zero one, so a full snapshot contains
+    only blocks ever written to a thin volume.
+    """
+
+    def __init__(self, block_size, size=0, blocks=None, changed=None):
+        self.block_size = block_size
+        self.size = size
+        self.blocks = blocks or []
+        self.changed = changed or []
+
+
+    @classmethod
+    def scan(cls, device, block_size, previous=None):
+        ret = cls(block_size)
+        prev_blocks = previous.blocks if previous else []
+        zero = '\0' * block_size
+        with open(device, 'rb') as fp:
+            while True:
+                data = fp.read(block_size)
+                if not data:
+                    break
+                if data == zero[:len(data)]:
+                    digest = ZERO_BLOCK
+                else:
+                    digest = hashlib.sha1(data).hexdigest()
+                idx = len(ret.blocks)
+                prev = prev_blocks[idx] if idx < len(prev_blocks) else ZERO_BLOCK
+                if digest != prev:
+                    ret.changed.append(idx)
+                ret.blocks.append(digest)
+                ret.size += len(data)
+        return ret
+
+
+    def _block_length(self, idx):
+        return min(self.block_size, self.size - idx * self.block_size)
+
+
+    def stream(self, device):
+        """
+        Generator of a single stream with changed blocks data. Data is read
+        in a thread started on first iteration, so this works inside
+        largetransfer process
+        """
+        read_fd, write_fd = os.pipe()
+        error = []
+
+        def writer():
+            try:
+                with os.fdopen(write_fd, 'wb') as out:
+                    with open(device, 'rb') as dev:
+                        for idx in self.changed:
+                            dev.seek(idx * self.block_size)
+                            out.write(dev.read(self._block_length(idx)))
+            except:
+                error.append(sys.exc_info())
+
+        t = threading.Thread(target=writer, name='Block reader')
+        t.setDaemon(True)
+        t.start()
+        with os.fdopen(read_fd, 'rb') as stream:
+            yield cloudfs.NamedStream(stream, 'blocks', extension='img')
+        t.join()
+        if error:
+            raise error[0][0], error[0][1], error[0][2]
+
+
+    def apply(self, stream, dev):
+        for idx in self.changed:
+            length = self._block_length(idx)
+            data = stream.read(length)
+            if len(data) != length:
+                raise storage2.StorageError('Unexpected end of data at block %d' % idx)
+            dev.seek(idx * self.block_size)
+            dev.write(data)
+
+
+    def save(self, url):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, os.path.basename(url))
+            with open(path, 'w') as fp:
+                json.dump(self.__dict__, fp)
+            cloudfs.cloudfs(urlparse.urlparse(url).scheme).put(path, url)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+    @classmethod
+    def load(cls, url):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = cloudfs.cloudfs(urlparse.urlparse(url).scheme).get(url, tmp_dir)
+            with open(path) as fp:
+                return cls(**json.load(fp))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
 storage2.volume_types['eph'] = EphVolume
 storage2.snapshot_types['eph'] = EphSnapshot
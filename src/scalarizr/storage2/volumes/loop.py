@@ -43,7 +43,7 @@ class LoopVolume(base.Volume):
         '''
         super(LoopVolume, self).__init__(file=file, size=size,
                         zerofill=zerofill, adjust_size=True, **kwds)
-        self.features.update(dict(restore=True, grow=True))
+        self.features.update(dict(restore=True, grow=True, grow_online=True))
 
     def _ensure(self):
         if self.snap:
@@ -122,6 +122,19 @@ class LoopVolume(base.Volume):
                                     'current.')
 
 
+    def _grow_online(self, **growth):
+        size = growth.get('size')
+        size_in_bytes = int(float(size) * 1024) * 1024 * 1024
+        if size_in_bytes < os.path.getsize(self.file):
+            raise storage2.StorageError('New loop device size is less than '
+                                    'current.')
+        with open(self.file, 'r+b') as fp:
+            fp.truncate(size_in_bytes)
+        coreutils.losetup(self.device, set_capacity=True)
+        self.size = size
+        return True
+
+
     def _grow(self, new_vol, **growth):
         snap = self.snapshot(description='Temporary snapshot for volume growth')
         try:
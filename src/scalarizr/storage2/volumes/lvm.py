@@ -9,7 +9,20 @@ import itertools
 
 from scalarizr import storage2, util
 from scalarizr.storage2.volumes import base
-from scalarizr.linux import lvm2, coreutils
+from scalarizr.linux import lvm2, coreutils, events
+
+
+def _lv_size_kwarg(size):
+    kwd = dict()
+    if '%' in str(size):
+        kwd['extents'] = size
+    else:
+        try:
+            int(size)
+            kwd['size'] = '%sG' % size
+        except:
+            kwd['size'] = size
+    return kwd
 
 
 class LvmVolume(base.Volume):
@@ -19,6 +32,7 @@ class LvmVolume(base.Volume):
                             vg=None,
                             name=None,
                             size=None,
+                            thin_pool=None,
                             **kwds):
         '''
         :type pvs: list
@@ -33,28 +47,21 @@ class LvmVolume(base.Volume):
         :type size: int or string
         :param size: Logical volume size <int>[bBsSkKmMgGtTpPeE]
                 or %{VG|PVS|FREE|ORIGIN}
+
+        :type thin_pool: string
+        :param thin_pool: Thin pool name. When set, pool of `size` is created
+                and logical volume is thin provisioned from it with the same
+                virtual size. lvm_snapshot() without size creates thin snapshots
         '''
         super(LvmVolume, self).__init__(pvs=pvs or [], vg=vg, name=name,
-                        size=size, **kwds)
-        self.features['restore'] = True
+                        size=size, thin_pool=thin_pool, **kwds)
+        self.features.update({'restore': True, 'grow': True, 'grow_online': True})
 
     def _lvinfo(self):
         return lvm2.lvs(lvm2.lvpath(self.vg, self.name)).values()[0]
 
 
     def _ensure(self):
-        def get_lv_size_kwarg(size):
-            kwd = dict()
-            if '%' in str(size):
-                kwd['extents'] = size
-            else:
-                try:
-                    int(size)
-                    kwd['size'] = '%sG' % size
-                except:
-                    kwd['size'] = size
-            return kwd
-
         if self.snap:
             pvs = []
             try:
@@ -95,10 +102,12 @@ class LvmVolume(base.Volume):
             except lvm2.NotFound:
                 lvm2.vgcreate(self.vg, *[disk.device for disk in self.pvs])
 
-            kwds = {'name': self.name}
-            kwds.update(get_lv_size_kwarg(self.size))
-
-            lvm2.lvcreate(self.vg, **kwds)
+            if self.thin_pool:
+                self._create_thin(_lv_size_kwarg(self.size))
+            else:
+                kwds = {'name': self.name}
+                kwds.update(_lv_size_kwarg(self.size))
+                lvm2.lvcreate(self.vg, **kwds)
             lv_info = self._lvinfo()
 
         self._config.update({
@@ -122,19 +131,89 @@ class LvmVolume(base.Volume):
 
         if pvs_to_extend_vg:
             lvm2.vgextend(self.vg, *pvs_to_extend_vg)
-            lvm2.lvextend(self.device, **get_lv_size_kwarg(self.size))
+            self._extend(self.size)
             if self.is_fs_created():
                 fs = storage2.filesystem(self.fstype)
                 if fs.features.get('resizable'):
                     fs.resize(self.device)
 
         if lv_info.lv_attr[4] == '-':
-            lvm2.lvchange(self.device, available='y')
-            util.wait_until(
-                    lambda: os.path.exists(self.device), sleep=1, timeout=30,
-                    start_text='Waiting for device %s' % self.device,
-                    error_text='Device %s not available' % self.device
-            )
+            with events.PathWatcher(self.device) as watcher:
+                lvm2.lvchange(self.device, available='y')
+                util.wait_until(
+                        lambda: os.path.exists(self.device),
+                        sleep=0.1, backoff=2, max_sleep=1, timeout=30,
+                        wakeup=watcher,
+                        start_text='Waiting for device %s' % self.device,
+                        error_text='Device %s not available' % self.device
+                )
+
+
+    def _lv_size(self, name):
+        lvol = '%s/%s' % (os.path.basename(self.vg), name)
+        lv_info = lvm2.lvs(lvol, units='b', nosuffix=True)[lvol]
+        return '%sB' % lv_info.lv_size
+
+
+    def _extend(self, size):
+        if self.thin_pool:
+            lvm2.lvextend(lvm2.lvpath(self.vg, self.thin_pool), **_lv_size_kwarg(size))
+            lvm2.lvextend(self.device, size=self._lv_size(self.thin_pool))
+        else:
+            lvm2.lvextend(self.device, **_lv_size_kwarg(size))
+
+
+    def grow(self, **growth):
+        # Clone shares vg and name with this volume, so base clone path
+        # would destroy original volume group when cleaning up after _grow
+        if not growth.get('online', True) or not self.device:
+            raise storage2.StorageError('LVM volume grows only in place: '
+                        'volume should be ensured and grown with online=True')
+        return super(LvmVolume, self).grow(**growth)
+
+
+    def check_growth(self, **growth):
+        if not (growth.get('size') or growth.get('pvs')):
+            raise storage2.StorageError('Size or pvs argument is missing '
+                                        'from grow config')
+
+
+    def _grow_online(self, **growth):
+        '''
+        :param size: New logical volume size, accepts '+<size>'
+                and defaults to 100%VG
+        :param pvs: Physical volumes to add to volume group
+        '''
+        size = growth.get('size') or '100%VG'
+        if growth.get('pvs'):
+            new_pvs = []
+            for pv in growth['pvs']:
+                pv = storage2.volume(pv)
+                pv.ensure()
+                lvm2.pvcreate(pv.device)
+                new_pvs.append(pv)
+            lvm2.vgextend(self.vg, *[pv.device for pv in new_pvs])
+            self.pvs = self.pvs + new_pvs
+        self._extend(size)
+        if growth.get('size'):
+            self.size = self._lv_size(self.name) if str(size).startswith('+') else size
+        return True
+
+
+    def _grow(self, new_vol, **growth):
+        raise storage2.StorageError('LVM volume grows only in place')
+
+
+    def _create_thin(self, size_kwds):
+        vg = os.path.basename(self.vg)
+        try:
+            lvm2.lvs('%s/%s' % (vg, self.thin_pool))
+        except lvm2.NotFound:
+            lvm2.lvcreate(vg, type='thin-pool', name=self.thin_pool, **size_kwds)
+        lvm2.lvcreate('%s/%s' % (vg, self.thin_pool),
+                      thin=True,
+                      virtualsize=self._lv_size(self.thin_pool),
+                      name=self.name)
 
 
     def lvm_snapshot(self, name=None, size=None):
@@ -148,6 +227,10 @@ class LvmVolume(base.Volume):
                 long_kwds['extents'] = size
             else:
                 long_kwds['size'] = size
+        elif self.thin_pool:
+            # thin snapshots share pool space with origin and are created
+            # with activation skip flag set
+            long_kwds['setactivationskip'] = 'n'
         else:
             long_kwds['extents'] = '1%ORIGIN'
 
@@ -15,7 +15,7 @@ import itertools
 
 
 from scalarizr import storage2, util
-from scalarizr.linux import mdadm, mount, lvm2, coreutils, os as os_detect
+from scalarizr.linux import mdadm, mount, lvm2, coreutils, events, os as os_detect
 from scalarizr.storage2.volumes import base
 
 
@@ -63,7 +63,7 @@ class RaidVolume(base.Volume):
                         raid_pv=raid_pv, level=level and int(level),
                         lvm_group_cfg=lvm_group_cfg,
                         vg=vg, pv_uuid=pv_uuid, **kwds)
-        self.features.update({'restore': True, 'grow': True})
+        self.features.update({'restore': True, 'grow': True, 'grow_online': True})
 
 
     def _disable_autoassembly(self):
@@ -206,13 +206,16 @@ class RaidVolume(base.Volume):
             lv_name = lv_infos.popitem()[1].lv_name
             self.device = lvm2.lvpath(self.vg, lv_name)
 
-            # Activate volume group
-            lvm2.vgchange(self.vg, available='y')
+            with events.PathWatcher(self.device) as watcher:
+                # Activate volume group
+                lvm2.vgchange(self.vg, available='y')
 
-            # Wait for logical volume device file
-            util.wait_until(lambda: os.path.exists(self.device),
-                                    timeout=120, logger=LOG,
-                                    error_text='Logical volume %s not found' % self.device)
+                # Wait for logical volume device file
+                util.wait_until(lambda: os.path.exists(self.device),
+                                        timeout=120, logger=LOG,
+                                        sleep=0.1, backoff=2, max_sleep=5,
+                                        wakeup=watcher,
+                                        error_text='Logical volume %s not found' % self.device)
 
             if self.mpoint:
                 # SCALARIZR-1929 raid wasn't auto-mounted after reboot.
@@ -473,33 +476,11 @@ class RaidVolume(base.Volume):
 
                     new_vol.ensure()
 
-                existing_raid_disk = new_vol.disks[0]
-                add_disks_count = new_len - current_len
-                for _ in range(add_disks_count):
-                    disk_to_add = existing_raid_disk.clone()
-                    added_disks.append(disk_to_add)
-                    disk_to_add.ensure()
-
-                added_disks_devices = [d.device for d in added_disks]
-                mdadm.mdadm('manage', new_vol.raid_pv, add=True,
-                                                                                                *added_disks_devices)
+                self._add_disks(new_vol.raid_pv, new_vol.disks[0],
+                                new_len - current_len, added_disks)
                 new_vol.disks.extend(added_disks)
 
-                mdadm.mdadm('grow', new_vol.raid_pv, raid_devices=new_len)
-
-            mdadm.mdadm('misc', None, new_vol.raid_pv, wait=True, raise_exc=False)
-            mdadm.mdadm('grow', new_vol.raid_pv, size='max')
-            mdadm.mdadm('misc', None, new_vol.raid_pv, wait=True, raise_exc=False)
-
-            lvm2.pvresize(new_vol.raid_pv)
-            try:
-                lvm2.lvresize(new_vol.device, extents='100%VG')
-            except:
-                e = sys.exc_info()[1]
-                if (self.level == 1 and 'matches existing size' in str(e) and not disk_growth):
-                    LOG.debug('Raid1 actual size has not changed')
-                else:
-                    raise
+            self._resize_array(new_vol.raid_pv, new_vol.device, disk_growth)
         except:
             err_type, err_val, trace = sys.exc_info()
             if growed_disks or added_disks:
@@ -516,6 +497,69 @@ class RaidVolume(base.Volume):
             raise err_type, err_val, trace
 
 
+    def _grow_online(self, **growth):
+        """
+        Grows disks in place when all of them can, adds new disks
+        to the running array and resizes it
+        """
+        disk_growth = growth.get('disks')
+        disks = [storage2.volume(disk) for disk in self.disks]
+        if disk_growth and not all(disk.features.get('grow_online') for disk in disks):
+            return False
+
+        if disk_growth:
+            for disk in disks:
+                try:
+                    disk.check_growth(**disk_growth)
+                except storage2.NoOpError:
+                    continue
+                if not disk._grow_online(**disk_growth):
+                    raise storage2.StorageError('Disk %s can not grow in place' % disk.id)
+            self.disks = disks
+
+        new_len = int(growth.get('disks_count', 0))
+        if new_len and new_len != len(disks):
+            added_disks = []
+            try:
+                self._add_disks(self.raid_pv, disks[0], new_len - len(disks), added_disks)
+            except:
+                with util.capture_exception(logger=LOG):
+                    for disk in added_disks:
+                        disk.destroy(force=True)
+            self.disks = disks + added_disks
+
+        self._resize_array(self.raid_pv, self.device, disk_growth)
+        self.lvm_group_cfg = lvm2.backup_vg_config(self.vg)
+        return True
+
+
+    def _add_disks(self, raid_pv, template_disk, count, added_disks):
+        for _ in range(count):
+            disk_to_add = template_disk.clone()
+            added_disks.append(disk_to_add)
+            disk_to_add.ensure()
+
+        added_disks_devices = [d.device for d in added_disks]
+        mdadm.mdadm('manage', raid_pv, add=True, *added_disks_devices)
+        mdadm.mdadm('grow', raid_pv, raid_devices=len(self.disks) + count)
+
+
+    def _resize_array(self, raid_pv, device, disk_growth):
+        mdadm.mdadm('misc', None, raid_pv, wait=True, raise_exc=False)
+        mdadm.mdadm('grow', raid_pv, size='max')
+        mdadm.mdadm('misc', None, raid_pv, wait=True, raise_exc=False)
+
+        lvm2.pvresize(raid_pv)
+        try:
+            lvm2.lvresize(device, extents='100%VG')
+        except:
+            e = sys.exc_info()[1]
+            if (self.level == 1 and 'matches existing size' in str(e) and not disk_growth):
+                LOG.debug('Raid1 actual size has not changed')
+            else:
+                raise
+
+
     def replace_disk(self, index, disk):
         '''
         :param: index RAID disk index. Starts from 0
@@ -248,7 +248,8 @@ class UpdClientAPI(object):
                         return False
                     else:
                         raise
-            wait_until(init_queryenv, timeout=120, sleep=10)
+            wait_until(init_queryenv, timeout=120,
+                       sleep=1, backoff=2, max_sleep=10, jitter=0.2)
 
         if not self.messaging_service:
             LOG.debug('Initializing messaging')
@@ -473,7 +474,7 @@ class UpdClientAPI(object):
             raise ValueError(
                 'Got an empty repository URL. '
                 'Check repositories configuration in Scalr config.yml')
-        self.pkgmgr.updatedb()
+        self.pkgmgr.updatedb(names=[self.package] + [dep['name'] for dep in self.deps(None) or []])
 
         # Need this if user wants to perform a manual update [SCALARIZR-1885]
         self._ensure_repos()
@@ -19,6 +19,7 @@ import xml.etree.ElementTree as ET
 from abc import ABCMeta, abstractmethod
 from distutils.version import LooseVersion
 from collections import namedtuple, defaultdict, Sized
+from multiprocessing.pool import ThreadPool
 try:
     import win32file
 except ImportError:
@@ -37,6 +38,9 @@ LOG = logging.getLogger(__name__)
 
 STORAGE_DIR = __node__['updclient']['cache_dir']
 ARCHIVE_SIZE = 2
+FETCH_WORKERS = 4
+FETCH_CHUNK_SIZE = 64 * 1024
+FETCH_RETRIES = 3
 
 
 class Error(Exception):
@@ -188,7 +192,7 @@ class AbstractPackageManager(object):
         pass
 
     @abstractmethod
-    def _parse_packages_metadata(self, metadata):
+    def _parse_packages_metadata(self, metadata, names=None):
         pass
 
     @abstractmethod
@@ -234,7 +238,7 @@ class AbstractPackageManager(object):
                                   download_date=time.time(),
                                   packages=map(lambda pkg: posixpath.basename(pkg.location), deps + [package]))
 
-    def _cleanup_history(self, name):
+    def _cleanup_history(self, name, keep=None):
         # We only keep last `ARCHIVE_SIZE` versions in our cache. Remove the rest.
         history = sorted(self._get_history(name),
                          key=lambda history: history['download_date'],
@@ -261,8 +265,10 @@ class AbstractPackageManager(object):
         # [SCALARIZR-1854]
         pkg_dir = os.path.join(STORAGE_DIR, name)
         if os.path.exists(pkg_dir):
+            # Keep the entry we are going to fetch into, to resume partial downloads
             broken_entries = [os.path.join(pkg_dir, dir) for dir in os.listdir(pkg_dir)
-                              if 'metadata' not in os.listdir(os.path.join(pkg_dir, dir))]
+                              if 'metadata' not in os.listdir(os.path.join(pkg_dir, dir)) and
+                              os.path.join(pkg_dir, dir) != keep]
 
             for entry in broken_entries:
                 LOG.debug("Removing broken entry from the pkgmgr cache: %s", entry)
@@ -271,12 +277,63 @@ class AbstractPackageManager(object):
     def _update_install_history(self, metadata):
         metadata.set(install_date=time.time())
 
-    def updatedb(self):
+    def _packages_cache_path(self, packages_path):
+        key = hashlib.sha1(str(packages_path)).hexdigest()
+        return os.path.join(STORAGE_DIR, '.repodata', key)
+
+    def _load_cached_packages(self, packages_path, checksum, names):
+        """
+        Returns packages parsed on previous sync when packages metadata
+        checksum didn't change and cache contains all `names`
+        """
+        if not checksum:
+            return None
+        path = self._packages_cache_path(packages_path)
+        try:
+            with open(path) as fp:
+                cache = json.load(fp)
+        except (IOError, ValueError):
+            return None
+        if cache.get('checksum') != checksum:
+            return None
+        if cache.get('names') is not None and \
+                (names is None or not set(names).issubset(cache['names'])):
+            return None
+        LOG.debug('Packages metadata not changed, using cached copy')
+        return [Package(*entry) for entry in cache['packages']]
+
+    def _save_cached_packages(self, packages_path, checksum, names, packages):
+        if not checksum:
+            return
+        path = self._packages_cache_path(packages_path)
+        try:
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path + '.tmp', 'w') as fp:
+                json.dump({'checksum': checksum,
+                           'names': sorted(names) if names is not None else None,
+                           'packages': [list(pkg) for pkg in packages]}, fp)
+            os.rename(path + '.tmp', path)
+        except (IOError, OSError):
+            LOG.debug('Failed to save packages metadata cache: %s', sys.exc_info()[1])
+
+    def updatedb(self, names=None):
+        """
+        Syncs repository packages list.
+        Packages metadata is downloaded only when its checksum changed since
+        previous sync. When `names` are given, only these packages are parsed
+        and kept in the list.
+        """
         LOG.info('Syncing repository info')
         repo_metadata = self._get_repo_metadata()
         packages_path, checksum = self._parse_repo_metadata(repo_metadata)
-        packages_metadata = self._get_packages_metadata(packages_path, checksum)
-        packages = self._parse_packages_metadata(packages_metadata)
+        packages = self._load_cached_packages(packages_path, checksum, names)
+        if packages is None:
+            packages_metadata = self._get_packages_metadata(packages_path, checksum)
+            packages = self._parse_packages_metadata(packages_metadata, names)
+            self._save_cached_packages(packages_path, checksum, names, packages)
+        elif names is not None:
+            packages = [pkg for pkg in packages if pkg.name in names]
         self.packages = PackageList(packages)
 
     def fetch(self, name, version, deps=None):
@@ -307,41 +364,83 @@ class AbstractPackageManager(object):
         download date, install date and package installation order.
         """
 
-        def _fetch(pkg, dir):
-            hasher = hashlib.new(pkg.hash_type)
-            path = os.path.join(dir, posixpath.basename(pkg.location))
-            LOG.debug("Fetching package from %s", path)
-            r = requests_get(posixpath.join(self.baseurl, pkg.location), stream=True,
-                             exc_class=RepositoryError,
-                             exc_message="Cannot fetch packages from the repository")
-            with open(path, 'wb') as f:
-                for chunk in r.iter_content(1024):
-                    f.write(chunk)
-                    hasher.update(chunk)
-            if pkg.hash != hasher.hexdigest():
-                os.unlink(path)
-                raise IntegrityError("Package {0} checksum doesn't match".format(name))
+        LOG.info('Fetching packages')
+        package = self.packages.get(name, version)
+        storage_dir = os.path.join(STORAGE_DIR, name, package.hash)
 
         # [SCALARIZR-2133]
         try:
-            self._cleanup_history(name)
+            self._cleanup_history(name, keep=storage_dir)
         except:
             LOG.warn("Scalarizr was unable to clean up cache directory. "
                      "If this error persits it can consume a lot of disk space.",
                      exc_info=sys.exc_info())
-        LOG.info('Fetching packages')
-        package = self.packages.get(name, version)
-        storage_dir = os.path.join(STORAGE_DIR, name, package.hash)
         if not os.path.exists(storage_dir):
             os.makedirs(storage_dir)
 
         deps = [self.packages.get(**dep) for dep in deps] if deps else []
-        for pkg in deps + [package]:
-            _fetch(pkg, storage_dir)
+        pool = ThreadPool(processes=min(FETCH_WORKERS, len(deps) + 1))
+        try:
+            pool.map(lambda pkg: self._fetch_package(pkg, storage_dir), deps + [package])
+        finally:
+            pool.close()
+            pool.join()
 
         self._update_fetch_history(storage_dir, package, deps)
         return package.hash
 
+    def _fetch_package(self, pkg, dir):
+        """
+        Downloads package into `dir`, verifying its checksum.
+        Download goes into a .part file and is resumed with HTTP Range request
+        after connection failures. Already fetched package is not downloaded again.
+        """
+        path = os.path.join(dir, posixpath.basename(pkg.location))
+        if os.path.exists(path) and self._file_hash(path, pkg.hash_type) == pkg.hash:
+            LOG.debug("Package %s already fetched", path)
+            return
+        part_path = path + '.part'
+        url = posixpath.join(self.baseurl, pkg.location)
+        LOG.debug("Fetching package from %s", url)
+        for attempt in range(FETCH_RETRIES):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {'Range': 'bytes={0}-'.format(offset)} if offset else {}
+            try:
+                r = requests_get(url, stream=True, headers=headers,
+                                 exc_class=RepositoryError,
+                                 exc_message="Cannot fetch packages from the repository")
+                if offset and r.status_code == 206:
+                    LOG.debug("Resuming %s from %s bytes", path, offset)
+                    hasher = hashlib.new(pkg.hash_type)
+                    self._file_hash(part_path, pkg.hash_type, hasher)
+                    mode = 'ab'
+                else:
+                    hasher = hashlib.new(pkg.hash_type)
+                    mode = 'wb'
+                with open(part_path, mode) as f:
+                    for chunk in r.iter_content(FETCH_CHUNK_SIZE):
+                        f.write(chunk)
+                        hasher.update(chunk)
+                break
+            except (RepositoryError, requests.RequestException, IOError):
+                if offset and isinstance(sys.exc_info()[1], RepositoryError):
+                    # Range not satisfiable or partial content expired
+                    coreutils.remove(part_path)
+                if attempt == FETCH_RETRIES - 1:
+                    raise
+                LOG.debug("Fetching %s failed: %s, retrying", url, sys.exc_info()[1])
+        if pkg.hash != hasher.hexdigest():
+            os.unlink(part_path)
+            raise IntegrityError("Package {0} checksum doesn't match".format(pkg.name))
+        os.rename(part_path, path)
+
+    def _file_hash(self, path, hash_type, hasher=None):
+        hasher = hasher or hashlib.new(hash_type)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(FETCH_CHUNK_SIZE), ''):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
     def status(self, name):
         package_versions = self.packages.get_all(name)
 
@@ -419,13 +518,14 @@ class YumManager(AbstractPackageManager):
         hasher.update(r.content)
         if checksum['value'] != hasher.hexdigest():
             raise IntegrityError("Packages file has wrong sha1 sum")
-        metadata = gzip.GzipFile(fileobj=StringIO(r.content)).read()
-        return metadata
+        return gzip.GzipFile(fileobj=StringIO(r.content))
 
-    def _parse_packages_metadata(self, metadata):
+    def _parse_packages_metadata(self, metadata, names=None):
+        """
+        Stream-parses primary.xml file object, keeping in memory
+        only a single <package> element at a time
+        """
         ns = YumManager.COMMON_NAMESPACE
-        tree = ET.fromstring(metadata)
-        entries = tree.findall(ns + "package")
 
         def make_package(element):
             name = element.find(ns + 'name').text
@@ -436,7 +536,14 @@ class YumManager(AbstractPackageManager):
             hash_type = 'sha1' if hash_type == 'sha' else hash_type
             return Package(name, version, location, hash.text, hash_type)
 
-        return map(make_package, entries)
+        packages = []
+        for _, element in ET.iterparse(metadata):
+            if element.tag != ns + 'package':
+                continue
+            if names is None or element.find(ns + 'name').text in names:
+                packages.append(make_package(element))
+            element.clear()
+        return packages
 
     def _get_installed_version(self, name):
         out, err, returncode = system(
@@ -523,13 +630,16 @@ class AptManager(AbstractPackageManager):
                 raise IntegrityError("Packages file has wrong checksum")
         return r.text
 
-    def _parse_packages_metadata(self, metadata):
+    def _parse_packages_metadata(self, metadata, names=None):
         def make_package(entry):
+            name = re.search(r"^Package:(.*)", entry, re.M).group(1).strip()
+            if names is not None and name not in names:
+                return None
+
             arch = re.search(r"^Architecture:(.*)", entry, re.M).group(1).strip()
             if arch not in (self.ARCH, 'all'):
                 return None
 
-            name = re.search(r"^Package:(.*)", entry, re.M).group(1).strip()
             version = re.search(r"^Version:(.*)", entry, re.M).group(1).strip()
             location = re.search(r"^Filename:(.*)", entry, re.M).group(1).strip()
             hash = re.search(
@@ -604,14 +714,15 @@ class WinPackageManager(AbstractPackageManager):
     def _get_packages_metadata(self, packages_path, checksum):
         return self._get_repo_metadata()
 
-    def _parse_packages_metadata(self, metadata):
+    def _parse_packages_metadata(self, metadata, names=None):
         def make_package(entry):
             name = entry['name']
             version = entry['version']
             location = entry['path']
             hash = entry['md5']
             return Package(name, version, location, hash, self.HASH_TYPE)
-        return map(make_package, metadata['packages'])
+        return [make_package(entry) for entry in metadata['packages']
+                if names is None or entry['name'] in names]
 
     def _get_installed_version(self, name):
         """
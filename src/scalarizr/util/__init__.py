@@ -6,6 +6,7 @@ import logging
 import threading
 import weakref
 import time
+import random
 import sys
 import signal
 import string
@@ -312,7 +313,17 @@ def system2(*popenargs, **kwargs):
     return out, err, p.returncode
 
 
-def wait_until(target, args=None, kwargs=None, sleep=5, logger=None, timeout=None, start_text=None, error_text=None, raise_exc=True):
+def wait_until(target, args=None, kwargs=None, sleep=5, logger=None, timeout=None, start_text=None, error_text=None, raise_exc=True,
+               backoff=1, max_sleep=None, jitter=0, wakeup=None):
+    '''
+    Calls target until it returns true value.
+
+    :param backoff: sleep is multiplied by it after every attempt, up to max_sleep
+    :param jitter: every sleep is randomized within +/- this fraction of it
+    :param wakeup: threading.Event or scalarizr.linux.events watcher.
+        Next attempt is made as soon as it wakes up. Event is cleared before
+        every attempt, so it should be set on every change
+    '''
     args = args or ()
     kwargs = kwargs or {}
     time_until = None
@@ -324,18 +335,34 @@ def wait_until(target, args=None, kwargs=None, sleep=5, logger=None, timeout=Non
         if isinstance(timeout, int):
             text += '(timeout: %d seconds)' % timeout
         logger.debug(text)
-    while not target(*args, **kwargs):
-        if time_until and time.time() >= time_until:
+    delay = sleep
+    while True:
+        if hasattr(wakeup, 'clear'):
+            wakeup.clear()
+        if target(*args, **kwargs):
+            return True
+        now = time.time()
+        if time_until and now >= time_until:
             msg = error_text + '. ' if error_text else ''
             msg += 'Timeout: %d seconds reached' % (timeout, )
             if raise_exc:
                 raise BaseException(msg)
             else:
                 return False
+        pause = delay
+        if jitter:
+            pause *= random.uniform(1 - jitter, 1 + jitter)
+        if time_until:
+            pause = min(pause, time_until - now)
         if logger:
-            logger.debug("Wait %.2f seconds before the next attempt", sleep)
-        time.sleep(sleep)
-    return True
+            logger.debug("Wait %.2f seconds before the next attempt", pause)
+        if wakeup is not None:
+            wakeup.wait(pause)
+        else:
+            time.sleep(pause)
+        delay *= backoff
+        if max_sleep:
+            delay = min(delay, max_sleep)
 
 
 def xml_strip(el):
@@ -364,8 +364,10 @@ def wait_sock(sock=None):
     if not isinstance(sock, SockParam):
         raise InitdError('Socks parameter must be instance of SockParam class')
 
-    time_start = time.time()
-    while time.time() - time_start < sock.timeout:
+    # poll often right after start, most services are listening in a fraction of second
+    time_until = time.time() + sock.timeout
+    delay = 0.05
+    while True:
         try:
             s = socket.socket(sock.family, sock.type)
             s.connect(sock.conn_address)
@@ -373,6 +375,10 @@ def wait_sock(sock=None):
             del s
             return
         except:
-            time.sleep(1)
             pass
+        remaining = time_until - time.time()
+        if remaining <= 0:
+            break
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 1)
     raise InitdError("Service unavailable after %d seconds of waiting" % sock.timeout)
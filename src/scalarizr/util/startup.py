@@ -0,0 +1,101 @@
+'''
+Startup profiling.
+
+ImportProfiler wraps __import__ and measures how long every module takes
+to import, itself and together with modules it imports.
+PhaseTimer records durations of sequential startup phases.
+
+Import profiling is enabled by setting SCALARIZR_PROFILE_STARTUP
+environment variable, it should be installed before anything else
+is imported.
+'''
+
+import os
+import sys
+import time
+import __builtin__
+
+
+PROFILE_ENV = 'SCALARIZR_PROFILE_STARTUP'
+
+
+class ImportProfiler(object):
+
+    def __init__(self):
+        # module name -> [cumulative seconds, self seconds]
+        self.stats = {}
+        self._stack = []
+        self._orig_import = None
+
+    def install(self):
+        if not self._orig_import:
+            self._orig_import = __builtin__.__import__
+            __builtin__.__import__ = self._import
+
+    def uninstall(self):
+        if self._orig_import:
+            __builtin__.__import__ = self._orig_import
+            self._orig_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=None, level=-1):
+        if name in sys.modules:
+            return self._orig_import(name, globals, locals, fromlist, level)
+        self._stack.append(0.0)
+        start = time.time()
+        try:
+            return self._orig_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.time() - start
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            entry = self.stats.setdefault(name, [0.0, 0.0])
+            entry[0] += elapsed
+            entry[1] += elapsed - children
+
+    def top(self, limit=20):
+        '''
+        :returns: list of (module, cumulative seconds, self seconds)
+            sorted by self time
+        '''
+        ret = sorted(((name, cum, own) for name, (cum, own) in self.stats.items()),
+                     key=lambda row: row[2], reverse=True)
+        return ret[:limit]
+
+    def report(self, limit=20):
+        lines = ['%8s %8s  %s' % ('self', 'total', 'module')]
+        lines += ['%7.3fs %7.3fs  %s' % (own, cum, name)
+                  for name, cum, own in self.top(limit)]
+        return '\n'.join(lines)
+
+
+class PhaseTimer(object):
+    '''
+    mark(name) closes phase started at previous mark (or timer creation)
+    '''
+
+    def __init__(self):
+        self.phases = []
+        self.started_at = self._last = time.time()
+
+    def mark(self, name):
+        now = time.time()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    @property
+    def total(self):
+        return self._last - self.started_at
+
+    def report(self):
+        return ', '.join('%s: %.2fs' % phase for phase in self.phases)
+
+
+import_profiler = ImportProfiler()
+
+
+def profile_imports():
+    if os.environ.get(PROFILE_ENV):
+        import_profiler.install()
+        return True
+    return False
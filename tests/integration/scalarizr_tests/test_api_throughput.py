@@ -0,0 +1,135 @@
+'''
+Load benchmark for the JSON-RPC HTTP API server.
+
+50 concurrent clients call a cheap method over signed and encrypted
+keep-alive connections, one call per request and in batches. Starvation
+case keeps IDLE_CLIENTS (many more than handler threads) kept-alive
+connections idle and measures how long a new client waits for a call:
+
+    nosetests -s tests/integration/scalarizr_tests/test_api_throughput.py
+'''
+
+import os
+import time
+import shutil
+import httplib
+import tempfile
+import threading
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from nose.tools import eq_, ok_
+
+from scalarizr import rpc
+from scalarizr.api.binding import jsonrpc_http
+from scalarizr.util import cryptotool
+
+
+CLIENTS = 50
+DURATION = 5
+BATCH_SIZE = 5
+IDLE_CLIENTS = 42
+
+
+class SystemService(object):
+
+    @rpc.query_method
+    def uptime(self):
+        return [123.45, 67.89]
+
+
+class QuietRequestHandler(jsonrpc_http.WSGIRequestHandler):
+
+    def log_request(self, *args):
+        pass
+
+
+class Client(jsonrpc_http.Security):
+
+    def __init__(self, port, crypto_key_path):
+        jsonrpc_http.Security.__init__(self, crypto_key_path)
+        self.conn = httplib.HTTPConnection('127.0.0.1', port)
+        self.key = self._read_crypto_key()
+
+    def call(self, req):
+        data = self.encrypt_data(json.dumps(req))
+        sig, date = self.sign(data, self.key)
+        self.conn.request('POST', '/system', data, {'X-Signature': sig, 'Date': date})
+        resp = self.conn.getresponse()
+        eq_(resp.status, 200)
+        return json.loads(self.decrypt_data(resp.read()))
+
+
+class TestApiThroughput(object):
+
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.crypto_key_path = os.path.join(self.tmp_dir, 'crypto_key')
+        with open(self.crypto_key_path, 'w') as fp:
+            fp.write(cryptotool.keygen())
+        app = jsonrpc_http.WsgiApplication(
+                rpc.RequestHandler({'system': SystemService()}),
+                self.crypto_key_path)
+        self.server = jsonrpc_http.make_server('127.0.0.1', 0, app)
+        self.server.RequestHandlerClass = QuietRequestHandler
+        self.server_thread = threading.Thread(target=self.server.serve_forever)
+        self.server_thread.setDaemon(True)
+        self.server_thread.start()
+
+    def teardown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _bench(self, batch_size):
+        port = self.server.server_address[1]
+        calls = []
+        deadline = time.time() + DURATION
+
+        def client():
+            c = Client(port, self.crypto_key_path)
+            n = 0
+            while time.time() < deadline:
+                if batch_size:
+                    req = [{'method': 'uptime', 'params': {}, 'id': i} for i in range(batch_size)]
+                    eq_(len(c.call(req)), batch_size)
+                    n += batch_size
+                else:
+                    c.call({'method': 'uptime', 'params': {}, 'id': 1})
+                    n += 1
+            calls.append(n)
+
+        threads = [threading.Thread(target=client) for _ in range(CLIENTS)]
+        map(threading.Thread.start, threads)
+        map(threading.Thread.join, threads)
+        rate = sum(calls) / float(DURATION)
+        print '%d clients, batch %2d: %8.1f calls/sec' % (CLIENTS, batch_size or 1, rate)
+        return rate
+
+    def test_throughput(self):
+        self._bench(None)
+        self._bench(BATCH_SIZE)
+
+    def test_idle_keep_alive_starvation(self):
+        port = self.server.server_address[1]
+        idle = []
+        for _ in range(IDLE_CLIENTS):
+            c = Client(port, self.crypto_key_path)
+            c.call({'method': 'uptime', 'params': {}, 'id': 1})
+            idle.append(c)
+
+        latencies = []
+        for _ in range(10):
+            start = time.time()
+            Client(port, self.crypto_key_path).call({'method': 'uptime', 'params': {}, 'id': 1})
+            latencies.append(time.time() - start)
+        print '%d idle clients, %d handlers: new client call %.1f ms (max %.1f ms)' % (
+                IDLE_CLIENTS, self.server.pool_size,
+                sum(latencies) / len(latencies) * 1000, max(latencies) * 1000)
+        ok_(max(latencies) < jsonrpc_http.KEEPALIVE_TIMEOUT / 2.0)
+
+        for c in idle:
+            c.call({'method': 'uptime', 'params': {}, 'id': 1})
+            c.conn.close()
@@ -14,7 +14,7 @@ import subprocess
 import multiprocessing
 
 from scalarizr.storage2 import largetransfer
-from scalarizr.storage2.cloudfs import cloudfs_types, local
+from scalarizr.storage2.cloudfs import cloudfs_types, local, NamedStream
 from scalarizr.util import cryptotool
 
 from scalarizr.storage2.largetransfer import LOG
@@ -608,6 +608,23 @@ class TestUpload(object):
         assert progress_cb.call_count > 2
 
 
+    def test_streams_concurrency(self):
+        streams = []
+        for name in ('db1', 'db2', 'db3'):
+            file_path, size, md5_sum = make_file(name=name, size=5)
+            streams.append(NamedStream(open(file_path, 'rb'), name))
+        dst = 'file://' + os.path.join(tmp_dir, 'dst')
+        upload = largetransfer.Upload(
+            iter(streams), dst, gzip=False, chunk_size=2, streams_concurrency=2)
+        upload.apply_async()
+        upload.join()
+
+        files = sorted(upload.manifest['files'], key=lambda f: f['name'])
+        assert [f['name'] for f in files] == ['db1', 'db2', 'db3'], files
+        for f in files:
+            assert [c[2] for c in f['chunks']] == [2097152, 2097152, 1048576], f['chunks']
+
+
 class TestDownload(object):
 
     _origin_get = cloudfs_types['file'].get
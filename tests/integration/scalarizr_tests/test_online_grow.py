@@ -0,0 +1,160 @@
+'''
+Online growth of mounted loop, LVM-over-loop and RAID-over-loop volumes.
+Needs root and e2fsprogs, lvm2 and mdadm for LVM and RAID tests:
+
+    nosetests -s tests/integration/scalarizr_tests/test_online_grow.py
+'''
+
+import os
+import uuid
+import shutil
+import tempfile
+
+import nose
+from nose.tools import eq_, ok_
+
+from scalarizr import linux
+from scalarizr import storage2
+from scalarizr.linux import coreutils
+
+
+class TestLoopOnlineGrow(object):
+
+    def setup(self):
+        if os.getuid() != 0 or not linux.which('losetup') or not linux.which('resize2fs'):
+            raise nose.SkipTest('root, losetup and resize2fs required')
+        self.tmp_dir = tempfile.mkdtemp()
+        self.vol = storage2.volume(
+                type='loop',
+                file=os.path.join(self.tmp_dir, 'loopdev'),
+                size=0.05,
+                fstype='ext4',
+                mpoint=os.path.join(self.tmp_dir, 'mnt'))
+        self.vol.ensure(mount=True, mkfs=True, fstab=False)
+
+    def teardown(self):
+        if hasattr(self, 'vol'):
+            self.vol.destroy(force=True)
+            shutil.rmtree(self.tmp_dir)
+
+    def test_grow_mounted(self):
+        data_file = os.path.join(self.vol.mpoint, 'data')
+        with open(data_file, 'w') as fp:
+            fp.write('x' * 1024)
+        size_before = coreutils.statvfs(self.vol.mpoint)['size']
+        device = self.vol.device
+
+        with open(data_file) as fp:
+            # open file on a mounted filesystem keeps it busy
+            grown = self.vol.grow(size=0.1)
+            eq_(fp.read(), 'x' * 1024)
+
+        ok_(grown is self.vol)
+        eq_(self.vol.device, device)
+        eq_(self.vol.mounted_to(), self.vol.mpoint)
+        ok_(coreutils.statvfs(self.vol.mpoint)['size'] > size_before * 1.8)
+
+
+class _OverLoopGrow(object):
+
+    tools = ('losetup', 'resize2fs')
+
+    def setup(self):
+        if os.getuid() != 0 or not all(linux.which(tool) for tool in self.tools):
+            raise nose.SkipTest('root and %s required' % ', '.join(self.tools))
+        self.tmp_dir = tempfile.mkdtemp()
+        self.vg = 'szrtest%s' % uuid.uuid4().hex[:8]
+        self.vol = storage2.volume(**self.config())
+        self.vol.ensure(mount=True, mkfs=True, fstab=False)
+        self.data_file = os.path.join(self.vol.mpoint, 'data')
+        with open(self.data_file, 'w') as fp:
+            fp.write('x' * 1024)
+        self.size_before = coreutils.statvfs(self.vol.mpoint)['size']
+
+    def teardown(self):
+        if hasattr(self, 'vol'):
+            self.vol.destroy(force=True, remove_disks=True)
+            shutil.rmtree(self.tmp_dir)
+
+    def config(self):
+        raise NotImplementedError()
+
+    def loop(self, name, size=0.05):
+        return dict(type='loop', file=os.path.join(self.tmp_dir, name), size=size)
+
+    def assert_grown_in_place(self, grown, device, factor):
+        ok_(grown is self.vol)
+        eq_(self.vol.device, device)
+        eq_(self.vol.mounted_to(), self.vol.mpoint)
+        with open(self.data_file) as fp:
+            eq_(fp.read(), 'x' * 1024)
+        ok_(coreutils.statvfs(self.vol.mpoint)['size'] > self.size_before * factor)
+
+
+class TestLvmOverLoopOnlineGrow(_OverLoopGrow):
+
+    tools = _OverLoopGrow.tools + ('lvcreate', 'vgextend')
+
+    def config(self):
+        return dict(type='lvm', pvs=[self.loop('pv0')], vg=self.vg, name='data',
+                    size='100%FREE', fstype='ext4',
+                    mpoint=os.path.join(self.tmp_dir, 'mnt'))
+
+    def test_grow_pvs(self):
+        device = self.vol.device
+        with open(self.data_file):
+            grown = self.vol.grow(pvs=[self.loop('pv1')])
+
+        self.assert_grown_in_place(grown, device, 1.8)
+        eq_(len(self.vol.pvs), 2)
+        from scalarizr.linux import lvm2
+        vg_info = lvm2.vgs(self.vg).values()[0]
+        eq_(int(vg_info.pv_count), 2)
+
+
+class TestThinLvmOverLoopOnlineGrow(TestLvmOverLoopOnlineGrow):
+
+    def config(self):
+        config = super(TestThinLvmOverLoopOnlineGrow, self).config()
+        config.update(thin_pool='pool', size='80%VG')
+        return config
+
+    def test_grow_pvs(self):
+        device = self.vol.device
+        with open(self.data_file):
+            grown = self.vol.grow(pvs=[self.loop('pv1')], size='+40M')
+
+        self.assert_grown_in_place(grown, device, 1.5)
+        from scalarizr.linux import lvm2
+        pool = lvm2.lvs(lvm2.lvpath(self.vg, 'pool')).values()[0]
+        data = lvm2.lvs(device).values()[0]
+        # thin volume follows the pool size
+        eq_(data.lv_size, pool.lv_size)
+
+
+class TestRaidOverLoopOnlineGrow(_OverLoopGrow):
+
+    tools = _OverLoopGrow.tools + ('mdadm', 'lvcreate')
+
+    def config(self):
+        return dict(type='raid', level=1, vg=self.vg,
+                    disks=[self.loop('disk0'), self.loop('disk1')],
+                    fstype='ext4', mpoint=os.path.join(self.tmp_dir, 'mnt'))
+
+    def test_grow_disks(self):
+        device = self.vol.device
+        with open(self.data_file):
+            grown = self.vol.grow(disks={'size': 0.1})
+
+        self.assert_grown_in_place(grown, device, 1.8)
+        eq_([float(disk.size) for disk in self.vol.disks], [0.1, 0.1])
+
+    def test_add_disks(self):
+        device = self.vol.device
+        with open(self.data_file):
+            grown = self.vol.grow(disks_count=3)
+
+        self.assert_grown_in_place(grown, device, 0.9)
+        eq_(len(self.vol.disks), 3)
+        from scalarizr.linux import mdadm
+        eq_(mdadm.detail(self.vol.raid_pv)['raid_devices'], 3)
@@ -0,0 +1,80 @@
+'''
+Benchmark for ParallelRsync against a single rsync of a synthetic tree.
+
+Builds RSYNC_BENCH_DIRS top level dirs, each with RSYNC_BENCH_SUBDIRS
+subdirs of RSYNC_BENCH_FILES files of RSYNC_BENCH_FILE_SIZE Kb (defaults
+8 x 4 x 64 x 256Kb = 512 Mb), copies it with 1, 2, 4 and 8 workers
+and checks copies are identical:
+
+    nosetests -s tests/integration/scalarizr_tests/test_rsync_throughput.py
+'''
+
+import os
+import time
+import shutil
+import filecmp
+import tempfile
+
+import nose
+from nose.tools import ok_
+
+from scalarizr import linux
+from scalarizr.linux import rsync
+
+
+env = os.environ.get
+
+KB = 1024
+
+
+class TestRsyncThroughput(object):
+
+    def setup(self):
+        self.executable = linux.which('rsync')
+        if not self.executable:
+            raise nose.SkipTest('rsync not found')
+        self.tmp_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.tmp_dir, 'src')
+        self.size = 0
+        chunk = os.urandom(int(env('RSYNC_BENCH_FILE_SIZE', 256)) * KB)
+        for i in range(int(env('RSYNC_BENCH_DIRS', 8))):
+            for j in range(int(env('RSYNC_BENCH_SUBDIRS', 4))):
+                path = os.path.join(self.src, 'dir%d' % i, 'sub%d' % j)
+                os.makedirs(path)
+                for k in range(int(env('RSYNC_BENCH_FILES', 64))):
+                    with open(os.path.join(path, 'file%d' % k), 'w') as fp:
+                        fp.write(chunk)
+                    self.size += len(chunk)
+        os.makedirs(os.path.join(self.src, 'excluded'))
+        with open(os.path.join(self.src, 'top'), 'w') as fp:
+            fp.write('top level file')
+
+    def teardown(self):
+        if hasattr(self, 'tmp_dir'):
+            shutil.rmtree(self.tmp_dir)
+
+    def _bench(self, workers):
+        dst = os.path.join(self.tmp_dir, 'dst%d' % workers)
+        os.mkdir(dst)
+        engine = rsync.ParallelRsync(self.src, dst,
+                workers=workers,
+                excludes=['/excluded'],
+                executable=self.executable,
+                archive=True, sparse=True)
+        engine.split_size = self.size / (workers * 4) or 1
+        start = time.time()
+        engine.run()
+        elapsed = time.time() - start
+
+        ok_(not os.path.exists(os.path.join(dst, 'excluded')))
+        ok_(os.path.exists(os.path.join(dst, 'top')))
+        cmp = filecmp.dircmp(self.src, dst, ignore=['excluded'])
+        ok_(not cmp.left_only and not cmp.diff_files)
+        print '%d workers: %6.2f sec %8.1f MB/s' % (
+                workers, elapsed, self.size / elapsed / KB / KB)
+        shutil.rmtree(dst)
+        return elapsed
+
+    def test_throughput(self):
+        for workers in (1, 2, 4, 8):
+            self._bench(workers)
@@ -0,0 +1,93 @@
+'''
+Throughput benchmark for S3FileSystem single stream vs multipart transfers.
+
+Runs against any S3-compatible endpoint (minio, fake-s3, ceph rgw), e.g.:
+
+    S3_BENCH_HOST=127.0.0.1 S3_BENCH_PORT=9000 \
+    S3_BENCH_ACCESS_KEY=... S3_BENCH_SECRET_KEY=... \
+    nosetests -s tests/integration/scalarizr_tests/test_s3_throughput.py
+
+Optional: S3_BENCH_BUCKET (default scalarizr-bench), S3_BENCH_SIZE in MB (default 256)
+'''
+
+import os
+import time
+import shutil
+import logging
+import tempfile
+import subprocess
+
+import mock
+import nose
+from nose.tools import eq_
+
+from scalarizr.storage2.cloudfs import s3
+from scalarizr.util import cryptotool
+
+
+LOG = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+env = os.environ.get
+
+
+def connect():
+    import boto
+    from boto.s3.connection import OrdinaryCallingFormat
+    return boto.connect_s3(
+        aws_access_key_id=env('S3_BENCH_ACCESS_KEY'),
+        aws_secret_access_key=env('S3_BENCH_SECRET_KEY'),
+        host=env('S3_BENCH_HOST'),
+        port=int(env('S3_BENCH_PORT', 80)),
+        is_secure=False,
+        calling_format=OrdinaryCallingFormat())
+
+
+class TestS3Throughput(object):
+
+    def setup(self):
+        if not env('S3_BENCH_HOST'):
+            raise nose.SkipTest('S3_BENCH_HOST is not set')
+        self.tmp_dir = tempfile.mkdtemp()
+        self.size = int(env('S3_BENCH_SIZE', 256))
+        self.src = os.path.join(self.tmp_dir, 'bench.bin')
+        subprocess.check_call(['dd', 'if=/dev/urandom', 'of=%s' % self.src,
+                               'bs=1M', 'count=%d' % self.size],
+                              stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+        self.md5 = cryptotool.calculate_md5_sum(self.src)
+        self.url = 's3://%s/bench/' % env('S3_BENCH_BUCKET', 'scalarizr-bench')
+        self.patcher = mock.patch.multiple(s3.S3FileSystem,
+                _get_connection=mock.Mock(side_effect=connect),
+                _bucket_location=mock.Mock(return_value=''))
+        self.patcher.start()
+
+    def teardown(self):
+        if hasattr(self, 'patcher'):
+            self.patcher.stop()
+            shutil.rmtree(self.tmp_dir)
+
+    def _bench(self, name, **driver_kwds):
+        driver = s3.S3FileSystem(acl='private', **driver_kwds)
+        dst_dir = os.path.join(self.tmp_dir, name)
+        os.mkdir(dst_dir)
+
+        start = time.time()
+        remote = driver.put(self.src, self.url)
+        put_time = time.time() - start
+
+        start = time.time()
+        local = driver.get(remote, dst_dir)
+        get_time = time.time() - start
+
+        eq_(cryptotool.calculate_md5_sum(local), self.md5)
+        driver.delete(remote)
+        print '%-12s put %7.1f MB/s   get %7.1f MB/s' % (
+                name, self.size / put_time, self.size / get_time)
+        return put_time, get_time
+
+    def test_throughput(self):
+        self._bench('single', multipart_threshold=self.size * MB)
+        for concurrency in (2, 4, 8):
+            self._bench('parts x%d' % concurrency,
+                        part_size=16 * MB, concurrency=concurrency)
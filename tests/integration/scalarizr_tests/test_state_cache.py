@@ -0,0 +1,70 @@
+'''
+Benchmark for cached config.State lookups against the SQLite server thread
+that serves them in the agent:
+
+    nosetests -s tests/integration/scalarizr_tests/test_state_cache.py
+'''
+
+import os
+import time
+import shutil
+import sqlite3
+import tempfile
+
+import mock
+from nose.tools import eq_, ok_
+
+from scalarizr import config
+from scalarizr.util import sqlite_server
+
+
+LOOKUPS = int(os.environ.get('STATE_BENCH_LOOKUPS', 2000))
+
+
+class TestStateCache(object):
+
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        db_file = os.path.join(self.tmp_dir, 'db.sqlite')
+
+        def connect():
+            conn = sqlite3.connect(db_file, 5.0)
+            conn.row_factory = sqlite3.Row
+            return conn
+
+        conn = connect()
+        conn.execute('CREATE TABLE state ('
+                '"name" TEXT PRIMARY KEY ON CONFLICT REPLACE, "value" TEXT)')
+        conn.close()
+        t = sqlite_server.SQLiteServerThread(connect)
+        t.setDaemon(True)
+        t.start()
+        sqlite_server.wait_for_server_thread(t)
+        self.bus = mock.patch.object(config, 'bus')
+        self.bus.start().db = t.connection
+
+    def teardown(self):
+        self.bus.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def _bench(self, state):
+        start = time.time()
+        for _ in xrange(LOOKUPS):
+            eq_(state['global.version'], '3.0.1')
+        return time.time() - start
+
+    def test_lookups(self):
+        state = config.State()
+        state['global.version'] = '3.0.1'
+
+        cached = self._bench(state)
+        state.check_interval = 0
+        stat_only = self._bench(state)
+        with mock.patch.object(state, '_cache', mock.MagicMock(
+                __getitem__=mock.Mock(side_effect=KeyError))):
+            uncached = self._bench(state)
+
+        for name, elapsed in (('cached', cached), ('cached, stat every lookup', stat_only),
+                              ('sqlite round-trip', uncached)):
+            print '%-26s %8.1f us/lookup' % (name, elapsed / LOOKUPS * 1e6)
+        ok_(cached < uncached)
@@ -9,7 +9,9 @@ import sys
 install_opener()
 
 import binascii
+import httplib
 import os
+import time
 import tempfile
 import shutil
 
@@ -98,3 +100,86 @@ class TestWsgiApplication(object):
             assert 0, 'Exception expected, but statement passed'
         except:
             assert '500' in str(sys.exc_info()[1])
+
+
+class TestThreadPoolWSGIServer(object):
+
+    def setup(self):
+        import threading
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+        def app(environ, start_response):
+            with self.lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            time.sleep(0.05)
+            with self.lock:
+                self.running -= 1
+            body = 'pong'
+            start_response('200 OK', [('Content-length', str(len(body)))])
+            return [body]
+
+        self.server = jsonrpc_http.make_server('127.0.0.1', 0, app)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def teardown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive(self):
+        conn = httplib.HTTPConnection('127.0.0.1', self.port)
+        conn.request('POST', '/', 'ping')
+        assert_equals(conn.getresponse().read(), 'pong')
+        sock = conn.sock
+        conn.request('POST', '/', 'ping')
+        assert_equals(conn.getresponse().read(), 'pong')
+        assert conn.sock is sock, 'Connection was not reused'
+        conn.close()
+
+    def test_bounded_pool(self):
+        import threading
+
+        def client():
+            conn = httplib.HTTPConnection('127.0.0.1', self.port)
+            conn.request('POST', '/', 'ping', {'Connection': 'close'})
+            conn.getresponse().read()
+            conn.close()
+
+        clients = [threading.Thread(target=client) for _ in range(30)]
+        map(threading.Thread.start, clients)
+        map(threading.Thread.join, clients)
+        assert 0 < self.max_running <= self.server.pool_size, self.max_running
+
+    def test_idle_keep_alive_does_not_hold_workers(self):
+        idle = []
+        for _ in range(self.server.pool_size * 2):
+            conn = httplib.HTTPConnection('127.0.0.1', self.port)
+            conn.request('POST', '/', 'ping')
+            assert_equals(conn.getresponse().read(), 'pong')
+            idle.append(conn)
+
+        start = time.time()
+        conn = httplib.HTTPConnection('127.0.0.1', self.port)
+        conn.request('POST', '/', 'ping', {'Connection': 'close'})
+        assert_equals(conn.getresponse().read(), 'pong')
+        assert time.time() - start < 1, 'Request waited for idle connections'
+
+        # parked connections are still served
+        for conn in idle:
+            conn.request('POST', '/', 'ping')
+            assert_equals(conn.getresponse().read(), 'pong')
+            conn.close()
+
+    def test_idle_connection_closed(self):
+        self.server._keepalive.timeout = 0.2
+        conn = httplib.HTTPConnection('127.0.0.1', self.port)
+        conn.request('POST', '/', 'ping')
+        conn.getresponse().read()
+        time.sleep(1.5)
+        assert_equals(conn.sock.recv(1), '')
+        conn.close()
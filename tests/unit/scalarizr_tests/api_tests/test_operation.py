@@ -2,6 +2,7 @@
 from scalarizr.api import operation
 
 import mock
+import logging
 import time
 import threading
 from nose.tools import eq_, ok_, raises
@@ -126,3 +127,61 @@ class TestOperation(object):
 		time.sleep(.01) # Interrupt thread
 
 
+
+	def test_logs_not_shared(self):
+		def fn(op):
+			op.logger.info('line from %s', op.operation_id)
+
+		api = operation.OperationAPI()
+		op1 = api.create('test_logs_not_shared', fn)
+		op1.run()
+		op2 = api.create('test_logs_not_shared', fn)
+		op2.run()
+		eq_(list(op1.logs), ['line from %s' % op1.operation_id])
+		eq_(list(op2.logs), ['line from %s' % op2.operation_id])
+
+	def test_logs_not_shared_concurrent(self):
+		started = threading.Event()
+		logged = threading.Event()
+		def fn1(op):
+			started.set()
+			logged.wait()
+			op.logger.info('line from %s', op.operation_id)
+		def fn2(op):
+			op.logger.info('line from %s', op.operation_id)
+			logged.set()
+
+		api = operation.OperationAPI()
+		op1 = api.create('test_logs_not_shared_concurrent', fn1)
+		op1.run_async()
+		started.wait()
+		op2 = api.create('test_logs_not_shared_concurrent', fn2)
+		op2.run()
+		op1.thread.join()
+		eq_(list(op1.logs), ['line from %s' % op1.operation_id])
+		eq_(list(op2.logs), ['line from %s' % op2.operation_id])
+		ok_(op1.logger.name not in logging.Logger.manager.loggerDict)
+
+	@mock.patch.object(operation.Operation, 'log_limit', 3)
+	def test_logs_since(self):
+		def fn(op):
+			for i in range(5):
+				op.logger.info('line %d', i)
+
+		api = operation.OperationAPI()
+		op = api.create('test_logs_since', fn)
+		op.run()
+		result = api.result(op.operation_id)
+		eq_(result['logs'], ['line 2', 'line 3', 'line 4'])
+		eq_(result['logs_cursor'], 5)
+		eq_(api.result(op.operation_id, since=4)['logs'], ['line 4'])
+		eq_(api.result(op.operation_id, since=1)['logs'], ['line 2', 'line 3', 'line 4'])
+		eq_(api.result(op.operation_id, since=5)['logs'], [])
+
+	def test_rotate(self):
+		api = operation.OperationAPI()
+		op = api.create('test_rotate', mock.Mock())
+		op.run()
+		op.finished_at -= api.finished_ttl + 1
+		api.rotate()
+		ok_(op.operation_id not in [o['id'] for o in api.list()])
@@ -0,0 +1,132 @@
+import os
+import time
+import shutil
+import signal
+import tempfile
+import multiprocessing
+
+import mock
+from nose.tools import eq_, ok_, raises
+
+from scalarizr.api import postgresql
+from scalarizr.handlers import HandlerError
+
+
+def _killed(pid):
+    stat = '/proc/%d/stat' % pid
+    if not os.path.exists(stat):
+        return True
+    with open(stat) as fp:
+        # killed orphan is a zombie until init reaps it
+        return fp.read().split()[2] in ('Z', 'X')
+
+
+class TestPgDumpStream(object):
+
+    def test_read(self):
+        dump = postgresql._PgDumpStream('db', ['/bin/sh', '-c', 'echo dump'])
+        eq_(dump.read(), 'dump\n')
+        eq_(dump.read(), '')
+        ok_(dump._stderr.closed)
+
+    @raises(HandlerError)
+    def test_failed_dump(self):
+        dump = postgresql._PgDumpStream('db', ['/bin/sh', '-c', 'echo error >&2; exit 1'])
+        try:
+            dump.read()
+        finally:
+            ok_(dump._stderr.closed)
+
+    def test_close_kills_process_group(self):
+        dump = postgresql._PgDumpStream('db',
+                ['/bin/sh', '-c', 'sleep 60 & echo $!; wait'])
+        child_pid = int(dump._popen.stdout.readline())
+        dump.close()
+        eq_(dump._popen.returncode, -signal.SIGKILL)
+        ok_(dump._stderr.closed)
+        stat = '/proc/%d/stat' % child_pid
+        if os.path.exists(stat):
+            with open(stat) as fp:
+                # killed child is a zombie until reparented and reaped
+                ok_(fp.read().split()[2] in ('Z', 'X'))
+        dump.close()
+
+
+class _Upload(object):
+    """
+    Reads sources in a child process like largetransfer.Upload
+    and fails once every dump is started
+    """
+
+    def __init__(self, src, dst, **kwds):
+        self.src = src
+        self.pidfile = None
+
+    def apply_async(self):
+        self.process = multiprocessing.Process(target=self._run)
+        self.process.start()
+
+    def _run(self):
+        for _ in self.src:
+            pass
+        time.sleep(60)
+
+    def join(self):
+        for _ in range(100):
+            if len(self._pids()) == 2:
+                break
+            time.sleep(0.1)
+        raise Exception('Upload failed')
+
+    def terminate(self):
+        os.kill(self.process.pid, signal.SIGKILL)
+        self.process.join()
+
+    def _pids(self):
+        with open(self.pidfile) as fp:
+            return map(int, fp.read().split())
+
+
+class TestDoBackup(object):
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.pidfile = os.path.join(self.tmpdir, 'pids')
+        open(self.pidfile, 'w').close()
+        # stands for su: records its pid, which is the dump process group
+        self.su = os.path.join(self.tmpdir, 'su')
+        with open(self.su, 'w') as fp:
+            fp.write('#!/bin/sh\necho $$ >> %s\nexec /bin/sh -c "$4"\n' % self.pidfile)
+        os.chmod(self.su, 0755)
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    @mock.patch.object(postgresql, 'PSQL')
+    @mock.patch.object(postgresql, '__node__')
+    @mock.patch.object(postgresql, 'largetransfer')
+    def test_terminate_kills_dumps(self, largetransfer, node, psql):
+        psql.return_value.list_pg_databases.return_value = ['db1', 'db2']
+        uploads = []
+        def upload(*args, **kwds):
+            uploads.append(_Upload(*args, **kwds))
+            uploads[-1].pidfile = self.pidfile
+            return uploads[-1]
+        largetransfer.Upload.side_effect = upload
+        api = postgresql.PostgreSQLAPI.__new__(postgresql.PostgreSQLAPI)
+        api.postgresql = mock.Mock()
+        api.postgresql.root_user.name = 'postgres'
+
+        with mock.patch.multiple(postgresql, SU_EXEC=self.su, PG_DUMP='sleep 60 #',
+                __postgresql__={postgresql.OPT_REPLICATION_MASTER: '1'}):
+            try:
+                api.do_backup()
+                ok_(False, 'do_backup should fail')
+            except Exception, e:
+                eq_(str(e), 'Upload failed')
+
+        pids = uploads[0]._pids()
+        eq_(len(pids), 2)
+        time.sleep(0.2)
+        for pid in pids:
+            ok_(_killed(pid), 'dump process group %d is alive' % pid)
@@ -5,6 +5,9 @@ Created on 07.02.2012
 '''
 
 import os, stat
+import shutil
+import binascii
+import time
 import unittest
 import mock
 import glob
@@ -159,6 +162,9 @@ class TestSysInfoAPI(unittest.TestCase):
         self.info._CPUINFO = CPUINFO
         self.info._NETSTATS = NETSTATS
 
+    def setUp(self):
+        self.info._scaling_metrics = system._ScalingMetricsCollector()
+
 
     def test_fqdn(self):
         (out, err, rc) = system2(('hostname'))
@@ -255,7 +261,7 @@ class TestSysInfoAPI(unittest.TestCase):
     def test_scaling_metrics_read(self, bus_mock):
         bus_mock.queryenv_service = mock.Mock()
 
-        m = mock.Mock()
+        m = mock.Mock(timeout=None, interval=None)
         m.id = '777'
         m.name = 'test_name'
         with open('/tmp/test_custom_scaling_metric_read', 'w+') as fp:
@@ -263,7 +269,7 @@ class TestSysInfoAPI(unittest.TestCase):
         m.path = '/tmp/test_custom_scaling_metric_read'
         m.retrieve_method = 'read'
         system.bus.queryenv_service.get_scaling_metrics.return_value = [m]
-        assert self.info.scaling_metrics() == [{'error': '', 'id': '777', 'value': 555.0, 'name': 'test_name'}]
+        assert self.info.scaling_metrics() == [{'error': '', 'id': '777', 'value': 555.0, 'name': 'test_name', 'age': 0}]
         os.remove('/tmp/test_custom_scaling_metric_read')
 
 
@@ -271,20 +277,20 @@ class TestSysInfoAPI(unittest.TestCase):
     def test_scaling_metrics_read_error(self, bus_mock):
         bus_mock.queryenv_service = mock.Mock()
 
-        m = mock.Mock()
+        m = mock.Mock(timeout=None, interval=None)
         m.id = '777'
         m.name = 'test_name'
         m.path = '/tmp/this_file_dosnt_exist'
         m.retrieve_method = 'read'
         system.bus.queryenv_service.get_scaling_metrics.return_value = [m]
-        assert self.info.scaling_metrics() == [{'error': "File is not readable: '/tmp/this_file_dosnt_exist'", 'id': '777', 'value': 0.0, 'name': 'test_name'}]
+        assert self.info.scaling_metrics() == [{'error': "File is not readable: '/tmp/this_file_dosnt_exist'", 'id': '777', 'value': 0.0, 'name': 'test_name', 'age': 0}]
 
 
     @mock.patch('scalarizr.api.system.bus')
     def test_scaling_metrics_execute(self, bus_mock):
         bus_mock.queryenv_service = mock.Mock()
 
-        m = mock.Mock()
+        m = mock.Mock(timeout=None, interval=None)
         m.id = '777'
         m.name = 'test_name'
         with open('/tmp/test_custom_scaling_metric_execute.sh', 'w+') as fp:
@@ -293,7 +299,7 @@ class TestSysInfoAPI(unittest.TestCase):
         m.path = '/tmp/test_custom_scaling_metric_execute.sh'
         m.retrieve_method = 'execute'
         system.bus.queryenv_service.get_scaling_metrics.return_value = [m]
-        assert self.info.scaling_metrics() == [{'error': '', 'id': '777', 'value': 555.0, 'name': 'test_name'}]
+        assert self.info.scaling_metrics() == [{'error': '', 'id': '777', 'value': 555.0, 'name': 'test_name', 'age': 0}]
         os.remove('/tmp/test_custom_scaling_metric_execute.sh')
 
 
@@ -301,7 +307,7 @@ class TestSysInfoAPI(unittest.TestCase):
     def test_scaling_metrics_execute_error(self, bus_mock):
         bus_mock.queryenv_service = mock.Mock()
 
-        m = mock.Mock()
+        m = mock.Mock(timeout=None, interval=None)
         m.id = '777'
         m.name = 'test_name'
         with open('/tmp/test_custom_scaling_metric_execute.sh', 'w+') as fp:
@@ -310,7 +316,7 @@ class TestSysInfoAPI(unittest.TestCase):
         m.path = '/tmp/test_custom_scaling_metric_execute.sh'
         m.retrieve_method = 'execute'
         system.bus.queryenv_service.get_scaling_metrics.return_value = [m]
-        assert self.info.scaling_metrics() == [{'error': 'exitcode: 1', 'id': '777', 'value': 0.0, 'name': 'test_name'}]
+        assert self.info.scaling_metrics() == [{'error': 'exitcode: 1', 'id': '777', 'value': 0.0, 'name': 'test_name', 'age': 0}]
         os.remove('/tmp/test_custom_scaling_metric_execute.sh')
 
 
@@ -318,7 +324,7 @@ class TestSysInfoAPI(unittest.TestCase):
     def test_scaling_metrics_execute_timeout(self, bus_mock):
         bus_mock.queryenv_service = mock.Mock()
 
-        m = mock.Mock()
+        m = mock.Mock(timeout=None, interval=None)
         m.id = '777'
         m.name = 'test_name'
         with open('/tmp/test_custom_scaling_metric_execute.sh', 'w+') as fp:
@@ -327,7 +333,7 @@ class TestSysInfoAPI(unittest.TestCase):
         m.path = '/tmp/test_custom_scaling_metric_execute.sh'
         m.retrieve_method = 'execute'
         system.bus.queryenv_service.get_scaling_metrics.return_value = [m]
-        assert self.info.scaling_metrics() == [{'error': 'Timeouted', 'id': '777', 'value': 0.0, 'name': 'test_name'}]
+        assert self.info.scaling_metrics() == [{'error': 'Timeouted', 'id': '777', 'value': 0.0, 'name': 'test_name', 'age': 0}]
 
         ps = subps.Popen(['ps -ef'], shell=True, stdout=subps.PIPE)
         output = ps.stdout.read()
@@ -342,7 +348,7 @@ class TestSysInfoAPI(unittest.TestCase):
     def test_scaling_metrics_multi(self, bus_mock):
         bus_mock.queryenv_service = mock.Mock()
 
-        m = mock.Mock()
+        m = mock.Mock(timeout=None, interval=None)
         m.id = '777'
         m.name = 'test_name'
         with open('/tmp/test_custom_scaling_metric_read', 'w+') as fp:
@@ -350,10 +356,82 @@ class TestSysInfoAPI(unittest.TestCase):
         m.path = '/tmp/test_custom_scaling_metric_read'
         m.retrieve_method = 'read'
         system.bus.queryenv_service.get_scaling_metrics.return_value = [m for _ in range(27)]
-        assert self.info.scaling_metrics() == [{'error': '', 'id': '777', 'value': 555.0, 'name': 'test_name'} for _ in range(27)]
+        assert self.info.scaling_metrics() == [{'error': '', 'id': '777', 'value': 555.0, 'name': 'test_name', 'age': 0} for _ in range(27)]
         os.remove('/tmp/test_custom_scaling_metric_read')
 
 
+    @mock.patch('scalarizr.api.system.bus')
+    def test_scaling_metrics_cached(self, bus_mock):
+        bus_mock.queryenv_service = mock.Mock()
+
+        m = mock.Mock(timeout=None, interval=None)
+        m.id = '777'
+        m.name = 'test_name'
+        with open('/tmp/test_custom_scaling_metric_read', 'w+') as fp:
+            fp.writelines('555')
+        m.path = '/tmp/test_custom_scaling_metric_read'
+        m.retrieve_method = 'read'
+        system.bus.queryenv_service.get_scaling_metrics.return_value = [m]
+        assert self.info.scaling_metrics()[0]['value'] == 555.0
+        with open('/tmp/test_custom_scaling_metric_read', 'w+') as fp:
+            fp.writelines('666')
+        # served from cache until metric interval passes
+        assert self.info.scaling_metrics()[0]['value'] == 555.0
+        assert system.bus.queryenv_service.get_scaling_metrics.call_count == 1
+        os.remove('/tmp/test_custom_scaling_metric_read')
+
+
+    @mock.patch('scalarizr.api.system.bus')
+    def test_scaling_metrics_replaced_concurrently(self, bus_mock):
+        collector = self.info._scaling_metrics
+        m = mock.Mock(id='777')
+        bus_mock.queryenv_service.get_scaling_metrics.return_value = [m]
+
+        def collect(metrics):
+            # another call refreshed metric definitions while collecting
+            collector._set_metrics([], time.time())
+        with mock.patch.object(collector, '_collect', side_effect=collect):
+            with mock.patch.object(collector, '_ensure_running'):
+                self.assertEqual(collector.results(), [])
+
+
+    @mock.patch('scalarizr.api.system.bus')
+    def test_scaling_metrics_custom_timeout(self, bus_mock):
+        bus_mock.queryenv_service = mock.Mock()
+
+        m = mock.Mock(timeout=1, interval=None)
+        m.id = '777'
+        m.name = 'test_name'
+        with open('/tmp/test_custom_scaling_metric_execute.sh', 'w+') as fp:
+            fp.writelines('#!/bin/sh\nsleep 10s\nreturn 1\n')
+            os.chmod('/tmp/test_custom_scaling_metric_execute.sh', stat.S_IEXEC)
+        m.path = '/tmp/test_custom_scaling_metric_execute.sh'
+        m.retrieve_method = 'execute'
+        system.bus.queryenv_service.get_scaling_metrics.return_value = [m]
+        started = time.time()
+        assert self.info.scaling_metrics()[0]['error'] == 'Timeouted'
+        assert time.time() - started < 2
+        os.remove('/tmp/test_custom_scaling_metric_execute.sh')
+
+    def test_get_script_logs_range(self):
+        logs_dir = '/tmp/test_script_logs'
+        os.mkdir(logs_dir)
+        try:
+            with open(os.path.join(logs_dir, 'deploy.HostUp.e1bf3b47-out.log'), 'w') as fp:
+                fp.write('0123456789')
+            with open(os.path.join(logs_dir, 'deploy.HostUp.e1bf3b47-err.log'), 'w') as fp:
+                fp.write('')
+            with mock.patch.object(system.script_executor, 'logs_dir', logs_dir):
+                logs = self.info.get_script_logs('e1bf3b47', maxsize=4, stdout_offset=3)
+            self.assertEqual(binascii.a2b_base64(logs['stdout']), '3456')
+            self.assertEqual(logs['stdout_offset'], 7)
+            self.assertEqual(logs['stdout_size'], 10)
+            self.assertEqual(binascii.a2b_base64(logs['stderr']), '')
+            self.assertEqual(logs['stderr_offset'], 0)
+        finally:
+            shutil.rmtree(logs_dir)
+
+
 def tearDownModule():
     os.remove(DISKSTATS)
     os.remove(CPUINFO)
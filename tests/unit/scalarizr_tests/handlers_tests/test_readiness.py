@@ -0,0 +1,53 @@
+import threading
+
+import mock
+from nose.tools import eq_, ok_
+
+from scalarizr import handlers
+from scalarizr.messaging import MessageConsumer
+
+
+class TestReadinessWaiter(object):
+
+    def setup(self):
+        self.consumer = MessageConsumer()
+        self.bus = mock.patch.object(handlers, 'bus').start()
+        self.bus.messaging_service.get_consumer.return_value = self.consumer
+
+    def teardown(self):
+        mock.patch.stopall()
+
+    def test_backoff(self):
+        waiter = handlers.ReadinessWaiter(delay=0.5, factor=2, max_delay=2)
+        check = mock.Mock(side_effect=[None, None, None, None, 'ready'])
+        with mock.patch.object(waiter._wakeup, 'wait') as wait:
+            eq_(waiter.wait(check), 'ready')
+        eq_([c[0][0] for c in wait.call_args_list], [0.5, 1, 2, 2])
+
+    def test_timeout(self):
+        waiter = handlers.ReadinessWaiter(delay=0.01)
+        ok_(waiter.wait(lambda: False, timeout=0.05) is None)
+
+    def test_wake_on_message(self):
+        waiter = handlers.ReadinessWaiter(wake_on=('HostUp', ), delay=60)
+        ready = []
+        message = mock.Mock()
+        message.name = 'HostUp'
+
+        def check():
+            if not ready:
+                ready.append(True)
+                threading.Timer(0.05, self.consumer.ingoing_listeners[0],
+                                (message, 'control')).start()
+                return False
+            return True
+
+        eq_(waiter.wait(check, timeout=5), True)
+        eq_(self.consumer.ingoing_listeners, [])
+
+    def test_other_message_ignored(self):
+        waiter = handlers.ReadinessWaiter(wake_on=('HostUp', ))
+        message = mock.Mock()
+        message.name = 'HostDown'
+        waiter._on_message(message, 'control')
+        ok_(not waiter._wakeup.is_set())
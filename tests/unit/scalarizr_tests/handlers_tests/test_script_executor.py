@@ -0,0 +1,218 @@
+import os
+import time
+import shutil
+import signal
+import binascii
+import tempfile
+import threading
+import subprocess
+
+import mock
+from nose.tools import eq_, ok_, raises
+
+from scalarizr.handlers import script_executor
+from scalarizr.handlers.script_executor import Script, ScriptSupervisor, LogTailer, read_log_range, \
+        OutputSender
+
+
+def make_script(command, exec_timeout=10):
+    script = Script.__new__(Script)
+    script.name = command
+    script.logger = mock.Mock()
+    script.proc = subprocess.Popen(['/bin/sh', '-c', command])
+    script.pid = script.proc.pid
+    script.start_time = time.time()
+    script.exec_timeout = exec_timeout
+    return script
+
+
+@mock.patch.object(script_executor, '__node__', {'running': True})
+class TestScriptSupervisor(object):
+
+    def setup(self):
+        self.supervisor = ScriptSupervisor()
+        self.supervisor.kill_grace = 0.5
+
+    def test_wait(self):
+        script = make_script('exit 3')
+        eq_(self.supervisor.wait(script), 3)
+        eq_(script.proc.returncode, 3)
+        ok_(script.rusage)
+
+    def test_reaped_without_sigchld_handler(self):
+        script = make_script('sleep 0.1')
+        start = time.time()
+        eq_(self.supervisor.wait(script), 0)
+        ok_(time.time() - start < 0.5)
+        eq_(signal.getsignal(signal.SIGCHLD), signal.SIG_DFL)
+
+    def test_wait_signaled(self):
+        script = make_script('kill -9 $$')
+        eq_(self.supervisor.wait(script), -9)
+
+    def test_timeout(self):
+        script = make_script('exec sleep 30', exec_timeout=0.2)
+        start = time.time()
+        eq_(self.supervisor.wait(script), Script.TIMEOUT_RETURN_CODE)
+        ok_(time.time() - start < 2)
+        eq_(script.proc.returncode, -15)
+
+    def test_timeout_kill(self):
+        script = make_script('trap "" TERM; exec sleep 30', exec_timeout=0.2)
+        with mock.patch.object(script_executor.execute, 'eradicate',
+                               side_effect=lambda pid: script_executor.os.kill(pid, 9)) as eradicate:
+            eq_(self.supervisor.wait(script), Script.TIMEOUT_RETURN_CODE)
+        eradicate.assert_called_once_with(script.pid)
+
+    def test_kill_not_queued_behind_callbacks(self):
+        self.supervisor.workers = 1
+        release = threading.Event()
+        busy = make_script('exit 0')
+        self.supervisor.watch(busy, lambda script, return_code: release.wait(5))
+        script = make_script('trap "" TERM; exec sleep 30', exec_timeout=0.2)
+        try:
+            with mock.patch.object(script_executor.execute, 'eradicate',
+                                   side_effect=lambda pid: script_executor.os.kill(pid, 9)) as eradicate:
+                self.supervisor.watch(script, lambda script, return_code: None)
+                start = time.time()
+                while not eradicate.called and time.time() - start < 3:
+                    time.sleep(0.05)
+            ok_(eradicate.called, 'Kill waited for the busy worker')
+        finally:
+            release.set()
+
+    def test_wait_not_queued_behind_callbacks(self):
+        self.supervisor.workers = 1
+        release = threading.Event()
+        self.supervisor.apply_async(release.wait, (5, ))
+        busy = make_script('exit 0')
+        self.supervisor.watch(busy, lambda script, return_code: release.wait(5))
+        script = make_script('exit 3')
+        try:
+            start = time.time()
+            eq_(self.supervisor.wait(script), 3)
+            ok_(time.time() - start < 2, 'Wait was queued behind blocked callbacks')
+        finally:
+            release.set()
+
+    def test_reaped_elsewhere(self):
+        script = make_script('exit 3')
+        script.proc.wait()
+        script.proc.returncode = None
+        eq_(self.supervisor.wait(script), Script.UNKNOWN_RETURN_CODE)
+
+    def test_reaped_elsewhere_known_code(self):
+        script = make_script('exit 3')
+        script.proc.wait()
+        eq_(self.supervisor.wait(script), 3)
+
+    def test_watch_many(self):
+        results = {}
+        done = threading.Event()
+
+        def callback(script, return_code):
+            results[script.pid] = return_code
+            if len(results) == 20:
+                done.set()
+
+        scripts = [make_script('sleep 0.%d; exit %d' % (i % 5, i)) for i in range(20)]
+        for script in scripts:
+            self.supervisor.watch(script, callback)
+        done.wait(5)
+        eq_(results, dict((script.pid, i) for i, script in enumerate(scripts)))
+
+    @raises(KeyboardInterrupt)
+    def test_wait_interrupted(self):
+        script = make_script('exec sleep 30')
+        try:
+            with mock.patch.dict(script_executor.__node__, {'running': False}):
+                self.supervisor.wait(script)
+        finally:
+            script.proc.kill()
+            script.proc.wait()
+
+    def test_progress(self):
+        calls = []
+        self.supervisor.progress_interval = 0.1
+        script = make_script('exec sleep 0.55')
+        eq_(self.supervisor.wait(script, progress=calls.append), 0)
+        ok_(3 <= len(calls) <= 5, calls)
+        ok_(all(s is script for s in calls))
+
+
+class TestOutputSender(object):
+
+    def test_send_does_not_block(self):
+        sent = []
+        release = threading.Event()
+        def send(body):
+            release.wait(5)
+            sent.append(body)
+        sender = OutputSender(send)
+        start = time.time()
+        for i in range(3):
+            sender.send(i)
+        ok_(time.time() - start < 1)
+        eq_(sent, [])
+        release.set()
+        ok_(sender.flush(5))
+        eq_(sent, [0, 1, 2])
+
+    def test_send_error(self):
+        send = mock.Mock(side_effect=[Exception('gone away'), None])
+        sender = OutputSender(send)
+        sender.send('a')
+        sender.send('b')
+        ok_(sender.flush(5))
+        eq_(send.call_args_list, [mock.call('a'), mock.call('b')])
+
+
+class TestLogTailer(object):
+
+    def setup(self):
+        self.fd, self.path = tempfile.mkstemp()
+
+    def teardown(self):
+        os.close(self.fd)
+        os.remove(self.path)
+
+    def write(self, data):
+        os.write(self.fd, data)
+
+    def test_read_log_range(self):
+        self.write('line 1\nline 2\nline')
+        eq_(read_log_range(self.path, 2, 8), ('ne 1\nlin', 10, 18))
+        eq_(read_log_range(self.path, 2, 8, whole_lines=True), ('ne 1\n', 7, 18))
+        eq_(read_log_range(self.path, 14, 8, whole_lines=True), ('', 14, 18))
+        eq_(read_log_range(self.path, 100), ('', 18, 18))
+
+    def test_read_long_line(self):
+        self.write('x' * 10)
+        eq_(read_log_range(self.path, 0, 4, whole_lines=True), ('xxxx', 4, 10))
+
+    def test_incremental(self):
+        tailer = LogTailer(self.path)
+        self.write('a\nb')
+        eq_(tailer.read(100), (0, 'a\n', 1))
+        eq_(tailer.read(100), (2, '', 1))
+        self.write('c\nd\n')
+        eq_(tailer.read(2), (2, 'bc', 3))
+        eq_(tailer.read(100), (4, '\nd\n', 0))
+        self.write('e')
+        eq_(tailer.read(100, final=True), (7, 'e', 0))
+
+    def test_script_read_output(self):
+        script = Script.__new__(Script)
+        script.name = 'deploy'
+        script.execution_id = 'e1bf3b47'
+        script.stdout_path = self.path
+        script.stderr_path = self.path + '.missing'
+        eq_(script.read_output(100), None)
+        self.write('started\n')
+        output = script.read_output(100)
+        eq_(binascii.a2b_base64(output['stdout']), 'started\n')
+        eq_(output['stdout_offset'], 0)
+        eq_(binascii.a2b_base64(output['stderr']), '')
+        eq_(output['execution_id'], 'e1bf3b47')
+        eq_(output['pending'], 0)
+        eq_(script.read_output(100), None)
@@ -0,0 +1,62 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+
+import mock
+from nose.tools import eq_, ok_
+
+from scalarizr.linux import events
+
+
+class TestPathWatcher(object):
+
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_wakes_up_on_nested_path(self):
+        path = os.path.join(self.tmp_dir, 'vg', 'lv')
+        def create():
+            os.mkdir(os.path.dirname(path))
+            time.sleep(0.05)
+            open(path, 'w').close()
+
+        with events.PathWatcher(path) as watcher:
+            threading.Timer(0.05, create).start()
+            start = time.time()
+            while not os.path.exists(path):
+                ok_(watcher.wait(5))
+            ok_(time.time() - start < 2)
+            ok_(not watcher.wait(0.05))
+
+    def test_polling_fallback(self):
+        with mock.patch.object(events, '_inotify', side_effect=OSError(38, 'ENOSYS')):
+            watcher = events.PathWatcher(os.path.join(self.tmp_dir, 'file'))
+        eq_(watcher._fileno(), None)
+        with mock.patch.object(events.time, 'sleep') as sleep:
+            ok_(not watcher.wait(0.5))
+        sleep.assert_called_once_with(0.5)
+
+
+class TestUeventWatcher(object):
+
+    def test_matches(self):
+        watcher = events.UeventWatcher('block', ('add',))
+        try:
+            ok_(watcher._matches('add@/devices/xvdf\0ACTION=add\0SUBSYSTEM=block\0DEVNAME=xvdf'))
+            ok_(not watcher._matches('remove@/devices/xvdf\0ACTION=remove\0SUBSYSTEM=block'))
+            ok_(not watcher._matches('add@/devices/eth1\0ACTION=add\0SUBSYSTEM=net'))
+        finally:
+            watcher.close()
+
+    def test_polling_fallback(self):
+        with mock.patch.object(events.socket, 'socket', side_effect=events.socket.error(1, 'EPERM')):
+            watcher = events.UeventWatcher('block')
+        eq_(watcher._fileno(), None)
+        with mock.patch.object(events.time, 'sleep') as sleep:
+            ok_(not watcher.wait(1))
+        sleep.assert_called_once_with(1)
@@ -0,0 +1,48 @@
+import mock
+from nose.tools import eq_, ok_
+
+from scalarizr.linux import inventory
+
+
+class TestCache(object):
+
+    def setup(self):
+        self.loader = mock.Mock(side_effect=lambda: {'n': self.loader.call_count})
+        self.cache = inventory.Cache(self.loader)
+
+    def teardown(self):
+        inventory._caches.remove(self.cache)
+
+    def test_get_cached(self):
+        eq_(self.cache.get(), {'n': 1})
+        eq_(self.cache.get(), {'n': 1})
+        eq_(self.loader.call_count, 1)
+
+    @mock.patch.object(inventory.time, 'time')
+    def test_expired(self, time):
+        time.return_value = 100
+        self.cache.get()
+        time.return_value = 100 + inventory.Cache.max_age
+        eq_(self.cache.get(), {'n': 2})
+
+    def test_mutating_invalidates(self):
+        @inventory.mutating
+        def lvcreate():
+            raise Exception('failed')
+        self.cache.get()
+        try:
+            lvcreate()
+        except Exception:
+            pass
+        eq_(self.cache.get(), {'n': 2})
+
+    def test_stale_load_not_stored(self):
+        def loader():
+            # mutating command finished while value was loading
+            inventory.invalidate()
+            return {}
+        self.loader.side_effect = loader
+        self.cache.get()
+        self.cache.get()
+        eq_(self.loader.call_count, 2)
+        ok_(self.cache._value is None)
@@ -0,0 +1,97 @@
+import json
+import collections
+
+import mock
+from nose.tools import eq_, ok_, raises
+
+from scalarizr.linux import lvm2
+
+
+def row(info_cls, **values):
+    return collections.OrderedDict(
+            (name, values.get(name, '')) for name in info_cls.COLUMNS.split(','))
+
+
+FULLREPORT = {'report': [
+    {
+        'pv': [row(lvm2.PVInfo, pv_name='/dev/loop0', vg_name='data'),
+               row(lvm2.PVInfo, pv_name='/dev/loop1', vg_name='data')],
+        'vg': [row(lvm2.VGInfo, vg_name='data', pv_count='2', lv_count='2')],
+        'lv': [row(lvm2.LVInfo, vg_name='data', lv_name='vol1', lv_attr='-wi-ao'),
+               row(lvm2.LVInfo, vg_name='data', lv_name='vol2', lv_attr='-wi-a-')]
+    },
+    {
+        'pv': [row(lvm2.PVInfo, pv_name='/dev/loop2', vg_name='logs')],
+        'vg': [row(lvm2.VGInfo, vg_name='logs', pv_count='1', lv_count='0')],
+        'lv': []
+    }
+]}
+
+
+@mock.patch.object(lvm2.os.path, 'realpath', side_effect=lambda path: path)
+@mock.patch.object(lvm2, 'system', return_value=(json.dumps(FULLREPORT), '', 0))
+class TestInventory(object):
+
+    def setup(self):
+        lvm2._inventory.invalidate()
+        lvm2._fullreport_supported = True
+
+    def teardown(self):
+        lvm2._inventory.invalidate()
+
+    def test_fullreport(self, system, realpath):
+        report = lvm2._fullreport()
+        eq_(sorted(report['pv']), ['/dev/loop0', '/dev/loop1', '/dev/loop2'])
+        eq_(sorted(report['vg']), ['data', 'logs'])
+        eq_(sorted(report['lv']), ['data/vol1', 'data/vol2'])
+        lv = report['lv']['data/vol1']
+        ok_(isinstance(lv, lvm2.LVInfo))
+        eq_((lv.vg_name, lv.lv_name, lv.lv_attr), ('data', 'vol1', '-wi-ao'))
+        eq_(report['pv']['/dev/loop2'].vg_name, 'logs')
+        cmd = system.call_args[0][0]
+        eq_(cmd[:4], ['/sbin/lvm', 'fullreport', '--reportformat', 'json'])
+
+    def test_fullreport_unsupported(self, system, realpath):
+        system.side_effect = [lvm2.linux.LinuxError('Unrecognised command'),
+                              ('/dev/loop0|data|lvm2|a--|1g|0|uuid\n', '', 0),
+                              ('data|1|0|0|wz--n-|1g|0\n', '', 0),
+                              ('', '', 0)]
+        with mock.patch.object(lvm2.linux, 'system', side_effect=system.side_effect):
+            eq_(sorted(lvm2.vgs()), ['data'])
+        ok_(not lvm2._fullreport_supported)
+
+    def test_lvs_filter(self, system, realpath):
+        eq_(sorted(lvm2.lvs()), ['data/vol1', 'data/vol2'])
+        eq_(sorted(lvm2.lvs('data')), ['data/vol1', 'data/vol2'])
+        eq_(sorted(lvm2.lvs('/dev/data/vol2')), ['data/vol2'])
+        eq_(sorted(lvm2.lvs('data/vol1')), ['data/vol1'])
+        eq_(lvm2.lvs('logs'), {})
+        eq_(system.call_count, 1)
+
+    @raises(lvm2.NotFound)
+    def test_lvs_not_found(self, system, realpath):
+        lvm2.lvs('data/vol3')
+
+    def test_pvs_vgs_filter(self, system, realpath):
+        eq_(sorted(lvm2.pvs('/dev/loop1', '/dev/loop2')), ['/dev/loop1', '/dev/loop2'])
+        eq_(sorted(lvm2.vgs('/dev/logs')), ['logs'])
+        eq_(len(lvm2.pvs()), 3)
+        eq_(system.call_count, 1)
+
+    @raises(lvm2.NotFound)
+    def test_pvs_not_found(self, system, realpath):
+        lvm2.pvs('/dev/sdz')
+
+    def test_mutating_reloads(self, system, realpath):
+        lvm2.vgs()
+        with mock.patch.object(lvm2.linux, 'system'):
+            lvm2.vgcreate('tmp', '/dev/loop3')
+        lvm2.vgs()
+        eq_(system.call_count, 2)
+
+    def test_extra_options_bypass_cache(self, system, realpath):
+        with mock.patch.object(lvm2.linux, 'system',
+                               return_value=('data|1|0|0|wz--n-|1g|0\n', '', 0)) as report:
+            eq_(sorted(lvm2.vgs(units='b')), ['data'])
+        ok_(report.called)
+        ok_(not system.called)
@@ -0,0 +1,74 @@
+import mock
+from nose.tools import eq_, raises
+
+from scalarizr.linux import mdadm
+from scalarizr.storage2 import StorageError
+
+
+MDSTAT = '''Personalities : [raid0] [raid1] [raid10]
+md1 : active raid1 loop3[1] loop2[0](F)
+      102336 blocks super 1.2 [2/1] [_U]
+
+md0 : active raid0 loop1[1] loop0[0]
+      204672 blocks super 1.2 512k chunks
+
+md2 : inactive loop4[0](S)
+      102336 blocks super 1.2
+
+unused devices: <none>
+'''
+
+
+def test_parse_mdstat():
+    eq_(mdadm.parse_mdstat(MDSTAT), {
+        '/dev/md0': {'state': 'active', 'level': '0', 'devices': ['loop1', 'loop0']},
+        '/dev/md1': {'state': 'active', 'level': '1', 'devices': ['loop3', 'loop2']},
+        '/dev/md2': {'state': 'inactive', 'level': None, 'devices': ['loop4']}
+    })
+
+
+@mock.patch.object(mdadm.os.path, 'realpath', side_effect=lambda path: path)
+@mock.patch.object(mdadm._mdstat, 'loader', side_effect=lambda: mdadm.parse_mdstat(MDSTAT))
+class TestMdfind(object):
+
+    def setup(self):
+        mdadm._mdstat.invalidate()
+
+    def teardown(self):
+        mdadm._mdstat.invalidate()
+
+    def test_found(self, read_mdstat, realpath):
+        eq_(mdadm.mdfind('/dev/loop0', '/dev/loop1'), '/dev/md0')
+        eq_(mdadm.mdfind('/dev/loop2', '/dev/loop3'), '/dev/md1')
+        eq_(read_mdstat.call_count, 1)
+
+    @raises(StorageError)
+    def test_not_found(self, read_mdstat, realpath):
+        mdadm.mdfind('/dev/loop0')
+
+    def test_invalidated_by_mdadm(self, read_mdstat, realpath):
+        mdadm.mdfind('/dev/loop0', '/dev/loop1')
+        with mock.patch.object(mdadm.linux, 'system'):
+            mdadm.mdadm('stop', '/dev/md0')
+        mdadm.mdfind('/dev/loop0', '/dev/loop1')
+        eq_(read_mdstat.call_count, 2)
+
+
+def test_mdstat_after_mdadm():
+    stats = [MDSTAT]
+
+    def system(*args, **kwds):
+        # array state is read by another thread while mdadm is running
+        mdadm.mdstat()
+        stats[0] = MDSTAT.replace('md2 : inactive', 'md2 : active')
+
+    mdadm._mdstat.invalidate()
+    try:
+        with mock.patch.object(mdadm._mdstat, 'loader',
+                               side_effect=lambda: mdadm.parse_mdstat(stats[0])):
+            eq_(mdadm.mdstat()['/dev/md2']['state'], 'inactive')
+            with mock.patch.object(mdadm.linux, 'system', side_effect=system):
+                mdadm.mdadm('assemble', '/dev/md2', '/dev/loop4', run=True)
+            eq_(mdadm.mdstat()['/dev/md2']['state'], 'active')
+    finally:
+        mdadm._mdstat.invalidate()
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+
+import mock
+from nose.tools import eq_, ok_, raises
+
+from scalarizr.linux import mount
+
+
+MOUNTINFO = '''17 22 0:16 / /sys rw,nosuid,nodev,noexec,relatime shared:7 - sysfs sysfs rw
+22 1 202:1 / / rw,relatime shared:1 - ext4 /dev/root rw,data=ordered
+35 22 253:0 / /mnt/dbstorage rw,noatime shared:20 - xfs /dev/mapper/vg-data rw,attr2,inode64,noquota
+36 22 253:0 / /mnt/db\\040copy rw,noatime shared:20 - xfs /dev/mapper/vg-data rw,attr2,inode64,noquota
+'''
+
+
+class TestMountTable(object):
+
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, 'mountinfo')
+        with open(self.filename, 'w') as fp:
+            fp.write(MOUNTINFO)
+        self.table = mount._MountTable(self.filename)
+        mock.patch.object(mount, '_mount_table', self.table).start()
+
+    def teardown(self):
+        mock.patch.stopall()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_parse(self):
+        entries, index, by_devno = self.table.get()
+        eq_(len(entries), 4)
+        eq_(entries[1], mount._MountEntry('/dev/root', '/', 'ext4', 'rw,relatime,data=ordered', '0', '0'))
+        eq_(entries[3].mpoint, '/mnt/db copy')
+        eq_(by_devno['202:1'].mpoint, '/')
+
+    def test_mounts_lookup(self):
+        mounts = mount.mounts()
+        eq_(mounts['/mnt/dbstorage'].fstype, 'xfs')
+        # first entry wins, like linear scan over /proc/mounts
+        eq_(mounts['/dev/mapper/vg-data'].mpoint, '/mnt/dbstorage')
+        ok_('/' in mounts)
+        ok_('/mnt/nothing' not in mounts)
+        eq_(mounts.by_devno('253:0').mpoint, '/mnt/dbstorage')
+
+    @raises(KeyError)
+    def test_mounts_missing(self):
+        mount.mounts()['/dev/sdz']
+
+    def test_reparsed_on_change(self):
+        with mock.patch.object(self.table, '_parse', wraps=self.table._parse) as parse:
+            self.table.get()
+            self.table._poll = mock.Mock()
+            self.table._poll.poll.return_value = []
+            self.table.get()
+            eq_(parse.call_count, 1)
+
+            self.table._poll.poll.return_value = [(3, mount.select.POLLPRI)]
+            self.table.get()
+            eq_(parse.call_count, 2)
+
+            self.table._poll.poll.return_value = []
+            with mock.patch.object(mount.linux, 'system'):
+                mount.umount('/mnt/dbstorage')
+            self.table.get()
+            eq_(parse.call_count, 3)
+
+    def test_reopened_after_fork(self):
+        with mock.patch.object(self.table, '_parse', wraps=self.table._parse) as parse:
+            self.table.get()
+            fp = self.table._fp
+            self.table._poll = mock.Mock()
+            self.table._poll.poll.return_value = []
+            with mock.patch.object(mount.os, 'getpid', return_value=self.table._pid + 1):
+                self.table.get()
+                ok_(fp.closed)
+                ok_(self.table._fp is not fp)
+                eq_(self.table._pid, mount.os.getpid())
+            eq_(parse.call_count, 2)
+
+    def test_fstab_not_cached(self):
+        fstab = os.path.join(self.tmp_dir, 'fstab')
+        with open(fstab, 'w') as fp:
+            fp.write('/dev/sdb /mnt ext3 defaults 0 0\n')
+        eq_(mount.fstab(fstab)['/mnt'].device, '/dev/sdb')
@@ -0,0 +1,59 @@
+import os
+import tempfile
+
+import mock
+from nose.tools import eq_
+
+from scalarizr.linux import pkgmgr
+
+
+class TestPackageInventory(object):
+    def setup(self):
+        fd, self.db_path = tempfile.mkstemp()
+        os.write(fd, 'Package: python\n')
+        os.close(fd)
+        self.inventory = pkgmgr.PackageInventory()
+        self.loader = mock.Mock(return_value={'python': '2.7.3-0ubuntu3'})
+
+    def teardown(self):
+        os.remove(self.db_path)
+
+    def test_get_cached(self):
+        eq_(self.inventory.get([self.db_path], self.loader), {'python': '2.7.3-0ubuntu3'})
+        eq_(self.inventory.get([self.db_path], self.loader), {'python': '2.7.3-0ubuntu3'})
+        eq_(self.loader.call_count, 1)
+
+    def test_get_returns_copy(self):
+        self.inventory.get([self.db_path], self.loader)['nginx'] = '1.4.6'
+        assert 'nginx' not in self.inventory.get([self.db_path], self.loader)
+
+    def test_db_changed(self):
+        self.inventory.get([self.db_path], self.loader)
+        with open(self.db_path, 'a') as fp:
+            fp.write('Package: nginx\n')
+        self.inventory.get([self.db_path], self.loader)
+        eq_(self.loader.call_count, 2)
+
+    def test_invalidate(self):
+        self.inventory.get([self.db_path], self.loader)
+        self.inventory.invalidate()
+        self.inventory.get([self.db_path], self.loader)
+        eq_(self.loader.call_count, 2)
+
+    def test_no_db(self):
+        self.inventory.get(['/non/existed/db'], self.loader)
+        self.inventory.get(['/non/existed/db'], self.loader)
+        eq_(self.loader.call_count, 2)
+
+
+@mock.patch.object(pkgmgr, 'inventory')
+class TestAptPackageMgr(object):
+    @mock.patch.object(pkgmgr.AptPackageMgr, 'apt_get_command')
+    def test_remove_invalidates(self, apt_get_command, inventory):
+        pkgmgr.AptPackageMgr().remove('nginx')
+        inventory.invalidate.assert_called_once_with()
+
+    @mock.patch.object(pkgmgr.AptPackageMgr, '_install_package')
+    def test_install_invalidates(self, install_package, inventory):
+        pkgmgr.AptPackageMgr().install('nginx')
+        inventory.invalidate.assert_called_once_with()
@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+
+import mock
+from nose.tools import eq_
+
+from scalarizr.linux import procstat
+
+
+NET_DEV = '''Inter-|   Receive                                                |  Transmit
+ face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+    lo:    1000      10    0    0    0     0          0         0     1000      10    0    0    0     0       0          0
+  eth0: 2000000    3000    1    0    0     0          0         0   500000    2000    0    0    0     0       0          0
+'''
+
+DISKSTATS = '''   1       0 ram0 0 0 0 0 0 0 0 0 0 0 0
+ 202       1 xvda1 %d 10 %d 400 200 20 %d 800 0 600 1200
+'''
+
+
+class TestReaders(object):
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _file(self, name, data):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w') as fp:
+            fp.write(data)
+        return path
+
+    def test_read_cpu(self):
+        path = self._file('stat', 'cpu  8416 0 6754 147309 120 0 3 0 0 0\ncpu0 8416 0 6754 147309\n')
+        eq_(procstat.read_cpu(path), {'user': 8416, 'nice': 0, 'system': 6754, 'idle': 147309})
+
+    def test_read_memory(self):
+        path = self._file('meminfo', 'MemTotal: 604364 kB\nMemFree: 165108 kB\n'
+                          'Buffers: 17832 kB\nCached: 316756 kB\nSwapTotal: 0 kB\n'
+                          'SwapFree: 0 kB\nShmem: 168 kB\n')
+        eq_(procstat.read_memory(path), {
+            'total_swap': 0, 'avail_swap': 0, 'total_real': 604364, 'total_free': 165108,
+            'shared': 168, 'buffer': 17832, 'cached': 316756})
+
+    def test_read_disk(self):
+        path = self._file('diskstats', DISKSTATS % (100, 4000, 2000))
+        eq_(procstat.read_disk(path), {'xvda1': {
+            'read': {'num': 100, 'sectors': 4000, 'bytes': 4000 * 512},
+            'write': {'num': 200, 'sectors': 2000, 'bytes': 2000 * 512}}})
+
+    def test_read_net(self):
+        path = self._file('dev', NET_DEV)
+        eq_(procstat.read_net(path)['eth0'], {
+            'receive': {'bytes': 2000000, 'packets': 3000, 'errors': 1},
+            'transmit': {'bytes': 500000, 'packets': 2000, 'errors': 0}})
+
+
+class TestSampler(object):
+    def setup(self):
+        self.sampler = procstat.Sampler(history=3)
+        self.values = iter([{'user': 100, 'idle': 1000}, {'user': 150, 'idle': 1100},
+                            {'user': 250, 'idle': 1300}, {'user': 300, 'idle': 1400}])
+        self.sampler.readers = {'cpu': lambda: next(self.values)}
+        self.sampler.counters = ('cpu', )
+
+    def test_snapshot_cached(self):
+        with mock.patch('time.time', return_value=100.0):
+            first = self.sampler.snapshot(max_age=5)
+            eq_(self.sampler.snapshot(max_age=5), first)
+        with mock.patch('time.time', return_value=106.0):
+            assert self.sampler.snapshot(max_age=5) is not first
+        eq_(len(self.sampler.samples), 2)
+
+    def test_rates(self):
+        with mock.patch('time.time', return_value=100.0):
+            eq_(self.sampler.rates(max_age=5), None)
+        with mock.patch('time.time', return_value=110.0):
+            eq_(self.sampler.rates(max_age=5), {'period': 10.0, 'cpu': {'user': 5.0, 'idle': 10.0}})
+        with mock.patch('time.time', return_value=120.0):
+            eq_(self.sampler.rates(period=10, max_age=5),
+                {'period': 10.0, 'cpu': {'user': 10.0, 'idle': 20.0}})
+
+    def test_history_bounded(self):
+        for i in range(4):
+            with mock.patch('time.time', return_value=100.0 + i * 10):
+                self.sampler.snapshot(max_age=5)
+        eq_(len(self.sampler.samples), 3)
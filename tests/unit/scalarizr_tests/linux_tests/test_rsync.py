@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+
+import mock
+from nose.tools import eq_, ok_, raises
+
+from scalarizr import linux
+from scalarizr.linux import rsync
+
+
+MB = 1024 * 1024
+
+
+class TestParallelRsync(object):
+
+    def setup(self):
+        self.src = tempfile.mkdtemp()
+        self.tree = {
+            'etc/hosts': 100,
+            'usr/lib/a.so': 3 * MB,
+            'usr/lib/b.so': 2 * MB,
+            'usr/share/doc/readme': 2 * MB,
+            'usr/bin/python': 1 * MB,
+            'var/log/syslog': 1 * MB,
+            'tmp/junk': 5 * MB,
+            'vmlinuz': 4 * MB
+        }
+        for path, size in self.tree.items():
+            path = os.path.join(self.src, path)
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as fp:
+                fp.truncate(size)
+        os.symlink('usr/lib', os.path.join(self.src, 'lib'))
+
+    def teardown(self):
+        shutil.rmtree(self.src)
+
+    def engine(self, **kwds):
+        kwds.setdefault('excludes', ['/tmp'])
+        kwds.setdefault('executable', 'rsync')
+        return rsync.ParallelRsync(self.src, '/mnt/img', archive=True, **kwds)
+
+    def test_partitions(self):
+        r = self.engine()
+        r.split_size = 5 * MB
+        eq_(sorted(r.partitions()), [
+            ('etc', 100, 1),
+            ('usr/bin', 1 * MB, 1),
+            ('usr/lib', 5 * MB, 2),
+            ('usr/share', 2 * MB, 1),
+            ('var', 1 * MB, 1)])
+        eq_(r.total_bytes, 9 * MB + 100)
+        eq_(r.total_files, 6)
+
+    def test_partitions_max_depth(self):
+        r = self.engine()
+        r.split_size = 0
+        r.max_depth = 2
+        ok_('usr/share' in [p[0] for p in r.partitions()])
+        ok_('usr/share/doc' not in [p[0] for p in r.partitions()])
+
+    @mock.patch.object(linux, 'system')
+    def test_run(self, system):
+        progress = mock.Mock()
+        r = self.engine(progress=progress)
+        r.run()
+        cmds = [c[0][0] for c in system.call_args_list if c[0][0] != ['sync']]
+        eq_(len(cmds), 4)
+        eq_(sorted(cmd[-2] for cmd in cmds[:3]),
+            [os.path.join(self.src, '.', part) for part in ('etc', 'usr', 'var')])
+        for cmd in cmds[:3]:
+            eq_(cmd[-1], '/mnt/img')
+            eq_(sorted(cmd[:-2]), ['--archive', '--exclude', '--relative', '/tmp', 'rsync'])
+        eq_(cmds[-1][-2:], [self.src + '/', '/mnt/img'])
+        ok_('--relative' not in cmds[-1])
+        eq_(progress.call_args_list[-1], mock.call(9 * MB + 100, 9 * MB + 100, 6, 6))
+
+    @mock.patch.object(linux, 'system')
+    def test_retry_failed_partition(self, system):
+        failures = [linux.LinuxError('rsync failed', '', '', 12, ['rsync'])]
+
+        def side_effect(cmd):
+            if os.path.join(self.src, '.', 'var') in cmd and failures:
+                raise failures.pop()
+        system.side_effect = side_effect
+        self.engine().run()
+        cmds = [c[0][0] for c in system.call_args_list if c[0][0] != ['sync']]
+        eq_(len([cmd for cmd in cmds if os.path.join(self.src, '.', 'var') in cmd]), 2)
+        eq_(len(cmds), 5)
+
+    @raises(linux.LinuxError)
+    @mock.patch.object(linux, 'system')
+    def test_final_error(self, system):
+        def side_effect(cmd):
+            if self.src + '/' in cmd:
+                raise linux.LinuxError('rsync failed', '', '', 23, cmd)
+        system.side_effect = side_effect
+        self.engine().run()
@@ -0,0 +1,77 @@
+import time
+import logging
+import threading
+
+import mock
+from nose.tools import eq_, ok_
+
+from scalarizr.messaging import loghandler
+
+
+class TestMessagingLogHandler(object):
+
+    def setup(self):
+        self.sent = []
+        self.service = mock.Mock()
+        self.service.new_message.side_effect = lambda name, body: (name, body)
+        self.service.get_producer.return_value.send.side_effect = \
+                lambda queue, msg: self.sent.append(msg[1]['message'])
+        self.patcher = mock.patch.object(loghandler, 'bus', mock.Mock(messaging_service=self.service))
+        self.patcher.start()
+        self.logger = logging.getLogger('test_loghandler')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.handlers = []
+
+    def teardown(self):
+        for hdlr in self.handlers:
+            self.logger.removeHandler(hdlr)
+            hdlr.close()
+        self.patcher.stop()
+
+    def handler(self, **kwds):
+        hdlr = loghandler.MessagingLogHandler('TestLog', **kwds)
+        self.logger.addHandler(hdlr)
+        self.handlers.append(hdlr)
+        return hdlr
+
+    def test_batches(self):
+        hdlr = self.handler(batch_size=3, flush_interval=10)
+        for i in range(7):
+            self.logger.info('line %d', i)
+        hdlr.flush()
+        eq_(self.sent, ['line 0\nline 1\nline 2', 'line 3\nline 4\nline 5', 'line 6'])
+        eq_(hdlr.stats['messages'], 3)
+        eq_(hdlr.stats['sent'], 7)
+
+    def test_batch_bytes(self):
+        hdlr = self.handler(batch_bytes=10, flush_interval=10)
+        for line in ('aaaa', 'bbbb', 'cccc', 'x' * 20):
+            self.logger.info(line)
+        hdlr.flush()
+        eq_(self.sent, ['aaaa\nbbbb', 'cccc', 'x' * 20])
+
+    def test_flush_interval(self):
+        hdlr = self.handler(flush_interval=0.1)
+        self.logger.info('line')
+        time.sleep(0.5)
+        eq_(self.sent, ['line'])
+
+    def test_emit_does_not_block(self):
+        blocked = threading.Event()
+        self.service.get_producer.return_value.send.side_effect = lambda queue, msg: blocked.wait(5)
+        hdlr = self.handler(capacity=5, batch_size=1, flush_interval=0)
+        start = time.time()
+        for i in range(20):
+            self.logger.info('line %d', i)
+        ok_(time.time() - start < 1)
+        ok_(hdlr.stats['dropped'] >= 14)
+        blocked.set()
+
+    def test_send_error(self):
+        self.service.get_producer.return_value.send.side_effect = Exception('Connection refused')
+        hdlr = self.handler()
+        self.logger.info('line')
+        hdlr.flush()
+        eq_(hdlr.stats['errors'], 1)
+        eq_(hdlr.stats['sent'], 0)
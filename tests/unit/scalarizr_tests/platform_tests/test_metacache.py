@@ -0,0 +1,102 @@
+import threading
+import SocketServer
+import BaseHTTPServer
+
+from nose.tools import eq_, ok_, raises
+
+from scalarizr.platform import metacache
+
+
+TREE = {
+    'latest/meta-data/': 'instance-id\nplacement/\nblock-device-mapping/\npublic-keys/\npublic-ipv4',
+    'latest/meta-data/instance-id': 'i-12345678',
+    'latest/meta-data/placement/': 'availability-zone',
+    'latest/meta-data/placement/availability-zone': 'us-east-1a',
+    'latest/meta-data/block-device-mapping/': 'ami\nroot\nephemeral0',
+    'latest/meta-data/block-device-mapping/ami': '/dev/sda1',
+    'latest/meta-data/block-device-mapping/root': '/dev/sda1',
+    'latest/meta-data/block-device-mapping/ephemeral0': 'sdb',
+    'latest/meta-data/public-keys/': '0=my-key',
+    'latest/meta-data/public-keys/0/': 'openssh-key',
+    'latest/meta-data/public-keys/0/openssh-key': 'ssh-rsa AAAA',
+    'latest/meta-data/public-ipv4': '54.1.2.3'
+}
+
+
+class MetadataHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        key = self.path.lstrip('/')
+        body = TREE.get(key)
+        if body is None and not key.endswith('/'):
+            body = TREE.get(key + '/')
+        self.send_response(404 if body is None else 200)
+        body = body or ''
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class MetadataServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class TestMetadataCache(object):
+    def setup(self):
+        self.server = MetadataServer(('127.0.0.1', 0), MetadataHandler)
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.setDaemon(True)
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%d/' % self.server.server_address[1]
+
+    def teardown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_get_cached(self):
+        cache = metacache.MetadataCache(self.url)
+        eq_(cache.get('latest/meta-data/instance-id'), 'i-12345678')
+        eq_(cache.get('latest/meta-data/instance-id'), 'i-12345678')
+        eq_(len(self.server.requests), 1)
+        eq_(cache.stats['hits'], 1)
+
+    def test_get_not_found(self):
+        cache = metacache.MetadataCache(self.url)
+        eq_(cache.get('latest/meta-data/kernel-id'), '')
+
+    def test_ttl(self):
+        cache = metacache.MetadataCache(self.url,
+                ttl={'latest/meta-data/public-': 0})
+        cache.get('latest/meta-data/public-ipv4')
+        cache.get('latest/meta-data/public-ipv4')
+        eq_(len(self.server.requests), 2)
+
+    def test_prefetch(self):
+        cache = metacache.MetadataCache(self.url)
+        cache.prefetch(['latest/meta-data/'])
+        requests = len(self.server.requests)
+
+        eq_(cache.get('latest/meta-data/placement/availability-zone'), 'us-east-1a')
+        eq_(cache.get('latest/meta-data/block-device-mapping/ephemeral0'), 'sdb')
+        eq_(cache.get('latest/meta-data/public-keys/0/openssh-key'), 'ssh-rsa AAAA')
+        eq_(cache.list('latest/meta-data/block-device-mapping'), ['ami', 'root', 'ephemeral0'])
+        eq_(len(self.server.requests), requests)
+
+    def test_prefetch_skips_cached(self):
+        cache = metacache.MetadataCache(self.url)
+        cache.prefetch(['latest/meta-data/block-device-mapping/'])
+        requests = len(self.server.requests)
+        cache.prefetch(['latest/meta-data/block-device-mapping/'])
+        eq_(len(self.server.requests), requests)
+
+    @raises(metacache.Error)
+    def test_connection_error(self):
+        self.teardown()
+        cache = metacache.MetadataCache(self.url, timeout=1)
+        cache.get('latest/meta-data/instance-id')
@@ -0,0 +1,117 @@
+import threading
+
+import mock
+from nose.tools import eq_, ok_, raises
+
+from scalarizr.services import ServiceError
+from scalarizr.services import mysql
+
+
+class TestConnectionPool(object):
+
+    def setup(self):
+        self.connect = mock.Mock(side_effect=lambda: mock.Mock())
+        self.pool = mysql.ConnectionPool(self.connect, size=2, timeout=0.1)
+
+    def test_reuse(self):
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        ok_(self.pool.acquire() is conn)
+        eq_(self.connect.call_count, 1)
+
+    @raises(ServiceError)
+    def test_bounded(self):
+        self.pool.acquire()
+        self.pool.acquire()
+        self.pool.acquire()
+
+    def test_broken_closed(self):
+        conn = self.pool.acquire()
+        self.pool.release(conn, broken=True)
+        ok_(conn.close.called)
+        ok_(self.pool.acquire() is not conn)
+
+    def test_ping_idle(self):
+        self.pool.ping_interval = 0
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        conn.ping.side_effect = Exception('gone away')
+        ok_(self.pool.acquire() is not conn)
+        ok_(conn.close.called)
+
+    def test_pin(self):
+        self.pool.pin()
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        ok_(self.pool.acquire() is conn)
+
+        other = []
+        t = threading.Thread(target=lambda: other.append(self.pool.acquire()))
+        t.start()
+        t.join()
+        ok_(other[0] is not conn)
+
+        self.pool.unpin()
+        eq_(self.pool._idle[0][0], conn)
+
+    def test_pinned_by_exited_thread(self):
+        t = threading.Thread(target=self.pool.pin)
+        t.start()
+        t.join()
+        self.pool.acquire()
+        self.pool.acquire()
+        eq_(self.pool._pinned, {})
+
+    def test_clear(self):
+        conn = self.pool.acquire()
+        idle = self.pool.acquire()
+        self.pool.release(idle)
+        self.pool.clear()
+        ok_(idle.close.called)
+        self.pool.release(conn)
+        ok_(conn.close.called)
+        eq_(self.pool._idle, [])
+
+
+class TestMySQLClient(object):
+
+    def setup(self):
+        self.client = mysql.MySQLClient('scalr', 'secret')
+        self.conn = mock.Mock()
+        self.cursor = self.conn.cursor.return_value
+        self.pool = mock.patch.object(mysql.MySQLClient, '_pools',
+                {self.client.creds: mysql.ConnectionPool(lambda: self.conn)}).start()
+
+    def teardown(self):
+        mock.patch.stopall()
+
+    def test_parameterized(self):
+        self.client.remove_user("x' OR '1'='1", 'localhost')
+        self.cursor.execute.assert_called_once_with(
+                'DELETE FROM mysql.user WHERE User=%s and Host=%s',
+                ("x' OR '1'='1", 'localhost'))
+
+    def test_retry_lost_connection(self):
+        self.cursor.execute.side_effect = [mysql.pymysql.err.OperationalError(2013, 'Lost'), None]
+        self.cursor.fetchone.return_value = (1, )
+        eq_(self.client.fetchone('SELECT 1'), (1, ))
+        eq_(self.cursor.execute.call_count, 2)
+
+    def test_lock_tables_keeps_session(self):
+        self.client.lock_tables()
+        ok_(self.client.pool.acquire() is self.conn)
+        eq_(self.client.pool._idle, [])
+        self.client.unlock_tables()
+        eq_(self.client.pool._pinned, {})
+
+    @raises(ServiceError)
+    def test_lock_tables_lost_connection(self):
+        self.cursor.execute.side_effect = mysql.pymysql.err.OperationalError(2013, 'Lost')
+        try:
+            self.client.lock_tables()
+        finally:
+            # FTWRL wasn't retried on a new session, that would stay locked in pool
+            eq_(self.cursor.execute.call_count, 1)
+            ok_(self.conn.close.called)
+            eq_(self.client.pool._pinned, {})
+            eq_(self.client.pool._idle, [])
@@ -0,0 +1,120 @@
+import mock
+from nose.tools import eq_, ok_, raises
+
+from scalarizr.services import mysql2
+
+
+class TestMySQLSnapBackupFreezeMethod(object):
+
+    def setup(self):
+        self.bak = mysql2.MySQLSnapBackup()
+
+    def _method(self, type):
+        volume = mock.Mock(type=type)
+        volume.mounted_to.return_value = '/mnt/dbstorage'
+        with mock.patch.object(mysql2.linux, 'which', return_value='/sbin/fsfreeze'):
+            return self.bak._freeze_method(volume)
+
+    def test_by_volume_type(self):
+        for type in ('ebs', 'cinder', 'csvol', 'gce_persistent', 'loop'):
+            eq_(self._method(type), 'fsfreeze', type)
+        # these suspend device or run lvcreate -s while taking a snapshot
+        for type in ('lvm', 'eph', 'raid'):
+            eq_(self._method(type), 'lock', type)
+
+    def test_not_mounted(self):
+        volume = mock.Mock(type='ebs')
+        volume.mounted_to.return_value = None
+        eq_(self.bak._freeze_method(volume), 'lock')
+
+    def test_explicit(self):
+        self.bak.freeze_method = 'fsfreeze'
+        eq_(self._method('lvm'), 'fsfreeze')
+
+
+@mock.patch.object(mysql2, '__mysql__', {'replication_master': '1'})
+@mock.patch.object(mysql2.coreutils, 'sync')
+@mock.patch.object(mysql2.coreutils, 'fsfreeze')
+class TestMySQLSnapBackupLocking(object):
+
+    def setup(self):
+        self.bak = mysql2.MySQLSnapBackup(freeze_method='fsfreeze')
+        self.bak._mysql_init = mock.Mock()
+        self.client = mock.Mock()
+        self.client.long_running_queries.return_value = []
+        self.client.master_status.return_value = ('binlog.000001', 107)
+        self.bak._client = mock.Mock(return_value=self.client)
+        self.volume = mock.Mock(type='ebs')
+        self.volume.mounted_to.return_value = '/mnt/dbstorage'
+
+    def test_fsfreeze_releases_lock(self, fsfreeze, sync):
+        calls = []
+        self.client.lock_tables.side_effect = lambda: calls.append('lock')
+        self.client.unlock_tables.side_effect = lambda: calls.append('unlock')
+        fsfreeze.side_effect = lambda mpoint, unfreeze=False: calls.append('fsfreeze')
+        state = {}
+        self.bak.freeze(self.volume, state)
+
+        eq_(calls, ['lock', 'fsfreeze', 'unlock'])
+        fsfreeze.assert_called_once_with('/mnt/dbstorage')
+        ok_('lock_duration' in state)
+        eq_(state['log_file'], 'binlog.000001')
+        eq_(state['log_pos'], 107)
+        eq_(sync.call_count, 0)
+
+    @raises(mysql2.Error)
+    def test_freeze_error_unlocks(self, fsfreeze, sync):
+        self.client.master_status.side_effect = mysql2.Error('Connection lost')
+        try:
+            self.bak.freeze(self.volume, {})
+        finally:
+            self.client.unlock_tables.assert_called_once_with()
+            eq_(fsfreeze.call_count, 0)
+
+    @raises(mysql2.Error)
+    def test_freeze_error_thaws(self, fsfreeze, sync):
+        self.client.unlock_tables.side_effect = [mysql2.Error('Connection lost'), None]
+        try:
+            self.bak.freeze(self.volume, {})
+        finally:
+            eq_(fsfreeze.call_args_list, [mock.call('/mnt/dbstorage'),
+                                          mock.call('/mnt/dbstorage', unfreeze=True)])
+            eq_(self.client.unlock_tables.call_count, 2)
+
+    @mock.patch.object(mysql2.time, 'sleep')
+    def test_wait_long_queries(self, sleep, fsfreeze, sync):
+        query = {'ID': 12, 'TIME': 30}
+        self.client.long_running_queries.side_effect = [[query], [query], []]
+        self.bak.freeze(self.volume, {})
+        eq_(sleep.call_count, 2)
+        self.client.lock_tables.assert_called_once_with()
+
+    @raises(mysql2.Error)
+    def test_wait_long_queries_timeout(self, fsfreeze, sync):
+        self.bak.long_query_timeout = 0
+        self.client.long_running_queries.return_value = [{'ID': 12, 'TIME': 30}]
+        try:
+            self.bak.freeze(self.volume, {})
+        finally:
+            eq_(self.client.lock_tables.call_count, 0)
+
+    def test_unfreeze_thaws(self, fsfreeze, sync):
+        state = {}
+        self.bak.freeze(self.volume, state)
+        self.bak.unfreeze(self.volume, state)
+        eq_(fsfreeze.call_args_list, [mock.call('/mnt/dbstorage'),
+                                      mock.call('/mnt/dbstorage', unfreeze=True)])
+        self.client.unlock_tables.assert_called_once_with()
+
+    def test_unfreeze_unlocks(self, fsfreeze, sync):
+        self.bak.freeze_method = 'lock'
+        state = {}
+        self.bak.freeze(self.volume, state)
+        sync.assert_called_once_with()
+        eq_(self.client.unlock_tables.call_count, 0)
+        ok_('lock_duration' not in state)
+
+        self.bak.unfreeze(self.volume, state)
+        self.client.unlock_tables.assert_called_once_with()
+        ok_(state['lock_duration'] >= 0)
+        eq_(fsfreeze.call_count, 0)
@@ -0,0 +1,253 @@
+import os
+import json
+import shutil
+import tempfile
+
+import mock
+from nose.tools import eq_, raises
+
+from scalarizr.storage2 import cloudfs
+from scalarizr.storage2.cloudfs import base
+
+
+class TestLocalDeleteMany(object):
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.driver = cloudfs.cloudfs('file')
+        self.urls = []
+        for i in range(20):
+            path = os.path.join(self.tmp_dir, 'chunk.%03d' % i)
+            open(path, 'w').close()
+            self.urls.append('file://' + path)
+
+    def teardown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_delete_many(self):
+        self.driver.delete_many(self.urls)
+        eq_(os.listdir(self.tmp_dir), [])
+
+    def test_delete_many_missing(self):
+        self.driver.delete_many(self.urls + ['file://' + self.tmp_dir + '/missing'])
+        eq_(os.listdir(self.tmp_dir), [])
+
+    def test_ls_iter(self):
+        eq_(sorted(self.driver.ls_iter('file://' + self.tmp_dir)), self.urls)
+
+    @raises(base.DriverError)
+    def test_delete_many_errors(self):
+        with mock.patch.object(os, 'remove', side_effect=OSError(13, 'Permission denied')):
+            self.driver.delete_many(self.urls)
+
+    def test_manifest_delete(self):
+        manifest = cloudfs.Manifest()
+        manifest.cloudfs_path = 'file://' + self.tmp_dir + '/manifest.json'
+        manifest.data = {'files': [{
+            'chunks': [(os.path.basename(url), '', 0) for url in self.urls]
+        }]}
+        manifest.delete()
+        eq_(os.listdir(self.tmp_dir), [])
+
+
+class TestS3DeleteMany(object):
+    def setup(self):
+        from scalarizr.storage2.cloudfs import s3
+        self.driver = s3.S3FileSystem()
+        self.bucket = mock.Mock()
+        self.bucket.name = 'backups'
+        self.bucket.delete_keys.return_value.errors = []
+        self.driver._get_bucket = mock.Mock(return_value=self.bucket)
+
+    def test_batches(self):
+        urls = ['s3://backups/mysql/chunk.%04d' % i for i in range(2500)]
+        self.driver.delete_many(urls)
+
+        eq_(self.bucket.delete_keys.call_count, 3)
+        sizes = [len(call[0][0]) for call in self.bucket.delete_keys.call_args_list]
+        eq_(sizes, [1000, 1000, 500])
+        ok = self.bucket.get_key.call_count == 0
+        assert ok, 'HEAD request per key'
+
+    @raises(base.DriverError)
+    def test_errors(self):
+        error = mock.Mock(key='mysql/chunk.0001', code='AccessDenied')
+        self.bucket.delete_keys.return_value.errors = [error]
+        self.driver.delete_many(['s3://backups/mysql/chunk.0001'])
+
+
+class TestSwiftDeleteSegments(object):
+    def setup(self):
+        from scalarizr.storage2.cloudfs import swift
+        self.driver = swift.SwiftFileSystem()
+        self.conn = mock.Mock()
+        self.conn.get_capabilities.return_value = {'swift': {}, 'bulk_delete': {}}
+        def post_account(headers=None, query_string=None, data=None):
+            return {}, json.dumps({'Response Status': '200 OK', 'Errors': [],
+                                   'Number Deleted': len(data.split('\n')),
+                                   'Number Not Found': 0})
+        self.conn.post_account.side_effect = post_account
+        self.segments = [
+            {'name': 'mysql/chunk.0001/slo/1400000000/00000000'},
+            {'name': 'mysql/chunk.0001/slo/1400000000/00000001'},
+            {'name': 'mysql/chunk.0003/slo/1400000000/00000000'},
+            {'name': 'pgsql/chunk.0001/slo/1400000000/00000000'},
+        ]
+        def get_container(container, marker='', prefix=None):
+            if container != 'backups_segments':
+                raise swift.ClientException('Not found', http_status=404)
+            return {}, [obj for obj in self.segments
+                        if obj['name'].startswith(prefix or '') and obj['name'] > marker]
+        self.conn.get_container.side_effect = get_container
+        self.driver._get_connection = mock.Mock(return_value=self.conn)
+
+    def test_listed_once_per_directory(self):
+        self.driver.delete_many(['swift://backups/mysql/chunk.0001',
+                                 'swift://backups/mysql/chunk.0002'])
+
+        prefixes = set(call[1]['prefix'] for call in self.conn.get_container.call_args_list)
+        eq_(prefixes, set(['mysql/']))
+        eq_(self.conn.post_account.call_count, 1)
+        body = self.conn.post_account.call_args[1]['data']
+        eq_(sorted(body.split('\n')), [
+            'backups/mysql/chunk.0001',
+            'backups/mysql/chunk.0002',
+            'backups_segments/mysql/chunk.0001/slo/1400000000/00000000',
+            'backups_segments/mysql/chunk.0001/slo/1400000000/00000001'])
+
+    def test_nested_directories(self):
+        self.driver.delete_many(['swift://backups/mysql/chunk.0001',
+                                 'swift://backups/mysql/2014/chunk.0001'])
+
+        prefixes = set(call[1]['prefix'] for call in self.conn.get_container.call_args_list)
+        eq_(prefixes, set(['mysql/']))
+
+    def test_no_segments_container(self):
+        self.driver.delete_many(['swift://other/mysql/chunk.0001'])
+        eq_(self.conn.post_account.call_count, 1)
+        eq_(self.conn.post_account.call_args[1]['data'], 'other/mysql/chunk.0001')
+
+
+class TestSwiftBulkDelete(object):
+    def setup(self):
+        from scalarizr.storage2.cloudfs import swift
+        self.driver = swift.SwiftFileSystem()
+        self.driver._list_segments = mock.Mock(return_value=[])
+        self.conn = mock.Mock()
+        self.conn.get_capabilities.return_value = {'swift': {}, 'bulk_delete': {}}
+        self.driver._get_connection = mock.Mock(return_value=self.conn)
+        self.urls = ['swift://backups/mysql/chunk.0001', 'swift://backups/mysql/chunk.0002']
+
+    def _response(self, status='200 OK', deleted=2, not_found=0, errors=()):
+        return {}, json.dumps({'Response Status': status, 'Errors': list(errors),
+                               'Number Deleted': deleted, 'Number Not Found': not_found})
+
+    def test_bulk_delete(self):
+        self.conn.post_account.return_value = self._response(deleted=1, not_found=1)
+        self.driver.delete_many(self.urls)
+        eq_(self.conn.post_account.call_count, 1)
+        eq_(self.conn.delete_object.call_count, 0)
+
+    def test_capabilities_checked_once(self):
+        self.conn.post_account.return_value = self._response()
+        self.driver.delete_many(self.urls)
+        self.driver.delete_many(self.urls)
+        eq_(self.conn.get_capabilities.call_count, 1)
+
+    def test_no_bulk_delete_capability(self):
+        self.conn.get_capabilities.return_value = {'swift': {}}
+        self.driver.delete_many(self.urls)
+        eq_(self.conn.post_account.call_count, 0)
+        eq_(self.conn.delete_object.call_count, 2)
+
+    def test_no_capabilities(self):
+        from scalarizr.storage2.cloudfs import swift
+        self.conn.get_capabilities.side_effect = swift.ClientException('Not found', http_status=404)
+        self.driver.delete_many(self.urls)
+        eq_(self.conn.post_account.call_count, 0)
+        eq_(self.conn.delete_object.call_count, 2)
+
+    def test_error_status(self):
+        self.conn.post_account.return_value = self._response(status='400 Bad Request',
+                deleted=1, errors=[['/backups/mysql/chunk.0002', '403 Forbidden']])
+        self.driver.delete_many(self.urls)
+        eq_(self.conn.delete_object.call_count, 2)
+
+    def test_not_all_processed(self):
+        self.conn.post_account.return_value = self._response(deleted=1)
+        self.driver.delete_many(self.urls)
+        eq_(self.conn.delete_object.call_count, 2)
+
+    def test_unparsable_response(self):
+        self.conn.post_account.return_value = ({}, '<html>Accepted</html>')
+        self.driver.delete_many(self.urls)
+        eq_(self.conn.delete_object.call_count, 2)
+
+
+class TestParts(object):
+    def setup(self):
+        fd, self.path = tempfile.mkstemp()
+        os.write(fd, ''.join(chr(i % 256) for i in range(1000)))
+        os.close(fd)
+
+    def teardown(self):
+        os.remove(self.path)
+
+    def test_split_parts(self):
+        driver = cloudfs.cloudfs('file', part_size=300)
+        eq_(driver._split_parts(1000),
+            [(0, 0, 300), (1, 300, 300), (2, 600, 300), (3, 900, 100)])
+        eq_(driver._split_parts(0), [])
+
+    def test_file_slice(self):
+        fp = base.FileSlice(self.path, 300, 300)
+        try:
+            eq_(len(fp), 300)
+            eq_(fp.read(10), open(self.path).read()[300:310])
+            eq_(len(fp.read()), 290)
+            eq_(fp.read(), '')
+            fp.seek(0)
+            eq_(fp.tell(), 0)
+        finally:
+            fp.close()
+
+    def test_parts_progress(self):
+        report_to = mock.Mock()
+        progress = base.PartsProgress(1000, report_to)
+        progress.callback(0)(100, 300)
+        progress.callback(1)(200, 300)
+        progress.callback(0)(300, 300)
+        report_to.assert_called_with(500, 1000)
+
+
+class TestS3Multipart(object):
+    def setup(self):
+        from scalarizr.storage2.cloudfs import s3
+        self.driver = s3.S3FileSystem(multipart_threshold=100, part_size=300)
+        self.bucket = mock.Mock()
+        self.driver._get_bucket = mock.Mock(return_value=self.bucket)
+        fd, self.path = tempfile.mkstemp()
+        os.write(fd, 'x' * 1000)
+        os.close(fd)
+
+    def teardown(self):
+        os.remove(self.path)
+
+    def test_put(self):
+        mp = self.bucket.initiate_multipart_upload.return_value
+        self.driver.put(self.path, 's3://backups/mysql/')
+
+        eq_(sorted(call[0][1] for call in mp.upload_part_from_file.call_args_list),
+            [1, 2, 3, 4])
+        eq_(sorted(call[1]['size'] for call in mp.upload_part_from_file.call_args_list),
+            [100, 300, 300, 300])
+        mp.complete_upload.assert_called_once_with()
+
+    @raises(base.DriverError)
+    def test_put_cancel(self):
+        mp = self.bucket.initiate_multipart_upload.return_value
+        mp.upload_part_from_file.side_effect = IOError('Connection reset')
+        try:
+            self.driver.put(self.path, 's3://backups/mysql/')
+        finally:
+            mp.cancel_upload.assert_called_once_with()
+            eq_(mp.complete_upload.call_count, 0)
@@ -106,10 +106,51 @@ class TestVolume(object):
             assert vol.mount.call_count == 0, "mount wasn't called"
 
 
+    @mock.patch.object(base.inventory, 'invalidate')
+    def test_ensure_invalidates_inventory(self, invalidate):
+        vol = base.Volume(device='/dev/sdb2')
+        with mock.patch.object(base.Volume, '_ensure') as _ensure:
+            _ensure.side_effect = lambda: invalidate.assert_not_called()
+            vol.ensure()
+        invalidate.assert_called_once_with()
+
+
     def test_ensure_with_mount_and_mkfs(self):
         pass
 
 
+    def test_grow_online(self):
+        vol = base.Volume(device='/dev/sdb', id='vol-1')
+        vol.features.update({'grow': True, 'grow_online': True})
+        with mock.patch.multiple(base.Volume, _grow_online=mock.DEFAULT, _resize_fs=mock.DEFAULT,
+                                 detach=mock.DEFAULT, clone=mock.DEFAULT):
+            vol._grow_online.return_value = True
+            assert vol.grow(size=2) is vol
+            vol._grow_online.assert_called_once_with(size=2)
+            vol._resize_fs.assert_called_once_with()
+            assert vol.detach.call_count == 0, "detach wasn't called"
+            assert vol.clone.call_count == 0, "clone wasn't called"
+
+
+    def test_grow_online_fallback(self):
+        vol = base.Volume(device='/dev/sdb', id='vol-1')
+        vol.features.update({'grow': True, 'grow_online': True})
+        with mock.patch.multiple(base.Volume, _grow_online=mock.DEFAULT, _grow=mock.DEFAULT,
+                                 detach=mock.DEFAULT, clone=mock.DEFAULT,
+                                 mounted_to=mock.DEFAULT):
+            vol._grow_online.return_value = False
+            new_vol = vol.grow(size=2, resize_fs=False)
+            assert new_vol is vol.clone.return_value
+            vol.detach.assert_called_once_with()
+            vol._grow.assert_called_once_with(new_vol, size=2)
+
+
+    def test_features_not_shared(self):
+        vol = base.Volume(device='/dev/sdb')
+        vol.features['grow'] = True
+        assert not base.Volume(device='/dev/sdc').features['grow']
+
+
 class TestSnapshot(object):
     def test_restore(self):
         pass
@@ -1,5 +1,9 @@
 import os
+import json
+import shutil
+import tempfile
 import unittest
+import cStringIO
 
 import mock
 
@@ -262,3 +266,123 @@ class EphSnapshotTest(unittest.TestCase):
         self.assertEqual(storage_drv.delete.mock_calls, drv_del_calls)
 
         rm.assert_called_once_with(manifest)
+
+
+    def test_destroy_thin_refused(self):
+        snap = eph.EphSnapshot(type='eph', path='http://test', block_size=4)
+        with mock.patch.object(eph.EphSnapshot, '_destroy') as destroy:
+            self.assertRaises(eph.storage2.StorageError, snap.destroy)
+            self.assertFalse(destroy.called)
+
+    def test_destroy_thin_forced(self):
+        snap = eph.EphSnapshot(type='eph', path='http://test', block_size=4)
+        with mock.patch.object(eph.EphSnapshot, '_destroy') as destroy:
+            snap.destroy(force=True)
+            destroy.assert_called_once_with()
+
+
+class EphLastSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.private_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.private_dir, 'storage'))
+        self.vol = eph.EphVolume(type='eph', thin=True, cloudfs_dir='s3://bucket/dir/')
+        self.write('mysql.json', dict(self.vol.config()))
+        self.write('redis.json', {'type': 'eph', 'id': 'eph-vol-other'})
+        mock.patch.object(eph, '__node__', {'private_dir': self.private_dir}).start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+        shutil.rmtree(self.private_dir)
+
+    def write(self, name, config):
+        with open(os.path.join(self.private_dir, 'storage', name), 'w') as fp:
+            json.dump(config, fp)
+
+    def read(self, name):
+        with open(os.path.join(self.private_dir, 'storage', name)) as fp:
+            return json.load(fp)
+
+    def test_saved_on_completed_upload(self):
+        snap = mock.Mock(COMPLETED='completed')
+        snap.status.return_value = 'completed'
+        snap.config.return_value = {'type': 'eph', 'id': 'eph-snap-1', 'path': 's3://p'}
+
+        self.vol._upload_thin_snapshot(snap, mock.Mock(), {}, None)
+
+        self.assertEqual(self.vol.last_snapshot, snap.config.return_value)
+        self.assertEqual(self.read('mysql.json')['last_snapshot'], snap.config.return_value)
+        self.assertEqual(self.read('mysql.json')['id'], self.vol.id)
+        self.assertFalse('last_snapshot' in self.read('redis.json'))
+
+    def test_not_saved_on_failed_upload(self):
+        snap = mock.Mock(COMPLETED='completed')
+        snap.status.return_value = 'failed'
+
+        self.vol._upload_thin_snapshot(snap, mock.Mock(), {}, None)
+
+        self.assertEqual(self.read('mysql.json')['last_snapshot'], None)
+
+
+class BlockMapTest(unittest.TestCase):
+
+    block_size = 4
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.device = os.path.join(self.tmp_dir, 'device')
+        self.write('aaaa\0\0\0\0bbbbcc')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, data):
+        with open(self.device, 'wb') as fp:
+            fp.write(data)
+
+    def test_scan_full(self):
+        blockmap = eph.BlockMap.scan(self.device, self.block_size)
+        self.assertEqual(blockmap.size, 14)
+        self.assertEqual(len(blockmap.blocks), 4)
+        self.assertEqual(blockmap.blocks[1], eph.ZERO_BLOCK)
+        # zero blocks are not uploaded into a full snapshot
+        self.assertEqual(blockmap.changed, [0, 2, 3])
+
+    def test_scan_delta(self):
+        previous = eph.BlockMap.scan(self.device, self.block_size)
+        self.write('aaaaxxxx\0\0\0\0cc')
+        blockmap = eph.BlockMap.scan(self.device, self.block_size, previous)
+        self.assertEqual(blockmap.changed, [1, 2])
+
+    def test_stream_and_apply(self):
+        previous = eph.BlockMap.scan(self.device, self.block_size)
+        self.write('aaaaxxxx\0\0\0\0cd')
+        blockmap = eph.BlockMap.scan(self.device, self.block_size, previous)
+
+        streams = blockmap.stream(self.device)
+        data = next(streams).read()
+        self.assertEqual(data, 'xxxx\0\0\0\0cd')
+        self.assertRaises(StopIteration, next, streams)
+
+        restored = os.path.join(self.tmp_dir, 'restored')
+        with open(restored, 'wb') as fp:
+            fp.write('aaaa\0\0\0\0bbbbcc')
+        with open(restored, 'r+b') as fp:
+            blockmap.apply(cStringIO.StringIO(data), fp)
+        with open(restored) as fp:
+            self.assertEqual(fp.read(), 'aaaaxxxx\0\0\0\0cd')
+
+    @mock.patch('scalarizr.storage2.volumes.eph.storage2')
+    def test_apply_truncated(self, storage2):
+        storage2.StorageError = Exception
+        blockmap = eph.BlockMap.scan(self.device, self.block_size)
+        with open(self.device, 'r+b') as fp:
+            self.assertRaises(Exception, blockmap.apply,
+                              cStringIO.StringIO('aaaabbbb'), fp)
+
+    def test_save_load(self):
+        blockmap = eph.BlockMap.scan(self.device, self.block_size)
+        url = 'file://%s/snap/blockmap.json' % self.tmp_dir
+        blockmap.save(url)
+        loaded = eph.BlockMap.load(url)
+        self.assertEqual(loaded.__dict__, blockmap.__dict__)
@@ -1,5 +1,6 @@
 
 import os
+import tempfile
 
 import mock
 
@@ -77,5 +78,21 @@ class TestLvmVolume(object):
 
         losetup_all.assert_called_once_with()
 
+    @mock.patch('scalarizr.linux.coreutils.losetup')
+    def test_grow_online(self, losetup):
+        fd, filename = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            with open(filename, 'w') as fp:
+                fp.truncate(10 * 1024 * 1024)
+            vol = storage2.volume(type='loop', id='vol-1', device='/dev/loop0',
+                                  file=filename, size=0.01)
+            assert vol.grow(size=0.02, resize_fs=False) is vol
+            assert os.path.getsize(filename) == 20 * 1024 * 1024
+            assert vol.size == 0.02
+            losetup.assert_called_once_with('/dev/loop0', set_capacity=True)
+        finally:
+            os.remove(filename)
+
     def test_restore(self):
         pass
@@ -247,3 +247,24 @@ class TestLvmVolume(unittest.TestCase):
         lvm2.lvextend.assert_called_once_with('/dev/mapper/data-vol1',
                                                                                   extents='98%FREE')
         fs.resize.assert_called_once_with('/dev/mapper/data-vol1')
+
+
+    def test_grow_offline_refused(self, lvm2, mod_mount):
+        vol = lvm.LvmVolume(id='lvm-1', name='vol1', vg='data',
+                            device='/dev/mapper/data-vol1')
+        with mock.patch.object(lvm.LvmVolume, 'detach') as detach:
+            self.assertRaises(storage2.StorageError, vol.grow,
+                              size='+1G', online=False)
+            assert not detach.called
+        assert not lvm2.vgremove.called
+        assert not lvm2.pvremove.called
+        assert not lvm2.lvextend.called
+
+
+    def test_grow_detached_refused(self, lvm2, mod_mount):
+        vol = lvm.LvmVolume(id='lvm-1', name='vol1', vg='data')
+        with mock.patch.object(lvm.LvmVolume, 'detach') as detach:
+            self.assertRaises(storage2.StorageError, vol.grow, size='+1G')
+            assert not detach.called
+        assert not lvm2.vgremove.called
+        assert not lvm2.pvremove.called
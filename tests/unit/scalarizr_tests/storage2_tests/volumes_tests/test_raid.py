@@ -196,6 +196,7 @@ class RaidVolumeTest(unittest.TestCase):
                                                     storage2, exists, rm, tfile, b64, op):
         disks_snaps = [dict(type='loop', size=0.01)]*2
         lvm2.pvs.side_effect = Exception
+        lvm2.lvpath.return_value = '/dev/mapper/test-lv'
         tempfile_mock = mock.MagicMock()
         tfile.mktemp.return_value = tempfile_mock
         raid_vol = raid.RaidVolume(type='raid',
@@ -216,6 +217,7 @@ class RaidVolumeTest(unittest.TestCase):
                                                     storage2, exists, rm, tfile, b64, op):
         disks = [mock.MagicMock() for _ in xrange(4)]
         storage2.volume.side_effect = disks
+        lvm2.lvpath.return_value = '/dev/mapper/test-lv'
         raid_vol = raid.RaidVolume(type='raid',
                                                 vg='test', level=1,
                                                 disks=disks, pv_uuid='pvuuid',
@@ -0,0 +1,59 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import mock
+from nose.tools import eq_, ok_
+
+from scalarizr import config
+
+
+class TestState(object):
+
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.tmp_dir, 'db.sqlite')
+        self.conn = self._connect()
+        self.conn.execute('CREATE TABLE state ('
+                '"name" TEXT PRIMARY KEY ON CONFLICT REPLACE, "value" TEXT)')
+        self.conn = mock.Mock(wraps=self.conn)
+        self.bus = mock.patch.object(config, 'bus').start()
+        self.bus.db = self.conn
+        self.state = config.State()
+
+    def teardown(self):
+        mock.patch.stopall()
+        shutil.rmtree(self.tmp_dir)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def test_cached(self):
+        self.state['global.version'] = '3.0.1'
+        self.conn.cursor.reset_mock()
+        for _ in range(10):
+            eq_(self.state['global.version'], '3.0.1')
+        eq_(self.conn.cursor.call_count, 0)
+
+    def test_missing_cached(self):
+        ok_(self.state['global.api_port'] is None)
+        calls = self.conn.cursor.call_count
+        ok_(self.state['global.api_port'] is None)
+        eq_(self.conn.cursor.call_count, calls)
+
+    def test_other_process_write(self):
+        self.state['global.api_port'] = 8010
+        eq_(self.state['global.api_port'], 8010)
+
+        other = self._connect()
+        other.execute('INSERT INTO state VALUES (?, ?)', ['global.api_port', '8011'])
+        other.commit()
+        # mtime resolution on some filesystems is 1 sec
+        os.utime(self.db_file, (0, 0))
+
+        eq_(self.state['global.api_port'], 8010)
+        self.state._checked_at = 0
+        eq_(self.state['global.api_port'], 8011)
@@ -1,9 +1,11 @@
 import os
+import shutil
+import tempfile
 
 import mock
 
 from scalarizr import node
-from nose.tools import raises, eq_
+from nose.tools import raises, eq_, ok_
 from nose.plugins.attrib import attr
 
 
@@ -146,3 +148,55 @@ class TestIni(object):
         finally:
             if os.path.exists(filename):
                 os.remove(filename)
+
+
+class TestBatch(object):
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, 'mysql.ini')
+        self.store = node.Ini(self.filename, 'mysql')
+        self.stats = mock.patch.dict(node.stats, {'stat': 0, 'parse': 0, 'write': 0})
+        self.stats.start()
+
+    def teardown(self):
+        self.stats.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_single_write(self):
+        mysql = node.Compound({'root_password,log_file,log_pos': self.store})
+        mysql.update({'root_password': 'secret', 'log_file': 'binlog.000001', 'log_pos': 107})
+        eq_(node.stats['write'], 1)
+        eq_(node.Ini(self.filename, 'mysql')['log_pos'], '107')
+        eq_(os.listdir(self.tmp_dir), ['mysql.ini'])
+
+    def test_discarded_on_error(self):
+        try:
+            with node.batch():
+                self.store['log_pos'] = 107
+                raise Exception('failed')
+        except Exception:
+            pass
+        ok_(not os.path.exists(self.filename))
+        raises(KeyError)(lambda: self.store['log_pos'])()
+
+    def test_stat_coalesced(self):
+        self.store['log_pos'] = 107
+        node.stats['stat'] = 0
+        for _ in range(10):
+            eq_(self.store['log_pos'], '107')
+        eq_(node.stats['stat'], 0)
+        eq_(node.stats['parse'], 0)
+
+    def test_write_seen_by_other_store(self):
+        other = node.IniOption(self.filename, 'mysql', 'log_pos')
+        self.store['log_pos'] = 107
+        eq_(other['log_pos'], '107')
+        self.store['log_pos'] = 108
+        eq_(other['log_pos'], '108')
+
+    def test_file_cached(self):
+        store = node.File(os.path.join(self.tmp_dir, '.scalr-version'))
+        store['version'] = '5.1'
+        eq_(store['version'], '5.1')
+        eq_(store['version'], '5.1')
+        eq_(node.stats['parse'], 1)
@@ -0,0 +1,82 @@
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import mock
+from nose.tools import eq_
+
+from scalarizr import rpc
+
+
+class MyService(object):
+
+    @rpc.query_method
+    def foo(self):
+        return 'bar'
+
+    @rpc.query_method
+    def echo(self, value=None):
+        return value
+
+    @rpc.query_method
+    def unserializable(self):
+        return object()
+
+
+class TestRequestHandler(object):
+
+    def setup(self):
+        self.handler = rpc.RequestHandler({'myservice': MyService()})
+
+    def _call(self, req):
+        return json.loads(self.handler.handle_request(json.dumps(req), namespace='myservice'))
+
+    def test_single(self):
+        eq_(self._call({'method': 'foo', 'params': {}, 'id': 1}),
+            {'result': 'bar', 'id': 1})
+
+    def test_batch(self):
+        resp = self._call([
+            {'method': 'foo', 'params': {}, 'id': 1},
+            {'method': 'echo', 'params': {'value': [1, 2]}, 'id': 2},
+            {'method': 'missing', 'params': {}, 'id': 3}])
+        eq_(len(resp), 3)
+        eq_(resp[0], {'result': 'bar', 'id': 1})
+        eq_(resp[1], {'result': [1, 2], 'id': 2})
+        eq_(resp[2]['id'], 3)
+        eq_(resp[2]['error']['code'], rpc.ServiceError.METHOD_NOT_FOUND)
+
+    def test_empty_batch(self):
+        resp = self._call([])
+        eq_(resp['error']['code'], rpc.ServiceError.INVALID_REQUEST)
+
+    def test_parse_error(self):
+        resp = json.loads(self.handler.handle_request('{not json', namespace='myservice'))
+        eq_(resp['error']['code'], rpc.ServiceError.PARSE)
+
+    def test_unserializable_result(self):
+        resp = self._call({'method': 'unserializable', 'params': {}, 'id': 1})
+        eq_(resp['id'], 1)
+        eq_(resp['error']['code'], rpc.ServiceError.INTERNAL)
+
+    def test_result_serialized_once(self):
+        with mock.patch.object(rpc.json, 'dumps', wraps=json.dumps) as dumps:
+            self.handler.handle_request({'method': 'foo', 'params': {}, 'id': 1},
+                                        namespace='myservice')
+        eq_(dumps.call_count, 1)
+
+
+class TestServiceProxyBatch(object):
+
+    def setup(self):
+        handler = rpc.RequestHandler({'myservice': MyService()})
+        self.proxy = rpc.ServiceProxy()
+        self.proxy.exchange = mock.Mock(
+            side_effect=lambda req: handler.handle_request(req, namespace='myservice'))
+
+    def test_batch(self):
+        results = self.proxy.myservice.batch([('foo', None), ('echo', {'value': 1}), ('missing', {})])
+        eq_(results[:2], ['bar', 1])
+        assert isinstance(results[2], rpc.ServiceError)
+        eq_(self.proxy.exchange.call_count, 1)
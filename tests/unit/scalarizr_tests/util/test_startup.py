@@ -0,0 +1,65 @@
+import os
+import sys
+import shutil
+import tempfile
+import __builtin__
+
+import mock
+from nose.tools import eq_, ok_
+
+from scalarizr.util import startup
+
+
+class TestImportProfiler(object):
+
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.tmp_dir, 'startup_outer.py'), 'w') as fp:
+            fp.write('import startup_inner\n')
+        with open(os.path.join(self.tmp_dir, 'startup_inner.py'), 'w') as fp:
+            fp.write('x = 1\n')
+        sys.path.insert(0, self.tmp_dir)
+        self.orig_import = __builtin__.__import__
+        self.profiler = startup.ImportProfiler()
+
+    def teardown(self):
+        self.profiler.uninstall()
+        sys.path.remove(self.tmp_dir)
+        for name in ('startup_outer', 'startup_inner'):
+            sys.modules.pop(name, None)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_stats(self):
+        self.profiler.install()
+        __import__('startup_outer')
+        __import__('startup_outer')
+        self.profiler.uninstall()
+        eq_(__builtin__.__import__, self.orig_import)
+
+        eq_(sorted(self.profiler.stats), ['startup_inner', 'startup_outer'])
+        outer_cum, outer_self = self.profiler.stats['startup_outer']
+        inner_cum, inner_self = self.profiler.stats['startup_inner']
+        eq_(inner_cum, inner_self)
+        ok_(outer_cum >= inner_cum)
+        ok_(abs(outer_self - (outer_cum - inner_cum)) < 1e-6)
+        ok_('startup_outer' in self.profiler.report())
+
+    def test_top(self):
+        self.profiler.stats = {'a': [3.0, 1.0], 'b': [2.0, 2.0], 'c': [0.5, 0.5]}
+        eq_(self.profiler.top(2), [('b', 2.0, 2.0), ('a', 3.0, 1.0)])
+
+    def test_profile_imports_disabled(self):
+        with mock.patch.dict(os.environ, clear=True):
+            ok_(not startup.profile_imports())
+        eq_(__builtin__.__import__, self.orig_import)
+
+
+@mock.patch.object(startup.time, 'time')
+def test_phase_timer(time):
+    time.side_effect = [10.0, 11.5, 14.0]
+    phases = startup.PhaseTimer()
+    phases.mark('config')
+    phases.mark('services')
+    eq_(phases.phases, [('config', 1.5), ('services', 2.5)])
+    eq_(phases.total, 4.0)
+    eq_(phases.report(), 'config: 1.50s, services: 2.50s')
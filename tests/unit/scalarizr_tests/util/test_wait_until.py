@@ -0,0 +1,68 @@
+import threading
+
+import mock
+from nose.tools import eq_, ok_, raises
+
+from scalarizr import util
+
+
+class TestWaitUntil(object):
+
+    def setup(self):
+        self.now = [100.0]
+        self.sleeps = []
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            self.now[0] += seconds
+        self.patches = [
+            mock.patch.object(util.time, 'time', side_effect=lambda: self.now[0]),
+            mock.patch.object(util.time, 'sleep', side_effect=sleep)]
+        for patch in self.patches:
+            patch.start()
+
+    def teardown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def test_fixed_sleep(self):
+        target = mock.Mock(side_effect=[False, False, True])
+        ok_(util.wait_until(target, sleep=5))
+        eq_(self.sleeps, [5, 5])
+
+    def test_backoff(self):
+        target = mock.Mock(side_effect=[False] * 5 + [True])
+        util.wait_until(target, sleep=0.5, backoff=2, max_sleep=3)
+        eq_(self.sleeps, [0.5, 1, 2, 3, 3])
+
+    def test_jitter(self):
+        target = mock.Mock(side_effect=[False] * 20 + [True])
+        util.wait_until(target, sleep=1, jitter=0.2)
+        ok_(all(0.8 <= s <= 1.2 for s in self.sleeps))
+        ok_(len(set(self.sleeps)) > 1)
+
+    def test_sleep_clipped_by_timeout(self):
+        ok_(not util.wait_until(lambda: False, sleep=4, timeout=10, raise_exc=False))
+        eq_(self.sleeps, [4, 4, 2])
+
+    @raises(BaseException)
+    def test_timeout(self):
+        util.wait_until(lambda: False, sleep=1, timeout=3)
+
+    def test_wakeup(self):
+        wakeup = mock.Mock(spec=['wait'])
+        target = mock.Mock(side_effect=[False, False, True])
+        util.wait_until(target, sleep=1, backoff=2, wakeup=wakeup)
+        eq_(wakeup.wait.call_args_list, [mock.call(1), mock.call(2)])
+        eq_(self.sleeps, [])
+
+
+def test_wakeup_event():
+    event = threading.Event()
+    state = {'ready': False}
+    def set_ready():
+        state['ready'] = True
+        event.set()
+    event.set()  # stale signal is cleared before the first check
+    threading.Timer(0.05, set_ready).start()
+    ok_(util.wait_until(lambda: state['ready'], sleep=30, timeout=5, wakeup=event))
+    ok_(not event.is_set())
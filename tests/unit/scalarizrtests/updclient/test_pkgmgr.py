@@ -1,7 +1,9 @@
 import os
 import sys
+import shutil
+import tempfile
 
-from mock import Mock
+from mock import Mock, patch
 
 sys.modules['requests'] = Mock()
 
@@ -48,3 +50,29 @@ class TestPkgMgr(object):
 
         assert len(packages) == 14
         assert packages.get('scalarizr')
+
+    def test_updatedb_cached(self):
+        repomd_file = os.path.join(fixtures_dir, 'repomd.xml')
+        primary_file = os.path.join(fixtures_dir, 'primary.xml.gz')
+
+        def get(query):
+            file = repomd_file if query.endswith("repomd.xml") else primary_file
+            result = Mock()
+            result.text = open(file).read()
+            result.content = open(file, 'rb').read()
+            return result
+        sys.modules['requests'].get = Mock(side_effect=get)
+
+        storage_dir = tempfile.mkdtemp()
+        try:
+            with patch.object(pkgmgr, 'STORAGE_DIR', storage_dir):
+                mgr = pkgmgr.YumManager("http://rpm.scalr.net/rpm/rhel/latest/x86_64/")
+                mgr.updatedb()
+                mgr.updatedb(names=['scalarizr-base'])
+        finally:
+            shutil.rmtree(storage_dir)
+
+        # primary.xml.gz downloaded only once
+        assert sys.modules['requests'].get.call_count == 3
+        assert len(mgr.packages) == 1
+        assert mgr.packages.get('scalarizr-base')